@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (AssetStaging.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Spot staging used by RenderShow.py
+#
+#Instead of deleting the project's imported audio folder and copying every spot into it
+#again on every run, the stager keeps a manifest of what it staged last time (source
+#path, size and modified time).  Spots that haven't changed since are left alone, new or
+#changed spots are linked or copied in, and anything that isn't used by this run anymore
+#is removed from the folder - apart from sidecar files (such as Reaper's peaks) of the spots
+#that are still used.
+#
+#Files are staged by the cheapest independent copy the file system supports: a reflink
+#(copy-on-write clone), then copy_file_range, and finally a regular copy.  Reaper's
+#destructive edits (and anything else that opens a staged spot for writing) change the file
+#in the project folder, so a staged spot that's hardlinked to the asset library would change
+#the library too - hardlinks are only used when asked for with StageModeLink.  Every file is
+#written to a temporary name and renamed into place, so a hardlinked file is never written
+#through by the stager itself.
+#
+
+import os
+import sys
+import json
+import shutil
+import concurrent.futures
+
+conManifestFilename = ".staging.json"
+conFICLONE = 0x40049409 #linux ioctl used to reflink a file
+
+StageModeCopy = "copy" #always an independent copy (reflink if possible)
+StageModeLink = "link" #hardlink if possible, otherwise an independent copy
+
+class StagingStats:
+	def __init__(self):
+		self.intSkipped = 0
+		self.intLinked = 0
+		self.intReflinked = 0
+		self.intCopied = 0
+		self.intRemoved = 0
+		self.intBytesCopied = 0
+
+	def __str__(self):
+		return "%i unchanged, %i hardlinked, %i reflinked, %i copied (%i bytes), %i removed" % (self.intSkipped, self.intLinked, self.intReflinked, self.intCopied, self.intBytesCopied, self.intRemoved)
+
+def FileSignature(strPath):
+	objStat = os.stat(strPath)
+	return [objStat.st_size, objStat.st_mtime_ns]
+
+def Reflink(strSrcPath, strDestPath):
+	if not sys.platform.startswith("linux"):
+		return False
+	import fcntl
+	with open(strSrcPath, "rb") as fSrc, open(strDestPath, "wb") as fDest:
+		try:
+			fcntl.ioctl(fDest.fileno(), conFICLONE, fSrc.fileno())
+			return True
+		except OSError:
+			return False
+
+def CopyFileRange(strSrcPath, strDestPath):
+	#kernel-side copy where it's available, a regular buffered copy otherwise
+	if not hasattr(os, "copy_file_range"):
+		shutil.copyfile(strSrcPath, strDestPath)
+		return
+	with open(strSrcPath, "rb") as fSrc, open(strDestPath, "wb") as fDest:
+		intRemaining = os.fstat(fSrc.fileno()).st_size
+		try:
+			while intRemaining > 0:
+				intCopied = os.copy_file_range(fSrc.fileno(), fDest.fileno(), intRemaining)
+				if intCopied == 0:
+					break
+				intRemaining -= intCopied
+		except OSError:
+			intRemaining = -1
+	if intRemaining != 0:
+		shutil.copyfile(strSrcPath, strDestPath)
+
+def LinkOrCopy(strSrcPath, strDestPath, blnAllowHardlink=True):
+	#put a copy of the source at the destination by the cheapest method available and return
+	#	which one was used ("link", "reflink" or "copy")
+	strDestFolder = os.path.dirname(strDestPath)
+	if strDestFolder:
+		os.makedirs(strDestFolder, exist_ok=True)
+	strTempPath = strDestPath + ".staging"
+	try:
+		os.remove(strTempPath)
+	except OSError:
+		pass
+
+	strMethod = ""
+	if blnAllowHardlink:
+		try:
+			os.link(strSrcPath, strTempPath)
+			strMethod = "link"
+		except OSError:
+			pass
+	if not strMethod:
+		if Reflink(strSrcPath, strTempPath):
+			strMethod = "reflink"
+		else:
+			CopyFileRange(strSrcPath, strTempPath)
+			strMethod = "copy"
+		#keep the source's modified time so the copy can be matched to it later
+		shutil.copystat(strSrcPath, strTempPath)
+	os.replace(strTempPath, strDestPath)
+	return strMethod
+
+class AssetStager:
+	def __init__(self, strStagingRoot, strMode=StageModeCopy, intWorkers=4, tupSidecars=()):
+		self.strStagingRoot = strStagingRoot
+		self.tupSidecars = tupSidecars #extensions of files kept next to a staged spot, e.g. its peaks
+		self.strManifestPath = os.path.join(strStagingRoot, conManifestFilename)
+		self.strMode = strMode
+		self.intWorkers = max(1, intWorkers)
+		self.dictRequests = {} #destination path -> source path
+		self.dictManifest = {}
+		self.objStats = StagingStats()
+		try:
+			with open(self.strManifestPath, "r") as fManifest:
+				self.dictManifest = json.load(fManifest)
+		except (OSError, ValueError):
+			self.dictManifest = {}
+
+	def Add(self, strSrcPath, strDestPath):
+		#queue a spot to be staged - nothing is copied until Run()
+		self.dictRequests[os.path.normpath(strDestPath)] = strSrcPath
+
+	def IsCurrent(self, strDestPath, strSrcPath, lstSrcSignature):
+		#the staged file is up to date if it came from the same source, the source hasn't changed
+		#	since, and nobody has touched the staged file
+		dictEntry = self.dictManifest.get(self.ManifestKey(strDestPath))
+		if not dictEntry or dictEntry.get("src") != strSrcPath or dictEntry.get("srcsig") != lstSrcSignature:
+			return False
+		try:
+			return FileSignature(strDestPath) == dictEntry.get("destsig")
+		except OSError:
+			return False
+
+	def ManifestKey(self, strDestPath):
+		return os.path.relpath(strDestPath, self.strStagingRoot)
+
+	def StageFile(self, strSrcPath, strDestPath):
+		#runs on a worker thread - returns the method used
+		return LinkOrCopy(strSrcPath, strDestPath, self.strMode == StageModeLink)
+
+	def Run(self):
+		dictNewManifest = {}
+		lstToStage = []
+		for strDestPath, strSrcPath in self.dictRequests.items():
+			lstSrcSignature = FileSignature(strSrcPath)
+			if self.IsCurrent(strDestPath, strSrcPath, lstSrcSignature):
+				self.objStats.intSkipped += 1
+				dictNewManifest[self.ManifestKey(strDestPath)] = self.dictManifest[self.ManifestKey(strDestPath)]
+			else:
+				lstToStage.append((strSrcPath, strDestPath, lstSrcSignature))
+
+		with concurrent.futures.ThreadPoolExecutor(max_workers=self.intWorkers) as objPool:
+			dictFutures = {objPool.submit(self.StageFile, strSrcPath, strDestPath): (strSrcPath, strDestPath, lstSrcSignature) for strSrcPath, strDestPath, lstSrcSignature in lstToStage}
+			for objFuture in concurrent.futures.as_completed(dictFutures):
+				strSrcPath, strDestPath, lstSrcSignature = dictFutures[objFuture]
+				strMethod = objFuture.result()
+				if strMethod == "link":
+					self.objStats.intLinked += 1
+				elif strMethod == "reflink":
+					self.objStats.intReflinked += 1
+				else:
+					self.objStats.intCopied += 1
+					self.objStats.intBytesCopied += lstSrcSignature[0]
+				dictNewManifest[self.ManifestKey(strDestPath)] = {"src": strSrcPath, "srcsig": lstSrcSignature, "destsig": FileSignature(strDestPath), "method": strMethod}
+
+		self.Prune()
+		self.dictManifest = dictNewManifest
+		os.makedirs(self.strStagingRoot, exist_ok=True)
+		with open(self.strManifestPath, "w") as fManifest:
+			json.dump(self.dictManifest, fManifest, indent=1, sort_keys=True)
+		return self.objStats
+
+	def IsSidecar(self, strPath):
+		#a file that belongs to one of the staged spots
+		for strExtension in self.tupSidecars:
+			if strPath.endswith(strExtension) and strPath[:-len(strExtension)] in self.dictRequests:
+				return True
+		return False
+
+	def Prune(self):
+		#remove everything in the staging folder that this run didn't ask for
+		if not os.path.isdir(self.strStagingRoot):
+			return
+		for strDirPath, lstDirNames, lstFileNames in os.walk(self.strStagingRoot, topdown=False):
+			for strFileName in lstFileNames:
+				strPath = os.path.normpath(os.path.join(strDirPath, strFileName))
+				if strPath not in self.dictRequests and strPath != os.path.normpath(self.strManifestPath) and not self.IsSidecar(strPath):
+					os.remove(strPath)
+					self.objStats.intRemoved += 1
+			if strDirPath != self.strStagingRoot and not os.listdir(strDirPath):
+				os.rmdir(strDirPath)
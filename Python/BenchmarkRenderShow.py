@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (BenchmarkRenderShow.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Synthetic-project benchmark for the RenderShow.py pipeline
+#
+#Generates master projects of controlled size (markers, IMPORT items, tracks with large
+#embedded plugin chunks) and a WAV spot tree for each station, then runs RenderShow.py on them
+#- the same load, plan, write, stage and render scheduling a real show goes through - with
+#--trace, and reports how long each traced phase took.  Reaper is replaced by this script's
+#--fakerender, which writes a silent WAV as long as the station project, so the renders cost
+#next to nothing and everything around them is what's measured.
+#
+#Every case is run twice: cold (empty caches, nothing staged, every station rendered) and warm
+#(nothing changed, so the spots are already staged and the renders come from the render cache).
+#A phase's time is its own, without the phases traced inside it, and every run lists the main
+#phases of the pipeline (parse, marker extraction, item rewriting, duration probing, asset
+#staging and project write) separately.  Results are written as JSON so runs from different versions can be compared, e.g.:
+#	python BenchmarkRenderShow.py --stations 10,100,500 --markers 1000 --output bench.json
+#
+
+import os
+import sys
+import json
+import time
+import wave
+import shlex
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+import RppProject
+
+conTrackName = "Station VT"
+conProcessKeyword = "IMPORT "
+conOptionDesignator = "-"
+conMasterFilename = "show-master.RPP"
+conFakeRenderRate = 100 #sample rate of the fake renders - the length is all that's checked
+#the pipeline's phases and the spans they're traced as - every run reports all of them, even
+#	the ones it didn't get to (the warm run doesn't probe anything)
+conPipelinePhases = (("parse", "parse master"), ("marker extraction", "extract markers"), ("item rewriting", "rewrite items"), ("duration probing", "probe"),
+	("asset staging", "stage spots"), ("project write", "write project"))
+
+def WriteWav(strPath, fltSeconds, intRate=44100, intChannels=2):
+	os.makedirs(os.path.dirname(strPath), exist_ok=True)
+	with wave.open(strPath, "wb") as fWav:
+		fWav.setnchannels(intChannels)
+		fWav.setsampwidth(2)
+		fWav.setframerate(intRate)
+		fWav.writeframes(b"\0\0" * intChannels * int(round(fltSeconds * intRate)))
+
+def ItemLines(strIndent, fltPosition, fltLength, strName, strFile):
+	return [strIndent + "<ITEM", strIndent + "  POSITION %s" % fltPosition, strIndent + "  SNAPOFFS 0", strIndent + "  LENGTH %s" % fltLength,
+		strIndent + "  LOOP 1", strIndent + "  ALLTAKES 0", strIndent + "  FADEIN 1 0 0 1 0 0 0", strIndent + "  FADEOUT 1 0 0 1 0 0 0",
+		strIndent + "  MUTE 0 0", strIndent + "  SEL 0", strIndent + "  IGUID {00000000-0000-0000-0000-000000000000}", strIndent + "  IID 1",
+		strIndent + "  VOLPAN 1 0 1 -1", strIndent + "  NAME \"%s\"" % strName, strIndent + "  SOFFS 0", strIndent + "  PLAYRATE 1 1 0 -1 0 0.0025",
+		strIndent + "  CHANMODE 0", strIndent + "  GUID {00000000-0000-0000-0000-000000000000}", strIndent + "  <SOURCE WAVE",
+		strIndent + "    FILE \"%s\"" % strFile, strIndent + "  >", strIndent + ">"]
+
+def GenerateMaster(strPath, intMarkers, intTracks, intItemsPerTrack, intChunkKB):
+	#markers alternate between plain, end snapped and random spots - returns the spot names and options
+	lstSpots = []
+	lstLines = ["<REAPER_PROJECT 0.1 \"6.0/x64\" 1600000000", "  RIPPLE 0", "  SAMPLERATE 44100 0 0", "  CURSOR 812.3", "  ZOOM 2.5 100 0", "  VZOOMEX 6 0",
+		"  RENDER_FILE \"show.mp3\"", "  <RENDER_CFG", "    ZXZhdxAA", "  >"]
+	for intMarker in range(intMarkers):
+		strOptions = ("", "e", "r", "re")[intMarker % 4]
+		strName = "spot %i" % intMarker
+		lstSpots.append((strName, strOptions, 30.0 * (intMarker + 1)))
+		lstLines.append("  MARKER %i %s \"IMPORT %s%s\" 0 0 1 B {%08X-0000-0000-0000-000000000000} 0" % (intMarker + 1, 30.0 * (intMarker + 1), strName, ("-" + strOptions) if strOptions else "", intMarker))
+	fltShowLength = 30.0 * (intMarkers + 2)
+
+	#program tracks with big opaque plugin state chunks
+	strChunkLine = "      " + "A" * 76
+	for intTrack in range(intTracks):
+		lstLines += ["  <TRACK {%08X-0000-0000-0000-000000000001}" % intTrack, "    NAME \"Music %i\"" % intTrack, "    VOLPAN 1 0 -1 -1 1", "    <FXCHAIN", "      <VST \"VST: ReaEQ (Cockos)\" reaeq.dll 0 \"\" 1919247729"]
+		lstLines += [strChunkLine] * (intChunkKB * 1024 // len(strChunkLine))
+		lstLines += ["      >", "    >"]
+		for intItem in range(intItemsPerTrack):
+			fltLength = fltShowLength / intItemsPerTrack
+			lstLines += ItemLines("    ", intItem * fltLength, fltLength, "music %i-%i" % (intTrack, intItem), "Audio/music-%i-%i.wav" % (intTrack, intItem))
+		lstLines.append("  >")
+
+	lstLines += ["  <TRACK {FFFFFFFF-0000-0000-0000-000000000001}", "    NAME \"%s\"" % conTrackName, "    VOLPAN 1 0 -1 -1 1"]
+	for strName, strOptions, fltPosition in lstSpots:
+		lstLines += ItemLines("    ", fltPosition, 5, "IMPORT " + strName, "Audio/Template/5-SecondSilence.wav")
+	lstLines += ["  >", ">"]
+
+	os.makedirs(os.path.dirname(strPath), exist_ok=True)
+	with open(strPath, "w") as fMaster:
+		fMaster.write("\n".join(lstLines) + "\n")
+	return lstSpots
+
+def GenerateSpots(strAssetsPath, lstStations, lstSpots, intRandomSpots, fltSpotSeconds):
+	#one WAV per station for every general spot plus the random spot folder, and the silence the
+	#	template station is made with
+	intRandomNeeded = sum(1 for _, strOptions, _ in lstSpots if "r" in strOptions)
+	for strStation in lstStations:
+		for strName, strOptions, _ in lstSpots:
+			if "r" not in strOptions:
+				WriteWav(os.path.join(strAssetsPath, "Audio", strStation, "General", "%s-%s.wav" % (strStation, strName)), fltSpotSeconds)
+		for intSpot in range(max(intRandomSpots, intRandomNeeded)):
+			WriteWav(os.path.join(strAssetsPath, "Audio", strStation, "Random spots", "%s-random%i.wav" % (strStation, intSpot)), fltSpotSeconds)
+	WriteWav(os.path.join(strAssetsPath, "Audio", "General", "5-SecondSilence.wav"), 5.0)
+
+def FakeRender(strProjectPath):
+	#stands in for Reaper - a silent WAV at the project's RENDER_FILE, as long as the project
+	objProject = RppProject.ParseProject(strProjectPath, conTrackName, conProcessKeyword, conOptionDesignator)
+	strOutputPath = shlex.split(objProject.lstLines[objProject.RootElement("RENDER_FILE")].strip())[1]
+	WriteWav(strOutputPath, objProject.Length(), conFakeRenderRate, 1)
+
+def TracePhases(strTracePath):
+	#{span name: seconds} added up over a --trace file - a span's own time leaves out the spans
+	#	inside it on the same thread, so nested phases (the markers extracted while the master
+	#	is parsed, the items rewritten for each station...) aren't counted twice
+	with open(strTracePath, "r") as fTrace:
+		lstEvents = json.load(fTrace)["traceEvents"]
+	lstSpans = sorted((dictEvent for dictEvent in lstEvents if dictEvent.get("ph") == "X"), key=lambda dictEvent: (dictEvent["tid"], dictEvent["ts"], -dictEvent["dur"]))
+	dictPhases = {}
+	lstOpen = [] #(thread, end, name) of the spans the next one could be inside
+	for dictEvent in lstSpans:
+		while lstOpen and (lstOpen[-1][0] != dictEvent["tid"] or lstOpen[-1][1] <= dictEvent["ts"]):
+			lstOpen.pop()
+		fltSeconds = dictEvent["dur"] / 1000000.0
+		dictPhases[dictEvent["name"]] = dictPhases.get(dictEvent["name"], 0.0) + fltSeconds
+		if lstOpen:
+			dictPhases[lstOpen[-1][2]] -= fltSeconds
+		lstOpen.append((dictEvent["tid"], dictEvent["ts"] + dictEvent["dur"], dictEvent["name"]))
+	return dictPhases
+
+def RunShow(lstShowArgs, strTracePath):
+	#run RenderShow.py once - returns (seconds, traced phases)
+	strScriptPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "RenderShow.py")
+	fltStart = time.perf_counter()
+	objResult = subprocess.run([sys.executable, strScriptPath] + lstShowArgs + ["--trace", strTracePath], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+	fltSeconds = time.perf_counter() - fltStart
+	if objResult.returncode != 0 or not os.path.isfile(strTracePath):
+		raise RuntimeError("RenderShow.py failed:\n" + objResult.stdout[-4000:])
+	return fltSeconds, TracePhases(strTracePath)
+
+def RunCase(strWorkPath, intStations, intMarkers, intTracks, intItemsPerTrack, intChunkKB, fltSpotSeconds, intSeed, intWorkers, lstExtraArgs):
+	strCasePath = os.path.join(strWorkPath, "case-%i-%i" % (intStations, intMarkers))
+	#RenderShow.py takes the show number and DJ from the folder the project folder is in
+	strProjectPath = os.path.join(strCasePath, "show %i - Benchmark" % intMarkers, "Show")
+	strAssetsPath = os.path.join(strCasePath, "Assets")
+	strRenderPath = os.path.join(strCasePath, "Renders")
+	strMasterPath = os.path.join(strProjectPath, conMasterFilename)
+	lstStations = ["st%03i" % intStation for intStation in range(intStations)]
+
+	fltStart = time.perf_counter()
+	lstSpots = GenerateMaster(strMasterPath, intMarkers, intTracks, intItemsPerTrack, intChunkKB)
+	GenerateSpots(strAssetsPath, lstStations, lstSpots, 8, fltSpotSeconds)
+	os.makedirs(strRenderPath, exist_ok=True)
+	fltGenerateTime = time.perf_counter() - fltStart
+
+	strRenderCommand = " ".join("\"%s\"" % strToken for strToken in (sys.executable, os.path.abspath(__file__), "--fakerender", "{project}"))
+	lstShowArgs = ["--projectpath", strProjectPath, "--assetspath", strAssetsPath, "--renderpath", strRenderPath, "--projectfile", conMasterFilename,
+		"--stations", ",".join(lstStations), "--scriptversion", "3", "--renderformat", "wav", "--rendercommand", strRenderCommand,
+		"--renderworkers", str(intWorkers), "--seed", str(intSeed)] + lstExtraArgs
+	dictRuns = {}
+	for strRun in ("cold", "warm"):
+		fltSeconds, dictPhases = RunShow(lstShowArgs, os.path.join(strCasePath, "trace-%s.json" % strRun))
+		#a station that didn't render would make the run look faster than it is
+		lstMissing = [strStation for strStation in lstStations if not any(strStation in strFileName for strFileName in os.listdir(strRenderPath))]
+		if lstMissing:
+			raise RuntimeError("the %s run didn't render %s" % (strRun, ", ".join(lstMissing)))
+		dictRuns[strRun] = {"seconds": round(fltSeconds, 6), "phases": {strPhase: round(fltSeconds, 6) for strPhase, fltSeconds in sorted(dictPhases.items())},
+			"pipeline": {strPhase: round(dictPhases.get(strSpan, 0.0), 6) for strPhase, strSpan in conPipelinePhases}}
+
+	intMasterBytes = os.path.getsize(strMasterPath)
+	shutil.rmtree(strCasePath, True)
+	fltWriteSeconds = dictRuns["cold"]["phases"].get("write project", 0.0)
+	return {
+		"stations": intStations,
+		"markers": intMarkers,
+		"tracks": intTracks,
+		"items_per_track": intItemsPerTrack,
+		"chunk_kb": intChunkKB,
+		"master_bytes": intMasterBytes,
+		"generate_seconds": round(fltGenerateTime, 6),
+		"runs": dictRuns,
+		"write_mb_per_second": round(intMasterBytes * intStations / 1048576.0 / max(fltWriteSeconds, 1e-9), 1),
+	}
+
+def ScriptVersion():
+	try:
+		return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True).stdout.strip()
+	except OSError:
+		return ""
+
+if __name__ == "__main__":
+	objCLParser = argparse.ArgumentParser(description="Times each phase of the RenderShow pipeline on synthetic projects")
+	objCLParser.add_argument("--stations", default="10,100", metavar="[counts]", help="comma separated station counts to run (default=10,100)")
+	objCLParser.add_argument("--markers", default="200", metavar="[counts]", help="comma separated IMPORT marker counts to run (default=200)")
+	objCLParser.add_argument("--tracks", type=int, default=20, metavar="[count]", help="program tracks in the master (default=20)")
+	objCLParser.add_argument("--items", type=int, default=50, metavar="[count]", help="items on each program track (default=50)")
+	objCLParser.add_argument("--chunkkb", type=int, default=256, metavar="[KB]", help="size of the plugin chunk on each program track (default=256)")
+	objCLParser.add_argument("--spotseconds", type=float, default=1.0, metavar="[sec]", help="length of the generated spots (default=1)")
+	objCLParser.add_argument("--seed", type=int, default=1, metavar="[number]", help="random seed for the spots RenderShow.py picks (default=1)")
+	objCLParser.add_argument("--renderworkers", type=int, default=4, metavar="[count]", help="stations rendered at the same time (default=4)")
+	objCLParser.add_argument("--showargs", default="", metavar="[arguments]", help="more arguments for RenderShow.py, given with = e.g. --showargs=\"--writemode text\"")
+	objCLParser.add_argument("--workpath", metavar="[path]", help="where the synthetic projects are generated (default=a temporary folder)")
+	objCLParser.add_argument("--output", metavar="[file]", help="write the results as JSON to this file instead of the console")
+	objCLParser.add_argument("--fakerender", metavar="[project]", help=argparse.SUPPRESS)
+	objCLArgs = objCLParser.parse_args()
+
+	if objCLArgs.fakerender:
+		#run by RenderShow.py as the render command
+		FakeRender(objCLArgs.fakerender)
+		sys.exit()
+
+	strWorkPath = objCLArgs.workpath or tempfile.mkdtemp(prefix="rendershow-bench-")
+	lstResults = []
+	for intMarkers in [int(strCount) for strCount in objCLArgs.markers.split(",")]:
+		for intStations in [int(strCount) for strCount in objCLArgs.stations.split(",")]:
+			print("Running %i station(s) with %i marker(s)..." % (intStations, intMarkers), file=sys.stderr)
+			lstResults.append(RunCase(strWorkPath, intStations, intMarkers, objCLArgs.tracks, objCLArgs.items, objCLArgs.chunkkb, objCLArgs.spotseconds, objCLArgs.seed,
+				objCLArgs.renderworkers, shlex.split(objCLArgs.showargs)))
+	if not objCLArgs.workpath:
+		shutil.rmtree(strWorkPath, True)
+
+	dictReport = {
+		"version": ScriptVersion(),
+		"python": platform.python_version(),
+		"platform": platform.platform(),
+		"results": lstResults,
+	}
+	if objCLArgs.output:
+		with open(objCLArgs.output, "w") as fOutput:
+			json.dump(dictReport, fOutput, indent=1)
+	else:
+		print(json.dumps(dictReport, indent=1))
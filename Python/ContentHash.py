@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (ContentHash.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#File content hashes used by RenderShow.py's caches
+#
+#Hashing a multi-hour show's music every run would cost more than it saves, so the hashes
+#are kept in an on-disk index keyed by path, size and modified time.  A file is only read
+#again when one of those changes.
+#
+
+import os
+import json
+import hashlib
+import threading
+
+conIndexFilename = "hashes.json"
+conHashBlockSize = 1024 * 1024
+
+def HashFile(strPath):
+	objHash = hashlib.sha256()
+	with open(strPath, "rb") as fFile:
+		while True:
+			bytBlock = fFile.read(conHashBlockSize)
+			if not bytBlock:
+				break
+			objHash.update(bytBlock)
+	return objHash.hexdigest()
+
+class ContentHashIndex:
+	def __init__(self, strCachePath=None):
+		#strCachePath is the folder the index is kept in - None keeps the index in memory only
+		self.strIndexPath = os.path.join(strCachePath, conIndexFilename) if strCachePath else None
+		self.dictIndex = {}
+		self.blnDirty = False
+		self.objLock = threading.Lock()
+		self.intBytesHashed = 0
+		if self.strIndexPath:
+			try:
+				with open(self.strIndexPath, "r") as fIndex:
+					self.dictIndex = json.load(fIndex)
+			except (OSError, ValueError):
+				self.dictIndex = {}
+
+	def Get(self, strPath):
+		strKey = os.path.normcase(os.path.abspath(strPath))
+		objStat = os.stat(strPath)
+		with self.objLock:
+			lstEntry = self.dictIndex.get(strKey)
+			if lstEntry and lstEntry[0] == objStat.st_size and lstEntry[1] == objStat.st_mtime_ns:
+				return lstEntry[2]
+
+		strHash = HashFile(strPath)
+		with self.objLock:
+			self.intBytesHashed += objStat.st_size
+			self.dictIndex[strKey] = [objStat.st_size, objStat.st_mtime_ns, strHash]
+			self.blnDirty = True
+		return strHash
+
+	def Save(self):
+		if not self.strIndexPath or not self.blnDirty:
+			return
+		with self.objLock:
+			os.makedirs(os.path.dirname(self.strIndexPath), exist_ok=True)
+			strTempPath = self.strIndexPath + ".tmp"
+			with open(strTempPath, "w") as fIndex:
+				json.dump(self.dictIndex, fIndex)
+			os.replace(strTempPath, self.strIndexPath)
+			self.blnDirty = False
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (Id3Tag.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#ID3 tagging used by RenderShow.py (replaces the bundled id3.exe)
+#
+#Writes an ID3v2.3 or v2.4 tag at the start of an MP3 and fixes up (or adds) the ID3v1
+#tag at the end.  If the file already has an ID3v2 tag that's big enough, the new tag is
+#written over it in place and the rest of the old tag is left as padding, so only the tag
+#region is touched.  If there's no room the file is rewritten once with the new tag plus
+#padding for next time.  Frames in an existing tag that we don't set are kept.
+#
+#TagFiles() tags a batch of files on a thread pool.
+#
+
+import os
+import struct
+import shutil
+import concurrent.futures
+
+conPaddingBytes = 2048 #padding added when a tag has to be grown
+conCopyBlockSize = 1024 * 1024
+
+#the standard ID3v1 genres - anything else is written as "unknown" (255) in the ID3v1 tag
+lstID3v1Genres = ["Blues", "Classic Rock", "Country", "Dance", "Disco", "Funk", "Grunge", "Hip-Hop", "Jazz", "Metal",
+	"New Age", "Oldies", "Other", "Pop", "R&B", "Rap", "Reggae", "Rock", "Techno", "Industrial",
+	"Alternative", "Ska", "Death Metal", "Pranks", "Soundtrack", "Euro-Techno", "Ambient", "Trip-Hop", "Vocal", "Jazz+Funk",
+	"Fusion", "Trance", "Classical", "Instrumental", "Acid", "House", "Game", "Sound Clip", "Gospel", "Noise",
+	"AlternRock", "Bass", "Soul", "Punk", "Space", "Meditative", "Instrumental Pop", "Instrumental Rock", "Ethnic", "Gothic",
+	"Darkwave", "Techno-Industrial", "Electronic", "Pop-Folk", "Eurodance", "Dream", "Southern Rock", "Comedy", "Cult", "Gangsta",
+	"Top 40", "Christian Rap", "Pop/Funk", "Jungle", "Native American", "Cabaret", "New Wave", "Psychadelic", "Rave", "Showtunes",
+	"Trailer", "Lo-Fi", "Tribal", "Acid Punk", "Acid Jazz", "Polka", "Retro", "Musical", "Rock & Roll", "Hard Rock"]
+
+class Id3Error(Exception):
+	pass
+
+def SyncsafeEncode(intValue):
+	return bytes([(intValue >> 21) & 0x7F, (intValue >> 14) & 0x7F, (intValue >> 7) & 0x7F, intValue & 0x7F])
+
+def SyncsafeDecode(bytValue):
+	return (bytValue[0] << 21) | (bytValue[1] << 14) | (bytValue[2] << 7) | bytValue[3]
+
+def TextFrameData(strText, intVersion):
+	#v2.4 can use UTF-8, v2.3 only has latin-1 and UTF-16
+	if intVersion == 4:
+		return b"\x03" + strText.encode("utf-8")
+	try:
+		return b"\x00" + strText.encode("latin-1")
+	except UnicodeEncodeError:
+		return b"\x01" + strText.encode("utf-16")
+
+def Frame(strFrameId, bytData, intVersion):
+	bytSize = SyncsafeEncode(len(bytData)) if intVersion == 4 else struct.pack(">I", len(bytData))
+	return strFrameId.encode("latin-1") + bytSize + b"\x00\x00" + bytData
+
+def ReadTagHeader(fFile):
+	#(major version, flags, total tag size including the header) - None if there's no ID3v2 tag
+	fFile.seek(0)
+	bytHeader = fFile.read(10)
+	if len(bytHeader) < 10 or bytHeader[:3] != b"ID3" or any(intByte & 0x80 for intByte in bytHeader[6:10]):
+		return None
+	intSize = 10 + SyncsafeDecode(bytHeader[6:10])
+	if bytHeader[5] & 0x10:
+		#footer present
+		intSize += 10
+	return (bytHeader[3], bytHeader[5], intSize)
+
+def ReadFrames(fFile, tupHeader):
+	#the raw frames of an existing tag in the same layout we write - empty if it can't be kept as-is
+	intVersion, intFlags, intSize = tupHeader
+	if intVersion not in (3, 4) or intFlags & 0xC0:
+		#unsynchronised tags and extended headers are simply replaced
+		return []
+	fFile.seek(10)
+	bytBody = fFile.read(intSize - 10 - (10 if intFlags & 0x10 else 0))
+	lstFrames = []
+	intPosition = 0
+	while intPosition + 10 <= len(bytBody) and bytBody[intPosition] != 0:
+		strFrameId = bytBody[intPosition:intPosition + 4].decode("latin-1")
+		bytSize = bytBody[intPosition + 4:intPosition + 8]
+		intFrameSize = SyncsafeDecode(bytSize) if intVersion == 4 else struct.unpack(">I", bytSize)[0]
+		intEnd = intPosition + 10 + intFrameSize
+		if intEnd > len(bytBody):
+			break
+		lstFrames.append((strFrameId, bytBody[intPosition:intEnd]))
+		intPosition = intEnd
+	return lstFrames
+
+def BuildTag(dictFrames, lstExistingFrames, intVersion, intMinSize):
+	#dictFrames maps frame ids (TIT2, TPE1, TCON...) to text - existing frames that aren't being
+	#	set are carried over, and the tag is padded out to at least intMinSize bytes
+	bytFrames = b"".join(bytFrame for strFrameId, bytFrame in lstExistingFrames if strFrameId not in dictFrames)
+	bytFrames += b"".join(Frame(strFrameId, TextFrameData(strText, intVersion), intVersion) for strFrameId, strText in dictFrames.items() if strText)
+	intSize = intMinSize if 10 + len(bytFrames) <= intMinSize else 10 + len(bytFrames) + conPaddingBytes
+	return b"ID3" + bytes([intVersion, 0, 0]) + SyncsafeEncode(intSize - 10) + bytFrames + b"\x00" * (intSize - 10 - len(bytFrames))
+
+def ID3v1Tag(dictFrames):
+	def Field(strText, intLength):
+		return strText.encode("latin-1", "replace")[:intLength].ljust(intLength, b"\x00")
+	strGenre = dictFrames.get("TCON", "")
+	intGenre = lstID3v1Genres.index(strGenre) if strGenre in lstID3v1Genres else 255
+	strYear = dictFrames.get("TYER", dictFrames.get("TDRC", ""))[:4]
+	return b"TAG" + Field(dictFrames.get("TIT2", ""), 30) + Field(dictFrames.get("TPE1", ""), 30) + Field(dictFrames.get("TALB", ""), 30) + \
+		Field(strYear, 4) + Field(dictFrames.get("COMM", ""), 30) + bytes([intGenre])
+
+def TagFile(strPath, dictFrames, intVersion=3, blnID3v1=True):
+	if intVersion not in (3, 4):
+		raise Id3Error("ID3v2.%i isn't supported" % intVersion)
+	if intVersion == 3 and "TDRC" in dictFrames:
+		dictFrames = dict(dictFrames)
+		dictFrames["TYER"] = dictFrames.pop("TDRC")[:4]
+
+	with open(strPath, "r+b") as fFile:
+		tupHeader = ReadTagHeader(fFile)
+		intOldSize = tupHeader[2] if tupHeader else 0
+		lstExistingFrames = ReadFrames(fFile, tupHeader) if tupHeader and tupHeader[0] == intVersion else []
+		bytTag = BuildTag(dictFrames, lstExistingFrames, intVersion, intOldSize)
+
+		if len(bytTag) == intOldSize:
+			#the new tag fits in the old one - only the tag region is rewritten
+			fFile.seek(0)
+			fFile.write(bytTag)
+		else:
+			#no room, write the file again with the bigger tag in front of the audio
+			strTempPath = strPath + ".tagging"
+			with open(strTempPath, "wb") as fTemp:
+				fTemp.write(bytTag)
+				fFile.seek(intOldSize)
+				shutil.copyfileobj(fFile, fTemp, conCopyBlockSize)
+			fFile.close()
+			shutil.copystat(strPath, strTempPath)
+			os.replace(strTempPath, strPath)
+
+	if blnID3v1:
+		with open(strPath, "r+b") as fFile:
+			fFile.seek(0, os.SEEK_END)
+			intSize = fFile.tell()
+			if intSize >= 128:
+				fFile.seek(intSize - 128)
+				if fFile.read(3) == b"TAG":
+					#replace the existing ID3v1 tag
+					fFile.seek(intSize - 128)
+				else:
+					fFile.seek(intSize)
+			fFile.write(ID3v1Tag(dictFrames))
+
+def TagFiles(lstFiles, intVersion=3, blnID3v1=True, intWorkers=4):
+	#lstFiles holds (path, dictFrames) pairs - returns {path: error} for the ones that failed
+	dictErrors = {}
+	with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, intWorkers)) as objPool:
+		dictFutures = {objPool.submit(TagFile, strPath, dictFrames, intVersion, blnID3v1): strPath for strPath, dictFrames in lstFiles}
+		for objFuture in concurrent.futures.as_completed(dictFutures):
+			try:
+				objFuture.result()
+			except (OSError, Id3Error) as objError:
+				dictErrors[dictFutures[objFuture]] = str(objError)
+	return dictErrors
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (Loudness.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Spot loudness analysis used by RenderShow.py
+#
+#Station spots arrive at very different levels.  With --spotloudness every spot in the
+#stations' audio folders is measured once - integrated loudness (ITU-R BS.1770 K-weighting and
+#gating), true peak and RMS - and the gain that brings it to the target loudness is written
+#into the spot's ITEM volume in the station projects, so Reaper doesn't need any FX or manual
+#gain on the spots to match them.
+#
+#A mono spot is measured the way it's heard - Reaper plays it on both channels of the stereo
+#Station VT track, and --stationmix adds it to every channel - so it's matched to the target
+#at the same level as a stereo spot.
+#
+#The measurements are cached by the content hash of the WAV, so a spot is only analysed again
+#when the file itself changes, however often it's renamed or copied between stations.
+#
+#Everything is done with NumPy on the whole spot at once.  The K-weighting filters are applied
+#in the frequency domain with their exact response (there's no IIR filter in NumPy), with
+#enough padding that the filters' tails don't wrap around, and the true peak is measured on a
+#4x oversampled signal as the standard describes.
+#
+
+import os
+import json
+import math
+import threading
+import concurrent.futures
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+import WavInfo
+import StationMix
+
+conCacheFilename = "loudness2.json" #mono spots were measured as a single channel in loudness.json
+conBlockSeconds = 0.4 #gating block length
+conBlockStep = 0.1 #gating blocks overlap by 75%
+conAbsoluteGate = -70.0 #LUFS
+conRelativeGate = -10.0 #LU below the loudness of the blocks above the absolute gate
+conPeakCeiling = -1.0 #dBTP a spot's true peak is kept under when its gain is raised
+conFilterTailSeconds = 1.0 #padding for the K-weighting filters' response to die out
+conOversampleTaps = 12 #taps per phase of the true peak interpolation filter
+
+class LoudnessError(Exception):
+	pass
+
+class SpotLevels:
+	__slots__ = ("fltLoudness", "fltTruePeak", "fltRMS")
+
+	def __init__(self, fltLoudness, fltTruePeak, fltRMS):
+		#None for a spot that's silent (or too short to measure its loudness)
+		self.fltLoudness = fltLoudness #LUFS
+		self.fltTruePeak = fltTruePeak #dBTP
+		self.fltRMS = fltRMS #dBFS
+
+	def ToList(self):
+		return [self.fltLoudness, self.fltTruePeak, self.fltRMS]
+
+	@classmethod
+	def FromList(cls, lstValues):
+		return cls(*lstValues)
+
+def Decibels(fltValue, fltScale=20.0):
+	return fltScale * math.log10(fltValue) if fltValue > 0.0 else None
+
+def KWeightingFilters(intRate):
+	#(b, a) of the BS.1770 pre-filter (a high shelf for the head) and RLB high-pass, worked out
+	#	for the sample rate from the filters' analog parameters - at 48kHz these are the
+	#	coefficients given in the standard
+	fltK = math.tan(math.pi * 1681.974450955533 / intRate)
+	fltQ = 0.7071752369554196
+	fltHighGain = 10.0 ** (3.999843853973347 / 20.0)
+	fltBandGain = fltHighGain ** 0.4996667741545416
+	fltA0 = 1.0 + fltK / fltQ + fltK * fltK
+	tupShelf = ([(fltHighGain + fltBandGain * fltK / fltQ + fltK * fltK) / fltA0, 2.0 * (fltK * fltK - fltHighGain) / fltA0, (fltHighGain - fltBandGain * fltK / fltQ + fltK * fltK) / fltA0],
+		[1.0, 2.0 * (fltK * fltK - 1.0) / fltA0, (1.0 - fltK / fltQ + fltK * fltK) / fltA0])
+
+	fltK = math.tan(math.pi * 38.13547087602444 / intRate)
+	fltQ = 0.5003270373238773
+	fltA0 = 1.0 + fltK / fltQ + fltK * fltK
+	tupHighPass = ([1.0, -2.0, 1.0], [1.0, 2.0 * (fltK * fltK - 1.0) / fltA0, (1.0 - fltK / fltQ + fltK * fltK) / fltA0])
+	return [tupShelf, tupHighPass]
+
+def KWeight(arrSamples, intRate):
+	#the (frames, channels) samples run through the K-weighting filters
+	intFrames = len(arrSamples)
+	intSize = 1 << max(1, (intFrames + int(conFilterTailSeconds * intRate)) - 1).bit_length()
+	arrZ = numpy.exp(-1j * numpy.linspace(0.0, math.pi, intSize // 2 + 1))
+	arrResponse = numpy.ones(len(arrZ), dtype=numpy.complex128)
+	for lstB, lstA in KWeightingFilters(intRate):
+		arrResponse *= (lstB[0] + lstB[1] * arrZ + lstB[2] * arrZ * arrZ) / (lstA[0] + lstA[1] * arrZ + lstA[2] * arrZ * arrZ)
+	arrSpectrum = numpy.fft.rfft(arrSamples, intSize, axis=0)
+	return numpy.fft.irfft(arrSpectrum * arrResponse[:, None], intSize, axis=0)[:intFrames]
+
+def IntegratedLoudness(arrWeighted, intRate):
+	#gated loudness of K-weighted samples in LUFS - None if every block is below the absolute gate
+	intBlock = int(round(conBlockSeconds * intRate))
+	intStep = int(round(conBlockStep * intRate))
+	if len(arrWeighted) < intBlock:
+		return None
+	#mean square of each channel over every block, from a running sum of the squares - the
+	#	channels are left and right so every one is weighted 1.0
+	arrSums = numpy.concatenate((numpy.zeros((1, arrWeighted.shape[1])), numpy.cumsum(arrWeighted * arrWeighted, axis=0)))
+	arrStarts = numpy.arange(0, len(arrWeighted) - intBlock + 1, intStep)
+	arrPower = ((arrSums[arrStarts + intBlock] - arrSums[arrStarts]) / intBlock).sum(axis=1)
+	with numpy.errstate(divide="ignore"):
+		arrBlockLoudness = -0.691 + 10.0 * numpy.log10(arrPower)
+
+	arrGated = arrPower[arrBlockLoudness > conAbsoluteGate]
+	if len(arrGated) == 0:
+		return None
+	fltRelativeGate = -0.691 + 10.0 * math.log10(arrGated.mean()) + conRelativeGate
+	arrGated = arrPower[(arrBlockLoudness > conAbsoluteGate) & (arrBlockLoudness > fltRelativeGate)]
+	return -0.691 + 10.0 * math.log10(arrGated.mean())
+
+def OversampleFilters(intFactor):
+	#the phases of a windowed-sinc interpolation filter - phase 0 is the original samples
+	intTaps = intFactor * conOversampleTaps + 1
+	arrTime = (numpy.arange(intTaps) - intTaps // 2) / float(intFactor)
+	arrFilter = numpy.sinc(arrTime) * numpy.kaiser(intTaps, 8.0)
+	return [arrFilter[intPhase::intFactor] for intPhase in range(intFactor)]
+
+def TruePeak(arrSamples, intRate):
+	#highest absolute sample value of the signal oversampled to at least 192kHz, in dBTP
+	intFactor = 4 if intRate < 96000 else 2 if intRate < 192000 else 1
+	fltPeak = 0.0
+	lstPhases = OversampleFilters(intFactor) if intFactor > 1 else [numpy.ones(1)]
+	for intChannel in range(arrSamples.shape[1]):
+		arrChannel = arrSamples[:, intChannel]
+		for arrPhase in lstPhases:
+			fltPeak = max(fltPeak, float(numpy.abs(numpy.convolve(arrChannel, arrPhase)).max()))
+	return Decibels(fltPeak)
+
+def Analyze(strPath):
+	#measure a WAV - raises LoudnessError if it can't be read
+	if numpy is None:
+		raise LoudnessError("NumPy isn't installed")
+	try:
+		objInfo = WavInfo.ReadWavInfo(strPath)
+		arrSamples = StationMix.ToFloat(StationMix.MapSamples(strPath, objInfo), objInfo)
+	except (OSError, WavInfo.WavError, StationMix.MixError) as objError:
+		raise LoudnessError(str(objError))
+	if objInfo.intFrames == 0:
+		return SpotLevels(None, None, None)
+	arrWeighted = KWeight(arrSamples, objInfo.intSampleRate)
+	if objInfo.intChannels == 1:
+		#played on both channels
+		arrWeighted = numpy.repeat(arrWeighted, 2, axis=1)
+	fltLoudness = IntegratedLoudness(arrWeighted, objInfo.intSampleRate)
+	return SpotLevels(fltLoudness, TruePeak(arrSamples, objInfo.intSampleRate), Decibels(float(numpy.mean(arrSamples * arrSamples)), 10.0))
+
+def MatchGain(objLevels, fltTargetLoudness, fltPeakCeiling=conPeakCeiling):
+	#linear gain that brings a spot to the target loudness without pushing its true peak over
+	#	the ceiling - silent spots are left alone
+	if objLevels.fltLoudness is None:
+		return 1.0
+	fltGain = fltTargetLoudness - objLevels.fltLoudness
+	if objLevels.fltTruePeak is not None and fltGain > 0.0:
+		fltGain = max(0.0, min(fltGain, fltPeakCeiling - objLevels.fltTruePeak))
+	return 10.0 ** (fltGain / 20.0)
+
+class LevelCache:
+	def __init__(self, strCachePath=None, objHashIndex=None):
+		#strCachePath is the folder the measurements are kept in - None keeps them in memory only
+		self.strIndexPath = os.path.join(strCachePath, conCacheFilename) if strCachePath else None
+		self.objHashIndex = objHashIndex
+		self.dictIndex = {} #content hash -> SpotLevels.ToList()
+		self.blnDirty = False
+		self.objLock = threading.Lock()
+		self.intAnalyzed = 0
+		if self.strIndexPath:
+			try:
+				with open(self.strIndexPath, "r") as fIndex:
+					self.dictIndex = json.load(fIndex)
+			except (OSError, ValueError):
+				self.dictIndex = {}
+
+	def Key(self, strPath):
+		if self.objHashIndex is not None:
+			return self.objHashIndex.Get(strPath)
+		return os.path.normcase(os.path.abspath(strPath))
+
+	def Get(self, strPath):
+		#raises LoudnessError (or OSError) if the spot can't be measured
+		strKey = self.Key(strPath)
+		with self.objLock:
+			lstEntry = self.dictIndex.get(strKey)
+			if lstEntry is not None:
+				return SpotLevels.FromList(lstEntry)
+
+		objLevels = Analyze(strPath)
+		with self.objLock:
+			self.intAnalyzed += 1
+			self.dictIndex[strKey] = objLevels.ToList()
+			self.blnDirty = True
+		return objLevels
+
+	def Analyze(self, lstPaths, intWorkers=4):
+		#measure a batch of spots on a thread pool - returns {path: error} for the ones that failed
+		dictErrors = {}
+		with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, intWorkers)) as objPool:
+			dictFutures = {objPool.submit(self.Get, strPath): strPath for strPath in lstPaths}
+			for objFuture in concurrent.futures.as_completed(dictFutures):
+				try:
+					objFuture.result()
+				except (OSError, LoudnessError) as objError:
+					dictErrors[dictFutures[objFuture]] = str(objError)
+		return dictErrors
+
+	def Save(self):
+		if not self.strIndexPath or not self.blnDirty:
+			return
+		with self.objLock:
+			os.makedirs(os.path.dirname(self.strIndexPath), exist_ok=True)
+			strTempPath = self.strIndexPath + ".tmp"
+			with open(strTempPath, "w") as fIndex:
+				json.dump(self.dictIndex, fIndex)
+			os.replace(strTempPath, self.strIndexPath)
+			self.blnDirty = False
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (OutputEncoder.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Render once, encode many - used by RenderShow.py
+#
+#With --encode Reaper renders each station once, to a master WAV, and the outputs are made from
+#that WAV here - any number of MP3 bitrates (and WAV copies) per station, with all the
+#stations' outputs encoded at the same time.  The encoder is a command template, the same one
+#--stationmix uses, so it can be swapped for any other encoder.
+#
+#Every output is encoded and tagged under a temporary name next to it and only renamed to its
+#real name once it's finished, so a half-written MP3 never shows up in the render folder and
+#the one from the last run is there until the new one replaces it.
+#
+
+import os
+import time
+import shutil
+import concurrent.futures
+
+import StationMix
+import Id3Tag
+import Tracing
+
+conFormatMP3 = "mp3"
+conFormatWAV = "wav"
+conDefaultBitrate = 320 #kbps when an MP3 format doesn't give one
+conTempSuffix = ".encoding" #added in front of the extension while an output is being written
+
+class EncodeError(Exception):
+	pass
+
+class OutputFormat:
+	__slots__ = ("strFormat", "intBitrate", "strStation")
+
+	def __init__(self, strFormat, intBitrate=None, strStation=None):
+		self.strFormat = strFormat
+		self.intBitrate = intBitrate #kbps - None for a WAV
+		self.strStation = strStation #None when it's for every station without formats of its own
+
+	def __eq__(self, objOther):
+		return (self.strFormat, self.intBitrate, self.strStation) == (objOther.strFormat, objOther.intBitrate, objOther.strStation)
+
+	def __hash__(self):
+		return hash((self.strFormat, self.intBitrate, self.strStation))
+
+	def __str__(self):
+		strFormat = "%s %ikbps" % (self.strFormat.upper(), self.intBitrate) if self.intBitrate else self.strFormat.upper()
+		return strFormat + (" for " + self.strStation if self.strStation else "")
+
+def ParseFormat(strSpec):
+	#[station:]mp3[-bitrate] or [station:]wav - raises EncodeError if it's neither
+	strStation, _, strFormat = strSpec.strip().rpartition(":")
+	strFormat, _, strBitrate = strFormat.strip().lower().partition("-")
+	if strFormat == conFormatWAV and not strBitrate:
+		return OutputFormat(conFormatWAV, None, strStation.strip().lower() or None)
+	if strFormat == conFormatMP3:
+		try:
+			intBitrate = int(strBitrate.lower().rstrip("k")) if strBitrate else conDefaultBitrate
+		except ValueError:
+			intBitrate = 0
+		if intBitrate > 0:
+			return OutputFormat(conFormatMP3, intBitrate, strStation.strip().lower() or None)
+	raise EncodeError("\"%s\" isn't an output format - expecting [station:]mp3[-bitrate] or [station:]wav" % strSpec)
+
+def StationFormats(lstFormats, strStation):
+	#the station's own formats if it has any, otherwise the ones for every station
+	lstStationFormats = [objFormat for objFormat in lstFormats if objFormat.strStation == strStation] or [objFormat for objFormat in lstFormats if objFormat.strStation is None]
+	return list(dict.fromkeys(lstStationFormats))
+
+def OutputPaths(strBasePath, lstFormats):
+	#(format, path) for each output of a station - strBasePath is the output path without an
+	#	extension, and when a station has more than one MP3 they're told apart by their bitrate
+	dictCounts = {}
+	for objFormat in lstFormats:
+		dictCounts[objFormat.strFormat] = dictCounts.get(objFormat.strFormat, 0) + 1
+	lstPaths = []
+	for objFormat in lstFormats:
+		strSuffix = "-%ik" % objFormat.intBitrate if dictCounts[objFormat.strFormat] > 1 and objFormat.intBitrate else ""
+		lstPaths.append((objFormat, strBasePath + strSuffix + "." + objFormat.strFormat))
+	return lstPaths
+
+class EncodeJob:
+	__slots__ = ("strName", "strInputPath", "strOutputPath", "objFormat", "dictTags", "strError", "fltSeconds")
+
+	def __init__(self, strName, strInputPath, strOutputPath, objFormat, dictTags=None):
+		self.strName = strName
+		self.strInputPath = strInputPath #the station's master WAV
+		self.strOutputPath = strOutputPath
+		self.objFormat = objFormat
+		self.dictTags = dictTags #ID3 frames written to an MP3
+		self.strError = None
+		self.fltSeconds = 0.0
+
+class EncoderPool:
+	def __init__(self, strCommandTemplate, intWorkers=None, intTagVersion=3, objTracer=None):
+		#strCommandTemplate runs the encoder - {input}, {output} and {bitrate} are filled in
+		self.strCommandTemplate = strCommandTemplate
+		self.intWorkers = intWorkers or os.cpu_count() or 1
+		self.intTagVersion = intTagVersion
+		self.objTracer = objTracer or Tracing.objNullTracer
+
+	def Encode(self, objJob):
+		strRoot, strExt = os.path.splitext(objJob.strOutputPath)
+		#the encoder may go by the extension, so the temporary name keeps it
+		strTempPath = strRoot + conTempSuffix + strExt
+		try:
+			if objJob.objFormat.strFormat == conFormatWAV:
+				shutil.copyfile(objJob.strInputPath, strTempPath)
+			else:
+				StationMix.EncodeFile(self.strCommandTemplate, objJob.strInputPath, strTempPath, objJob.objFormat.intBitrate)
+				if objJob.dictTags:
+					Id3Tag.TagFile(strTempPath, objJob.dictTags, self.intTagVersion)
+			os.replace(strTempPath, objJob.strOutputPath)
+		finally:
+			if os.path.exists(strTempPath):
+				os.remove(strTempPath)
+
+	def RunJob(self, objJob):
+		fltStart = time.monotonic()
+		with self.objTracer.Span("encode", "subprocess", station=objJob.strName, format=str(objJob.objFormat)):
+			try:
+				self.Encode(objJob)
+			except (OSError, StationMix.MixError, Id3Tag.Id3Error) as objError:
+				objJob.strError = str(objError)
+		objJob.fltSeconds = time.monotonic() - fltStart
+
+	def Run(self, lstJobs):
+		#encode every job, as many at a time as there are workers - failed jobs have strError set
+		if not lstJobs:
+			return
+		with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(lstJobs), self.intWorkers)) as objPool:
+			for objFuture in [objPool.submit(self.RunJob, objJob) for objJob in lstJobs]:
+				objFuture.result()
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (OutputQC.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Rendered output checks used by RenderShow.py
+#
+#A render that "worked" can still have dead air or clipping where a station spot was dropped
+#in.  With --qc every station's output is checked around each of its spots - from a little
+#before the spot starts to a little after it ends - for digital silence, clipping, and level
+#jumps where the spot starts and ends.  Each station gets a JSON report.
+#
+#Only the audio around the spots is read, in fixed-size blocks from a memory mapped WAV, so
+#the memory used doesn't depend on the length of the show.  MP3s are decoded to a temporary
+#WAV first with a decoder command ({input} and {output} are replaced with the paths).
+#
+
+import os
+import json
+import shlex
+import subprocess
+import concurrent.futures
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+import WavInfo
+import StationMix
+import Tracing
+
+conBlockFrames = 65536 #frames read at a time
+conMarginSeconds = 2.0 #how far either side of a spot is checked
+conSilenceSeconds = 0.5 #digital silence at least this long is dead air
+conClipLevel = 0.999 #samples at or above this (linear, full scale is 1.0) are clipped
+conClipSamples = 3 #consecutive clipped samples before it counts as clipping
+conJumpSeconds = 1.0 #audio either side of a spot's start and end that's compared
+conMaxJump = 15.0 #dB - a bigger change in level where a spot starts or ends is reported
+
+class QCError(Exception):
+	pass
+
+class QCSpot:
+	__slots__ = ("strName", "fltPosition", "fltDuration")
+
+	def __init__(self, strName, fltPosition, fltDuration):
+		self.strName = strName
+		self.fltPosition = fltPosition
+		self.fltDuration = fltDuration
+
+class RunFinder:
+	#runs of True in a mask that arrives a block at a time - (first frame, frames) for every run
+	#	that's at least intMinLength long, including runs that cross from one block into the next
+	def __init__(self, intMinLength):
+		self.intMinLength = max(1, intMinLength)
+		self.lstRuns = []
+		self.intOpenStart = None #a run that reaches the end of the last block
+		self.intOpenEnd = None
+
+	def Add(self, arrMask, intOffset):
+		arrEdges = numpy.flatnonzero(numpy.diff(numpy.concatenate(([False], arrMask, [False])).astype(numpy.int8))) + intOffset
+		arrStarts = arrEdges[0::2]
+		arrEnds = arrEdges[1::2]
+		if self.intOpenStart is not None:
+			if len(arrStarts) and arrStarts[0] == self.intOpenEnd:
+				#the run carries on from the last block
+				arrStarts = arrStarts.copy()
+				arrStarts[0] = self.intOpenStart
+			else:
+				self.Close()
+		self.intOpenStart = None
+		if len(arrEnds) and arrEnds[-1] == intOffset + len(arrMask):
+			#the last run may carry on in the next block
+			self.intOpenStart = int(arrStarts[-1])
+			self.intOpenEnd = int(arrEnds[-1])
+			arrStarts = arrStarts[:-1]
+			arrEnds = arrEnds[:-1]
+		arrKeep = (arrEnds - arrStarts) >= self.intMinLength
+		self.lstRuns.extend(zip(arrStarts[arrKeep].tolist(), (arrEnds - arrStarts)[arrKeep].tolist()))
+
+	def Close(self):
+		if self.intOpenStart is not None and self.intOpenEnd - self.intOpenStart >= self.intMinLength:
+			self.lstRuns.append((self.intOpenStart, self.intOpenEnd - self.intOpenStart))
+		self.intOpenStart = None
+
+def Blocks(arrSamples, objInfo, intStart, intEnd, intBlockFrames=conBlockFrames):
+	#(first frame, float samples) for the frames from intStart to intEnd, a block at a time
+	intStart = max(0, intStart)
+	intEnd = min(len(arrSamples), intEnd)
+	for intFrom in range(intStart, intEnd, intBlockFrames):
+		yield intFrom, StationMix.ToFloat(arrSamples[intFrom:min(intFrom + intBlockFrames, intEnd)], objInfo)
+
+def Level(arrSamples, objInfo, intStart, intEnd):
+	#RMS level in dBFS of the frames from intStart to intEnd - None if it's digital silence or empty
+	fltSum = 0.0
+	intFrames = 0
+	for _, arrBlock in Blocks(arrSamples, objInfo, intStart, intEnd):
+		fltSum += float(numpy.square(arrBlock).sum())
+		intFrames += arrBlock.size
+	if intFrames == 0 or fltSum == 0.0:
+		return None
+	return 10.0 * numpy.log10(fltSum / intFrames)
+
+def CheckSpot(arrSamples, objInfo, objSpot, fltMargin=conMarginSeconds):
+	#the problems found around one spot
+	intRate = objInfo.intSampleRate
+	intStart = int(round((objSpot.fltPosition - fltMargin) * intRate))
+	intEnd = int(round((objSpot.fltPosition + objSpot.fltDuration + fltMargin) * intRate))
+	objSilence = RunFinder(int(conSilenceSeconds * intRate))
+	objClipping = RunFinder(conClipSamples)
+	for intFrom, arrBlock in Blocks(arrSamples, objInfo, intStart, intEnd):
+		objSilence.Add(~arrBlock.any(axis=1), intFrom)
+		arrClipped = numpy.abs(arrBlock) >= conClipLevel
+		#a run of clipped samples on any of the channels
+		objClipping.Add(arrClipped.any(axis=1), intFrom)
+	objSilence.Close()
+	objClipping.Close()
+
+	dictSpot = {"name": objSpot.strName, "position": objSpot.fltPosition, "duration": objSpot.fltDuration,
+		"silence": [[intFrom / float(intRate), intFrames / float(intRate)] for intFrom, intFrames in objSilence.lstRuns],
+		"clipping": [[intFrom / float(intRate), intFrames] for intFrom, intFrames in objClipping.lstRuns],
+		"jumps": []}
+	intJump = int(conJumpSeconds * intRate)
+	for strEdge, fltTime in (("start", objSpot.fltPosition), ("end", objSpot.fltPosition + objSpot.fltDuration)):
+		intEdge = int(round(fltTime * intRate))
+		fltBefore = Level(arrSamples, objInfo, intEdge - intJump, intEdge)
+		fltAfter = Level(arrSamples, objInfo, intEdge, intEdge + intJump)
+		#silence either side is reported as silence
+		if fltBefore is not None and fltAfter is not None and abs(fltAfter - fltBefore) > conMaxJump:
+			dictSpot["jumps"].append({"at": fltTime, "edge": strEdge, "before": round(fltBefore, 1), "after": round(fltAfter, 1)})
+	return dictSpot
+
+def CheckWav(strPath, lstSpots):
+	#check a rendered WAV around every spot - returns the spots' reports
+	try:
+		objInfo = WavInfo.ReadWavInfo(strPath)
+		arrSamples = StationMix.MapSamples(strPath, objInfo)
+	except (OSError, WavInfo.WavError, StationMix.MixError) as objError:
+		raise QCError("unable to read %s (%s)" % (strPath, objError))
+	try:
+		return [CheckSpot(arrSamples, objInfo, objSpot) for objSpot in lstSpots]
+	finally:
+		#the file stays open as long as it's mapped
+		del arrSamples
+
+def DecodeFile(strCommandTemplate, strInputPath, strOutputPath):
+	lstCommand = [strToken.format(input=strInputPath, output=strOutputPath) for strToken in shlex.split(strCommandTemplate)]
+	try:
+		objResult = subprocess.run(lstCommand, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+	except OSError as objError:
+		raise QCError("unable to start the decoder (%s)" % objError)
+	if objResult.returncode != 0 or not os.path.exists(strOutputPath):
+		raise QCError("decoder exited with code %i" % objResult.returncode)
+
+class QCJob:
+	__slots__ = ("strName", "strOutputPath", "lstSpots", "strReportPath", "lstReport", "intIssues", "strError")
+
+	def __init__(self, strName, strOutputPath, lstSpots, strReportPath):
+		self.strName = strName
+		self.strOutputPath = strOutputPath #the rendered WAV or MP3
+		self.lstSpots = lstSpots #QCSpots
+		self.strReportPath = strReportPath
+		self.lstReport = []
+		self.intIssues = 0
+		self.strError = None
+
+class OutputChecker:
+	def __init__(self, strDecodeCommand, strTempPath, intWorkers=None, objTracer=None):
+		#MP3s are decoded into strTempPath
+		self.strDecodeCommand = strDecodeCommand
+		self.strTempPath = strTempPath
+		self.intWorkers = intWorkers or os.cpu_count() or 1
+		self.objTracer = objTracer or Tracing.objNullTracer
+
+	def Check(self, objJob):
+		if numpy is None:
+			raise QCError("NumPy isn't installed")
+		if objJob.strOutputPath.lower().endswith(".wav"):
+			objJob.lstReport = CheckWav(objJob.strOutputPath, objJob.lstSpots)
+		else:
+			strWavPath = os.path.join(self.strTempPath, os.path.splitext(os.path.basename(objJob.strOutputPath))[0] + ".decoding.wav")
+			try:
+				with self.objTracer.Span("decode", "subprocess", station=objJob.strName):
+					DecodeFile(self.strDecodeCommand, objJob.strOutputPath, strWavPath)
+				objJob.lstReport = CheckWav(strWavPath, objJob.lstSpots)
+			finally:
+				if os.path.exists(strWavPath):
+					os.remove(strWavPath)
+		objJob.intIssues = sum(len(dictSpot["silence"]) + len(dictSpot["clipping"]) + len(dictSpot["jumps"]) for dictSpot in objJob.lstReport)
+		with open(objJob.strReportPath, "w") as fReport:
+			json.dump({"station": objJob.strName, "file": objJob.strOutputPath, "issues": objJob.intIssues, "spots": objJob.lstReport}, fReport, indent=1)
+
+	def RunJob(self, objJob):
+		with self.objTracer.Span("qc", "station", station=objJob.strName) as dictSpan:
+			try:
+				self.Check(objJob)
+			except (OSError, QCError) as objError:
+				objJob.strError = str(objError)
+			dictSpan["issues"] = objJob.intIssues
+
+	def Run(self, lstJobs):
+		#check every station's output, as many at a time as there are workers
+		if not lstJobs:
+			return
+		os.makedirs(self.strTempPath, exist_ok=True)
+		with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(lstJobs), self.intWorkers)) as objPool:
+			for objFuture in [objPool.submit(self.RunJob, objJob) for objJob in lstJobs]:
+				objFuture.result()
+
+def Issues(dictSpot):
+	#one line for each problem found around a spot
+	lstLines = ["dead air at %.2f for %.2f seconds" % (fltAt, fltSeconds) for fltAt, fltSeconds in dictSpot["silence"]]
+	lstLines.extend("clipping at %.2f (%i samples)" % (fltAt, intSamples) for fltAt, intSamples in dictSpot["clipping"])
+	lstLines.extend("level jumps from %.1f to %.1f dBFS at the %s (%.2f)" % (dictJump["before"], dictJump["after"], dictJump["edge"], dictJump["at"]) for dictJump in dictSpot["jumps"])
+	return lstLines
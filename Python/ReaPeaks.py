@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (ReaPeaks.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Reaper peak files for the staged spots, used by RenderShow.py
+#
+#Reaper draws (and, when it renders, first builds) a .reapeaks file for every media file it
+#loads.  The spots are staged into each station's own folder, so without this Reaper builds
+#the same peaks again for every station project it opens.  With --peaks the peaks of every
+#staged spot are written next to it before Reaper ever sees it.
+#
+#The peaks only depend on the audio, so they're cached by the spot's content hash and each
+#spot's peaks are worked out once - a staged copy only gets the cached peaks with its own
+#modified time and size filled into the header (Reaper uses those to tell the peaks are
+#current).  The peaks are the min/max of each channel over blocks of samples, read a block at
+#a time from a memory mapped WAV, at three resolutions (mipmaps) of 128, 4096 and 65536
+#samples per peak.
+#
+
+import os
+import struct
+import threading
+import concurrent.futures
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+import WavInfo
+import StationMix
+import Tracing
+
+conPeakExtension = ".reapeaks"
+conCacheFolderName = "peaks" #folder in the cache folder where the peaks are kept by content hash
+conMagic = b"RPKM" #peak file with more than one mipmap
+lstDivisions = [128, 4096, 65536] #samples per peak for each mipmap - each one divides the next
+conBlockFrames = 65536 * 4 #frames read at a time - a multiple of every division
+conHeaderFormat = "<4sBBiII" #magic, channels, mipmaps, sample rate, source modified time, source size
+conSourceOffset = 10 #where the source's modified time and size are in the header
+
+class PeakError(Exception):
+	pass
+
+class PeakStats:
+	def __init__(self):
+		self.intWritten = 0
+		self.intSkipped = 0
+		self.intComputed = 0
+		self.dictErrors = {} #spot -> error
+
+	def __str__(self):
+		return "%i written, %i unchanged, %i spot(s) analysed, %i error(s)" % (self.intWritten, self.intSkipped, self.intComputed, len(self.dictErrors))
+
+def Decimate(arrMax, arrMin, intFactor):
+	#combine every intFactor peaks (or samples) into one - the last one may cover fewer
+	intCount = -(-len(arrMax) // intFactor)
+	intPad = intCount * intFactor - len(arrMax)
+	if intPad:
+		arrMax = numpy.pad(arrMax, ((0, intPad), (0, 0)), mode="edge")
+		arrMin = numpy.pad(arrMin, ((0, intPad), (0, 0)), mode="edge")
+	return arrMax.reshape(intCount, intFactor, arrMax.shape[1]).max(axis=1), arrMin.reshape(intCount, intFactor, arrMin.shape[1]).min(axis=1)
+
+def ToShorts(arrPeaks):
+	return numpy.clip(numpy.round(arrPeaks * 32767.0), -32768, 32767).astype("<i2")
+
+def BuildPeaks(strPath):
+	#the peak file for a WAV with the source's modified time and size left at 0 - raises PeakError
+	if numpy is None:
+		raise PeakError("NumPy isn't installed")
+	try:
+		objInfo = WavInfo.ReadWavInfo(strPath)
+		arrSamples = StationMix.MapSamples(strPath, objInfo)
+	except (OSError, WavInfo.WavError, StationMix.MixError) as objError:
+		raise PeakError("unable to read %s (%s)" % (strPath, objError))
+
+	try:
+		lstMax = []
+		lstMin = []
+		for intFrom in range(0, objInfo.intFrames, conBlockFrames):
+			arrBlock = StationMix.ToFloat(arrSamples[intFrom:intFrom + conBlockFrames], objInfo)
+			arrMax, arrMin = Decimate(arrBlock, arrBlock, lstDivisions[0])
+			lstMax.append(arrMax)
+			lstMin.append(arrMin)
+	finally:
+		#the file stays open as long as it's mapped
+		del arrSamples
+	arrMax = numpy.concatenate(lstMax) if lstMax else numpy.zeros((0, objInfo.intChannels))
+	arrMin = numpy.concatenate(lstMin) if lstMin else numpy.zeros((0, objInfo.intChannels))
+
+	lstMipmaps = []
+	intDivision = lstDivisions[0]
+	for intNext in lstDivisions:
+		if intNext != intDivision:
+			arrMax, arrMin = Decimate(arrMax, arrMin, intNext // intDivision)
+			intDivision = intNext
+		#each peak is the maximum and minimum of every channel in turn
+		lstMipmaps.append((intDivision, len(arrMax), ToShorts(numpy.stack((arrMax, arrMin), axis=2)).tobytes()))
+
+	bytHeader = struct.pack(conHeaderFormat, conMagic, objInfo.intChannels, len(lstMipmaps), objInfo.intSampleRate, 0, 0)
+	bytHeader += b"".join(struct.pack("<iI", intDivision, intCount) for intDivision, intCount, _ in lstMipmaps)
+	return bytHeader + b"".join(bytData for _, _, bytData in lstMipmaps)
+
+def SourceFields(strPath):
+	#the source's modified time and size the way Reaper keeps them in the header
+	objStat = os.stat(strPath)
+	return struct.pack("<II", int(objStat.st_mtime) & 0xFFFFFFFF, objStat.st_size & 0xFFFFFFFF)
+
+def IsCurrent(strPeakPath, bytSource):
+	try:
+		with open(strPeakPath, "rb") as fPeaks:
+			bytHeader = fPeaks.read(conSourceOffset + 8)
+	except OSError:
+		return False
+	return bytHeader[:4] == conMagic and bytHeader[conSourceOffset:] == bytSource
+
+class PeakCache:
+	def __init__(self, strCachePath, objHashIndex, intWorkers=None, objTracer=None):
+		self.strPeaksPath = os.path.join(strCachePath, conCacheFolderName)
+		self.objHashIndex = objHashIndex
+		self.intWorkers = intWorkers or os.cpu_count() or 1
+		self.objTracer = objTracer or Tracing.objNullTracer
+
+	def CachePath(self, strHash):
+		return os.path.join(self.strPeaksPath, strHash + conPeakExtension)
+
+	def Compute(self, strSrcPath, strHash):
+		#runs on a worker thread - work out a spot's peaks and keep them in the cache
+		with self.objTracer.Span("build peaks", file=os.path.basename(strSrcPath)):
+			bytPeaks = BuildPeaks(strSrcPath)
+		strCachePath = self.CachePath(strHash)
+		strTempPath = strCachePath + ".tmp%i" % threading.get_ident()
+		with open(strTempPath, "wb") as fPeaks:
+			fPeaks.write(bytPeaks)
+		os.replace(strTempPath, strCachePath)
+
+	def Write(self, dictFiles):
+		#dictFiles is the stager's {staged path: source path} - writes the peaks next to every
+		#	staged spot that doesn't have current ones
+		objStats = PeakStats()
+		dictPending = {}
+		for strDestPath, strSrcPath in dictFiles.items():
+			try:
+				bytSource = SourceFields(strDestPath)
+				if IsCurrent(strDestPath + conPeakExtension, bytSource):
+					objStats.intSkipped += 1
+					continue
+				dictPending[strDestPath] = (strSrcPath, self.objHashIndex.Get(strSrcPath), bytSource)
+			except OSError as objError:
+				objStats.dictErrors[strDestPath] = str(objError)
+
+		#every spot that isn't cached yet is analysed once, however many stations use it
+		os.makedirs(self.strPeaksPath, exist_ok=True)
+		dictMissing = {}
+		for strSrcPath, strHash, _ in dictPending.values():
+			if strHash not in dictMissing and not os.path.exists(self.CachePath(strHash)):
+				dictMissing[strHash] = strSrcPath
+		with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(len(dictMissing), self.intWorkers))) as objPool:
+			dictFutures = {objPool.submit(self.Compute, strSrcPath, strHash): strSrcPath for strHash, strSrcPath in dictMissing.items()}
+			for objFuture in concurrent.futures.as_completed(dictFutures):
+				try:
+					objFuture.result()
+					objStats.intComputed += 1
+				except (OSError, PeakError) as objError:
+					objStats.dictErrors[dictFutures[objFuture]] = str(objError)
+
+		for strDestPath, (strSrcPath, strHash, bytSource) in dictPending.items():
+			try:
+				with open(self.CachePath(strHash), "rb") as fCached:
+					bytPeaks = fCached.read()
+			except OSError:
+				#it couldn't be analysed - the error is already recorded
+				continue
+			strPeakPath = strDestPath + conPeakExtension
+			with open(strPeakPath + ".tmp", "wb") as fPeaks:
+				fPeaks.write(bytPeaks[:conSourceOffset] + bytSource + bytPeaks[conSourceOffset + 8:])
+			os.replace(strPeakPath + ".tmp", strPeakPath)
+			objStats.intWritten += 1
+		return objStats
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (RenderCache.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Content-addressed render cache used by RenderShow.py
+#
+#A station's render only depends on its generated project and the audio the project
+#points at, so the cache key is a hash of the station project with every FILE reference
+#replaced by the hash of that file's contents (and the RENDER_FILE folder left out, so
+#moving the render folder doesn't invalidate anything).  Anything else that changes the
+#output after the render - like the MP3 tag - is passed in as extra key text.
+#
+#Rendered files are kept under [cachepath]\renders and copied into the render folder when a
+#station's key matches, so Reaper is never started for that station.  The outputs in the
+#render folder are the user's to tag, edit or replace, so they're reflinked or copied, never
+#hardlinked - an edit made in place would change the cached render too.  Only files that
+#nothing but this script writes (the common mix in the cache folder) are hardlinked.  The
+#oldest renders are removed once the cache grows past its size limit.
+#
+
+import os
+import hashlib
+import shlex
+
+import AssetStaging
+
+conRenderCacheFolder = "renders"
+
+def ReferencedPath(strLine):
+	#the path from a FILE "..." element - None if the line isn't one
+	strStripped = strLine.strip()
+	if not strStripped.startswith("FILE "):
+		return None
+	try:
+		lstValues = shlex.split(strStripped)
+	except ValueError:
+		return None
+	return lstValues[1] if len(lstValues) > 1 else None
+
+def RenderKey(iterProjectLines, strProjectFolder, objHashIndex, strExtra=""):
+	objHash = hashlib.sha256()
+	for strLine in iterProjectLines:
+		strStripped = strLine.strip()
+		if strStripped.startswith("RENDER_FILE "):
+			#only the file name matters, not which folder it's rendered to
+			lstValues = shlex.split(strStripped)
+			strLine = "RENDER_FILE " + os.path.basename(lstValues[1].replace("\\", "/")) if len(lstValues) > 1 else strStripped
+		else:
+			strPath = ReferencedPath(strLine)
+			if strPath is not None:
+				strFullPath = strPath if os.path.isabs(strPath) else os.path.join(strProjectFolder, strPath)
+				try:
+					strLine = "FILE " + objHashIndex.Get(strFullPath)
+				except OSError:
+					strLine = "FILE missing " + strPath
+		objHash.update(strLine.strip().encode("utf-8"))
+		objHash.update(b"\n")
+	objHash.update(strExtra.encode("utf-8"))
+	return objHash.hexdigest()
+
+class RenderCache:
+	def __init__(self, strCachePath, intMaxBytes=0, blnAllowHardlink=True):
+		self.strRoot = os.path.join(strCachePath, conRenderCacheFolder)
+		self.intMaxBytes = intMaxBytes #0 means no limit
+		self.blnAllowHardlink = blnAllowHardlink
+		self.intHits = 0
+		self.intStored = 0
+
+	def EntryPath(self, strKey, strExt):
+		return os.path.join(self.strRoot, strKey[:2], strKey + strExt.lower())
+
+	def Fetch(self, strKey, strDestPath, blnPrivate=False):
+		#put the cached render for this key at strDestPath - returns False if there isn't one.
+		#	blnPrivate is for a destination only this script writes, which can be hardlinked
+		strEntryPath = self.EntryPath(strKey, os.path.splitext(strDestPath)[1])
+		if not os.path.isfile(strEntryPath):
+			return False
+		AssetStaging.LinkOrCopy(strEntryPath, strDestPath, blnPrivate and self.blnAllowHardlink)
+		#mark the entry as recently used so it's the last to be removed
+		os.utime(strEntryPath)
+		self.intHits += 1
+		return True
+
+	def Store(self, strKey, strSrcPath, blnPrivate=False):
+		strEntryPath = self.EntryPath(strKey, os.path.splitext(strSrcPath)[1])
+		AssetStaging.LinkOrCopy(strSrcPath, strEntryPath, blnPrivate and self.blnAllowHardlink)
+		os.utime(strEntryPath)
+		self.intStored += 1
+
+	def Prune(self):
+		#remove the least recently used renders until the cache fits in its size limit
+		if self.intMaxBytes <= 0 or not os.path.isdir(self.strRoot):
+			return
+		lstEntries = []
+		for strDirPath, _, lstFileNames in os.walk(self.strRoot):
+			for strFileName in lstFileNames:
+				strPath = os.path.join(strDirPath, strFileName)
+				objStat = os.stat(strPath)
+				lstEntries.append((objStat.st_mtime, objStat.st_size, strPath))
+		intTotal = sum(intSize for _, intSize, _ in lstEntries)
+		for _, intSize, strPath in sorted(lstEntries):
+			if intTotal <= self.intMaxBytes:
+				break
+			os.remove(strPath)
+			intTotal -= intSize
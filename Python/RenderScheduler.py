@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (RenderScheduler.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Parallel render scheduler used by RenderShow.py
+#
+#Station renders are queued as RenderJobs and run by a pool of workers.  The longest jobs
+#are started first so a long show doesn't end up starting last and holding up the whole
+#run - how long a job takes comes from RunHistory when the station has been rendered before,
+#otherwise the project length stands in for it.  Due to a bug in reaper the rendered file
+#sometimes isn't created, so every attempt is verified and failed jobs are put back in the
+#queue until they run out of attempts.
+#
+#The executor that actually renders a job is pluggable - CommandExecutor runs a command
+#template (reaper.exe by default) but any callable that takes a RenderJob will work,
+#which is how the scheduler is tested with a stand-in renderer.
+#
+
+import os
+import time
+import shlex
+import heapq
+import itertools
+import subprocess
+import concurrent.futures
+
+import Tracing
+
+class RenderJob:
+	__slots__ = ("strName", "strProjectPath", "strOutputPath", "fltEstimate", "fnOnSuccess", "intAttempts", "lstAttemptTimes", "lstAttemptErrors", "blnSuccess", "strError",
+		"intBytesPerSecond", "fltExpectedSeconds", "fltRenderLength")
+
+	def __init__(self, strName, strProjectPath, strOutputPath, fltEstimate=0.0, fnOnSuccess=None, intBytesPerSecond=0, fltExpectedSeconds=0.0, fltRenderLength=None):
+		self.strName = strName
+		self.strProjectPath = strProjectPath
+		self.strOutputPath = strOutputPath
+		self.fltEstimate = fltEstimate #the project length in seconds - used by the render checks and for ordering
+		self.fnOnSuccess = fnOnSuccess #called from the worker once the render is verified
+		self.intAttempts = 0
+		self.lstAttemptTimes = []
+		self.lstAttemptErrors = [] #"" for the attempt that worked
+		self.blnSuccess = False
+		self.strError = ""
+		self.intBytesPerSecond = intBytesPerSecond #how fast the output should grow - 0 if it isn't known
+		self.fltExpectedSeconds = fltExpectedSeconds #how long the render took in past runs - 0 if it isn't known
+		self.fltRenderLength = fltRenderLength #how long the rendered file should be when the project doesn't render all of itself (or adds a tail) - 0 if it isn't known
+
+	def Priority(self):
+		#jobs expected to take the longest go first - by their past render times when they're
+		#	known, otherwise by the project length
+		return self.fltExpectedSeconds or self.fltEstimate
+
+class CommandExecutor:
+	#renders a job by running a command template - {project} and {output} are replaced with
+	#	the job's paths, anything else passed in dictValues (e.g. {reaper}) is replaced too
+	def __init__(self, strCommandTemplate, dictValues=None, fltTimeout=None):
+		self.lstTemplate = shlex.split(strCommandTemplate)
+		self.dictValues = dict(dictValues or {})
+		self.fltTimeout = fltTimeout
+
+	def Command(self, objJob):
+		dictValues = dict(self.dictValues, project=objJob.strProjectPath, output=objJob.strOutputPath, name=objJob.strName)
+		return [strToken.format(**dictValues) for strToken in self.lstTemplate]
+
+	def __call__(self, objJob):
+		try:
+			objResult = subprocess.run(self.Command(objJob), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=self.fltTimeout)
+		except subprocess.TimeoutExpired:
+			return "renderer timed out after %i seconds" % self.fltTimeout
+		except OSError as objError:
+			return "unable to start the renderer (%s)" % objError
+		if objResult.returncode != 0:
+			return "renderer exited with code %i" % objResult.returncode
+		return ""
+
+def VerifyOutputExists(objJob):
+	if os.path.exists(objJob.strOutputPath):
+		return ""
+	return "rendered file was not created"
+
+class RenderSummary:
+	def __init__(self, lstJobs, fltWallTime):
+		self.lstJobs = lstJobs
+		self.fltWallTime = fltWallTime
+		self.intTotalAttempts = sum(objJob.intAttempts for objJob in lstJobs)
+		self.intSuccessCnt = sum(1 for objJob in lstJobs if objJob.blnSuccess)
+		self.intFailedAttempts = self.intTotalAttempts - self.intSuccessCnt
+		#stations that needed more than one attempt, and the ones that never rendered
+		self.lstRetriedJobs = [objJob for objJob in lstJobs if objJob.intAttempts > 1]
+		self.lstFailedJobs = [objJob for objJob in lstJobs if not objJob.blnSuccess]
+
+	def Print(self):
+		print()
+		print("Render summary:")
+		for objJob in self.lstJobs:
+			strStatus = "ok" if objJob.blnSuccess else "FAILED (%s)" % objJob.strError
+			print(" %-20s %s - %i attempt(s), %.1f sec" % (objJob.strName, strStatus, objJob.intAttempts, sum(objJob.lstAttemptTimes)))
+		if self.lstRetriedJobs:
+			print("Station(s) requiring re-render:")
+			for objJob in self.lstRetriedJobs:
+				print(objJob.strName)
+		print("%i render(s) failed out of a total of %i render attempt(s) for %i station(s)" % (self.intFailedAttempts, self.intTotalAttempts, len(self.lstJobs)))
+		if self.lstFailedJobs:
+			print("Station(s) that did NOT render: %s" % ", ".join(objJob.strName for objJob in self.lstFailedJobs))
+		print("Total render time: %.1f sec" % self.fltWallTime)
+
+class RenderScheduler:
+	def __init__(self, fnExecutor, intWorkers=1, intMaxAttempts=3, fnVerify=VerifyOutputExists, fnLog=print, objTracer=None):
+		self.fnExecutor = fnExecutor
+		self.objTracer = objTracer or Tracing.objNullTracer
+		self.intWorkers = max(1, intWorkers)
+		self.intMaxAttempts = max(1, intMaxAttempts)
+		self.fnVerify = fnVerify
+		self.fnLog = fnLog
+		self.lstJobs = []
+
+	def Add(self, objJob):
+		self.lstJobs.append(objJob)
+		return objJob
+
+	def RunAttempt(self, objJob):
+		#runs on a worker thread - render, verify and, if that worked, run the job's success step
+		objJob.intAttempts += 1
+		self.fnLog(" rendering attempt %i for %s" % (objJob.intAttempts, objJob.strName))
+		fltStart = time.monotonic()
+		with self.objTracer.Span("render", "station", station=objJob.strName, attempt=objJob.intAttempts) as dictSpan:
+			try:
+				with self.objTracer.Span("renderer", "subprocess", station=objJob.strName):
+					strError = self.fnExecutor(objJob)
+				if not strError:
+					with self.objTracer.Span("verify render", station=objJob.strName):
+						strError = self.fnVerify(objJob)
+				if not strError and objJob.fnOnSuccess is not None:
+					objJob.fnOnSuccess(objJob)
+			except Exception as objError:
+				strError = "%s: %s" % (type(objError).__name__, objError)
+			dictSpan["error"] = strError
+		objJob.lstAttemptTimes.append(time.monotonic() - fltStart)
+		objJob.lstAttemptErrors.append(strError)
+		return strError
+
+	def Run(self):
+		fltStart = time.monotonic()
+		#longest job first - the counter keeps the order stable for jobs of the same length
+		intCounter = itertools.count()
+		lstQueue = [(-objJob.Priority(), next(intCounter), objJob) for objJob in self.lstJobs]
+		heapq.heapify(lstQueue)
+
+		with concurrent.futures.ThreadPoolExecutor(max_workers=self.intWorkers) as objPool:
+			dictRunning = {}
+			while lstQueue or dictRunning:
+				while lstQueue and len(dictRunning) < self.intWorkers:
+					objJob = heapq.heappop(lstQueue)[2]
+					dictRunning[objPool.submit(self.RunAttempt, objJob)] = objJob
+
+				setDone, _ = concurrent.futures.wait(dictRunning, return_when=concurrent.futures.FIRST_COMPLETED)
+				for objFuture in setDone:
+					objJob = dictRunning.pop(objFuture)
+					strError = objFuture.result()
+					if not strError:
+						objJob.blnSuccess = True
+						objJob.strError = ""
+						self.fnLog(" %s done!" % objJob.strName)
+					elif objJob.intAttempts < self.intMaxAttempts:
+						objJob.strError = strError
+						self.fnLog(" %s did not render correctly (%s), trying again..." % (objJob.strName, strError))
+						heapq.heappush(lstQueue, (-objJob.Priority(), next(intCounter), objJob))
+					else:
+						objJob.strError = strError
+						self.fnLog(" %s did not render correctly (%s), giving up after %i attempt(s)" % (objJob.strName, strError, objJob.intAttempts))
+
+		return RenderSummary(self.lstJobs, time.monotonic() - fltStart)
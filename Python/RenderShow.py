@@ -57,11 +57,6 @@
 
 #TODO:
 # MARKERS/ITEMS
-# - dont' hard-code the positions of the elements within the ITEM, instead loop through
-#	the item, check each element against a list of elements I'm looking for, note when
-#	the elements are found, and then use that as the index number to access those elements
-#	elsewhere in the code following.  That way the script can gracefully handle changes
-#	to the element structure if/when it changes as it seems likely to always be dynamic
 # - lock the rendered tracks except for the template - this way they can't be moved when
 #	demoing the show before rendering because sometimes I forget I'm not in the template.
 #	What I need to figure out is if it's ok to put a lock 1 following a lock 0, or do I
@@ -132,23 +127,49 @@
 
 
 
-import winsound
 import sys
 import os
-import re
+import json
+import time
 import pathlib
-import random
-import wave
-import contextlib
 import shlex
-import shutil
-import subprocess
 import argparse
+import RppProject
+import RenderScheduler
+import AssetStaging
+import WavInfo
+import ContentHash
+import RenderCache
+import Tracing
+import Id3Tag
+import StationMix
+import RenderWatchdog
+import SpotSampler
+import ShowPlanner
+import ShowWatcher
+import Loudness
+import OutputEncoder
+import RunHistory
+import OutputQC
+import ReaPeaks
+import SpotConditioning
+import WorkQueue
+import SpotPreview
+import ShowSegments
+import concurrent.futures
+
+try:
+	import winsound
+except ImportError:
+	#not on Windows - no beep at the end
+	winsound = None
 
 #these values need to be modified to match the Reaper audio configuration
 intRequiredBatchVersion = 3 #required version of the batch file
 conPathToReaper = "C:\\Program Files\\REAPER (x64)\\reaper.exe"
 blnUseCLArgs = True #use commandline arguments or override with test arguments in code?
+conRenderCommand = "\"{reaper}\" -renderproject \"{project}\"" #{project} and {output} are filled in for each station
+conRenderCommandNewInstance = "\"{reaper}\" -newinst -renderproject \"{project}\"" #used when rendering more than one station at a time
 
 #-Do not change anything below here---------------------------------------------------------------------'
 RenderMP3 = 1
@@ -156,8 +177,10 @@ RenderWAV = 2
 conRenderFilePrefix = "  RENDER_FILE "
 conMarkerLabel = "MARKER"
 conRenderConfigLabel = "RENDER_CFG"
+conRenderRangePrefix = "  RENDER_RANGE "
 RenderCfgMP3 = "    bDNwbUABAAABAAAABQAAAP////8EAAAAQAEAAAAAAAA="
 RenderCfgWAV = "    ZXZhdxAA"
+RenderCfgWAVMix = "    ZXZhdxgA" #24-bit - the common mix keeps more bits than the stations it's mixed into
 strTrackNameToFind = "Station VT"
 conMarkerOptionDesignator = "-"
 conProjectTemplate = "newtemplate"
@@ -173,8 +196,27 @@ conCursorLabel =  "  CURSOR"
 conDefaultCursorValue = "  CURSOR 0"
 conZoomLabel = "  ZOOM"
 conDefaultZoomValue = "  ZOOM 0.13521563292539 0 0"
+conCacheFolderName = ".rendershow" #folder in the assets folder where the script keeps its caches
 conVzoomexLabel = "  VZOOMEX"
 conDefaultVzoomexValue = "  VZOOMEX 8"
+conDefaultTagTitle = "Soul-Titanium Radio Show {show} - {dj}" #{show}, {dj} and {station} are filled in for each station
+conDefaultTagArtist = "Mike Soultanian"
+conDefaultTagGenre = "House"
+conEncodeCommand = "lame --quiet -b {bitrate} \"{input}\" \"{output}\"" #used to make the MP3s when stations are mixed instead of rendered, and by --encode
+conCommonMixName = "common" #station name used for the common mix in --stationmix mode
+conStationMixFolder = "mixes" #folder in the cache folder where the common mix is rendered
+conMasterRenderFolder = "masters" #folder in the cache folder where the stations are rendered with --encode
+conQCFolder = "qc" #folder in the cache folder where the --qc reports are written
+conPreviewFolder = "previews" #folder in the cache folder where the --preview windows are rendered
+conSegmentFolder = "segments" #folder in the cache folder where the --segments pieces are rendered
+conSegmentKeyword = "SEGMENT" #--segments splits the show at the markers whose names start with this
+conDecodeCommand = "lame --quiet --decode \"{input}\" \"{output}\"" #used by --qc to check MP3s
+conRenderBytesPerSecondMP3 = 40000 #320kbps - RenderCfgMP3
+conRenderBytesPerSampleWAV = 4 #16-bit stereo - RenderCfgWAV
+conRenderBitsPerSampleWAV = 16 #RenderCfgWAV - the bits of the mixed stations
+conRenderBytesPerSampleWAVMix = 6 #24-bit stereo - RenderCfgWAVMix
+conDefaultSeed = "rendershow" #used by --seed without any text and by --watch
+conQueueJobs = 50 #stations in the --queue folder at a time, unless --renderworkers says otherwise
 
 if not blnUseCLArgs:
 	print()
@@ -186,14 +228,58 @@ print('Python script directory:\n', strScriptPath)
 
 #retrieve the arguments from the calling batch file
 objCLParser = argparse.ArgumentParser(description="Really cool show processing script")
-objCLParser.add_argument("--projectpath", required=True, metavar="[path]", help="path to the Reaper project files to be processed")
+objCLParser.add_argument("--projectpath", required=False, nargs="+", metavar="[path]", help="path to the Reaper project files to be processed - give more than one to process a batch of shows")
 objCLParser.add_argument("--renderpath", required=True, metavar="[path]", help="path to where there rendered files should be output")
 objCLParser.add_argument("--assetspath", required=True, metavar="[path]", help="path to where the show assets are")
-objCLParser.add_argument("--stations", required=True, metavar="[station list]", help="comma separated list of stations to process")
+objCLParser.add_argument("--stations", required=False, metavar="[station list]", help="comma separated list of stations to process")
 objCLParser.add_argument("--scriptversion", required=True, metavar="[version number]", help="this integer value needs to match the version in the script")
+objCLParser.add_argument("--jobs", required=False, metavar="[file]", help="JSON list of shows to process as a batch - each one has a projectpath and can set its own projectfile, stations, show and dj")
 objCLParser.add_argument("--projectfile", required=False, metavar="[reaper project file]", help="bypasses the project file selection menu - only specify file name (i.e. show.RPP)")
 objCLParser.add_argument("--renderformat", required=False, metavar="[MP3|WAV]", help="bypasses the render format selection menu")
 objCLParser.add_argument("--norender", required=False, action="store_true", help="useful if you only want to generate the project files")
+objCLParser.add_argument("--renderworkers", required=False, type=int, metavar="[count]", help="number of stations to render at the same time (default=1, or half the CPU cores for a batch of shows)")
+objCLParser.add_argument("--renderattempts", required=False, type=int, default=3, metavar="[count]", help="how many times a station's render is attempted before giving up (default=3)")
+objCLParser.add_argument("--stagemode", required=False, default=AssetStaging.StageModeCopy, choices=[AssetStaging.StageModeCopy, AssetStaging.StageModeLink], help="copy makes independent copies of the spots in the project (reflinked when the file system can), link hardlinks them when possible - faster, but Reaper's destructive edits then change the spots in the assets folder too (default=copy)")
+objCLParser.add_argument("--writemode", required=False, default="splice", choices=["splice", "text"], help="splice writes station projects as byte ranges of the master, text rewrites them line by line (default=splice)")
+objCLParser.add_argument("--cachepath", required=False, metavar="[path]", help="where the script keeps its caches (default=[assetspath]\\%s)" % conCacheFolderName)
+objCLParser.add_argument("--norendercache", required=False, action="store_true", help="always render every station, even when a cached render of the same project exists")
+objCLParser.add_argument("--rendercachesize", required=False, type=float, default=20, metavar="[GB]", help="size limit of the render cache (default=20)")
+objCLParser.add_argument("--seed", required=False, nargs="?", const=conDefaultSeed, metavar="[text]", help="pick the same random spots every time a show is run for a station - change the text to reshuffle")
+objCLParser.add_argument("--plan", required=False, metavar="[file]", help="save the plan for every station (spot files, lengths and positions) as JSON")
+objCLParser.add_argument("--planonly", required=False, action="store_true", help="check the show and make the plan without writing or rendering anything")
+objCLParser.add_argument("--trace", required=False, metavar="[file]", help="record how long every phase and station takes and save it as a Chrome trace (opens in Perfetto)")
+objCLParser.add_argument("--peaks", required=False, action="store_true", help="write Reaper's peak files for the staged spots so Reaper doesn't build them for every station project - they're cached by the spots' content (needs NumPy)")
+objCLParser.add_argument("--qc", required=False, action="store_true", help="check every station's output around its spots for dead air, clipping and level jumps and write a report for each station (needs NumPy)")
+objCLParser.add_argument("--decodecommand", required=False, default=conDecodeCommand, metavar="[command]", help="MP3 decoder used by --qc - {input} and {output} are replaced with the MP3 and WAV paths (default=%s)" % conDecodeCommand)
+objCLParser.add_argument("--preview", required=False, action="store_true", help="instead of rendering every station's whole show, make a short WAV of the audio around each of its spots with a tone between them, to check the spots by ear (needs NumPy)")
+objCLParser.add_argument("--previewbefore", required=False, type=float, default=SpotPreview.conBeforeSeconds, metavar="[seconds]", help="audio --preview keeps before each spot starts (default=%s)" % SpotPreview.conBeforeSeconds)
+objCLParser.add_argument("--previewafter", required=False, type=float, default=SpotPreview.conAfterSeconds, metavar="[seconds]", help="audio --preview keeps after each spot ends (default=%s)" % SpotPreview.conAfterSeconds)
+objCLParser.add_argument("--segments", required=False, nargs="?", const=conSegmentKeyword, metavar="[marker text]", help="split each station's show at the markers whose names start with this text (default=%s), render the pieces at the same time and join them into the output - put the markers where nothing rings on, e.g. between songs (needs NumPy)" % conSegmentKeyword)
+objCLParser.add_argument("--nohistory", required=False, action="store_true", help="don't record the run in the run history (see RunHistory.py for the reports)")
+objCLParser.add_argument("--tagtitle", required=False, default=conDefaultTagTitle, metavar="[text]", help="MP3 title tag - {show}, {dj} and {station} are replaced (default=\"%s\")" % conDefaultTagTitle.replace("%", "%%"))
+objCLParser.add_argument("--tagartist", required=False, default=conDefaultTagArtist, metavar="[text]", help="MP3 artist tag (default=\"%s\")" % conDefaultTagArtist)
+objCLParser.add_argument("--taggenre", required=False, default=conDefaultTagGenre, metavar="[text]", help="MP3 genre tag (default=\"%s\")" % conDefaultTagGenre)
+objCLParser.add_argument("--tagversion", required=False, type=int, default=3, choices=[3, 4], help="ID3v2 version written to the MP3s - an ID3v1 tag is always written too (default=3)")
+objCLParser.add_argument("--renderstall", required=False, type=float, default=RenderWatchdog.conStallTimeout, metavar="[seconds]", help="kill and retry a render whose output stops growing for this long (default=%i)" % RenderWatchdog.conStallTimeout)
+objCLParser.add_argument("--rendertolerance", required=False, type=float, default=RenderWatchdog.conDurationTolerance, metavar="[seconds]", help="how far a rendered file's duration may be from the project length before it's rendered again, -1 turns the check off (default=%i)" % RenderWatchdog.conDurationTolerance)
+objCLParser.add_argument("--stationmix", required=False, action="store_true", help="render the show once without the %s track and mix each station's spots into that instead of rendering every station (needs NumPy)" % strTrackNameToFind)
+objCLParser.add_argument("--encodecommand", required=False, default=conEncodeCommand, metavar="[command]", help="MP3 encoder used with --stationmix and --encode - {input} and {output} are replaced with the WAV and MP3 paths and {bitrate} with the bitrate in kbps (default=%s)" % conEncodeCommand)
+objCLParser.add_argument("--encode", required=False, nargs="+", metavar="[format]", help="render each station once to a WAV and encode these outputs from it, e.g. mp3-320 mp3-128 web:mp3-96 wav - formats with a station name replace the others for that station")
+objCLParser.add_argument("--encodeworkers", required=False, type=int, metavar="[count]", help="number of outputs to encode at the same time with --encode (default=number of CPU cores)")
+objCLParser.add_argument("--watch", required=False, action="store_true", help="keep running and regenerate (and render, unless --norender is on) the stations whose spots or master project change - implies --seed")
+objCLParser.add_argument("--watchinterval", required=False, type=float, default=ShowWatcher.conPollInterval, metavar="[seconds]", help="how often --watch checks for changes (default=%s)" % ShowWatcher.conPollInterval)
+objCLParser.add_argument("--spotloudness", required=False, type=float, metavar="[LUFS]", help="measure every station spot and set its ITEM volume so it plays at this integrated loudness, e.g. -16 (needs NumPy)")
+objCLParser.add_argument("--spotpeak", required=False, type=float, default=Loudness.conPeakCeiling, metavar="[dBTP]", help="--spotloudness never turns a spot up past this true peak (default=%s)" % Loudness.conPeakCeiling)
+objCLParser.add_argument("--conditionspots", required=False, action="store_true", help="convert every station spot once to the project's sample rate, --spotchannels and --spotbits and trim its leading and trailing silence, so Reaper never converts a spot while rendering (needs NumPy)")
+objCLParser.add_argument("--spotchannels", required=False, type=int, default=2, choices=[1, 2], help="channels of the spots made by --conditionspots (default=2)")
+objCLParser.add_argument("--spotbits", required=False, type=int, default=24, choices=[16, 24, 32], help="bit depth of the spots made by --conditionspots - 32 is floating point (default=24)")
+objCLParser.add_argument("--trimlevel", required=False, type=float, default=SpotConditioning.conTrimLevel, metavar="[dBFS]", help="--conditionspots trims anything quieter than this from the start and end of every spot (default=%s)" % SpotConditioning.conTrimLevel)
+objCLParser.add_argument("--conditioncachesize", required=False, type=float, default=5, metavar="[GB]", help="size limit of the conditioned spots kept by --conditionspots (default=5)")
+objCLParser.add_argument("--ripple", required=False, action="store_true", help="when a station's spots overlap, or leave dead air between spots that are back to back in the master, move the later spots to fix it")
+objCLParser.add_argument("--queue", required=False, metavar="[path]", help="put the station renders in this shared folder for WorkQueue.py workers on any machine that can see it to render, instead of rendering them here")
+objCLParser.add_argument("--queueworkers", required=False, type=int, default=0, metavar="[count]", help="workers to start on this machine for --queue (default=0, only workers started elsewhere)")
+objCLParser.add_argument("--leasetimeout", required=False, type=float, default=WorkQueue.conLeaseTimeout, metavar="[seconds]", help="a --queue job whose worker hasn't been heard from for this long is given to another worker (default=%i)" % WorkQueue.conLeaseTimeout)
+objCLParser.add_argument("--rendercommand", required=False, metavar="[command]", help="command used to render a station - {project} and {output} are replaced with the station's paths (default runs reaper.exe)")
 if blnUseCLArgs:
 	objCLArgs = objCLParser.parse_args()
 else:
@@ -208,12 +294,13 @@ else:
 
 if objCLArgs.projectfile:
 	print("Project file:", objCLArgs.projectfile)
-if objCLArgs.renderformat.lower() == "mp3" or objCLArgs.renderformat.lower() == "wav":
-	print("Render format:", objCLArgs.renderformat)
-else:
-	print("WARNING: Invalid render format specified on the command-line")
-	sys.exit()
-	
+if objCLArgs.renderformat:
+	if objCLArgs.renderformat.lower() == "mp3" or objCLArgs.renderformat.lower() == "wav":
+		print("Render format:", objCLArgs.renderformat)
+	else:
+		print("WARNING: Invalid render format specified on the command-line")
+		sys.exit()
+
 if objCLArgs.norender:
 	print("Rendering DISABLED")
 	blnRenderOn = False
@@ -221,16 +308,29 @@ else:
 	print("Rendering ENABLED")
 	blnRenderOn = True
 
-strProjectPath = objCLArgs.projectpath
+#the shows to process - usually the one in --projectpath, but several project paths or a --jobs
+#	file run a batch of shows together
+lstShowSpecs = [{"projectpath": strPath} for strPath in objCLArgs.projectpath or []]
+if objCLArgs.jobs:
+	try:
+		with open(objCLArgs.jobs, "r") as fJobs:
+			lstShowSpecs.extend(json.load(fJobs))
+	except (OSError, ValueError) as objError:
+		print("ERROR: unable to read the job file -", objError)
+		sys.exit()
+	if not all(isinstance(dictSpec, dict) and "projectpath" in dictSpec for dictSpec in lstShowSpecs):
+		print("ERROR: every show in the job file needs a projectpath")
+		sys.exit()
+if not lstShowSpecs:
+	objCLParser.error("a --projectpath or a --jobs file is required")
+#batch mode never stops to ask - the project file defaults to show.RPP and the format to MP3
+blnBatch = len(lstShowSpecs) > 1 or bool(objCLArgs.jobs)
+if blnBatch:
+	print("Batch of %i shows" % len(lstShowSpecs))
+
 strRenderOutputPath = objCLArgs.renderpath
 strAssetsPath = objCLArgs.assetspath
-
-#check if the project folder exists
-if os.path.exists(strProjectPath):
-	print("Reaper project folder:\n", strProjectPath)
-else:
-	print("Project folder specified does not exist:\n", strProjectPath)
-	sys.exit()
+strCachePath = objCLArgs.cachepath or os.path.join(strAssetsPath, conCacheFolderName)
 
 #check if the render output folder exists
 if os.path.exists(strRenderOutputPath):
@@ -239,16 +339,6 @@ else:
 	print("Render output folder specified does not exist:\n", strRenderOutputPath)
 	sys.exit()
 
-#clean up the station list provided by the batch file
-strStations = objCLArgs.stations.replace(" ", "").lower()
-
-print("Stations from batch file: %s" % strStations)
-#convert the string list of station names to process to a list so it's easier to loop through
-lstStations = strStations.split(",")
-
-#add template identifier to the list of stations to output a template version of the show
-lstStations.append(conProjectTemplate)
-
 #will need to retrieve batch version from batch file
 tempbatchversion = objCLArgs.scriptversion
 intBatchVersion = int(tempbatchversion)
@@ -258,53 +348,49 @@ else:
 	print("Batch file is not the correction version.  Quitting.")
 	sys.exit()
 
-#pull the guest DJ name and show number from the path
-strParentFolder = str(pathlib.Path(strProjectPath).parent)
-strShowNameNum = os.path.basename(strParentFolder)
-#split the name and number into a list
-lstShowNameNum = strShowNameNum.split("-")
-#split the first list element of lstShowNameNum (show ##) and store the second element (number)
-strShowNumber = shlex.split(lstShowNameNum[0])[1]
-#strip the witespace off of the second element (name) in lstShowNameNum
-strDJName = lstShowNameNum[1].strip()
-
-print("DJ name: %s | show number: %s" % (strDJName, strShowNumber))
-
-#retrieve the files from the folder where the batch file is run
-lstProjectFolderFiles = [f for f in os.listdir(strProjectPath) if os.path.isfile(os.path.join(strProjectPath, f))]
-
-#pick out the valid reaper files from the file listing
-lstProjectFolderFiles = [x.lower() for x in lstProjectFolderFiles]
-lstValidFiles = []
-for strFileName in lstProjectFolderFiles:
-	if ".rpp" in strFileName and not ".rpp-bak" in strFileName:
-		lstValidFiles.append(strFileName)
-
-#project file selection menu
-if objCLArgs.projectfile:
-	#show file name specified on command-line
-	strMasterProjectFilePath = os.path.join(strProjectPath,objCLArgs.projectfile)
-else:
-	#no command-line arguments were specified, show menu
+def ShowNameNumber(strProjectPath):
+	#pull the guest DJ name and show number from the path
+	strParentFolder = str(pathlib.Path(strProjectPath).parent)
+	strShowNameNum = os.path.basename(strParentFolder)
+	#split the name and number into a list
+	lstShowNameNum = strShowNameNum.split("-")
+	#split the first list element of lstShowNameNum (show ##) and store the second element (number)
+	strShowNumber = shlex.split(lstShowNameNum[0])[1]
+	#strip the witespace off of the second element (name) in lstShowNameNum
+	strDJName = lstShowNameNum[1].strip()
+	return (strShowNumber, strDJName)
+
+def SelectProjectFile(strProjectPath):
+	#retrieve the files from the folder where the batch file is run
+	lstProjectFolderFiles = [f for f in os.listdir(strProjectPath) if os.path.isfile(os.path.join(strProjectPath, f))]
+
+	#pick out the valid reaper files from the file listing
+	lstProjectFolderFiles = [x.lower() for x in lstProjectFolderFiles]
+	lstValidFiles = []
+	for strFileName in lstProjectFolderFiles:
+		if ".rpp" in strFileName and not ".rpp-bak" in strFileName:
+			lstValidFiles.append(strFileName)
+
+	#project file selection menu
 	blnValidSelection = False
 	while blnValidSelection != True:
 		print()
 		for i,f in enumerate(lstValidFiles,start=1):
 			print("%i. %s" %(i,f))
-	
+
 		strInput = input("Select which Reaper file you'd like to process (default=show.RPP, x=exit): ")
-	
+
 		if strInput == "":
-			#default to "show.RPP"		
+			#default to "show.RPP"
 			strMasterProjectFilePath = os.path.join(strProjectPath,"show.RPP")
 			blnValidSelection = True
 		elif strInput.isnumeric():
 			strInput = int(strInput.lower().strip())
 			if strInput > 0 and strInput <= len(lstValidFiles):
-				#build complete path to the reaper project file		
+				#build complete path to the reaper project file
 				strMasterProjectFilePath = os.path.join(strProjectPath,lstValidFiles[strInput-1])
 				blnValidSelection = True
-			else:		
+			else:
 				print("\nInvalid selection - please make another selection.\n")
 		elif strInput == "x":
 			sys.exit()
@@ -312,8 +398,73 @@ else:
 			print("\nInvalid selection - please make another selection.\n")
 
 	print("\nSelected Reaper project:\n %s\n" % strMasterProjectFilePath)
+	return strMasterProjectFilePath
 
-if objCLArgs.renderformat:
+#(project path, master project file, show number, DJ name, stations) for each show
+lstShowArgs = []
+for dictSpec in lstShowSpecs:
+	strProjectPath = dictSpec["projectpath"]
+
+	#check if the project folder exists
+	if os.path.exists(strProjectPath):
+		print("Reaper project folder:\n", strProjectPath)
+	else:
+		print("Project folder specified does not exist:\n", strProjectPath)
+		sys.exit()
+
+	#clean up the station list provided by the batch file (or the job file)
+	strStations = dictSpec.get("stations", objCLArgs.stations)
+	if not strStations:
+		print("No stations to process for %s" % strProjectPath)
+		sys.exit()
+	if not isinstance(strStations, str):
+		strStations = ",".join(strStations)
+	strStations = strStations.replace(" ", "").lower()
+
+	print("Stations from batch file: %s" % strStations)
+	#convert the string list of station names to process to a list so it's easier to loop through
+	lstStations = strStations.split(",")
+
+	#add template identifier to the list of stations to output a template version of the show
+	lstStations.append(conProjectTemplate)
+
+	if "show" in dictSpec and "dj" in dictSpec:
+		strShowNumber = str(dictSpec["show"])
+		strDJName = dictSpec["dj"]
+	else:
+		try:
+			strShowNumber, strDJName = ShowNameNumber(strProjectPath)
+		except (IndexError, ValueError):
+			print("Unable to get the show number and DJ name from the folder name - expecting \"show ## - DJ name\":\n", str(pathlib.Path(strProjectPath).parent))
+			sys.exit()
+
+	print("DJ name: %s | show number: %s" % (strDJName, strShowNumber))
+
+	strProjectFile = dictSpec.get("projectfile", objCLArgs.projectfile)
+	if strProjectFile:
+		#show file name specified on command-line
+		strMasterProjectFilePath = os.path.join(strProjectPath,strProjectFile)
+	elif blnBatch:
+		strMasterProjectFilePath = os.path.join(strProjectPath,"show.RPP")
+	else:
+		#no command-line arguments were specified, show menu
+		strMasterProjectFilePath = SelectProjectFile(strProjectPath)
+	lstShowArgs.append((strProjectPath, strMasterProjectFilePath, strShowNumber, strDJName, lstStations))
+
+#with --encode the stations are rendered to master WAVs in the cache folder and every output
+#	format is encoded from them
+lstOutputFormats = []
+if objCLArgs.encode:
+	try:
+		lstOutputFormats = [OutputEncoder.ParseFormat(strSpec) for strSpecs in objCLArgs.encode for strSpec in strSpecs.split(",") if strSpec.strip()]
+	except OutputEncoder.EncodeError as objError:
+		print("ERROR:", objError)
+		sys.exit()
+	print("Output formats: %s" % ", ".join(str(objFormat) for objFormat in lstOutputFormats))
+
+if lstOutputFormats:
+	blnRenderMP3 = False
+elif objCLArgs.renderformat:
 	#render format specified on the command-line
 	if objCLArgs.renderformat.lower() == "mp3":
 		strRenderExt = ".mp3"
@@ -326,6 +477,8 @@ if objCLArgs.renderformat:
 	else:
 		print("WARNING: Should never get here - there was a problem")
 		sys.exit
+elif blnBatch:
+	blnRenderMP3 = True
 else:
 	#no command-line arguments where specified, show format selection menu
 	blnValidSelection = False
@@ -333,12 +486,11 @@ else:
 		print("\nSelect which format you'd like to render to:\n")
 		print(str(RenderMP3) + ". MP3")
 		print(str(RenderWAV) + ". WAV")
-	
+
 		strInput = input("Select render format (default=1): ")
-	
+
 		if strInput == "":
-			strRenderExt = ".mp3"
-			strRenderCfg = RenderCfgMP3
+			blnRenderMP3 = True
 			blnValidSelection = True
 		elif strInput.isnumeric:
 			strInput = int(strInput.lower().strip())
@@ -352,443 +504,1059 @@ else:
 				print("\nInvalid selection - please make another selection.\n")
 		else:
 			sys.exit()
-	
+
 	print("Selected render config: ", end="")
 	if blnRenderMP3:
 		print("MP3")
 	else:
 		print("WAV")
 	print()
-	
+
 if blnRenderMP3:
 	strRenderExt = ".mp3"
 	strRenderCfg = RenderCfgMP3
 else:
 	strRenderExt = ".wav"
 	strRenderCfg = RenderCfgWAV
-	
-intTotalRenderAttempts = 0
-intRenderSuccessCnt = 0
-intRenderFailureCnt = 0
-lstFailedStationRender = []
-
-#delete imported folder if it exists
-shutil.rmtree(os.path.join(strProjectPath,"Audio\\Imported"),True)
-
-for strStation in lstStations:
-	print("\nProcessing " + strStation + "...")
-
-	#find out how many random files there are for this station
-	if strStation != conProjectTemplate:
-		#finding random files for the stations, but not the template
-		
-		strStationRandomWAVPath = os.path.join(strAssetsPath, conAudioFolderName, strStation, conRandomSpotsSrcFolder)
-#		print(" Random wav folder:\n",strStationRandomWAVPath)
-		#check if the random wav folder exists
-		if not os.path.exists(strStationRandomWAVPath):
-			print(" random wav folder for %s is missing" % strStation)
-			sys.exit()
 
-		#build a list with all the random wavs in the folder
-		lstRandomWAVsFilenames = [f for f in os.listdir(strStationRandomWAVPath) if os.path.isfile(os.path.join(strStationRandomWAVPath, f)) and
-							re.search(r'\.wav$', f, re.IGNORECASE)]
-		
-#		print(" Found %i spots in the random audio folder" % (len(lstRandomWAVsFilenames)))
-			
-	#start parsing through the main project file and open the generated station file for writing
-	strStationProjectFilePath = os.path.join(strProjectPath, "show-" + strShowNumber + "-" + strStation + ".RPP")
-	with open(strMasterProjectFilePath, "r") as fShowTemplate, \
-		open(strStationProjectFilePath, "w") as fOutFile:  
-		#start moving line by line through the show template
-		dictMarkers = {}
-		for strLine in fShowTemplate:
-			#find the markers and save them in a dictionary
-			if conMarkerLabel.lower() in strLine.lower():
-				#the marker label was found, split it into a list
-
-				#let's check to see if it's associated with an importable spot
-				if "import" not in strLine.lower():
-					#this marker doesn't have the processing keyword so just write this line to the reaper file
-					fOutFile.write(strLine)
-				else:
-					#this MARKER has the processing keyword so let's process it
-
-					#remove the ITEM processing keyword split marker into a list
-					lstMarkerDetails = shlex.split( strLine.lower().replace(conITEMProcessKeyword.lower(), "") )
-
-#					print(" Processing: \"%s\"" % lstMarkerDetails[3])
-					
-					#lstMarkerDetails has the following:
-					#	0:marker label, 1:id, 2:position, 3:marker name, ...other stuff I'm not using
-					if conMarkerOptionDesignator in lstMarkerDetails[3]:
-						#options have been found, let's save them and the marker name
-						strMarkerName = lstMarkerDetails[3].split("-")[0].lower()
-						strMarkerOptions = lstMarkerDetails[3].split("-")[1]
-					else:
-						#no options found, just save the marker name
-						strMarkerName = lstMarkerDetails[3].lower()
-						strMarkerOptions = ""
-						
-					#store position		
-					strMarkerPosition = lstMarkerDetails[2]
-					
-					#check for duplicate markers
-					if strMarkerName not in dictMarkers:
-						# this is not a duplicate - save the marker details to a dictionary
-						#	{"marker name":["marker position","marker options"]}
-						#	options currently are E=end snap, R=Random spot
-						dictMarkers[strMarkerName] = [strMarkerPosition,strMarkerOptions]
-					else:
-						print(" Duplicate marker found")
-						sys.exit()
-					fOutFile.write(strLine.upper())
-
-			#update the render format with the one selected
-			elif conRenderConfigLabel.lower() in strLine.lower():
-				fOutFile.write(strLine)
-				fOutFile.write(strRenderCfg + "\n")
-				#this if is writing two lines to the project file so we'll advance the input project file pointer as well
-				next(fShowTemplate)
-
-			#reset the cursor position
-			elif conCursorLabel.lower() in strLine.lower():
-				fOutFile.write(conDefaultCursorValue + "\n")
-
-			#reset the zoom
-			elif conZoomLabel.lower() in strLine.lower():
-				fOutFile.write(conDefaultZoomValue + "\n")
-
-			#reset the vertical zoom
-			elif conVzoomexLabel.lower() in strLine.lower():
-				fOutFile.write(conDefaultVzoomexValue + "\n")
-				
-			#update the rendered file name
-			elif conRenderFilePrefix.lower().strip() in strLine.lower():
-				fOutFile.write(conRenderFilePrefix + "\"" + os.path.join(strRenderOutputPath, "show-" + strShowNumber + "-" + strStation + strRenderExt) + "\"\n")
-			
-			#search for the Station VT track
-			elif strTrackNameToFind.lower() not in strLine.lower():
-				#station VT track was not found so let's just write the current line
-				fOutFile.write(strLine)
-			elif strTrackNameToFind.lower() in strLine.lower():
-				#we're now inside the Station VT track
-				fOutFile.write(strLine)
-				lstRandomList = []
-				intRandomSpotCnt = 0
-				#move through the station vt track until we find the ITEM header
-				for strLine in fShowTemplate:
-					if "item" not in strLine.lower():
-						#item marker not found so just write the current line to the output file
-						fOutFile.write(strLine)
-					else:
-						#ITEM header was found - let's process its elements
-
-						#store how many spaces the ITEM marker is indented to use when writing other elements
-						intItemIndent = strLine.lower().find("item")-1
-						
-						#the for loop we're in advanced the pointer so we need to grab this line and add it to the
-						#	list that's going to store each line within the element
-						lstItem = []
-						lstItem.append(strLine)
-						
-						#step through all the elements in the ITEM and put them in a list
-						intElementCount = 0
-						for strLine in fShowTemplate:
-#							print("%s" % strLine,end="")
-							lstItem.append(strLine)
-							intElementCount = intElementCount + 1
-							if ">" in strLine and (len(strLine) - len(strLine.lstrip())) == intItemIndent:
-								#end of the ITEM
-								break
-
-
-
-
-#gotta figure out where to put this lock code and do it cleanly
-#								#let's lock all the station template spots
-#								lstItem.append(" "*(intItemIndent+2) + "LOCK 1\n")
-
-
-
-
-
-
-
-
-
-
-
-
-
-								
-						#now check to make sure all elements are where we expect them to be as a new
-						#	version of Reaper might change how ITEM elements are ordered.
-						#lstItem reference:
-						#	1:position, 3:length, 4: loop, 13:name, 20:file
-						
-						if "position"  in lstItem[1].lower():
-							fltItemPosition = float(shlex.split(lstItem[1])[1])
-						else:
-							print("ERROR: POSITION element wasn't where it was expected to be!")
-							print("Found this instead:",lstItem[1])
-							sys.exit()
-						
-						if "length" in lstItem[3].lower():
-							fltItemLength = float(shlex.split(lstItem[3])[1])
-						else:
-							print("ERROR: LENGTH element wasn't where it was expected to be!")
-							print("Found this instead:",lstItem[3])
-							sys.exit()
-							
-						if "loop" in lstItem[4].lower():
-							intItemLoop = int(shlex.split(lstItem[4])[1])
-						else:
-							print("ERROR: LENGTH element wasn't where it was expected to be!")
-							print("Found this instead:",lstItem[4])
-							sys.exit()
-
-						if "name" in lstItem[13].lower():
-							strItemName = shlex.split(lstItem[13])[1].lower()
-						else:
-							print("ERROR: NAME element wasn't where it was expected to be!")
-							print("Found this instead:",lstItem[13])
-							sys.exit()
-						
-						if "file" in lstItem[20].lower():
-							strItemFile = shlex.split(lstItem[20])[1]
-						else:
-							print("ERROR: FILE element wasn't where it was expected to be!")
-							print("Found this instead:",lstItem[20])
-							sys.exit()
-
-						#let's check to see if this is an importable spot
-						if "import" not in strItemName.lower():
-							print(" Spot \"%s\" does not contain IMPORT - skipping" % strItemName)
-						else:
-							#this ITEM has the IMPORT keyword so let's process it
-
-							#check if item name exists in marker dictionary
-
-######### todo check exist in marker ditionary
-							
-							#remove the item processing keyword
-							strItemName = strItemName.replace(conITEMProcessKeyword.lower(), "")
-
-							#store this spot's associated marker options in a variable
-							strItemOptions = dictMarkers[strItemName][1].lower()
-	#						print(" spot options:", strItemOptions)
-
-							if conSpotEndSnapOption in strItemOptions:
-								#this spot's position is snapped to the end of the spot
-	#							print( " snapped to end of spot")
-								blnEndSnap = True
-							else:
-								#this spot's position is snapped to the beginning of the spot
-	#							print( " snapped to beginning of spot")
-								blnEndSnap = False
-							
-							#update the elements within this spot's ITEM block
-							if strStation != conProjectTemplate:
-								#check to make sure that this spots ITEM name has an associated marker
-								if strItemName.lower() not in dictMarkers.keys():
-									print(),print(" This spot (%s) does not have an associated marker" % strItemName)
-									sys.exit()
-
-								#update file location stored for this spot
-								if conSpotRandomOption in strItemOptions:
-									#this is a random spot
-									#check to make sure there are enough random files to match the number of spots
-									intRandomSpotCnt += 1
-									if intRandomSpotCnt > len(lstRandomWAVsFilenames):
-										print(" Not enough WAVs in the %s folder to fill all the spots.  Expecting at least %i spots" % (strStation,intRandomSpotCnt))
-										print()
-										sys.exit()
-
-									#select a random spot but make sure it hasn't been used already
-									while True:
-										#random number needs to be offset by one because the list of random WAVs starts at 0
-										intFileNumber = random.randint(0,len(lstRandomWAVsFilenames)-1)
-										if intFileNumber not in lstRandomList:
-											lstRandomList.append(intFileNumber)
-											break
-									
-									#build the full path the selected random file
-									strWavSrcPath = os.path.join(strAssetsPath, "Audio", strStation, "Random spots",lstRandomWAVsFilenames[intFileNumber])
-									strWavSrcFolder = str(pathlib.Path(strWavSrcPath))
-
-									#verify that file has station name in it just to be sure we're not accidentally 
-									#pulling ling the wrong files
-									if (strStation + "-") not in os.path.basename(strWavSrcPath):
-										print(" \"%s\" needs to contain [station hypen] at the beginning of the filename" % os.path.basename(strWavSrcPath))
-										sys.exit()
-								else:
-									#this is general (non-random) spot
-									strWavSrcPath = os.path.join(strAssetsPath, "Audio", strStation, "General", strStation + "-" + strItemName + ".wav")
-									strWavSrcFolder = str(pathlib.Path(strWavSrcPath).parent)
-
-								#build the path to where the audio assets will be copied
-								strWavDestPath = os.path.join(strProjectPath,"Audio\\Imported",strStation,os.path.basename(strWavSrcPath))
-								strWavDestFolder = str(pathlib.Path(strWavDestPath).parent)
-
-								lstItem[20] = " "*(intItemIndent+4) + "FILE \"" + strWavDestPath + "\"\n"
-
-								#turn off looping as we don't want the spot to ever to loop if the length is wrong
-								lstItem[4] = " "*(intItemIndent+2) + "LOOP 0\n"
-
-								#update the length of the spot
-	#							print("item length: %f" % fltItemLength)
-	#							print("wav: %s" % strWavSrcPath)
-								with contextlib.closing(wave.open(strWavSrcPath,'r')) as f:
-									frames = f.getnframes()
-									rate = f.getframerate()
-									fltWAVDuration = round(frames / float(rate),14)
-
-								lstItem[3] = " "*(intItemIndent+2) + "LENGTH " + str(fltWAVDuration) + "\n"
-
-#								Gonna get rid of this and just place the item where the marker is								
-#								
-#								#update the position of the spot
-#								#check to make sure that the spot position is within a certain distance from the
-#								#	position specified by the marker
-#								if  blnEndSnap:
-#									#this spot's position is snapped to the end of the spot
-#									fltItemPositionDiff = abs(float(dictMarkers[strItemName][0]) - fltItemPosition - fltItemLength)
-#								else:
-#									#this spot's position is snapped to the beginning of the spot
-#									fltItemPositionDiff = abs(float(dictMarkers[strItemName][0]) - fltItemPosition)
-#		
-#								#check that the position is within tolerance, and if so, use that position
-#								if fltItemPositionDiff <= conSpotPositionTolerance:
-#									#spot is within required distance from marker, so we'll use marker position:
-#									if blnEndSnap:
-#										#snapped to end of spot
-#										fltNewItemPosition = float(dictMarkers[strItemName][0]) - fltWAVDuration
-#									else:
-#										#snapped to beginning of spot
-#										fltNewItemPosition = float(dictMarkers[strItemName][0])
-#								else:
-#									print("\"%s\" is too far away from where its marker expected it to be (end snap = %s)" % (strItemName, blnEndSnap) )
-#									print("Current location: %f\nMarker position: %s\nNew ITEM position based on WAV length: %f\nWAV length: %s\nDifference: %f\nPosition tolerance setting: %s" % (fltItemPosition, dictMarkers[strItemName][0], fltNewItemPosition, fltWAVDuration, fltItemPositionDiff, conSpotPositionTolerance) )
-#
-#									sys.exit()
-#
-#								print("\nITEM: %s (end snap: %s)\nLocation of beginning of ITEM: %f\nLocation of end of ITEM: %f\nMarker position: %s\nNew ITEM position based on WAV length: %f\nWAV length: %s\nDifference: %f\nPosition tolerance setting: %s" % (strItemName, blnEndSnap, fltItemPosition,fltItemPosition+fltItemLength, dictMarkers[strItemName][0], fltNewItemPosition, fltWAVDuration, fltItemPositionDiff, conSpotPositionTolerance) )
-
-
-								if blnEndSnap:
-									#snapped to end of spot
-									fltNewItemPosition = float(dictMarkers[strItemName][0]) - fltWAVDuration
-								else:
-									#snapped to beginning of spot
-									fltNewItemPosition = float(dictMarkers[strItemName][0])
-
-								lstItem[1] = " "*(intItemIndent+2) + "POSITION " + str(fltNewItemPosition) + "\n"
-								
-	#							print(" using \"%s\"" % (os.path.basename(strWavSrcPath)))
-		
-#		getting rid of this - always copying						if blnRenderOn:
-#									#rendering is enabled - check if destination folder exists
-
-								if not os.path.exists(strWavDestFolder):
-									os.makedirs(strWavDestFolder)
-		
-								if os.path.isfile(strWavSrcPath) and os.path.exists(strWavSrcPath):
-									if not os.path.exists(os.path.join(strProjectPath,"Audio\\Imported",strStation)):
-										print(" creating station folder in audio folder")
-										os.makedirs(os.path.join(strProjectPath,"Audio\\Imported",strStation))
-									shutil.copyfile(strWavSrcPath, strWavDestPath)
-								else:
-									print(" WARNING - file not found")
-									print(strWavSrcPath)
-									sys.exit()
-									
-							else:	
-								#generating spots for new template
-								#update the position of the spot
-								if blnEndSnap:
-									#snapped to end of spot
-									fltNewItemPosition = float(dictMarkers[strItemName.lower()][0]) - conTemplateDefaultSpotLength
-								else:
-									#snapped to beginning of spot
-									fltNewItemPosition = float(dictMarkers[strItemName.lower()][0])
-								
-								#we're not going to do this any more because we want to keep the original template ITEM
-								# positions in place.
-								#lstItem[1] = " "*(intItemIndent+2) + "POSITION " + str(fltNewItemPosition) + "\n"
-
-								#we're not going to do this any more because we want to keep the original template ITEM
-								# length in place.
-								#lstItem[3] = " "*(intItemIndent+2) + "LENGTH " + str(conTemplateDefaultSpotLength) + "\n"
-								
-								#turn on looping so that any length can be used for the silent wav
-								lstItem[4] = " "*(intItemIndent+2) + "LOOP 1\n"
-
-								#we're not going to do this any more because we want to keep the original template ITEM
-								# filename in place.
-								#lstItem[20] = " "*(intItemIndent+4) + "FILE \"Audio\\Template\\" + conSilentWAVFilename + "\"\n"
-
-	#							#this is here because the template uses a different style assets source folder layout than the stations
-								strWavSrcPath = os.path.join(strAssetsPath, "Audio\\General", conSilentWAVFilename)
-								strWavSrcFolder = str(pathlib.Path(strWavSrcPath).parent)
-								strWavDestPath = os.path.join(strProjectPath,"Audio\\Template",os.path.basename(strWavSrcPath))
-								strWavDestFolder = str(pathlib.Path(strWavDestPath).parent)
-
-							#commit all the changes made above
-							for strEntry in lstItem:
-								fOutFile.write(strEntry)
+#the stations are rendered straight to the render folder, or to their master WAVs with --encode
+strStationRenderPath = strRenderOutputPath
+if lstOutputFormats:
+	strStationRenderPath = os.path.join(strCachePath, conMasterRenderFolder)
+	os.makedirs(strStationRenderPath, exist_ok=True)
+
+#stations are rendered one at a time unless asked otherwise - a batch uses half the cores, as
+#	every Reaper render is multi-threaded itself
+intRenderWorkers = objCLArgs.renderworkers or (max(1, (os.cpu_count() or 2) // 2) if blnBatch else 1)
+if objCLArgs.queue:
+	#the workers are on the other end of the queue, the scheduler's only wait for them
+	intRenderWorkers = objCLArgs.renderworkers or conQueueJobs
+
+#trace the run's phases and stations if asked to - the run history only keeps how long each
+#	phase took, which doesn't need the whole trace
+if objCLArgs.trace:
+	objTracer = Tracing.Tracer()
+elif not objCLArgs.nohistory:
+	objTracer = Tracing.PhaseTimer()
+else:
+	objTracer = Tracing.objNullTracer
+
+#every run's stations, render attempts, failures and phases are recorded, and past render times
+#	decide which stations are rendered first
+objRunHistory = None
+if not objCLArgs.nohistory:
+	try:
+		os.makedirs(strCachePath, exist_ok=True)
+		objRunHistory = RunHistory.RunHistory(strCachePath)
+	except (OSError, RunHistory.sqlite3.Error) as objError:
+		print("WARNING: unable to open the run history -", objError)
+
+#set up the renderer - station renders are queued as the projects are generated and run once
+#	all the projects are written
+if objCLArgs.rendercommand:
+	strRenderCommand = objCLArgs.rendercommand
+elif intRenderWorkers > 1:
+	strRenderCommand = conRenderCommandNewInstance
+else:
+	strRenderCommand = conRenderCommand
+#renders are watched while they run and the finished file is checked against the project length
+objRenderWatchdog = RenderWatchdog.WatchdogExecutor(strRenderCommand, {"reaper": conPathToReaper}, fltStallTimeout=objCLArgs.renderstall)
+#with --queue the renders are handed to the workers instead, which use the same command and checks
+objRenderExecutor = objRenderWatchdog
+lstQueueWorkers = []
+if objCLArgs.queue:
+	objRenderExecutor = WorkQueue.QueueExecutor(objCLArgs.queue, strRenderCommand, {"reaper": conPathToReaper}, objCLArgs.renderstall, objCLArgs.rendertolerance, objCLArgs.leasetimeout)
+	print("Render queue:\n", objCLArgs.queue)
+objRenderVerifier = RenderWatchdog.RenderVerifier(objCLArgs.rendertolerance)
+objEncoderPool = OutputEncoder.EncoderPool(objCLArgs.encodecommand, objCLArgs.encodeworkers, objCLArgs.tagversion, objTracer)
+
+#renders are cached by the content of the station project and the audio it uses, so stations
+#	where nothing changed since their last render are never rendered again
+objHashIndex = ContentHash.ContentHashIndex(strCachePath)
+objRenderCache = None if objCLArgs.norendercache else RenderCache.RenderCache(strCachePath, int(objCLArgs.rendercachesize * 1024**3))
+
+#spot durations are read from the WAV headers and remembered between runs
+objWavInfoCache = WavInfo.WavInfoCache(strCachePath)
+
+#the random spot folders are only listed again when they change, and the spots each station
+#	aired are remembered so the ones that haven't aired for a while are picked first
+objSpotListings = SpotSampler.SpotListingCache(strCachePath)
+objRotationHistory = SpotSampler.RotationHistory(strCachePath)
+
+#spot loudness is measured once per WAV content
+objLevelCache = None
+if objCLArgs.spotloudness is not None:
+	if Loudness.numpy is None:
+		print("ERROR: --spotloudness needs NumPy")
+		sys.exit()
+	objLevelCache = Loudness.LevelCache(strCachePath, objHashIndex)
+
+#spots are conditioned once per WAV content and format
+objSpotConditioner = None
+if objCLArgs.conditionspots:
+	if SpotConditioning.numpy is None:
+		print("ERROR: --conditionspots needs NumPy")
+		sys.exit()
+	objSpotConditioner = SpotConditioning.SpotConditioner(strCachePath, objHashIndex, int(objCLArgs.conditioncachesize * 1024**3), objCLArgs.trimlevel, objTracer)
+
+#the staged spots' peaks are worked out once per WAV content
+objPeakCache = None
+if objCLArgs.peaks:
+	if ReaPeaks.numpy is None:
+		print("ERROR: --peaks needs NumPy")
+		sys.exit()
+	objPeakCache = ReaPeaks.PeakCache(strCachePath, objHashIndex, objTracer=objTracer)
+
+#the outputs are checked around the spots once they're rendered
+strQCPath = os.path.join(strCachePath, conQCFolder)
+if objCLArgs.qc and OutputQC.numpy is None:
+	print("ERROR: --qc needs NumPy")
+	sys.exit()
+objOutputChecker = OutputQC.OutputChecker(objCLArgs.decodecommand, strQCPath, objTracer=objTracer)
+
+#the preview windows are rendered (or mixed) into the cache folder and joined in the render folder
+strPreviewPath = os.path.join(strCachePath, conPreviewFolder)
+if objCLArgs.preview and SpotPreview.numpy is None:
+	print("ERROR: --preview needs NumPy")
+	sys.exit()
+
+#the --segments pieces are rendered into the cache folder and joined into the station's output
+strSegmentPath = os.path.join(strCachePath, conSegmentFolder)
+if objCLArgs.segments and ShowSegments.numpy is None:
+	print("ERROR: --segments needs NumPy")
+	sys.exit()
+
+#in --watch mode the random spots are always seeded so editing the show doesn't reshuffle them
+strSeed = objCLArgs.seed if objCLArgs.seed is not None or not objCLArgs.watch else conDefaultSeed
+
+def SegmentTimes(objMasterProject, strKeyword):
+	#positions (seconds) of the markers whose names start with strKeyword
+	lstTimes = []
+	for intLine in objMasterProject.lstMarkers:
+		try:
+			#marker label, id, position, name, ...
+			lstFields = shlex.split(objMasterProject.lstLines[intLine])
+			if len(lstFields) > 3 and lstFields[3].upper().startswith(strKeyword.upper()):
+				lstTimes.append(float(lstFields[2]))
+		except ValueError:
+			continue
+	return lstTimes
+
+class ShowRun:
+	#a show's master project and the latest plan for each of its stations - in --watch mode it's
+	#	kept between passes so only the stations whose inputs changed are planned and written again
+	def __init__(self, strProjectPath, strMasterProjectFilePath, strShowNumber, strDJName, lstStations):
+		self.strProjectPath = strProjectPath
+		self.strMasterProjectFilePath = strMasterProjectFilePath
+		self.strShowNumber = strShowNumber
+		self.strDJName = strDJName
+		self.lstStations = lstStations
+		#render jobs are named after the station - in a batch the show number is added so the
+		#	renders of different shows can be told apart
+		self.strJobPrefix = "show " + strShowNumber + " " if blnBatch else ""
+		self.objMasterProject = None
+		self.dictStationPlans = {}
+		self.dictStationSpots = {}
+		self.dictRenderKeys = {}
+		#with --stationmix the common mix project is written next to the station projects and
+		#	rendered into the cache folder
+		self.strCommonProjectFilePath = os.path.join(strProjectPath, "show-" + strShowNumber + "-" + conCommonMixName + ".RPP")
+		self.strCommonMixPath = os.path.join(strCachePath, conStationMixFolder, "show-" + strShowNumber + "-" + conCommonMixName + ".wav")
+
+	def Load(self):
+		#parse the master project - every station project is generated from this tree.  Raises
+		#	OSError or RppProject.RppError if it can't be read, leaving the last one loaded in place
+		with objTracer.Span("parse master") as dictSpan:
+			objMasterProject = RppProject.ParseProject(self.strMasterProjectFilePath, strTrackNameToFind, conITEMProcessKeyword, conMarkerOptionDesignator, objTracer)
+			dictSpan.update(lines=len(objMasterProject.lstLines), markers=len(objMasterProject.dictImportMarkers), spots=len(objMasterProject.lstImportItems))
+
+		#dictMarkers holds the IMPORT markers by name:
+		#	{"marker name":RppMarker(position, options)}
+		#	options currently are E=end snap, R=Random spot
+		dictMarkers = objMasterProject.dictImportMarkers
+
+		#the following changes are the same for every station so they're made to the master once
+		for objMarker in dictMarkers.values():
+			#IMPORT markers are written upper case
+			objMasterProject.SetLine(objMarker.intLine, objMasterProject.lstLines[objMarker.intLine].upper())
+
+		#update the render format with the one selected
+		objRenderCfg = objMasterProject.objRoot.FindChunk(conRenderConfigLabel)
+		intRenderCfgLine = -1
+		strRenderCfgPrefix = ""
+		if objRenderCfg is not None:
+			if objRenderCfg.intEndLine > objRenderCfg.intLine + 1:
+				intRenderCfgLine = objRenderCfg.intLine + 1
 			else:
-				print("I'm not sure how I got here - figure it out!")
-				sys.exit()
-				
-#	print(" %s project file saved" % strStation)
+				intRenderCfgLine = objRenderCfg.intLine
+				strRenderCfgPrefix = objMasterProject.lstLines[intRenderCfgLine]
+			objMasterProject.SetLine(intRenderCfgLine, strRenderCfgPrefix + strRenderCfg + "\n")
+
+		#reset the cursor position, zoom and vertical zoom
+		for strLabel, strDefaultValue in ((conCursorLabel, conDefaultCursorValue), (conZoomLabel, conDefaultZoomValue), (conVzoomexLabel, conDefaultVzoomexValue)):
+			intLine = objMasterProject.RootElement(strLabel.strip())
+			if intLine >= 0:
+				objMasterProject.SetLine(intLine, strDefaultValue + "\n")
+
+		#ITEMs on the Station VT track without the IMPORT keyword are left out of the generated projects
+		for objItem in objMasterProject.lstStationItems:
+			if objItem not in objMasterProject.lstImportItems:
+				for intLine in range(objItem.intLine, objItem.intEndLine + 1):
+					objMasterProject.SetLine(intLine, "")
+
+		#the rendered file name and the IMPORT spots on the Station VT track are the only lines that
+		#	change between stations
+		intRenderFileLine = objMasterProject.RootElement(conRenderFilePrefix.strip())
+		lstSlotLines = [intRenderFileLine] if intRenderFileLine >= 0 else []
+		for objItem in objMasterProject.lstImportItems:
+			lstSlotLines.extend(objItem.SlotLines())
+			if objLevelCache is not None and objItem.intVolPanLine >= 0:
+				#the spot's gain goes in its volume
+				lstSlotLines.append(objItem.intVolPanLine)
+
+		#with --stationmix the show is rendered once with the Station VT track muted and each station's
+		#	spots are mixed into that - the spots' gains and fades are the same for every station
+		blnStationMix = objCLArgs.stationmix and blnRenderOn
+		fltStationTrackGain = 0.0
+		dictItemMixes = {}
+		intMuteSoloLine = -1
+		if blnStationMix:
+			try:
+				if StationMix.numpy is None:
+					raise StationMix.MixError("NumPy isn't installed")
+				if intRenderFileLine < 0 or intRenderCfgLine < 0:
+					raise StationMix.MixError("the project has no render settings")
+				fltStationTrackGain = StationMix.TrackGain(objMasterProject)
+				dictItemMixes = {objItem.intLine: StationMix.ItemMix(objMasterProject, objItem) for objItem in objMasterProject.lstImportItems}
+			except StationMix.MixError as objError:
+				print("WARNING: station mixing is off (%s) - every station will be rendered" % objError)
+				blnStationMix = False
+		if blnStationMix:
+			intMuteSoloLine = objMasterProject.objStationTrack.FindElement("MUTESOLO")
+			lstSlotLines.extend((intMuteSoloLine, intRenderCfgLine))
+
+		#with --preview each station's spot windows are rendered as custom time ranges to WAVs
+		blnPreview = objCLArgs.preview and blnRenderOn
+		intRenderRangeLine = objMasterProject.RootElement(conRenderRangePrefix.strip())
+		if blnPreview and (intRenderFileLine < 0 or intRenderCfgLine < 0):
+			print("WARNING: previews are off (the project has no render settings) - every station will be rendered in full")
+			blnPreview = False
+
+		#the part of the project Reaper renders - RENDER_RANGE is the bounds (0=custom, 1=entire
+		#	project, 2=time selection, 3 and up are regions or items), start, end, a tail flag for
+		#	each kind of bounds and the tail length in ms.  No RENDER_RANGE renders the whole project
+		tupRenderRange = (1, 0.0, 0.0, 0.0)
+		if intRenderRangeLine >= 0:
+			try:
+				lstRange = objMasterProject.lstLines[intRenderRangeLine].split()[1:]
+				intBounds = int(lstRange[0])
+				fltStart = float(lstRange[1])
+				fltEnd = float(lstRange[2])
+				fltTail = float(lstRange[4]) / 1000.0 if len(lstRange) > 4 and int(lstRange[3]) & (1 << intBounds) else 0.0
+				if intBounds == 2:
+					#the time selection is kept in the project's SELECTION element
+					intSelectionLine = objMasterProject.RootElement("SELECTION")
+					if intSelectionLine >= 0:
+						fltStart, fltEnd = [float(strValue) for strValue in objMasterProject.lstLines[intSelectionLine].split()[1:3]]
+					else:
+						fltStart = fltEnd = 0.0
+				tupRenderRange = (intBounds, fltStart, fltEnd, fltTail)
+			except (IndexError, ValueError):
+				print("WARNING: the project's RENDER_RANGE can't be read - the rendered files' lengths won't be checked")
+				tupRenderRange = (-1, 0.0, 0.0, 0.0)
+
+		#how fast a rendered WAV should grow, for the render watchdog
+		intSampleRateLine = objMasterProject.RootElement("SAMPLERATE")
+		intSampleRate = 0
+		if intSampleRateLine >= 0:
+			try:
+				intSampleRate = int(objMasterProject.lstLines[intSampleRateLine].split()[1])
+			except (IndexError, ValueError):
+				pass
+		intRenderBytesPerSecondWAV = intSampleRate * conRenderBytesPerSampleWAV
+
+		#with --segments each station is rendered in pieces split at the chosen markers - the
+		#	split points are whole frames, so the project's sample rate has to be known
+		lstSegmentTimes = []
+		if objCLArgs.segments and blnRenderOn and not blnPreview:
+			lstSegmentTimes = SegmentTimes(objMasterProject, objCLArgs.segments)
+			if not lstSegmentTimes:
+				print("WARNING: there are no %s markers - every station will be rendered in one piece" % objCLArgs.segments.upper())
+			elif intRenderFileLine < 0 or intRenderCfgLine < 0 or intSampleRate <= 0:
+				print("WARNING: segment rendering is off (the project has no render settings or sample rate) - every station will be rendered in one piece")
+				lstSegmentTimes = []
+			elif tupRenderRange[0] != 1:
+				print("WARNING: segment rendering is off (the project doesn't render the entire project) - every station will be rendered in one piece")
+				lstSegmentTimes = []
+
+		if blnPreview or lstSegmentTimes:
+			lstSlotLines.append(intRenderCfgLine)
+			if intRenderRangeLine >= 0:
+				lstSlotLines.append(intRenderRangeLine)
+
+		objMasterProject.Compile(lstSlotLines)
+
+		for objItem in objMasterProject.lstStationItems:
+			if objItem not in objMasterProject.lstImportItems:
+				print(" Spot \"%s\" does not contain IMPORT - skipping" % objItem.strName.lower())
+
+		self.objMasterProject = objMasterProject
+		self.intRenderFileLine = intRenderFileLine
+		self.intRenderCfgLine = intRenderCfgLine
+		self.strRenderCfgPrefix = strRenderCfgPrefix
+		self.blnStationMix = blnStationMix
+		self.fltStationTrackGain = fltStationTrackGain
+		self.dictItemMixes = dictItemMixes
+		self.intMuteSoloLine = intMuteSoloLine
+		self.blnPreview = blnPreview
+		self.lstSegmentTimes = lstSegmentTimes
+		self.intSampleRate = intSampleRate
+		self.intRenderRangeLine = intRenderRangeLine
+		self.tupRenderRange = tupRenderRange
+		self.fltMasterLength = objMasterProject.Length()
+		self.intRenderBytesPerSecond = conRenderBytesPerSecondMP3 if blnRenderMP3 else intRenderBytesPerSecondWAV
+		self.intRenderBytesPerSecondWAV = intRenderBytesPerSecondWAV
+		self.intRenderBytesPerSecondMix = intSampleRate * conRenderBytesPerSampleWAVMix
+		#conditioned spots are converted to the project's sample rate - or keep their own when the
+		#	project doesn't say
+		self.objSpotFormat = SpotConditioning.SpotFormat(intSampleRate or None, objCLArgs.spotchannels, objCLArgs.spotbits)
+
+	def Plan(self, lstStations):
+		#work out the stations' spots before anything is written so all the problems are found at once
+		objShowPlanner = ShowPlanner.ShowPlanner(self.objMasterProject, self.strShowNumber, self.strDJName, self.strProjectPath, strAssetsPath, strStationRenderPath, strRenderExt,
+			objWavInfoCache, objSpotListings, objRotationHistory, strSeed, objTracer, strTemplateName=conProjectTemplate, strProcessKeyword=conITEMProcessKeyword,
+			strEndSnapOption=conSpotEndSnapOption, strRandomOption=conSpotRandomOption, strAudioFolderName=conAudioFolderName, strRandomSpotsFolderName=conRandomSpotsSrcFolder,
+			objLevelCache=objLevelCache, fltTargetLoudness=objCLArgs.spotloudness, fltPeakCeiling=objCLArgs.spotpeak, intWorkers=os.cpu_count() or 1,
+			blnRipple=objCLArgs.ripple, objConditioner=objSpotConditioner, objSpotFormat=self.objSpotFormat)
+		with objTracer.Span("plan", stations=len(lstStations)) as dictSpan:
+			objShowPlan = objShowPlanner.Plan(lstStations)
+			dictSpan["problems"] = len(objShowPlan.lstProblems)
+		objWavInfoCache.Save()
+		objSpotListings.Save()
+		if objLevelCache is not None:
+			objLevelCache.Save()
+		if objSpotConditioner is not None:
+			objSpotConditioner.Prune()
+		if objLevelCache is not None or objSpotConditioner is not None:
+			objHashIndex.Save()
+		return objShowPlan
+
+	def StationEdits(self, objStationPlan):
+		#the station's changes to the master project
+		objMasterProject = self.objMasterProject
+		dictEdits = {}
+
+		#update the rendered file name
+		if self.intRenderFileLine >= 0:
+			dictEdits[self.intRenderFileLine] = conRenderFilePrefix + "\"" + objStationPlan.strRenderPath + "\"\n"
+
+		if objStationPlan.blnTemplate:
+			#generating spots for new template - the original template ITEM positions, lengths
+			#	and filenames are kept in place
+			for objItem in objMasterProject.lstImportItems:
+				#turn on looping so that any length can be used for the silent wav
+				dictEdits[objItem.intLoopLine] = objMasterProject.FormatElement(objItem.intLoopLine, "1")
+			return dictEdits
+
+		for objSpot in objStationPlan.lstSpots:
+			objItem = objSpot.objItem
+			dictEdits[objItem.intFileLine] = objMasterProject.FormatElement(objItem.intFileLine, "\"" + objSpot.strDestPath + "\"")
+			#turn off looping as we don't want the spot to ever to loop if the length is wrong
+			dictEdits[objItem.intLoopLine] = objMasterProject.FormatElement(objItem.intLoopLine, "0")
+			dictEdits[objItem.intLengthLine] = objMasterProject.FormatElement(objItem.intLengthLine, str(objSpot.fltDuration))
+			dictEdits[objItem.intPositionLine] = objMasterProject.FormatElement(objItem.intPositionLine, str(objSpot.fltPosition))
+			if objLevelCache is not None:
+				#match the spot's loudness with the ITEM's volume, on top of any volume set in the master
+				if objItem.intVolPanLine >= 0:
+					lstVolPan = objMasterProject.lstLines[objItem.intVolPanLine].split()[1:]
+					lstVolPan[0] = "%.14g" % (float(lstVolPan[0]) * objSpot.fltGain)
+					dictEdits[objItem.intVolPanLine] = objMasterProject.FormatElement(objItem.intVolPanLine, " ".join(lstVolPan))
+				else:
+					strIndent = objMasterProject.lstLines[objItem.intPositionLine][:-len(objMasterProject.lstLines[objItem.intPositionLine].lstrip())]
+					dictEdits[objItem.intPositionLine] += strIndent + "VOLPAN %.14g 0 1 -1\n" % objSpot.fltGain
+		return dictEdits
 
-	if strStation != conProjectTemplate:
+	def WriteProject(self, strProjectFilePath, dictEdits):
+		if objCLArgs.writemode == "splice":
+			self.objMasterProject.WriteSplice(strProjectFilePath, dictEdits)
+		else:
+			self.objMasterProject.Write(strProjectFilePath, dictEdits)
+
+	def Write(self, objShowPlan):
+		#write the planned stations' projects - returns the render jobs for them
+		lstJobs = []
+		for objStationPlan in objShowPlan.lstStations:
+			strStation = objStationPlan.strStation
+			print("\nProcessing " + strStation + "...")
+			tupStationSpan = objTracer.Begin("generate", "station", station=strStation)
+
+			with objTracer.Span("rewrite items", station=strStation, spots=len(objStationPlan.lstSpots)):
+				dictEdits = self.StationEdits(objStationPlan)
+			with objTracer.Span("write project", station=strStation, edits=len(dictEdits)):
+				self.WriteProject(objStationPlan.strProjectFilePath, dictEdits)
+			self.dictStationPlans[strStation] = objStationPlan
+
+			if not objStationPlan.blnTemplate:
+				if self.blnStationMix:
+					lstMixSpots = []
+					for objSpot in objStationPlan.lstSpots:
+						fltGain, fltOffset, fltFadeIn, fltFadeOut = self.dictItemMixes[objSpot.objItem.intLine]
+						lstMixSpots.append(StationMix.MixSpot(objSpot.strSrcPath, objSpot.fltPosition, fltGain * objSpot.fltGain * self.fltStationTrackGain, fltOffset, fltFadeIn, fltFadeOut))
+					self.dictStationSpots[strStation] = lstMixSpots
+				objRotationHistory.Record(strStation, self.strShowNumber, objStationPlan.lstRandomPicks)
+			objTracer.End(tupStationSpan)
+
+		#	print(" %s project file saved" % strStation)
+
+			if not objStationPlan.blnTemplate:
+				#a preview leaves the last full render where it is
+				if not self.blnPreview:
+					try:
+						os.remove(objStationPlan.strRenderPath)
+					except OSError:
+						pass
+
+				#queue the station's render - the template is never rendered
+				if blnRenderOn:
+					lstJobs.append(RenderScheduler.RenderJob(self.strJobPrefix + strStation, objStationPlan.strProjectFilePath, objStationPlan.strRenderPath, objStationPlan.fltLength,
+						intBytesPerSecond=self.intRenderBytesPerSecond, fltRenderLength=self.RenderLength(objStationPlan.fltLength)))
+
+		objRotationHistory.Save()
+
+		if self.blnStationMix:
+			#the common mix project - the Station VT track is muted and it's always rendered to a
+			#	24-bit WAV, so the mixed stations are only rounded to 16 bits once
+			os.makedirs(os.path.dirname(self.strCommonMixPath), exist_ok=True)
+			lstMuteSolo = self.objMasterProject.lstLines[self.intMuteSoloLine].split()[1:]
+			dictCommonEdits = {
+				self.intRenderFileLine: conRenderFilePrefix + "\"" + self.strCommonMixPath + "\"\n",
+				self.intRenderCfgLine: self.strRenderCfgPrefix + RenderCfgWAVMix + "\n",
+				self.intMuteSoloLine: self.objMasterProject.FormatElement(self.intMuteSoloLine, " ".join(["1"] + lstMuteSolo[1:])),
+			}
+			with objTracer.Span("write project", station=conCommonMixName, edits=len(dictCommonEdits)):
+				self.WriteProject(self.strCommonProjectFilePath, dictCommonEdits)
+		return lstJobs
+
+	def Stage(self):
+		#copy the spots used by the station projects into the project folder - spots that haven't
+		#	changed since the last run are left in place and anything no longer used is removed
+		print("\nStaging spots...")
+		objAssetStager = AssetStaging.AssetStager(os.path.join(self.strProjectPath,"Audio\\Imported"), objCLArgs.stagemode,
+			tupSidecars=(ReaPeaks.conPeakExtension,) if objPeakCache is not None else ())
+		for objStationPlan in self.dictStationPlans.values():
+			for objSpot in objStationPlan.lstSpots:
+				objAssetStager.Add(objSpot.strSrcPath, objSpot.strDestPath)
+		with objTracer.Span("stage spots") as dictSpan:
+			objStagingStats = objAssetStager.Run()
+			dictSpan.update(files=len(objAssetStager.dictRequests), unchanged=objStagingStats.intSkipped, linked=objStagingStats.intLinked + objStagingStats.intReflinked,
+				copied=objStagingStats.intCopied, bytes_copied=objStagingStats.intBytesCopied, removed=objStagingStats.intRemoved)
+		print(" %s" % objStagingStats)
+
+		if objPeakCache is not None:
+			with objTracer.Span("peaks") as dictSpan:
+				objPeakStats = objPeakCache.Write(objAssetStager.dictRequests)
+				dictSpan.update(written=objPeakStats.intWritten, unchanged=objPeakStats.intSkipped, analysed=objPeakStats.intComputed)
+			objHashIndex.Save()
+			print(" peaks: %s" % objPeakStats)
+			for strPath, strError in objPeakStats.dictErrors.items():
+				print(" WARNING - unable to write the peaks for %s (%s)" % (strPath, strError))
+
+	def Station(self, objJob):
+		#the station a render job is for
+		return objJob.strName[len(self.strJobPrefix):]
+
+	def StationTags(self, strStation):
+		#the ID3 frames written to a station's MP3
+		dictValues = {"show": self.strShowNumber, "dj": self.strDJName.title(), "station": strStation}
+		return {"TIT2": objCLArgs.tagtitle.format(**dictValues), "TPE1": objCLArgs.tagartist.format(**dictValues), "TCON": objCLArgs.taggenre.format(**dictValues)}
+
+	def RenderKeyExtra(self, strStation):
+		#anything done to the rendered file after Reaper is finished has to be part of its cache key
+		if blnRenderMP3:
+			return strRenderCfg + "ID3v2.%i %r" % (objCLArgs.tagversion, sorted(self.StationTags(strStation).items()))
+		return strRenderCfg
+
+	def QCJob(self, objJob):
+		#the check of a station's output around the spots its plan placed
+		objStationPlan = self.dictStationPlans[self.Station(objJob)]
+		lstSpots = [OutputQC.QCSpot(objSpot.strName, objSpot.fltPosition, objSpot.fltDuration) for objSpot in objStationPlan.lstSpots]
+		strReportPath = os.path.join(strQCPath, os.path.splitext(os.path.basename(objJob.strOutputPath))[0] + ".json")
+		return OutputQC.QCJob(objJob.strName, objJob.strOutputPath, lstSpots, strReportPath)
+
+	def EncodeJobs(self, objJob):
+		#the outputs encoded from a station's master WAV - they're named after it, in the render folder
+		strStation = self.Station(objJob)
+		strBasePath = os.path.join(strRenderOutputPath, os.path.splitext(os.path.basename(objJob.strOutputPath))[0])
+		return [OutputEncoder.EncodeJob(objJob.strName, objJob.strOutputPath, strOutputPath, objFormat, self.StationTags(strStation))
+			for objFormat, strOutputPath in OutputEncoder.OutputPaths(strBasePath, OutputEncoder.StationFormats(lstOutputFormats, strStation))]
+
+	def CachedRenders(self, lstJobs):
+		#use the cached render for stations that haven't changed - returns the jobs still to be done
+		lstPending = []
+		for objJob in lstJobs:
+			if objRenderCache is not None:
+				with objTracer.Span("render cache lookup", station=objJob.strName) as dictSpan, open(objJob.strProjectPath, "r") as fStationProject:
+					self.dictRenderKeys[objJob.strName] = RenderCache.RenderKey(fStationProject, self.strProjectPath, objHashIndex, self.RenderKeyExtra(self.Station(objJob)))
+					dictSpan["hit"] = objRenderCache.Fetch(self.dictRenderKeys[objJob.strName], objJob.strOutputPath)
+				if dictSpan["hit"]:
+					print(" %s hasn't changed since it was last rendered - using the cached render" % objJob.strName)
+					continue
+			lstPending.append(objJob)
+		return lstPending
+
+	def CommonMix(self):
+		#render the common mix, or take it from the render cache - returns False if it didn't render
+		print("\nRendering the common mix...")
+		#the common mix is always a 24-bit WAV
+		objCommonJob = RenderScheduler.RenderJob(self.strJobPrefix + conCommonMixName, self.strCommonProjectFilePath, self.strCommonMixPath, self.fltMasterLength,
+			intBytesPerSecond=self.intRenderBytesPerSecondMix, fltRenderLength=self.RenderLength(self.fltMasterLength))
+		blnHit = False
+		if objRenderCache is not None:
+			with objTracer.Span("render cache lookup", station=conCommonMixName) as dictSpan, open(self.strCommonProjectFilePath, "r") as fCommonProject:
+				strCommonKey = RenderCache.RenderKey(fCommonProject, self.strProjectPath, objHashIndex, RenderCfgWAVMix)
+				blnHit = dictSpan["hit"] = objRenderCache.Fetch(strCommonKey, self.strCommonMixPath, blnPrivate=True)
+		if blnHit:
+			print(" the common mix hasn't changed since it was last rendered - using the cached render")
+		else:
+			try:
+				os.remove(self.strCommonMixPath)
+			except OSError:
+				pass
+			objCommonScheduler = RenderScheduler.RenderScheduler(objRenderExecutor, intMaxAttempts=objCLArgs.renderattempts, fnVerify=objRenderVerifier, objTracer=objTracer)
+			objCommonScheduler.Add(objCommonJob)
+			objCommonScheduler.Run()
+			if not objCommonJob.blnSuccess:
+				print(" the common mix did not render (%s) - rendering every station instead" % objCommonJob.strError)
+				return False
+			if objRenderCache is not None:
+				objRenderCache.Store(strCommonKey, self.strCommonMixPath, blnPrivate=True)
+		return True
+
+	def MixStations(self, lstJobs):
+		#mix each station's spots into the common mix - returns the jobs that were mixed and the
+		#	ones that still have to be rendered
+		if not self.CommonMix():
+			return [], lstJobs
+
+		def MixStation(objJob):
+			lstMixSpots = self.dictStationSpots.get(self.Station(objJob), [])
+			with objTracer.Span("mix", "station", station=objJob.strName, spots=len(lstMixSpots)):
+				if not blnRenderMP3:
+					StationMix.MixStation(self.strCommonMixPath, lstMixSpots, objJob.strOutputPath, intBitsPerSample=conRenderBitsPerSampleWAV)
+					return
+				strMixPath = os.path.join(os.path.dirname(self.strCommonMixPath), os.path.splitext(os.path.basename(objJob.strOutputPath))[0] + ".wav")
+				try:
+					StationMix.MixStation(self.strCommonMixPath, lstMixSpots, strMixPath, intBitsPerSample=conRenderBitsPerSampleWAV)
+					with objTracer.Span("encode", "subprocess", station=objJob.strName):
+						StationMix.EncodeFile(objCLArgs.encodecommand, strMixPath, objJob.strOutputPath)
+				finally:
+					if os.path.exists(strMixPath):
+						os.remove(strMixPath)
+
+		print("\nMixing stations...")
+		lstMixed = []
+		lstUnmixed = []
+		with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(lstJobs), os.cpu_count() or 1)) as objPool:
+			dictFutures = {objPool.submit(MixStation, objJob): objJob for objJob in lstJobs}
+			for objFuture in concurrent.futures.as_completed(dictFutures):
+				objJob = dictFutures[objFuture]
+				try:
+					objFuture.result()
+				except (OSError, WavInfo.WavError, StationMix.MixError) as objError:
+					print(" %s could not be mixed (%s) - it will be rendered instead" % (objJob.strName, objError))
+					lstUnmixed.append(objJob)
+					continue
+				print(" %s mixed" % objJob.strName)
+				lstMixed.append(objJob)
+		return lstMixed, lstUnmixed
+
+	def RenderLength(self, fltLength):
+		#how long the render of a fltLength second station project should be - 0 when it depends
+		#	on regions or items, which aren't worked out here
+		intBounds, fltStart, fltEnd, fltTail = self.tupRenderRange
+		if intBounds == 1:
+			return fltLength + fltTail
+		if intBounds in (0, 2) and fltEnd > fltStart:
+			return fltEnd - fltStart + fltTail
+		return 0.0
+
+	def RangeEdits(self, dictEdits, strOutputPath, fltStart, fltEnd, blnTail=False):
+		#a station's edits changed to render fltStart to fltEnd seconds of the show to a WAV - with
+		#	blnTail it gets the tail a render of the whole project would have
+		dictEdits = dict(dictEdits)
+		strRange = "0 %.14g %.14g" % (fltStart, fltEnd)
+		dictEdits[self.intRenderFileLine] = conRenderFilePrefix + "\"" + strOutputPath + "\"\n"
+		dictEdits[self.intRenderCfgLine] = self.strRenderCfgPrefix + RenderCfgWAV + "\n"
+		if self.intRenderRangeLine >= 0:
+			#custom bounds, keeping the tail length
+			lstTail = self.objMasterProject.lstLines[self.intRenderRangeLine].split()[4:]
+			try:
+				lstTail[0] = str(int(lstTail[0]) & ~1 | (1 if blnTail and self.tupRenderRange[3] > 0 else 0))
+			except (IndexError, ValueError):
+				lstTail = ["0", "1000"]
+			dictEdits[self.intRenderRangeLine] = self.objMasterProject.FormatElement(self.intRenderRangeLine, strRange + " " + " ".join(lstTail))
+		else:
+			dictEdits[self.intRenderFileLine] += conRenderRangePrefix + strRange + " 0 1000\n"
+		return dictEdits
+
+	def PreviewWindows(self, objJob):
+		#the windows of the show around a station's spots
+		objStationPlan = self.dictStationPlans[self.Station(objJob)]
+		return SpotPreview.Windows([(objSpot.strName, objSpot.fltPosition, objSpot.fltDuration) for objSpot in objStationPlan.lstSpots], objStationPlan.fltLength,
+			objCLArgs.previewbefore, objCLArgs.previewafter)
+
+	def PreviewName(self, objJob):
+		return os.path.splitext(os.path.basename(objJob.strOutputPath))[0] + "-preview"
+
+	def PreviewJobs(self, objJob, lstWindows):
+		#write a project for each of a station's preview windows next to the station project -
+		#	returns their render jobs
+		objStationPlan = self.dictStationPlans[self.Station(objJob)]
+		dictEdits = self.StationEdits(objStationPlan)
+		lstJobs = []
+		for intWindow, objWindow in enumerate(lstWindows, start=1):
+			strName = "%s%i" % (self.PreviewName(objJob), intWindow)
+			objWindow.strPath = os.path.join(strPreviewPath, strName + ".wav")
+			try:
+				os.remove(objWindow.strPath)
+			except OSError:
+				pass
+			strProjectFilePath = os.path.join(self.strProjectPath, strName + ".RPP")
+			with objTracer.Span("write project", station=objJob.strName, window=intWindow):
+				self.WriteProject(strProjectFilePath, self.RangeEdits(dictEdits, objWindow.strPath, objWindow.fltStart, objWindow.fltEnd))
+			lstJobs.append(RenderScheduler.RenderJob("%s preview %i" % (objJob.strName, intWindow), strProjectFilePath, objWindow.strPath, objWindow.fltLength,
+				intBytesPerSecond=self.intRenderBytesPerSecondWAV))
+		return lstJobs
+
+	def MixPreview(self, objJob, lstWindows):
+		#mix a station's preview windows from the common mix
+		lstMixSpots = self.dictStationSpots.get(self.Station(objJob), [])
+		with objTracer.Span("mix preview", "station", station=objJob.strName, windows=len(lstWindows)):
+			for intWindow, objWindow in enumerate(lstWindows, start=1):
+				objWindow.strPath = os.path.join(strPreviewPath, "%s%i.wav" % (self.PreviewName(objJob), intWindow))
+				StationMix.MixStation(self.strCommonMixPath, lstMixSpots, objWindow.strPath, fltStart=objWindow.fltStart, fltEnd=objWindow.fltEnd,
+					intBitsPerSample=conRenderBitsPerSampleWAV)
+
+	def SegmentJobs(self, objJob):
+		#write a project for each segment of a station's show next to the station project - returns
+		#	(render job, frames) for every segment, or nothing if the show isn't split
+		objStationPlan = self.dictStationPlans[self.Station(objJob)]
+		lstBounds = ShowSegments.SplitFrames(self.lstSegmentTimes, objStationPlan.fltLength, self.intSampleRate)
+		if len(lstBounds) < 2:
+			return []
+		os.makedirs(strSegmentPath, exist_ok=True)
+		dictEdits = self.StationEdits(objStationPlan)
+		strBaseName = os.path.splitext(os.path.basename(objJob.strOutputPath))[0]
+		lstSegments = []
+		for intSegment, (intStart, intEnd) in enumerate(lstBounds, start=1):
+			strName = "%s-segment%i" % (strBaseName, intSegment)
+			strOutputPath = os.path.join(strSegmentPath, strName + ".wav")
+			try:
+				os.remove(strOutputPath)
+			except OSError:
+				pass
+			strProjectFilePath = os.path.join(self.strProjectPath, strName + ".RPP")
+			fltStart = intStart / float(self.intSampleRate)
+			fltEnd = intEnd / float(self.intSampleRate)
+			#the last segment has the whole project's tail and runs to wherever the render ends,
+			#	like a render of the whole show
+			blnLast = intSegment == len(lstBounds)
+			with objTracer.Span("write project", station=objJob.strName, segment=intSegment):
+				self.WriteProject(strProjectFilePath, self.RangeEdits(dictEdits, strOutputPath, fltStart, fltEnd, blnLast))
+			objSegmentJob = RenderScheduler.RenderJob("%s segment %i" % (objJob.strName, intSegment), strProjectFilePath, strOutputPath, fltEnd - fltStart,
+				intBytesPerSecond=self.intRenderBytesPerSecondWAV, fltRenderLength=fltEnd - fltStart + (self.tupRenderRange[3] if blnLast else 0.0))
+			lstSegments.append((objSegmentJob, None if blnLast else intEnd - intStart))
+		return lstSegments
+
+	def JoinSegments(self, objJob, lstSegments):
+		#join a station's rendered segments into its output - raises ShowSegments.SegmentError or
+		#	StationMix.MixError if they can't be
+		lstFailed = [objSegmentJob for objSegmentJob, _ in lstSegments if not objSegmentJob.blnSuccess]
+		if lstFailed:
+			raise ShowSegments.SegmentError("%s did not render (%s)" % (lstFailed[0].strName, lstFailed[0].strError))
+		lstPaths = [(objSegmentJob.strOutputPath, intFrames) for objSegmentJob, intFrames in lstSegments]
+		with objTracer.Span("join segments", station=objJob.strName, segments=len(lstSegments)):
+			if not blnRenderMP3:
+				ShowSegments.JoinSegments(lstPaths, objJob.strOutputPath)
+				return
+			strJoinPath = os.path.join(strSegmentPath, os.path.splitext(os.path.basename(objJob.strOutputPath))[0] + ".wav")
+			try:
+				ShowSegments.JoinSegments(lstPaths, strJoinPath)
+				with objTracer.Span("encode", "subprocess", station=objJob.strName):
+					StationMix.EncodeFile(objCLArgs.encodecommand, strJoinPath, objJob.strOutputPath)
+			finally:
+				if os.path.exists(strJoinPath):
+					os.remove(strJoinPath)
+
+def PreviewStations(lstShowJobs):
+	#lstShowJobs holds (ShowRun, render jobs) for every show - instead of the whole show each
+	#	station gets a preview of the audio around its spots.  With --stationmix the windows are
+	#	mixed from the common mix, otherwise (or if they can't be mixed) they're all rendered on
+	#	one scheduler together
+	os.makedirs(strPreviewPath, exist_ok=True)
+	objRenderScheduler = RenderScheduler.RenderScheduler(objRenderExecutor, intWorkers=intRenderWorkers, intMaxAttempts=objCLArgs.renderattempts,
+		fnVerify=objRenderVerifier, objTracer=objTracer)
+	#(ShowRun, station job, windows, window render jobs) for every station with spots
+	lstPreviews = []
+	for objShow, lstJobs in lstShowJobs:
+		lstShowPreviews = []
+		for objJob in lstJobs:
+			lstWindows = objShow.PreviewWindows(objJob)
+			if lstWindows:
+				lstShowPreviews.append((objShow, objJob, lstWindows, []))
+			else:
+				print(" %s has no spots to preview" % objJob.strName)
+
+		lstUnmixed = lstShowPreviews
+		if objShow.blnStationMix and lstShowPreviews and objShow.CommonMix():
+			print("\nMixing previews...")
+			lstUnmixed = []
+			with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(lstShowPreviews), os.cpu_count() or 1)) as objPool:
+				dictFutures = {objPool.submit(objShow.MixPreview, tupPreview[1], tupPreview[2]): tupPreview for tupPreview in lstShowPreviews}
+				for objFuture in concurrent.futures.as_completed(dictFutures):
+					tupPreview = dictFutures[objFuture]
+					try:
+						objFuture.result()
+					except (OSError, WavInfo.WavError, StationMix.MixError) as objError:
+						print(" %s's preview could not be mixed (%s) - it will be rendered instead" % (tupPreview[1].strName, objError))
+						lstUnmixed.append(tupPreview)
+		for _, objJob, lstWindows, lstWindowJobs in lstUnmixed:
+			lstWindowJobs.extend(objShow.PreviewJobs(objJob, lstWindows))
+			for objWindowJob in lstWindowJobs:
+				objRenderScheduler.Add(objWindowJob)
+		lstPreviews.extend(lstShowPreviews)
+
+	if objRenderScheduler.lstJobs:
+		print("\nRendering %i preview window(s)..." % len(objRenderScheduler.lstJobs))
+		objRenderScheduler.Run().Print()
+
+	print("\nJoining previews...")
+	for objShow, objJob, lstWindows, lstWindowJobs in lstPreviews:
+		strBasePath = os.path.join(strRenderOutputPath, objShow.PreviewName(objJob))
+		lstFailed = [objWindowJob for objWindowJob in lstWindowJobs if not objWindowJob.blnSuccess]
+		try:
+			if lstFailed:
+				print(" WARNING - no preview for %s (%s)" % (objJob.strName, lstFailed[0].strError))
+				continue
+			with objTracer.Span("join preview", station=objJob.strName, windows=len(lstWindows)):
+				SpotPreview.JoinWindows(lstWindows, strBasePath + ".wav", strBasePath + ".json")
+			print(" %s: %i spot(s) in %i window(s) - %s" % (objJob.strName, sum(len(objWindow.lstNames) for objWindow in lstWindows), len(lstWindows), strBasePath + ".wav"))
+		except (OSError, WavInfo.WavError, StationMix.MixError, SpotPreview.PreviewError) as objError:
+			print(" WARNING - unable to join the preview for %s (%s)" % (objJob.strName, objError))
+		finally:
+			#the windows and their projects are only needed until they're joined
+			for strPath in [objWindow.strPath for objWindow in lstWindows] + [objWindowJob.strProjectPath for objWindowJob in lstWindowJobs]:
+				try:
+					if strPath:
+						os.remove(strPath)
+				except OSError:
+					pass
+
+def JoinSegments(dictSegments, dictJobShows):
+	#dictSegments holds (segment job, frames) for every station rendered in segments - each
+	#	station's segments are joined into its output, and the ones that can't be are rendered
+	#	in one piece.  Returns the summary of those renders, or None
+	print("\nJoining segments...")
+	objWholeScheduler = RenderScheduler.RenderScheduler(objRenderExecutor, intWorkers=intRenderWorkers, intMaxAttempts=objCLArgs.renderattempts,
+		fnVerify=objRenderVerifier, objTracer=objTracer)
+	for objJob, lstSegments in dictSegments.items():
 		try:
-			os.remove(os.path.join(strRenderOutputPath, "show-" + strShowNumber + "-" + strStation + strRenderExt))
-		except OSError:
-			pass
+			dictJobShows[objJob].JoinSegments(objJob, lstSegments)
+		except (OSError, WavInfo.WavError, StationMix.MixError, ShowSegments.SegmentError) as objError:
+			print(" %s could not be joined (%s) - rendering it in one piece" % (objJob.strName, objError))
+			objWholeScheduler.Add(objJob)
+			continue
+		finally:
+			#the segments and their projects are only needed until they're joined
+			for objSegmentJob, _ in lstSegments:
+				for strPath in (objSegmentJob.strOutputPath, objSegmentJob.strProjectPath):
+					try:
+						os.remove(strPath)
+					except OSError:
+						pass
+		#the station's render is all of its segments' renders
+		objJob.blnSuccess = True
+		objJob.intAttempts = max(objSegmentJob.intAttempts for objSegmentJob, _ in lstSegments)
+		objJob.lstAttemptTimes = [sum(sum(objSegmentJob.lstAttemptTimes) for objSegmentJob, _ in lstSegments)]
+		objJob.lstAttemptErrors = [""]
+		print(" %s joined from %i segments" % (objJob.strName, len(lstSegments)))
+	if objWholeScheduler.lstJobs:
+		return objWholeScheduler.Run()
+	return None
+
+def RenderStations(lstShowJobs):
+	#lstShowJobs holds (ShowRun, render jobs) for every show - cached renders are used for the
+	#	stations that haven't changed, the rest are mixed or go on one scheduler together so the
+	#	renderers are kept busy across shows, and the new files are tagged and cached
+	lstPreviewJobs = [(objShow, lstJobs) for objShow, lstJobs in lstShowJobs if objShow.blnPreview]
+	if lstPreviewJobs:
+		PreviewStations(lstPreviewJobs)
+		lstShowJobs = [(objShow, lstJobs) for objShow, lstJobs in lstShowJobs if not objShow.blnPreview]
+		if not lstShowJobs:
+			return
+	objRenderScheduler = RenderScheduler.RenderScheduler(objRenderExecutor, intWorkers=intRenderWorkers, intMaxAttempts=objCLArgs.renderattempts,
+		fnVerify=objRenderVerifier, objTracer=objTracer)
+	dictJobShows = {}
+	dictSegments = {}
+	lstRendered = []
+	lstCached = []
+	lstMixed = []
+	for objShow, lstJobs in lstShowJobs:
+		lstPending = objShow.CachedRenders(lstJobs)
+		lstCached.extend((objShow, objJob) for objJob in lstJobs if objJob not in lstPending)
+
+		#mix the stations that can be mixed, the rest are rendered by Reaper
+		if objShow.blnStationMix and lstPending:
+			lstShowMixed, lstPending = objShow.MixStations(lstPending)
+			lstMixed.extend((objShow, objJob) for objJob in lstShowMixed)
+		for objJob in lstPending:
+			dictJobShows[objJob] = objShow
+			#with --segments the station's show is rendered in pieces
+			if objShow.lstSegmentTimes:
+				lstSegments = objShow.SegmentJobs(objJob)
+				if lstSegments:
+					dictSegments[objJob] = lstSegments
+	objHashIndex.Save()
+	lstRendered.extend(lstMixed)
 
 	#render the projects
-	#due to a bug in reaper, I need to check to see if the rendered file is created.  If not, I need
-	#to call the rendere again
-	intStationRenderAttempt = 0
-	if blnRenderOn:
-		while True:
+	#due to a bug in reaper, I need to check to see if the rendered file is created.  If not, the
+	#scheduler calls the renderer again
+	lstRenderSummaries = []
+	if dictJobShows:
+		if objRunHistory is not None:
+			objRunHistory.ExpectedSeconds([(dictJobShows[objJob].Station(objJob), objJob) for objJob in dictJobShows])
+		for objJob in dictJobShows:
+			if objJob not in dictSegments:
+				objRenderScheduler.Add(objJob)
+				continue
+			for objSegmentJob, _ in dictSegments[objJob]:
+				#each segment is expected to take its share of the station's render
+				if objJob.fltEstimate > 0:
+					objSegmentJob.fltExpectedSeconds = objJob.fltExpectedSeconds * objSegmentJob.fltEstimate / objJob.fltEstimate
+				objRenderScheduler.Add(objSegmentJob)
+		lstRenderSummaries.append(objRenderScheduler.Run())
+		if dictSegments:
+			lstRenderSummaries.append(JoinSegments(dictSegments, dictJobShows))
+		lstRendered.extend((dictJobShows[objJob], objJob) for objJob in dictJobShows if objJob.blnSuccess)
+
+	#tag all the new MP3s at once
+	dictTagErrors = {}
+	if blnRenderMP3 and lstRendered:
+		print("\nTagging MP3s...")
+		with objTracer.Span("tag", files=len(lstRendered)) as dictSpan:
+			dictTagErrors = Id3Tag.TagFiles([(objJob.strOutputPath, objShow.StationTags(objShow.Station(objJob))) for objShow, objJob in lstRendered], objCLArgs.tagversion)
+			dictSpan["errors"] = len(dictTagErrors)
+		for strPath, strError in dictTagErrors.items():
+			print(" WARNING - unable to tag %s (%s)" % (strPath, strError))
+
+	#only renders that made it all the way through are cached
+	if objRenderCache is not None:
+		for objShow, objJob in lstRendered:
+			if objJob.strOutputPath not in dictTagErrors:
+				objRenderCache.Store(objShow.dictRenderKeys[objJob.strName], objJob.strOutputPath)
+	for objRenderSummary in lstRenderSummaries:
+		if objRenderSummary is not None:
+			objRenderSummary.Print()
+	if objRenderCache is not None:
+		objRenderCache.Prune()
+
+	if objRunHistory is not None:
+		lstResults = [(objShow, objJob, "cached") for objShow, objJob in lstCached] + [(objShow, objJob, "mixed") for objShow, objJob in lstMixed]
+		lstResults.extend((dictJobShows[objJob], objJob, "rendered" if objJob.blnSuccess else "failed") for objJob in dictJobShows)
+		for objShow, objJob, strResult in lstResults:
+			objRunHistory.RecordStation(objShow.strShowNumber, objShow.Station(objJob), objJob, strResult)
+
+	if lstOutputFormats:
+		EncodeOutputs(lstCached + lstRendered)
+	if objCLArgs.qc:
+		CheckOutputs(lstCached + lstRendered)
+
+def CheckOutputs(lstOutputs):
+	#lstOutputs holds (ShowRun, render job) for every station with an output - with --encode it's
+	#	the master WAV that's checked
+	lstQCJobs = [objShow.QCJob(objJob) for objShow, objJob in lstOutputs]
+	if not lstQCJobs:
+		return
+	print("\nChecking outputs...")
+	with objTracer.Span("qc outputs", files=len(lstQCJobs)):
+		objOutputChecker.Run(lstQCJobs)
+	for objQCJob in lstQCJobs:
+		if objQCJob.strError:
+			print(" WARNING - unable to check %s (%s)" % (objQCJob.strName, objQCJob.strError))
+		elif objQCJob.intIssues:
+			print(" WARNING - %i problem(s) around the spots in %s - see %s" % (objQCJob.intIssues, objQCJob.strName, objQCJob.strReportPath))
+			for dictSpot in objQCJob.lstReport:
+				for strIssue in OutputQC.Issues(dictSpot):
+					print("  %s: %s" % (dictSpot["name"], strIssue))
+		else:
+			print(" %s ok" % objQCJob.strName)
+
+def EncodeOutputs(lstMasters):
+	#lstMasters holds (ShowRun, render job) for every station with a master WAV - all their
+	#	outputs are encoded at once
+	lstEncodes = [(objShow, objJob, objEncodeJob) for objShow, objJob in lstMasters for objEncodeJob in objShow.EncodeJobs(objJob)]
+	lstEncodeJobs = [objEncodeJob for _, _, objEncodeJob in lstEncodes]
+	if not lstEncodeJobs:
+		return
+	print("\nEncoding %i output(s)..." % len(lstEncodeJobs))
+	with objTracer.Span("encode outputs", files=len(lstEncodeJobs)) as dictSpan:
+		objEncoderPool.Run(lstEncodeJobs)
+		dictSpan["errors"] = sum(1 for objEncodeJob in lstEncodeJobs if objEncodeJob.strError)
+	if objRunHistory is not None:
+		for objShow, objJob, objEncodeJob in lstEncodes:
+			objRunHistory.RecordEncode(objShow.strShowNumber, objShow.Station(objJob), objEncodeJob)
+	for objEncodeJob in lstEncodeJobs:
+		if objEncodeJob.strError:
+			print(" WARNING - unable to encode %s (%s)" % (objEncodeJob.strOutputPath, objEncodeJob.strError))
+		else:
+			print(" %s (%.1f seconds)" % (objEncodeJob.strOutputPath, objEncodeJob.fltSeconds))
+
+def ShowMessages(objShowPlan, lstMessages):
+	#in a batch every problem or warning says which show it's in
+	if blnBatch:
+		return ["show %s: %s" % (objShowPlan.strShowNumber, strMessage) for strMessage in lstMessages]
+	return lstMessages
+
+def PrintWarnings(lstWarnings):
+	for strWarning in lstWarnings:
+		print(" WARNING - " + strWarning)
+
+def PrintProblems(lstProblems):
+	print()
+	print("%i problem(s) need to be fixed before the show can be processed - nothing was written:" % len(lstProblems))
+	for strProblem in lstProblems:
+		print(" " + strProblem)
+	print()
+
+def WatchShows(lstShows, dictStale):
+	#regenerate the stations whose inputs change until Ctrl+C is pressed - dictStale holds the
+	#	stations of each show that still have to be written because of problems in the last pass
+	dictInputs = {}
+	for objShow in lstShows:
+		for strStation in objShow.lstStations:
 			if strStation != conProjectTemplate:
-				#this is not the template, go ahead and render the show and update the mp3 tag
-				intTotalRenderAttempts += 1
-				intStationRenderAttempt += 1
-				print(" rendering attempt %i for %s" % (intStationRenderAttempt, strStation))
-				subprocess.run("\"" + conPathToReaper + "\" -renderproject \"" + strStationProjectFilePath + "\"")
-		#		print("output:",subprocess.CompletedProcess)
-			else:
-				#this is the template - don't render
-				break
-
-			#check to see if the MP3 rendered correctly
-			if os.path.exists(os.path.join(strRenderOutputPath, "show-" + strShowNumber + "-" + strStation + strRenderExt)):
-				#file was rendered, tag it if it's an mp3
-				if blnRenderMP3:
-					#apply ID3 tag to newly created MP3
-					print(" tagging MP3")
-					subprocess.call("\"" + os.path.join(strScriptPath, "id3.exe") + "\" -12 -v -t \"Soul-Titanium Radio Show " + strShowNumber + " - " + strDJName.title() + "\" -a \"Mike Soultanian\" -g \"House\" \"" + os.path.join(strRenderOutputPath, "show-" + strShowNumber + "-" + strStation + strRenderExt) + "\"")
-
-				print(" done!")
-				intRenderSuccessCnt += 1
-				break
-			else:
-				print(" This station's MP3 did not render correctly, trying again...")
-#				winsound.Beep(1000, 1000)
-				intRenderFailureCnt += 1
-				if strStation not in lstFailedStationRender:
-					lstFailedStationRender.append(strStation)
-
-if intTotalRenderAttempts > len(lstStations)-1:
-	print("Station(s) requiring re-render:")
-	for strFailedStation in lstFailedStationRender:
-		print(strFailedStation)
-	print("%i render(s) failed out of a total of %i render attempt(s) for %i station(s)" % (intRenderFailureCnt, intTotalRenderAttempts, len(lstStations)-1))
-
-winsound.Beep(1000, 50)
-winsound.Beep(1000, 50)
-print("Done")
\ No newline at end of file
+				dictInputs[(objShow, strStation)] = os.path.join(strAssetsPath, conAudioFolderName, strStation)
+		#None stands for the master project
+		dictInputs[(objShow, None)] = objShow.strMasterProjectFilePath
+	objWatcher = ShowWatcher.InputWatcher(dictInputs, objCLArgs.watchinterval)
+	print("\nWatching the master project and the station spots for changes - press Ctrl+C to stop")
+	try:
+		while True:
+			for objShow, strStation in objWatcher.Wait():
+				dictStale.setdefault(objShow, set()).add(strStation)
+			fltStart = time.monotonic()
+			#every pass is a run of its own in the run history
+			if objRunHistory is not None:
+				objRunHistory.BeginRun(" ".join(sys.argv[1:]), len(lstShows))
+			try:
+				WatchPass(lstShows, dictStale, fltStart)
+			finally:
+				if objRunHistory is not None:
+					objRunHistory.FinishRun(objTracer.TakePhases())
+	except KeyboardInterrupt:
+		print("\nStopped watching")
+
+def WatchPass(lstShows, dictStale, fltStart):
+	#regenerate the stations in dictStale
+	lstShowJobs = []
+	intStations = 0
+	for objShow in lstShows:
+		setChanged = dictStale.pop(objShow, set())
+		if not setChanged:
+			continue
+		if None in setChanged:
+			print("\nThe master project changed for show %s - loading it again" % objShow.strShowNumber)
+			try:
+				objShow.Load()
+			except (OSError, RppProject.RppError) as objError:
+				print("ERROR: unable to read the master project -", objError)
+				dictStale[objShow] = {None}
+				continue
+			#every station is generated from the master
+			lstChanged = list(objShow.lstStations)
+		else:
+			lstChanged = [strStation for strStation in objShow.lstStations if strStation in setChanged]
+			print("\nSpots changed for %s" % ", ".join(lstChanged))
+
+		objShowPlan = objShow.Plan(lstChanged)
+		PrintWarnings(ShowMessages(objShowPlan, objShowPlan.lstWarnings))
+		if objShowPlan.lstProblems:
+			PrintProblems(ShowMessages(objShowPlan, objShowPlan.lstProblems))
+			dictStale[objShow] = set(lstChanged)
+			continue
+		lstShowJobs.append((objShow, objShow.Write(objShowPlan)))
+		objShow.Stage()
+		intStations += len(lstChanged)
+	if lstShowJobs:
+		RenderStations(lstShowJobs)
+		print("\n%i station(s) regenerated in %.2f seconds - watching for changes" % (intStations, time.monotonic() - fltStart))
+
+#every show is loaded and planned before anything is written so all the problems are found at once
+lstShows = [ShowRun(*tupShowArgs) for tupShowArgs in lstShowArgs]
+for objShow in lstShows:
+	try:
+		objShow.Load()
+	except (OSError, RppProject.RppError) as objError:
+		print("ERROR: unable to read the master project -", objError)
+		sys.exit()
+
+print("\nPlanning stations...")
+lstShowPlans = [objShow.Plan(objShow.lstStations) for objShow in lstShows]
+for objShowPlan in lstShowPlans:
+	PrintWarnings(ShowMessages(objShowPlan, objShowPlan.lstWarnings))
+if objCLArgs.plan:
+	ShowPlanner.WritePlans(lstShowPlans, objCLArgs.plan)
+	print(" plan saved to %s" % objCLArgs.plan)
+
+lstProblems = []
+dictStale = {}
+lstReady = []
+for objShow, objShowPlan in zip(lstShows, lstShowPlans):
+	if objShowPlan.lstProblems:
+		lstProblems.extend(ShowMessages(objShowPlan, objShowPlan.lstProblems))
+		#nothing is written for the show until its problems are fixed
+		dictStale[objShow] = set(objShow.lstStations)
+	else:
+		lstReady.append((objShow, objShowPlan))
+if lstProblems:
+	PrintProblems(lstProblems)
+	if objCLArgs.planonly or not objCLArgs.watch:
+		sys.exit()
+elif objCLArgs.planonly:
+	print(" no problems found")
+	sys.exit()
+
+#run the plans - the run is recorded as finished however it ends
+if objRunHistory is not None:
+	objRunHistory.BeginRun(" ".join(sys.argv[1:]), len(lstShows))
+if objCLArgs.queue and objCLArgs.queueworkers > 0 and blnRenderOn:
+	lstQueueWorkers = WorkQueue.StartWorkers(objCLArgs.queue, objCLArgs.queueworkers)
+try:
+	lstShowJobs = []
+	for objShow, objShowPlan in lstReady:
+		lstShowJobs.append((objShow, objShow.Write(objShowPlan)))
+		objShow.Stage()
+	if lstShowJobs:
+		RenderStations(lstShowJobs)
+finally:
+	if objRunHistory is not None:
+		objRunHistory.FinishRun(objTracer.TakePhases())
+
+if objCLArgs.watch:
+	WatchShows(lstShows, dictStale)
+WorkQueue.StopWorkers(lstQueueWorkers)
+
+if objRunHistory is not None:
+	objRunHistory.Close()
+
+if objCLArgs.trace:
+	objTracer.Write(objCLArgs.trace)
+	print()
+	print(objTracer.Summary())
+	print("Trace saved to %s" % objCLArgs.trace)
+
+if winsound is not None:
+	winsound.Beep(1000, 50)
+	winsound.Beep(1000, 50)
+print("Done")
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (RenderWatchdog.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Render watchdog used by RenderShow.py
+#
+#WatchdogExecutor runs the render command like RenderScheduler.CommandExecutor but keeps an
+#eye on the output file while Reaper is working.  A render that hasn't started writing
+#after a while, or whose output stops growing, is killed right away so the scheduler can
+#try it again instead of waiting out the whole timeout.  A render whose output grows far
+#past the size expected for the project's length is killed too.
+#
+#RenderVerifier replaces the "does the file exist" check - the finished file's header is
+#parsed (every frame for an MP3, the chunk headers for a WAV) and its duration is compared
+#with the length the project renders, so a truncated or damaged render counts as a failed attempt.
+#
+
+import os
+import mmap
+import time
+import struct
+import subprocess
+
+import RenderScheduler
+import WavInfo
+
+conStartTimeout = 180 #seconds a render has to start writing its output
+conStallTimeout = 120 #seconds the output is allowed to stop growing
+conPollInterval = 1.0
+conMaxSizeRatio = 2.0 #output can be this many times its expected size before the render is killed
+conDurationTolerance = 2.0 #seconds the rendered duration may differ from the project length
+
+#MPEG audio layer III tables, by MPEG version bits (3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5)
+dictMp3Bitrates = {
+	3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+	2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+	0: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+dictMp3SampleRates = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+class Mp3Error(Exception):
+	pass
+
+class WatchdogExecutor(RenderScheduler.CommandExecutor):
+	#intBytesPerSecond is the expected output rate, used to judge how far along a render is when
+	#	the job doesn't have its own
+	def __init__(self, strCommandTemplate, dictValues=None, fltTimeout=None, intBytesPerSecond=0, fltStartTimeout=conStartTimeout, fltStallTimeout=conStallTimeout,
+		fltPollInterval=conPollInterval):
+		RenderScheduler.CommandExecutor.__init__(self, strCommandTemplate, dictValues, fltTimeout)
+		self.intBytesPerSecond = intBytesPerSecond
+		self.fltStartTimeout = fltStartTimeout
+		self.fltStallTimeout = fltStallTimeout
+		self.fltPollInterval = fltPollInterval
+
+	def BytesPerSecond(self, objJob):
+		#a job's own output rate wins - jobs from different shows can have different sample rates
+		return objJob.intBytesPerSecond or self.intBytesPerSecond
+
+	def Progress(self, objJob, intSize):
+		if self.BytesPerSecond(objJob) <= 0 or objJob.fltEstimate <= 0:
+			return ""
+		return " (%i%% done)" % (100.0 * intSize / (self.BytesPerSecond(objJob) * objJob.fltEstimate))
+
+	def Check(self, objJob, fltStart, fltNow, intSize, fltLastGrowth):
+		#why the render should be killed - "" while it looks fine
+		if self.fltTimeout and fltNow - fltStart > self.fltTimeout:
+			return "renderer timed out after %i seconds" % self.fltTimeout
+		if intSize < 0:
+			if fltNow - fltStart > self.fltStartTimeout:
+				return "renderer didn't start writing the output in %i seconds" % self.fltStartTimeout
+		elif fltNow - fltLastGrowth > self.fltStallTimeout:
+			return "output stopped growing at %i bytes%s for %i seconds" % (intSize, self.Progress(objJob, intSize), self.fltStallTimeout)
+		elif self.BytesPerSecond(objJob) > 0 and objJob.fltEstimate > 0 and intSize > conMaxSizeRatio * self.BytesPerSecond(objJob) * objJob.fltEstimate + 1024 * 1024:
+			return "output grew to %i bytes, far more than a %.0f second project needs" % (intSize, objJob.fltEstimate)
+		return ""
+
+	def __call__(self, objJob):
+		try:
+			objProcess = subprocess.Popen(self.Command(objJob), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+		except OSError as objError:
+			return "unable to start the renderer (%s)" % objError
+
+		fltStart = fltLastGrowth = time.monotonic()
+		intLastSize = -1
+		while True:
+			try:
+				objProcess.wait(timeout=self.fltPollInterval)
+				break
+			except subprocess.TimeoutExpired:
+				pass
+			try:
+				intSize = os.path.getsize(objJob.strOutputPath)
+			except OSError:
+				intSize = -1
+			fltNow = time.monotonic()
+			if intSize > intLastSize:
+				intLastSize = intSize
+				fltLastGrowth = fltNow
+			strError = self.Check(objJob, fltStart, fltNow, intSize, fltLastGrowth)
+			if strError:
+				objProcess.kill()
+				objProcess.wait()
+				return strError
+
+		if objProcess.returncode != 0:
+			return "renderer exited with code %i" % objProcess.returncode
+		return ""
+
+def Mp3FrameHeader(bytHeader):
+	#(frame length, samples per frame, sample rate) of a layer III frame header - None if it isn't one
+	intHeader = struct.unpack(">I", bytHeader)[0]
+	if intHeader & 0xFFE00000 != 0xFFE00000:
+		return None
+	intVersion = (intHeader >> 19) & 3
+	intLayer = (intHeader >> 17) & 3
+	intBitrateIndex = (intHeader >> 12) & 15
+	intRateIndex = (intHeader >> 10) & 3
+	if intVersion == 1 or intLayer != 1 or intBitrateIndex in (0, 15) or intRateIndex == 3:
+		return None
+	intBitrate = dictMp3Bitrates[intVersion][intBitrateIndex] * 1000
+	intSampleRate = dictMp3SampleRates[intVersion][intRateIndex]
+	intPadding = (intHeader >> 9) & 1
+	if intVersion == 3:
+		return (144 * intBitrate // intSampleRate + intPadding, 1152, intSampleRate)
+	return (72 * intBitrate // intSampleRate + intPadding, 576, intSampleRate)
+
+def Mp3Duration(strPath):
+	#walk every frame of an MP3 and return its duration in seconds - raises Mp3Error if the
+	#	file is damaged or cut short
+	with open(strPath, "rb") as fMp3:
+		intSize = os.fstat(fMp3.fileno()).st_size
+		if intSize < 4:
+			raise Mp3Error("%s is empty" % strPath)
+		objMap = mmap.mmap(fMp3.fileno(), 0, access=mmap.ACCESS_READ)
+		try:
+			intPosition = 0
+			if objMap[:3] == b"ID3" and intSize >= 10:
+				#skip the ID3v2 tag (and its footer)
+				bytTagSize = objMap[6:10]
+				intPosition = 10 + ((bytTagSize[0] << 21) | (bytTagSize[1] << 14) | (bytTagSize[2] << 7) | bytTagSize[3]) + (10 if objMap[5] & 0x10 else 0)
+			intEnd = intSize - 128 if intSize >= 128 and objMap[intSize - 128:intSize - 125] == b"TAG" else intSize
+
+			#find the first frame - there can be a little junk after the tag
+			intSearchEnd = min(intEnd, intPosition + 65536)
+			while intPosition + 4 <= intSearchEnd and Mp3FrameHeader(objMap[intPosition:intPosition + 4]) is None:
+				intPosition = objMap.find(b"\xff", intPosition + 1, intSearchEnd)
+				if intPosition < 0:
+					break
+			if intPosition < 0 or intPosition + 4 > intSearchEnd:
+				raise Mp3Error("%s has no MP3 frames" % strPath)
+
+			intFrames = 0
+			intSamples = 0
+			intSampleRate = 0
+			blnFirst = True
+			while intPosition + 4 <= intEnd:
+				tupFrame = Mp3FrameHeader(objMap[intPosition:intPosition + 4])
+				if tupFrame is None:
+					raise Mp3Error("%s is damaged at byte %i" % (strPath, intPosition))
+				intLength, intFrameSamples, intSampleRate = tupFrame
+				if intPosition + intLength > intEnd:
+					raise Mp3Error("%s is cut off in the middle of a frame" % strPath)
+				#the first frame can be a Xing/Info/VBRI header frame with no audio in it
+				if not (blnFirst and (objMap.find(b"Xing", intPosition, intPosition + 64) >= 0 or objMap.find(b"Info", intPosition, intPosition + 64) >= 0 or
+					objMap.find(b"VBRI", intPosition, intPosition + 64) >= 0)):
+					intFrames += 1
+					intSamples += intFrameSamples
+				blnFirst = False
+				intPosition += intLength
+		finally:
+			objMap.close()
+	if intFrames == 0:
+		raise Mp3Error("%s has no MP3 frames" % strPath)
+	return intSamples / float(intSampleRate)
+
+def OutputDuration(strPath):
+	#duration of a rendered file in seconds - None for formats that aren't checked
+	strExt = os.path.splitext(strPath)[1].lower()
+	if strExt == ".mp3":
+		return Mp3Duration(strPath)
+	if strExt == ".wav":
+		return WavInfo.ReadWavInfo(strPath).fltDuration
+	return None
+
+def RenderLength(objJob):
+	#how long a job's rendered file should be - the project length unless the job says otherwise
+	return objJob.fltEstimate if objJob.fltRenderLength is None else objJob.fltRenderLength
+
+class RenderVerifier:
+	#checks a finished render against the length the job's project renders
+	def __init__(self, fltTolerance=conDurationTolerance):
+		self.fltTolerance = fltTolerance
+
+	def __call__(self, objJob):
+		strError = RenderScheduler.VerifyOutputExists(objJob)
+		if strError:
+			return strError
+		try:
+			fltDuration = OutputDuration(objJob.strOutputPath)
+		except (OSError, Mp3Error, WavInfo.WavError) as objError:
+			return "rendered file is damaged (%s)" % objError
+		fltLength = RenderLength(objJob)
+		if fltDuration is None or fltLength <= 0 or self.fltTolerance < 0:
+			return ""
+		if fltDuration < fltLength - self.fltTolerance:
+			return "rendered file is %.1f seconds but the project renders %.1f seconds" % (fltDuration, fltLength)
+		if fltDuration > fltLength + self.fltTolerance:
+			return "rendered file is %.1f seconds, longer than the %.1f seconds the project renders" % (fltDuration, fltLength)
+		return ""
@@ -0,0 +1,430 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (RppProject.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Reaper project (RPP) chunk model used by RenderShow.py
+#
+#The master project is parsed once into a tree of chunks (<REAPER_PROJECT, <TRACK, <ITEM,
+#<SOURCE, etc.) that point back into a shared list of the project's lines.  Elements
+#inside the chunks we care about are looked up by keyword (POSITION, LENGTH, NAME...)
+#instead of by their position within the chunk, so the script keeps working if a new
+#version of Reaper adds or re-orders elements.
+#
+#Each station project is then written as a transform over the shared lines: the lines
+#that never change between stations are joined into static blocks once, and only the
+#handful of lines that differ per station (RENDER_FILE and the IMPORT spots' elements)
+#are substituted when the station file is written.
+#
+#WriteSplice() does the same thing at the byte level: the master file is memory-mapped
+#and the station file is written as the master's unchanged byte ranges (sent straight
+#from the page cache with sendfile where the OS has it) with the edited lines in between.
+#
+#The parse only notes where the root MARKER lines are - the IMPORT markers are pulled out of
+#them once the tree is built, in their own "extract markers" span, so the two are traced as
+#separate phases.
+#
+
+import os
+import mmap
+import array
+import shlex
+import locale
+
+import Tracing
+
+#chunks whose direct elements are indexed by keyword - everything else (plugin state,
+#	envelopes, notes, etc.) is kept as opaque lines so big projects stay cheap to parse
+conIndexedChunks = ("REAPER_PROJECT", "TRACK", "ITEM", "SOURCE", "RENDER_CFG")
+
+#unchanged ranges smaller than this are copied through the write buffer - sendfile only pays
+#	off for the big runs of plugin state and such between edits
+conSendfileMinBytes = 64 * 1024
+
+class RppError(Exception):
+	pass
+
+class RppChunk:
+	#a <KEYWORD ...> block - intLine is the header line, intEndLine is the closing ">" line
+	__slots__ = ("strKeyword", "intLine", "intEndLine", "lstChildren", "dictElements", "objParent")
+
+	def __init__(self, strKeyword, intLine, objParent):
+		self.strKeyword = strKeyword
+		self.intLine = intLine
+		self.intEndLine = -1
+		self.lstChildren = []
+		self.dictElements = {} if strKeyword in conIndexedChunks else None
+		self.objParent = objParent
+
+	def FindChunk(self, strKeyword):
+		#first direct child chunk with this keyword
+		for objChild in self.lstChildren:
+			if objChild.strKeyword == strKeyword:
+				return objChild
+		return None
+
+	def FindElement(self, strKeyword, blnRecursive=False):
+		#line number of the first element with this keyword, or -1 if it isn't there
+		if self.dictElements is not None and strKeyword in self.dictElements:
+			return self.dictElements[strKeyword]
+		if blnRecursive:
+			for objChild in self.lstChildren:
+				intLine = objChild.FindElement(strKeyword, True)
+				if intLine >= 0:
+					return intLine
+		return -1
+
+class RppTrack(RppChunk):
+	__slots__ = ("strName", "lstItems")
+
+	def __init__(self, strKeyword, intLine, objParent):
+		RppChunk.__init__(self, strKeyword, intLine, objParent)
+		self.strName = ""
+		self.lstItems = []
+
+class RppItem(RppChunk):
+	#line numbers of the elements the script rewrites are resolved once by keyword
+	__slots__ = ("strName", "intPositionLine", "intLengthLine", "intLoopLine", "intNameLine", "intFileLine", "intVolPanLine")
+
+	def __init__(self, strKeyword, intLine, objParent):
+		RppChunk.__init__(self, strKeyword, intLine, objParent)
+		self.strName = ""
+
+	def Resolve(self, lstLines):
+		#look up the elements by keyword - FILE lives inside the take's <SOURCE chunk
+		self.intPositionLine = self.FindElement("POSITION")
+		self.intLengthLine = self.FindElement("LENGTH")
+		self.intLoopLine = self.FindElement("LOOP")
+		self.intNameLine = self.FindElement("NAME")
+		self.intVolPanLine = self.FindElement("VOLPAN")
+		objSource = self.FindChunk("SOURCE")
+		self.intFileLine = objSource.FindElement("FILE", True) if objSource else -1
+		if self.intNameLine >= 0:
+			self.strName = ElementValues(lstLines[self.intNameLine])[0]
+
+	def Require(self, lstLines):
+		#make sure all the elements the script needs to rewrite are in this ITEM
+		for strKeyword, intLine in (("POSITION", self.intPositionLine), ("LENGTH", self.intLengthLine), ("LOOP", self.intLoopLine), ("NAME", self.intNameLine), ("FILE", self.intFileLine)):
+			if intLine < 0:
+				raise RppError("%s element wasn't found in the ITEM starting on line %i (%s)" % (strKeyword, self.intLine + 1, self.strName or lstLines[self.intLine].strip()))
+
+	def SlotLines(self):
+		#lines that get rewritten for each station
+		return [intLine for intLine in (self.intPositionLine, self.intLengthLine, self.intLoopLine, self.intFileLine) if intLine >= 0]
+
+class RppMarker:
+	#an IMPORT marker - name and options are stored lower case, options are what follows the designator
+	__slots__ = ("intLine", "strId", "strPosition", "strName", "strOptions")
+
+	def __init__(self, intLine, strId, strPosition, strName, strOptions):
+		self.intLine = intLine
+		self.strId = strId
+		self.strPosition = strPosition
+		self.strName = strName
+		self.strOptions = strOptions
+
+	@property
+	def fltPosition(self):
+		return float(self.strPosition)
+
+class RppProject:
+	__slots__ = ("strPath", "lstLines", "objRoot", "dictImportMarkers", "lstMarkers", "lstTracks", "objStationTrack", "lstStationItems", "lstImportItems", "lstSlots", "lstBlocks",
+		"arrOffsets", "strEncoding", "bytNewline", "lstSignature", "setChanged", "dictStaticSplices")
+
+	def __init__(self, strPath, lstLines):
+		self.strPath = strPath
+		self.lstLines = lstLines
+		self.objRoot = None
+		self.dictImportMarkers = {}
+		self.lstMarkers = []
+		self.lstTracks = []
+		self.objStationTrack = None
+		self.lstStationItems = []
+		self.lstImportItems = []
+		self.lstSlots = None
+		self.lstBlocks = None
+		#byte offsets of every line in the master file, used by WriteSplice()
+		self.arrOffsets = None
+		self.strEncoding = locale.getpreferredencoding(False)
+		self.bytNewline = b"\n"
+		self.lstSignature = None
+		self.setChanged = set()
+		self.dictStaticSplices = None
+
+	def RootElement(self, strKeyword):
+		return self.objRoot.FindElement(strKeyword)
+
+	def ItemPosition(self, objItem):
+		#where the ITEM starts on the timeline (seconds)
+		try:
+			return float(self.lstLines[objItem.intPositionLine].split()[1])
+		except (IndexError, ValueError):
+			return 0.0
+
+	def ItemEnd(self, objItem):
+		#where the ITEM ends on the timeline (seconds)
+		try:
+			return float(self.lstLines[objItem.intPositionLine].split()[1]) + float(self.lstLines[objItem.intLengthLine].split()[1])
+		except (IndexError, ValueError):
+			return 0.0
+
+	def Length(self, iterSkipItems=()):
+		#end of the last ITEM in the project (seconds), leaving out the ITEMs in iterSkipItems
+		setSkipItems = set(iterSkipItems)
+		fltLength = 0.0
+		for objTrack in self.lstTracks:
+			for objItem in objTrack.lstItems:
+				if objItem.intPositionLine >= 0 and objItem.intLengthLine >= 0 and objItem not in setSkipItems:
+					fltLength = max(fltLength, self.ItemEnd(objItem))
+		return fltLength
+
+	def SetLine(self, intLine, strText):
+		#edit the shared master lines - only allowed until the station template is compiled
+		if self.lstSlots is not None:
+			raise RppError("project lines can't be edited after the station template is compiled")
+		self.lstLines[intLine] = strText
+		self.setChanged.add(intLine)
+
+	def FormatElement(self, intLine, strValue):
+		#rebuild an element line with a new value, keeping its keyword and indentation
+		strLine = self.lstLines[intLine]
+		strStripped = strLine.lstrip()
+		return strLine[:len(strLine) - len(strStripped)] + strStripped.split(None, 1)[0] + " " + strValue + "\n"
+
+	def Compile(self, iterSlotLines):
+		#join every run of lines that is identical for all stations into a single block so
+		#	writing a station only has to substitute the slot lines
+		self.lstSlots = sorted(set(iterSlotLines))
+		self.lstBlocks = []
+		intStart = 0
+		for intSlot in self.lstSlots:
+			self.lstBlocks.append("".join(self.lstLines[intStart:intSlot]))
+			intStart = intSlot + 1
+		self.lstBlocks.append("".join(self.lstLines[intStart:]))
+		#lines that were edited for every station, as byte ranges of the master - a slot line
+		#	that was edited too is only used when a station doesn't replace it
+		if self.arrOffsets is not None:
+			self.dictStaticSplices = {intLine: self.Splice(intLine, self.lstLines[intLine]) for intLine in self.setChanged}
+
+	def Splice(self, intLine, strText):
+		#(start, end, replacement bytes) for replacing a whole line of the master file
+		return (self.arrOffsets[intLine], self.arrOffsets[intLine + 1], strText.replace("\n", "\r\n" if self.bytNewline == b"\r\n" else "\n").encode(self.strEncoding))
+
+	def Render(self, dictEdits):
+		#yield the station project text - dictEdits maps slot line numbers to replacement lines
+		if self.lstSlots is None:
+			self.Compile(dictEdits)
+		for intSlot, strBlock in zip(self.lstSlots, self.lstBlocks):
+			yield strBlock
+			strEdit = dictEdits.get(intSlot)
+			yield self.lstLines[intSlot] if strEdit is None else strEdit
+		yield self.lstBlocks[-1]
+
+	def Write(self, strPath, dictEdits):
+		with open(strPath, "w") as fOutFile:
+			fOutFile.writelines(self.Render(dictEdits))
+
+	def WriteSplice(self, strPath, dictEdits):
+		#write the station project as byte ranges of the master with the edited lines spliced in
+		if self.arrOffsets is None:
+			raise RppError("%s wasn't parsed from a file so it can't be spliced" % self.strPath)
+		if self.lstSlots is None:
+			self.Compile(dictEdits)
+		if FileSignature(self.strPath) != self.lstSignature:
+			raise RppError("%s changed after it was parsed" % self.strPath)
+
+		lstSplices = [tupSplice for intLine, tupSplice in self.dictStaticSplices.items() if intLine not in dictEdits]
+		lstSplices.extend(self.Splice(intLine, strEdit) for intLine, strEdit in dictEdits.items())
+		lstSplices.sort()
+
+		blnSendfile = hasattr(os, "sendfile")
+		with open(self.strPath, "rb") as fMaster, open(strPath, "wb") as fOutFile:
+			intSize = self.arrOffsets[-1]
+			objMap = mmap.mmap(fMaster.fileno(), 0, access=mmap.ACCESS_READ) if intSize else None
+			try:
+				intPosition = 0
+				for intStart, intEnd, bytReplacement in lstSplices + [(intSize, intSize, b"")]:
+					if intStart > intPosition:
+						if blnSendfile and intStart - intPosition >= conSendfileMinBytes:
+							fOutFile.flush()
+							blnSendfile = SendRange(fOutFile, fMaster, intPosition, intStart)
+							if blnSendfile:
+								intPosition = intStart
+						if intStart > intPosition:
+							fOutFile.write(objMap[intPosition:intStart])
+					fOutFile.write(bytReplacement)
+					intPosition = intEnd
+			finally:
+				if objMap is not None:
+					objMap.close()
+
+def SendRange(fOutFile, fInFile, intStart, intEnd):
+	#copy a byte range between files in the kernel - returns False if sendfile can't be used here
+	intOutFd = fOutFile.fileno()
+	intPosition = intStart
+	try:
+		while intPosition < intEnd:
+			intSent = os.sendfile(intOutFd, fInFile.fileno(), intPosition, intEnd - intPosition)
+			if intSent == 0:
+				break
+			intPosition += intSent
+	except OSError:
+		if intPosition != intStart:
+			raise
+		return False
+	#sendfile writes through the descriptor, so move the file object past what it wrote
+	fOutFile.seek(0, os.SEEK_END)
+	return True
+
+def FileSignature(strPath):
+	objStat = os.stat(strPath)
+	return (objStat.st_size, objStat.st_mtime_ns)
+
+def ElementValues(strLine):
+	#split an element line into its values (without the keyword), honoring Reaper's quoting
+	try:
+		return shlex.split(strLine)[1:]
+	except ValueError:
+		return strLine.split()[1:]
+
+def ParseProject(strPath, strStationTrackName, strProcessKeyword, strOptionDesignator, objTracer=None):
+	#the file is read as bytes so the byte offset of every line is known for WriteSplice() - the
+	#	lines themselves are decoded the same way open() in text mode would
+	lstSignature = FileSignature(strPath)
+	with open(strPath, "rb") as fProject:
+		bytData = fProject.read()
+	strEncoding = locale.getpreferredencoding(False)
+	lstRawLines = bytData.splitlines(True)
+	arrOffsets = array.array("q", [0])
+	lstLines = []
+	intOffset = 0
+	for bytLine in lstRawLines:
+		intOffset += len(bytLine)
+		arrOffsets.append(intOffset)
+		strLine = bytLine.decode(strEncoding)
+		if strLine.endswith("\r\n"):
+			strLine = strLine[:-2] + "\n"
+		elif strLine.endswith("\r"):
+			strLine = strLine[:-1] + "\n"
+		lstLines.append(strLine)
+
+	objProject = ParseLines(strPath, lstLines, strStationTrackName, strProcessKeyword, strOptionDesignator, objTracer)
+	objProject.arrOffsets = arrOffsets
+	objProject.strEncoding = strEncoding
+	objProject.bytNewline = b"\r\n" if lstRawLines and lstRawLines[0].endswith(b"\r\n") else b"\n"
+	objProject.lstSignature = lstSignature
+	return objProject
+
+def ParseLines(strPath, lstLines, strStationTrackName, strProcessKeyword, strOptionDesignator, objTracer=None):
+	objTracer = objTracer or Tracing.objNullTracer
+	objProject = RppProject(strPath, lstLines)
+	strStationTrackName = strStationTrackName.lower()
+	strProcessKeyword = strProcessKeyword.lower()
+	lstStack = []
+	objChunk = None
+	for intLine, strLine in enumerate(lstLines):
+		strStripped = strLine.strip()
+		if not strStripped:
+			continue
+		chrFirst = strStripped[0]
+		if chrFirst == "<":
+			#chunk header
+			strKeyword = strStripped[1:].split(None, 1)[0] if len(strStripped) > 1 else ""
+			if strKeyword == "TRACK":
+				objNew = RppTrack(strKeyword, intLine, objChunk)
+				objProject.lstTracks.append(objNew)
+			elif strKeyword == "ITEM":
+				objNew = RppItem(strKeyword, intLine, objChunk)
+			else:
+				objNew = RppChunk(strKeyword, intLine, objChunk)
+			if objChunk is None:
+				objProject.objRoot = objNew
+			else:
+				objChunk.lstChildren.append(objNew)
+			lstStack.append(objNew)
+			objChunk = objNew
+		elif chrFirst == ">" and len(strStripped) == 1:
+			#end of the current chunk
+			if objChunk is None:
+				raise RppError("unbalanced \">\" on line %i" % (intLine + 1))
+			objChunk.intEndLine = intLine
+			lstStack.pop()
+			if objChunk.strKeyword == "ITEM":
+				objChunk.Resolve(lstLines)
+				if isinstance(objChunk.objParent, RppTrack):
+					objChunk.objParent.lstItems.append(objChunk)
+			objChunk = lstStack[-1] if lstStack else None
+		elif objChunk is not None and objChunk.dictElements is not None:
+			#element of an indexed chunk - only the first occurrence of a keyword is kept,
+			#	which for ITEMs is the active take
+			strKeyword = strStripped.split(None, 1)[0]
+			if strKeyword not in objChunk.dictElements:
+				objChunk.dictElements[strKeyword] = intLine
+			if objChunk is objProject.objRoot and strKeyword == "MARKER":
+				objProject.lstMarkers.append(intLine)
+			elif strKeyword == "NAME" and objChunk.strKeyword == "TRACK" and objChunk.dictElements["NAME"] == intLine:
+				lstValues = ElementValues(strLine)
+				objChunk.strName = lstValues[0] if lstValues else ""
+				if objProject.objStationTrack is None and strStationTrackName in objChunk.strName.lower():
+					objProject.objStationTrack = objChunk
+
+	if lstStack:
+		raise RppError("project ended inside the <%s chunk starting on line %i" % (lstStack[-1].strKeyword, lstStack[-1].intLine + 1))
+	if objProject.objRoot is None:
+		raise RppError("%s is not a Reaper project" % strPath)
+
+	with objTracer.Span("extract markers", markers=len(objProject.lstMarkers)) as dictSpan:
+		for intLine in objProject.lstMarkers:
+			ParseMarker(objProject, intLine, strProcessKeyword, strOptionDesignator)
+		dictSpan["imports"] = len(objProject.dictImportMarkers)
+
+	if objProject.objStationTrack is not None:
+		objProject.lstStationItems = objProject.objStationTrack.lstItems
+		for objItem in objProject.lstStationItems:
+			if strProcessKeyword.strip() in objItem.strName.lower():
+				objItem.Require(lstLines)
+				objProject.lstImportItems.append(objItem)
+	return objProject
+
+def ParseMarker(objProject, intLine, strProcessKeyword, strOptionDesignator):
+	strLine = objProject.lstLines[intLine]
+	if strProcessKeyword.strip() not in strLine.lower():
+		return
+
+	#remove the processing keyword and split the marker into its fields:
+	#	0:marker label, 1:id, 2:position, 3:marker name, ...other stuff I'm not using
+	lstMarkerDetails = shlex.split(strLine.lower().replace(strProcessKeyword, ""))
+	if len(lstMarkerDetails) < 4:
+		raise RppError("IMPORT marker on line %i is missing its name" % (intLine + 1))
+	if strOptionDesignator in lstMarkerDetails[3]:
+		#options have been found, save them and the marker name
+		lstNameOptions = lstMarkerDetails[3].split(strOptionDesignator)
+		strMarkerName = lstNameOptions[0]
+		strMarkerOptions = lstNameOptions[1]
+	else:
+		strMarkerName = lstMarkerDetails[3]
+		strMarkerOptions = ""
+
+	if strMarkerName in objProject.dictImportMarkers:
+		raise RppError("Duplicate marker found: \"%s\"" % strMarkerName)
+	objProject.dictImportMarkers[strMarkerName] = RppMarker(intLine, lstMarkerDetails[1], lstMarkerDetails[2], strMarkerName, strMarkerOptions)
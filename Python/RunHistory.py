@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (RunHistory.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Run history used by RenderShow.py
+#
+#Every run is recorded in a SQLite database in the cache folder - each station's result
+#(rendered, mixed, cached or failed), its render attempts and why they failed, how long they
+#took, the size of the output, the encoded outputs and how long each phase of the run took.
+#RenderShow uses it to start the stations that took longest to render last time first.
+#
+#It can also be run on its own to look at trends:
+#	python RunHistory.py [cache folder or database] runs|failures|durations|phases
+#
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import statistics
+
+conDatabaseFilename = "history.sqlite3"
+conRateSamples = 10 #past renders of a station its render speed is worked out from
+
+#the seconds a station's render took are kept with the project length so renders of shows of
+#	different lengths can be compared
+lstSchema = [
+	"CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, started REAL, finished REAL, command TEXT, shows INTEGER)",
+	"CREATE TABLE IF NOT EXISTS stations (run INTEGER, show TEXT, station TEXT, length REAL, result TEXT, attempts INTEGER, seconds REAL, bytes INTEGER, error TEXT)",
+	"CREATE TABLE IF NOT EXISTS attempts (run INTEGER, show TEXT, station TEXT, attempt INTEGER, seconds REAL, error TEXT)",
+	"CREATE TABLE IF NOT EXISTS encodes (run INTEGER, show TEXT, station TEXT, output TEXT, format TEXT, seconds REAL, bytes INTEGER, error TEXT)",
+	"CREATE TABLE IF NOT EXISTS phases (run INTEGER, phase TEXT, count INTEGER, seconds REAL)",
+	"CREATE INDEX IF NOT EXISTS stations_station ON stations (station, result)",
+]
+
+def DatabasePath(strPath):
+	#a cache folder or the database itself
+	return os.path.join(strPath, conDatabaseFilename) if os.path.isdir(strPath) else strPath
+
+def FileSize(strPath):
+	try:
+		return os.path.getsize(strPath)
+	except OSError:
+		return None
+
+class RunHistory:
+	def __init__(self, strPath):
+		self.objConnection = sqlite3.connect(DatabasePath(strPath))
+		with self.objConnection:
+			for strStatement in lstSchema:
+				self.objConnection.execute(strStatement)
+		self.intRun = None
+
+	def Close(self):
+		self.objConnection.close()
+
+	def BeginRun(self, strCommand, intShows):
+		with self.objConnection:
+			self.intRun = self.objConnection.execute("INSERT INTO runs (started, command, shows) VALUES (?, ?, ?)", (time.time(), strCommand, intShows)).lastrowid
+
+	def FinishRun(self, dictPhases=None):
+		#dictPhases is the tracer's TakePhases() - {phase: [count, seconds]}
+		with self.objConnection:
+			self.objConnection.execute("UPDATE runs SET finished = ? WHERE id = ?", (time.time(), self.intRun))
+			self.objConnection.executemany("INSERT INTO phases VALUES (?, ?, ?, ?)",
+				[(self.intRun, strPhase, intCount, fltSeconds) for strPhase, (intCount, fltSeconds) in (dictPhases or {}).items()])
+
+	def RecordStation(self, strShow, strStation, objJob, strResult):
+		#objJob is the station's RenderJob - strResult is rendered, mixed, cached or failed
+		with self.objConnection:
+			self.objConnection.execute("INSERT INTO stations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", (self.intRun, strShow, strStation, objJob.fltEstimate, strResult, objJob.intAttempts,
+				sum(objJob.lstAttemptTimes), FileSize(objJob.strOutputPath) if strResult != "failed" else None, objJob.strError if strResult == "failed" else ""))
+			self.objConnection.executemany("INSERT INTO attempts VALUES (?, ?, ?, ?, ?, ?)", [(self.intRun, strShow, strStation, intAttempt, fltSeconds, strError)
+				for intAttempt, (fltSeconds, strError) in enumerate(zip(objJob.lstAttemptTimes, objJob.lstAttemptErrors), start=1)])
+
+	def RecordEncode(self, strShow, strStation, objEncodeJob):
+		with self.objConnection:
+			self.objConnection.execute("INSERT INTO encodes VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (self.intRun, strShow, strStation, objEncodeJob.strOutputPath, str(objEncodeJob.objFormat),
+				objEncodeJob.fltSeconds, None if objEncodeJob.strError else FileSize(objEncodeJob.strOutputPath), objEncodeJob.strError or ""))
+
+	def RenderRates(self):
+		#{station: median render seconds per second of the show} over the station's last
+		#	renders, and the median over every station for the ones that haven't been rendered yet
+		dictSamples = {}
+		for strStation, fltLength, fltSeconds in self.objConnection.execute(
+			"SELECT station, length, seconds FROM stations WHERE result = 'rendered' AND length > 0 AND attempts = 1 ORDER BY rowid DESC"):
+			lstSamples = dictSamples.setdefault(strStation, [])
+			if len(lstSamples) < conRateSamples:
+				lstSamples.append(fltSeconds / fltLength)
+		dictRates = {strStation: statistics.median(lstSamples) for strStation, lstSamples in dictSamples.items()}
+		fltDefault = statistics.median(dictRates.values()) if dictRates else None
+		return dictRates, fltDefault
+
+	def ExpectedSeconds(self, lstStationJobs):
+		#set fltExpectedSeconds on (station, RenderJob) pairs from the stations' past renders -
+		#	nothing is set when there's no history at all, so the jobs keep their usual order
+		dictRates, fltDefault = self.RenderRates()
+		if fltDefault is None:
+			return
+		for strStation, objJob in lstStationJobs:
+			objJob.fltExpectedSeconds = objJob.fltEstimate * dictRates.get(strStation, fltDefault)
+
+def Runs(objConnection, intLast):
+	lstLines = ["%-5s %-19s %9s %6s %9s %7s %7s %7s" % ("run", "started", "seconds", "shows", "rendered", "mixed", "cached", "failed")]
+	for intRun, fltStarted, fltFinished, intShows in objConnection.execute("SELECT id, started, finished, shows FROM runs ORDER BY id DESC LIMIT ?", (intLast,)):
+		dictResults = dict(objConnection.execute("SELECT result, COUNT(*) FROM stations WHERE run = ? GROUP BY result", (intRun,)).fetchall())
+		strSeconds = "%9.1f" % (fltFinished - fltStarted) if fltFinished else "%9s" % "-"
+		lstLines.append("%-5i %-19s %s %6i %9i %7i %7i %7i" % (intRun, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(fltStarted)), strSeconds, intShows,
+			dictResults.get("rendered", 0), dictResults.get("mixed", 0), dictResults.get("cached", 0), dictResults.get("failed", 0)))
+	return lstLines
+
+def Failures(objConnection, intLast):
+	#the stations whose renders fail most often over the last runs
+	lstLines = ["%-20s %8s %9s %8s %7s  %s" % ("station", "renders", "attempts", "retried", "failed", "most common error")]
+	lstRows = objConnection.execute("""SELECT station, COUNT(*), SUM(attempts), SUM(attempts > 1), SUM(result = 'failed') FROM stations
+		WHERE result IN ('rendered', 'failed') AND run > (SELECT MAX(id) FROM runs) - ? GROUP BY station""", (intLast,)).fetchall()
+	for strStation, intRenders, intAttempts, intRetried, intFailed in sorted(lstRows, key=lambda tupRow: (-(tupRow[2] - tupRow[1] + tupRow[4]) / tupRow[1], tupRow[0])):
+		tupError = objConnection.execute("""SELECT error, COUNT(*) AS cnt FROM attempts WHERE station = ? AND error != '' AND run > (SELECT MAX(id) FROM runs) - ?
+			GROUP BY error ORDER BY cnt DESC LIMIT 1""", (strStation, intLast)).fetchone()
+		lstLines.append("%-20s %8i %9i %8i %7i  %s" % (strStation, intRenders, intAttempts, intRetried, intFailed, "%s (%i)" % tupError if tupError else ""))
+	return lstLines
+
+def Durations(objConnection, intLast, strStation=None):
+	#how long the renders took as the shows got longer
+	lstLines = ["%-5s %-6s %-20s %9s %9s %8s %10s" % ("run", "show", "station", "minutes", "seconds", "sec/min", "MB")]
+	strWhere = " AND station = ?" if strStation else ""
+	for intRun, strShow, strName, fltLength, fltSeconds, intBytes in objConnection.execute(
+		"SELECT run, show, station, length, seconds, bytes FROM stations WHERE result = 'rendered' AND run > (SELECT MAX(id) FROM runs) - ?" + strWhere + " ORDER BY length, run",
+		(intLast, strStation) if strStation else (intLast,)):
+		lstLines.append("%-5i %-6s %-20s %9.1f %9.1f %8.2f %10.1f" % (intRun, strShow, strName, fltLength / 60.0, fltSeconds, 60.0 * fltSeconds / fltLength if fltLength else 0.0,
+			(intBytes or 0) / 1024.0**2))
+	return lstLines
+
+def Phases(objConnection, intLast):
+	#the average time spent in each phase per run
+	lstLines = ["%-24s %6s %11s %9s" % ("phase", "runs", "avg seconds", "avg count")]
+	for strPhase, intRuns, fltSeconds, fltCount in objConnection.execute("""SELECT phase, COUNT(*), AVG(seconds), AVG(count) FROM phases
+		WHERE run > (SELECT MAX(id) FROM runs) - ? GROUP BY phase ORDER BY AVG(seconds) DESC""", (intLast,)):
+		lstLines.append("%-24s %6i %11.2f %9.1f" % (strPhase, intRuns, fltSeconds, fltCount))
+	return lstLines
+
+if __name__ == "__main__":
+	objCLParser = argparse.ArgumentParser(description="Show what RenderShow.py recorded about its past runs")
+	objCLParser.add_argument("path", metavar="[cache folder or database]", help="the cache folder RenderShow.py uses ([assetspath]\\.rendershow by default) or the history database in it")
+	objCLParser.add_argument("report", choices=["runs", "failures", "durations", "phases"], help="runs lists the runs, failures the stations whose renders fail most, durations how long renders take as the show gets longer, phases where the time goes")
+	objCLParser.add_argument("--last", required=False, type=int, default=20, metavar="[count]", help="how many of the latest runs to look at (default=20)")
+	objCLParser.add_argument("--station", required=False, metavar="[station]", help="only show this station's durations")
+	objCLArgs = objCLParser.parse_args()
+
+	strDatabasePath = DatabasePath(objCLArgs.path)
+	if not os.path.isfile(strDatabasePath):
+		print("No run history found at %s" % strDatabasePath)
+		sys.exit()
+	objConnection = sqlite3.connect(strDatabasePath)
+	if objCLArgs.report == "runs":
+		lstLines = Runs(objConnection, objCLArgs.last)
+	elif objCLArgs.report == "failures":
+		lstLines = Failures(objConnection, objCLArgs.last)
+	elif objCLArgs.report == "durations":
+		lstLines = Durations(objConnection, objCLArgs.last, objCLArgs.station.lower() if objCLArgs.station else None)
+	else:
+		lstLines = Phases(objConnection, objCLArgs.last)
+	print("\n".join(lstLines))
+	objConnection.close()
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (ShowPlanner.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Station planning used by RenderShow.py
+#
+#Before anything is written or rendered, ShowPlanner works out every station's spots - which
+#WAV goes in each IMPORT slot, how long it is and where it's placed - along with the station
+#project and render file names.  Nothing is written while planning, and problems (missing
+#spot files, too few random spots, ITEMs without a marker, WAVs that can't be read) are
+#collected for every station instead of stopping at the first one, so they can all be fixed
+#before the run starts.  Random files without the station name in them are never picked, and
+#are only mentioned in the warnings.
+#
+#With a target loudness each spot's gain is worked out here too, from Loudness.LevelCache.  With
+#a SpotConditioner the stations are planned with the conditioned copies of the spots, so their
+#lengths (and the positions of -e spots) leave out the spots' leading and trailing silence.
+#
+#Once a station's spots are placed, SpotTimeline checks them for spots that now overlap and for
+#dead air between spots that were back to back in the template.  These are warnings rather
+#than problems, and with ripple on the later spots are moved to fix them.
+#
+#The finished plan can be saved as JSON to see exactly what a run is going to do.
+#
+
+import os
+import json
+import random
+
+import WavInfo
+import SpotSampler
+import Loudness
+import SpotTimeline
+import SpotConditioning
+import Tracing
+
+class SpotPlan:
+	__slots__ = ("objItem", "strName", "strSrcPath", "strDestPath", "fltDuration", "fltPosition", "blnRandom", "fltGain")
+
+	def __init__(self, objItem, strName, strSrcPath, strDestPath, fltDuration, fltPosition, blnRandom, fltGain=1.0):
+		self.objItem = objItem
+		self.strName = strName #item name without the IMPORT keyword, lower case
+		self.strSrcPath = strSrcPath #the spot in the assets folder, or its conditioned copy in the cache folder
+		self.strDestPath = strDestPath #where it's staged in the project folder
+		self.fltDuration = fltDuration
+		self.fltPosition = fltPosition
+		self.blnRandom = blnRandom
+		self.fltGain = fltGain #linear gain that matches the spot's loudness - 1.0 unless --spotloudness is on
+
+	def ToDict(self):
+		return {"name": self.strName, "file": self.strSrcPath, "imported": self.strDestPath, "duration": self.fltDuration, "position": self.fltPosition, "random": self.blnRandom,
+			"gain": self.fltGain}
+
+class StationPlan:
+	__slots__ = ("strStation", "blnTemplate", "strProjectFilePath", "strRenderPath", "lstSpots", "lstRandomPicks", "fltLength")
+
+	def __init__(self, strStation, blnTemplate, strProjectFilePath, strRenderPath, fltLength):
+		self.strStation = strStation
+		self.blnTemplate = blnTemplate #the template is written but never rendered
+		self.strProjectFilePath = strProjectFilePath
+		self.strRenderPath = strRenderPath
+		self.lstSpots = []
+		self.lstRandomPicks = []
+		self.fltLength = fltLength
+
+	def ToDict(self):
+		return {"station": self.strStation, "template": self.blnTemplate, "project": self.strProjectFilePath, "render": self.strRenderPath, "length": self.fltLength,
+			"spots": [objSpot.ToDict() for objSpot in self.lstSpots]}
+
+class ShowPlan:
+	def __init__(self, strShowNumber, strDJName, strMasterProjectFilePath):
+		self.strShowNumber = strShowNumber
+		self.strDJName = strDJName
+		self.strMasterProjectFilePath = strMasterProjectFilePath
+		self.lstStations = []
+		self.lstProblems = []
+		self.lstWarnings = [] #spot placement issues that don't stop the show from being processed
+
+	def ToDict(self):
+		return {"show": self.strShowNumber, "dj": self.strDJName, "master": self.strMasterProjectFilePath, "stations": [objStation.ToDict() for objStation in self.lstStations],
+			"problems": self.lstProblems, "warnings": self.lstWarnings}
+
+	def Write(self, strPath):
+		WritePlans([self], strPath)
+
+def WritePlans(lstShowPlans, strPath):
+	#one show's plan is saved as it is, a batch of shows as a list of plans
+	with open(strPath, "w") as fPlan:
+		json.dump(lstShowPlans[0].ToDict() if len(lstShowPlans) == 1 else [objShowPlan.ToDict() for objShowPlan in lstShowPlans], fPlan, indent=1)
+
+class ShowPlanner:
+	def __init__(self, objProject, strShowNumber, strDJName, strProjectPath, strAssetsPath, strRenderOutputPath, strRenderExt, objWavInfoCache, objSpotListings,
+		objRotationHistory, strSeed=None, objTracer=None, strTemplateName="newtemplate", strProcessKeyword="IMPORT ", strEndSnapOption="e", strRandomOption="r",
+		strAudioFolderName="Audio", strRandomSpotsFolderName="Random spots", objLevelCache=None, fltTargetLoudness=None, fltPeakCeiling=Loudness.conPeakCeiling, intWorkers=4,
+		blnRipple=False, objConditioner=None, objSpotFormat=None):
+		self.objProject = objProject
+		self.strShowNumber = strShowNumber
+		self.strDJName = strDJName
+		self.strProjectPath = strProjectPath
+		self.strAssetsPath = strAssetsPath
+		self.strRenderOutputPath = strRenderOutputPath
+		self.strRenderExt = strRenderExt
+		self.objWavInfoCache = objWavInfoCache
+		self.objSpotListings = objSpotListings
+		self.objRotationHistory = objRotationHistory
+		self.strSeed = strSeed #random spots are drawn from a generator seeded with the show and station when this is set
+		self.objTracer = objTracer or Tracing.objNullTracer
+		self.strTemplateName = strTemplateName
+		self.strProcessKeyword = strProcessKeyword.lower()
+		self.strEndSnapOption = strEndSnapOption
+		self.strRandomOption = strRandomOption
+		self.strAudioFolderName = strAudioFolderName
+		self.strRandomSpotsFolderName = strRandomSpotsFolderName
+		#with a target loudness every spot's gain is matched to it
+		self.objLevelCache = objLevelCache
+		self.fltTargetLoudness = fltTargetLoudness
+		self.fltPeakCeiling = fltPeakCeiling
+		self.intWorkers = intWorkers
+		self.blnRipple = blnRipple #move later spots to fix overlaps and close gaps between chained spots
+		#with a conditioner every spot is converted to objSpotFormat and trimmed before it's planned
+		self.objConditioner = objConditioner
+		self.objSpotFormat = objSpotFormat
+		#the length of the show without the station spots
+		self.fltSharedLength = objProject.Length(objProject.lstImportItems)
+		#the spots that are back to back in the template
+		lstTemplateSpans = [SpotTimeline.TimelineSpan(objProject.ItemPosition(objItem), objProject.ItemEnd(objItem), objItem) for objItem in objProject.lstImportItems]
+		self.setChains = SpotTimeline.Chains(lstTemplateSpans)
+		#the program material on the other tracks stays where it is in every station - the spots are
+		#	checked against it, but not against the ITEMs they already overlap in the template (a bed
+		#	under the spots)
+		self.lstProgramSpans = [SpotTimeline.TimelineSpan(objProject.ItemPosition(objItem), objProject.ItemEnd(objItem), objItem) for objTrack in objProject.lstTracks
+			if objTrack is not objProject.objStationTrack for objItem in objTrack.lstItems if objItem.intPositionLine >= 0 and objItem.intLengthLine >= 0]
+		self.setTemplateCollisions = {(objItem, objProgramItem) for objItem, objProgramItem, _ in SpotTimeline.SpotTimeline(lstTemplateSpans, self.lstProgramSpans).Collisions()}
+
+	def SpotItems(self, lstProblems):
+		#(ITEM, spot name, marker) for the IMPORT spots on the station track
+		lstSpotItems = []
+		for objItem in self.objProject.lstImportItems:
+			strItemName = objItem.strName.lower().replace(self.strProcessKeyword, "")
+			objMarker = self.objProject.dictImportMarkers.get(strItemName)
+			if objMarker is None:
+				lstProblems.append("This spot (%s) does not have an associated marker" % strItemName)
+				continue
+			lstSpotItems.append((objItem, strItemName, objMarker))
+		return lstSpotItems
+
+	def ProjectFilePath(self, strStation):
+		return os.path.join(self.strProjectPath, "show-" + self.strShowNumber + "-" + strStation + ".RPP")
+
+	def RenderPath(self, strStation):
+		return os.path.join(self.strRenderOutputPath, "show-" + self.strShowNumber + "-" + strStation + self.strRenderExt)
+
+	def PlaceSpots(self, objPlan, lstWarnings):
+		#check the station's spots against each other (and ripple them) once they're all placed
+		dictSpots = {objSpot.objItem: objSpot for objSpot in objPlan.lstSpots}
+		objTimeline = SpotTimeline.SpotTimeline([SpotTimeline.TimelineSpan(objSpot.fltPosition, objSpot.fltPosition + objSpot.fltDuration, objSpot.objItem) for objSpot in objPlan.lstSpots], self.lstProgramSpans)
+		if self.blnRipple:
+			dictStarts = objTimeline.Ripple(self.setChains)
+			for objItem, fltPosition in dictStarts.items():
+				dictSpots[objItem].fltPosition = round(fltPosition, 14)
+			if dictStarts:
+				lstWarnings.append("%s: %i spot(s) rippled to make room" % (objPlan.strStation, len(dictStarts)))
+				objTimeline = SpotTimeline.SpotTimeline([SpotTimeline.TimelineSpan(objSpot.fltPosition, objSpot.fltPosition + objSpot.fltDuration, objSpot.objItem) for objSpot in objPlan.lstSpots], self.lstProgramSpans)
+
+		for objItem, objNextItem, fltSeconds in objTimeline.Overlaps():
+			lstWarnings.append("%s: \"%s\" overlaps \"%s\" by %.2f seconds" % (objPlan.strStation, dictSpots[objItem].strName, dictSpots[objNextItem].strName, fltSeconds))
+		for objItem, objProgramItem, fltSeconds in objTimeline.Collisions():
+			if (objItem, objProgramItem) not in self.setTemplateCollisions:
+				lstWarnings.append("%s: \"%s\" runs into \"%s\" on the %s track by %.2f seconds" % (objPlan.strStation, dictSpots[objItem].strName, objProgramItem.strName,
+					objProgramItem.objParent.strName, fltSeconds))
+		for objItem, objNextItem, fltSeconds in objTimeline.Gaps(self.setChains):
+			lstWarnings.append("%s: %.2f seconds of dead air between \"%s\" and \"%s\"" % (objPlan.strStation, fltSeconds, dictSpots[objItem].strName, dictSpots[objNextItem].strName))
+		for objSpot in objPlan.lstSpots:
+			#only spots that used to end inside the show - a spot that closes the show can run past it
+			fltOverrun = objSpot.fltPosition + objSpot.fltDuration - self.fltSharedLength
+			if fltOverrun > objTimeline.fltTolerance and self.objProject.ItemEnd(objSpot.objItem) <= self.fltSharedLength + objTimeline.fltTolerance:
+				lstWarnings.append("%s: \"%s\" runs %.2f seconds past the end of the show" % (objPlan.strStation, objSpot.strName, fltOverrun))
+			objPlan.fltLength = max(objPlan.fltLength, objSpot.fltPosition + objSpot.fltDuration)
+
+	def PlanStation(self, strStation, lstSpotItems, lstProblems, lstWarnings):
+		blnTemplate = strStation == self.strTemplateName
+		objPlan = StationPlan(strStation, blnTemplate, self.ProjectFilePath(strStation), self.RenderPath(strStation), self.fltSharedLength)
+		if blnTemplate:
+			#the template keeps the original template ITEMs
+			return objPlan
+
+		strStationAudioPath = os.path.join(self.strAssetsPath, self.strAudioFolderName, strStation)
+		strRandomSpotsPath = os.path.join(strStationAudioPath, self.strRandomSpotsFolderName)
+		intRandomSpotsNeeded = sum(1 for _, _, objMarker in lstSpotItems if self.strRandomOption in objMarker.strOptions.lower())
+		if not os.path.isdir(strRandomSpotsPath):
+			lstProblems.append("%s: random wav folder is missing (%s)" % (strStation, strRandomSpotsPath))
+		elif intRandomSpotsNeeded > 0:
+			#only the files with the station name in them are picked from, so we're not pulling the
+			#	wrong files - the others are left out rather than stopping the station
+			lstRandomFiles = []
+			for strFileName in self.objSpotListings.List(strRandomSpotsPath):
+				if (strStation + "-") in strFileName:
+					lstRandomFiles.append(strFileName)
+				else:
+					lstWarnings.append("%s: \"%s\" was left out of the random spots - it needs to contain [station hypen] at the beginning of the filename" % (strStation, strFileName))
+			if intRandomSpotsNeeded > len(lstRandomFiles):
+				lstProblems.append("%s: not enough WAVs in the random spots folder to fill all the spots - expecting at least %i, found %i" %
+					(strStation, intRandomSpotsNeeded, len(lstRandomFiles)))
+			else:
+				objRandom = random.Random("%s-%s-%s" % (self.strSeed, self.strShowNumber, strStation)) if self.strSeed is not None else random
+				objPlan.lstRandomPicks = SpotSampler.PickSpots(lstRandomFiles, intRandomSpotsNeeded, self.objRotationHistory.LastAired(strStation, self.strShowNumber), objRandom)
+
+		intRandomSpotCnt = 0
+		for objItem, strItemName, objMarker in lstSpotItems:
+			strItemOptions = objMarker.strOptions.lower()
+			blnRandom = self.strRandomOption in strItemOptions
+			if blnRandom:
+				#take the next random spot picked for the station
+				if intRandomSpotCnt >= len(objPlan.lstRandomPicks):
+					continue
+				strWavSrcPath = os.path.join(strRandomSpotsPath, objPlan.lstRandomPicks[intRandomSpotCnt])
+				intRandomSpotCnt += 1
+			else:
+				strWavSrcPath = os.path.join(strStationAudioPath, "General", strStation + "-" + strItemName + ".wav")
+
+			if not os.path.isfile(strWavSrcPath):
+				lstProblems.append("%s: spot file not found (%s)" % (strStation, strWavSrcPath))
+				continue
+			#the spot keeps its name in the project folder, even when it's conditioned
+			strWavDestPath = os.path.join(self.strProjectPath, "Audio\\Imported", strStation, os.path.basename(strWavSrcPath))
+			if self.objConditioner is not None:
+				try:
+					strWavSrcPath = self.objConditioner.Get(strWavSrcPath, self.objSpotFormat)
+				except (OSError, SpotConditioning.ConditionError) as objError:
+					lstProblems.append("%s: unable to condition the spot (%s)" % (strStation, objError))
+					continue
+			try:
+				with self.objTracer.Span("probe", station=strStation, file=os.path.basename(strWavSrcPath)):
+					objWavInfo = self.objWavInfoCache.Get(strWavSrcPath)
+			except (OSError, WavInfo.WavError) as objError:
+				lstProblems.append("%s: unable to read the spot's WAV header (%s)" % (strStation, objError))
+				continue
+			fltDuration = round(objWavInfo.fltDuration, 14)
+			fltGain = 1.0
+			if self.fltTargetLoudness is not None:
+				try:
+					fltGain = Loudness.MatchGain(self.objLevelCache.Get(strWavSrcPath), self.fltTargetLoudness, self.fltPeakCeiling)
+				except (OSError, Loudness.LoudnessError) as objError:
+					lstProblems.append("%s: unable to measure the spot's loudness (%s)" % (strStation, objError))
+					continue
+
+			#place the spot where the marker is - either starting there or, when it's snapped
+			#	to its end, ending there
+			if self.strEndSnapOption in strItemOptions:
+				fltPosition = objMarker.fltPosition - fltDuration
+			else:
+				fltPosition = objMarker.fltPosition
+
+			objPlan.lstSpots.append(SpotPlan(objItem, strItemName, strWavSrcPath, strWavDestPath, fltDuration, fltPosition, blnRandom, fltGain))
+		self.PlaceSpots(objPlan, lstWarnings)
+		return objPlan
+
+	def StationWavs(self, lstStations):
+		#every WAV in the stations' audio folders
+		lstPaths = []
+		for strStation in lstStations:
+			if strStation == self.strTemplateName:
+				continue
+			for strDirPath, lstDirNames, lstFileNames in os.walk(os.path.join(self.strAssetsPath, self.strAudioFolderName, strStation)):
+				lstPaths.extend(os.path.join(strDirPath, strFileName) for strFileName in lstFileNames if strFileName.lower().endswith(".wav"))
+		return lstPaths
+
+	def Plan(self, lstStations):
+		objShowPlan = ShowPlan(self.strShowNumber, self.strDJName, self.objProject.strPath)
+		if self.objConditioner is not None or self.fltTargetLoudness is not None:
+			lstPaths = self.StationWavs(lstStations)
+		if self.objConditioner is not None:
+			#like the loudness, all the stations' spots are conditioned at once - and it's the
+			#	conditioned spots that are measured
+			intConditioned = self.objConditioner.intConditioned
+			with self.objTracer.Span("condition", spots=len(lstPaths)) as dictSpan:
+				lstPaths = list(self.objConditioner.Prepare(lstPaths, self.objSpotFormat, self.intWorkers).values())
+				dictSpan["conditioned"] = self.objConditioner.intConditioned - intConditioned
+		if self.fltTargetLoudness is not None:
+			#measure all the stations' spots at once, not just the ones picked this time, so the
+			#	random spots picked in later shows are already measured - problems with the spots
+			#	that are used are reported while planning
+			intAnalyzed = self.objLevelCache.intAnalyzed
+			with self.objTracer.Span("loudness", spots=len(lstPaths)) as dictSpan:
+				self.objLevelCache.Analyze(lstPaths, self.intWorkers)
+				dictSpan["analyzed"] = self.objLevelCache.intAnalyzed - intAnalyzed
+		lstSpotItems = self.SpotItems(objShowPlan.lstProblems)
+		for strStation in lstStations:
+			objShowPlan.lstStations.append(self.PlanStation(strStation, lstSpotItems, objShowPlan.lstProblems, objShowPlan.lstWarnings))
+		return objShowPlan
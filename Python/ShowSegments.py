@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (ShowSegments.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Segment rendering used by RenderShow.py
+#
+#However many stations are rendered at the same time, one long show is still one long render.
+#With --segments each station's show is split at the markers whose names start with SEGMENT,
+#RenderShow.py renders every segment to a WAV as a custom time range render of the station
+#project - the segments of every station go on the scheduler together - and they're joined
+#here into the station's output.
+#
+#The split points are rounded to whole frames so every segment starts on the frame the one
+#before it ended on, and each segment is cut to exactly its number of frames - nothing is
+#crossfaded.  Anything that carries over a split point (a reverb tail, a compressor holding the
+#level down) starts again from nothing in the next segment, so every join is checked for a
+#step in the waveform that's bigger than anything in the audio either side of it, and the
+#station is rendered in one piece when there is one.  The markers are best put where nothing
+#is ringing on, e.g. between songs.
+#
+
+import os
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+import WavInfo
+import StationMix
+
+conBoundaryFrames = 64 #frames either side of a join that are compared
+conStepFactor = 4.0 #a join that bends the waveform this many times more than the audio either side is a step
+conStepFloor = 0.01 #steps smaller than this (linear, full scale is 1.0) can't be heard
+conBlockFrames = 65536 #frames copied at a time
+
+class SegmentError(Exception):
+	pass
+
+def SplitFrames(lstSplitTimes, fltLength, intSampleRate):
+	#(first frame, end frame) of every segment of a fltLength second show - split points are
+	#	rounded to whole frames and ones outside the show or on top of each other are dropped
+	intEnd = int(round(fltLength * intSampleRate))
+	lstSplits = sorted(set(int(round(fltTime * intSampleRate)) for fltTime in lstSplitTimes))
+	lstBounds = [0] + [intSplit for intSplit in lstSplits if 0 < intSplit < intEnd] + [intEnd]
+	return list(zip(lstBounds[:-1], lstBounds[1:]))
+
+def Step(arrBefore, arrAfter):
+	#(the bend at the join, the biggest bend either side of it) for each channel - the bend is the
+	#	second difference of the waveform, so a steady slope or a sine at a normal level doesn't
+	#	look like a step
+	intJoin = len(arrBefore)
+	arrBend = numpy.abs(numpy.diff(numpy.concatenate((arrBefore, arrAfter)), n=2, axis=0))
+	#the two second differences that use frames from both sides
+	arrAtJoin = arrBend[intJoin - 2:intJoin].max(axis=0)
+	arrAround = numpy.concatenate((arrBend[:intJoin - 2], arrBend[intJoin:])).max(axis=0)
+	return arrAtJoin, arrAround
+
+def JoinSegments(lstSegments, strOutputPath, intBlockFrames=conBlockFrames):
+	#lstSegments holds (WAV path, frames) for every segment in order - frames is None for the last
+	#	one, which is used as it is.  Writes strOutputPath as the segments one after the other,
+	#	or raises SegmentError if they don't fit together
+	if numpy is None:
+		raise SegmentError("NumPy isn't installed")
+	lstInfos = []
+	for intSegment, (strPath, intFrames) in enumerate(lstSegments, start=1):
+		try:
+			objInfo = WavInfo.ReadWavInfo(strPath)
+		except (OSError, WavInfo.WavError) as objError:
+			raise SegmentError("unable to read segment %i (%s)" % (intSegment, objError))
+		if lstInfos and (objInfo.intFormat, objInfo.intChannels, objInfo.intSampleRate, objInfo.intBitsPerSample) != (lstInfos[0].intFormat, lstInfos[0].intChannels,
+			lstInfos[0].intSampleRate, lstInfos[0].intBitsPerSample):
+			raise SegmentError("segment %i isn't in the same format as segment 1" % intSegment)
+		if intFrames is not None and objInfo.intFrames < intFrames:
+			raise SegmentError("segment %i is %i frame(s) short" % (intSegment, intFrames - objInfo.intFrames))
+		lstInfos.append(objInfo)
+	lstFrames = [objInfo.intFrames if intFrames is None else intFrames for (_, intFrames), objInfo in zip(lstSegments, lstInfos)]
+	objInfo = lstInfos[0]
+
+	lstSamples = []
+	try:
+		for (strPath, _), objSegmentInfo in zip(lstSegments, lstInfos):
+			lstSamples.append(StationMix.MapSamples(strPath, objSegmentInfo))
+
+		#every join is checked before anything is written
+		intPosition = 0
+		for intSegment in range(1, len(lstSegments)):
+			intPosition += lstFrames[intSegment - 1]
+			intBefore = min(conBoundaryFrames, lstFrames[intSegment - 1])
+			intAfter = min(conBoundaryFrames, lstFrames[intSegment])
+			if intBefore < 3 or intAfter < 3:
+				continue
+			arrAtJoin, arrAround = Step(StationMix.ToFloat(lstSamples[intSegment - 1][lstFrames[intSegment - 1] - intBefore:lstFrames[intSegment - 1]], objInfo),
+				StationMix.ToFloat(lstSamples[intSegment][:intAfter], objInfo))
+			arrSteps = (arrAtJoin > conStepFloor) & (arrAtJoin > arrAround * conStepFactor)
+			if arrSteps.any():
+				raise SegmentError("the waveform steps by %.3f where segments %i and %i join (%.3f seconds)" % (arrAtJoin.max(), intSegment, intSegment + 1,
+					intPosition / float(objInfo.intSampleRate)))
+
+		intTotal = sum(lstFrames)
+		strTempPath = strOutputPath + ".joining"
+		with open(strTempPath, "wb") as fOutFile:
+			fOutFile.write(WavInfo.WavHeader(objInfo, intTotal))
+			for arrSamples, intFrames in zip(lstSamples, lstFrames):
+				for intFrom in range(0, intFrames, intBlockFrames):
+					fOutFile.write(arrSamples[intFrom:min(intFrom + intBlockFrames, intFrames)].tobytes())
+			if (intTotal * objInfo.intBlockAlign) & 1:
+				fOutFile.write(b"\x00")
+	finally:
+		#the files stay open as long as they're mapped
+		del lstSamples
+	os.replace(strTempPath, strOutputPath)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (ShowWatcher.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Watch mode used by RenderShow.py
+#
+#With --watch the script doesn't exit after its first run.  The parsed master project and the
+#caches stay in memory while InputWatcher polls the master project and every station's audio
+#folder in the assets folder, and when something changes only the stations that depend on it
+#are planned, written and rendered again - a change to the master project affects every
+#station, a spot dropped into a station's folder only affects that station.
+#
+#The inputs are polled instead of using inotify so watching works the same on Windows and on
+#network shares.  A change is only reported once the files have stopped changing for one poll
+#interval, so a project that's still being saved or a spot that's still being copied isn't
+#picked up half written.
+#
+
+import os
+import time
+
+conPollInterval = 0.25 #seconds between polls
+
+def PathSignature(strPath):
+	#size and modified time of a file, or of every file under a folder - None if it isn't there
+	try:
+		objStat = os.stat(strPath)
+	except OSError:
+		return None
+	if not os.path.isdir(strPath):
+		return (objStat.st_size, objStat.st_mtime_ns)
+	lstEntries = []
+	for strDirPath, lstDirNames, lstFileNames in os.walk(strPath):
+		lstDirNames.sort()
+		for strFileName in sorted(lstFileNames):
+			strFilePath = os.path.join(strDirPath, strFileName)
+			try:
+				objStat = os.stat(strFilePath)
+			except OSError:
+				continue
+			lstEntries.append((os.path.relpath(strFilePath, strPath), objStat.st_size, objStat.st_mtime_ns))
+	return tuple(lstEntries)
+
+class InputWatcher:
+	def __init__(self, dictInputs, fltInterval=conPollInterval):
+		#dictInputs maps a key (a station name, say) to the file or folder it depends on
+		self.dictInputs = dict(dictInputs)
+		self.fltInterval = fltInterval
+		self.dictSignatures = self.Signatures()
+
+	def Signatures(self):
+		return {keyInput: PathSignature(strPath) for keyInput, strPath in self.dictInputs.items()}
+
+	def Changed(self):
+		#the keys whose input changed since the last poll
+		dictSignatures = self.Signatures()
+		setChanged = {keyInput for keyInput, tupSignature in dictSignatures.items() if tupSignature != self.dictSignatures.get(keyInput)}
+		self.dictSignatures = dictSignatures
+		return setChanged
+
+	def Wait(self):
+		#block until something changes and then settles - returns the keys that changed
+		setChanged = set()
+		while True:
+			time.sleep(self.fltInterval)
+			setNew = self.Changed()
+			if setNew:
+				setChanged |= setNew
+			elif setChanged:
+				return setChanged
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (SpotConditioning.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Spot conditioning used by ShowPlanner.py
+#
+#Station spots come in at 44.1k and 48k, mono and stereo, 16 and 24 bits, and Reaper converts
+#them every time a station is rendered.  Most of them also start and end with some silence,
+#which throws off their LENGTH and where -e spots end up.  With --conditionspots every spot is
+#converted once to the project's sample rate, channel count and bit depth, with its leading and
+#trailing silence trimmed, and the stations are planned with the converted copy - so the
+#renders (and --stationmix) only ever read audio that's already in the project's format.
+#
+#The converted spots are kept in the cache folder by the content hash of the original and the
+#format, so a spot is only converted again when the file itself changes.  Every spot that's
+#used has its access time set, and the least recently used ones are removed once the cache
+#grows past its size limit.
+#
+#Everything is done with NumPy a block at a time from a memory mapped WAV.  The silence is
+#found with a vectorised threshold test, and the sample rate is changed with a polyphase
+#Kaiser windowed sinc filter for the exact ratio between the two rates.
+#
+
+import os
+import math
+import time
+import shutil
+import threading
+import concurrent.futures
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+import WavInfo
+import StationMix
+import Tracing
+
+conCacheFolderName = "conditioned" #folder in the cache folder where the conditioned spots are kept
+conTrimLevel = -60.0 #dBFS - anything quieter at the start or end of a spot is trimmed
+conBlockFrames = 16384 #frames read (and written) at a time
+conResampleZeros = 32 #zero crossings of the resampling filter either side of its centre
+conResampleCutoff = 0.95 #of the lower of the two Nyquist frequencies
+conKaiserBeta = 9.0
+
+class ConditionError(Exception):
+	pass
+
+class SpotFormat:
+	__slots__ = ("intSampleRate", "intChannels", "intBitsPerSample")
+
+	def __init__(self, intSampleRate=None, intChannels=2, intBitsPerSample=24):
+		self.intSampleRate = intSampleRate #None keeps each spot's own sample rate
+		self.intChannels = intChannels
+		self.intBitsPerSample = intBitsPerSample #32 is floating point
+
+	def Info(self, intSampleRate):
+		#the WavInfo of a spot in this format - intSampleRate is used when the format doesn't set one
+		intFormat = WavInfo.WaveFormatFloat if self.intBitsPerSample == 32 else WavInfo.WaveFormatPCM
+		intBlockAlign = self.intChannels * self.intBitsPerSample // 8
+		return WavInfo.WavInfo(intFormat, self.intChannels, self.intSampleRate or intSampleRate, self.intBitsPerSample, intBlockAlign)
+
+	def __str__(self):
+		return "%s, %s, %s" % ("%i Hz" % self.intSampleRate if self.intSampleRate else "spot's own rate", {1: "mono", 2: "stereo"}.get(self.intChannels, "%i channels" % self.intChannels),
+			"32-bit float" if self.intBitsPerSample == 32 else "%i-bit" % self.intBitsPerSample)
+
+def SameFormat(objInfo, objTargetInfo):
+	return (objInfo.intFormat, objInfo.intChannels, objInfo.intSampleRate, objInfo.intBitsPerSample, objInfo.intBlockAlign) == \
+		(objTargetInfo.intFormat, objTargetInfo.intChannels, objTargetInfo.intSampleRate, objTargetInfo.intBitsPerSample, objTargetInfo.intBlockAlign)
+
+def TrimRange(arrSamples, objInfo, fltLevel=conTrimLevel, intBlockFrames=conBlockFrames):
+	#(first frame, end frame) of the spot without its leading and trailing silence - the whole
+	#	spot when there's nothing louder than fltLevel in it
+	fltThreshold = 10.0 ** (fltLevel / 20.0)
+	intFrames = len(arrSamples)
+	for intFrom in range(0, intFrames, intBlockFrames):
+		arrLoud = numpy.flatnonzero((numpy.abs(StationMix.ToFloat(arrSamples[intFrom:intFrom + intBlockFrames], objInfo)) > fltThreshold).any(axis=1))
+		if len(arrLoud):
+			intFirst = intFrom + int(arrLoud[0])
+			break
+	else:
+		return 0, intFrames
+	#there's at least one loud frame, so the search back from the end stops at intFirst
+	for intTo in range(intFrames, intFirst, -intBlockFrames):
+		intFrom = max(intFirst, intTo - intBlockFrames)
+		arrLoud = numpy.flatnonzero((numpy.abs(StationMix.ToFloat(arrSamples[intFrom:intTo], objInfo)) > fltThreshold).any(axis=1))
+		if len(arrLoud):
+			return intFirst, intFrom + int(arrLoud[-1]) + 1
+	return intFirst, intFirst + 1
+
+def ReadFrames(arrSamples, objInfo, intStart, intEnd):
+	#float frames intStart to intEnd, with silence before the start and after the end of the file
+	arrBlock = numpy.zeros((intEnd - intStart, objInfo.intChannels))
+	intFrom = max(0, intStart)
+	intTo = min(len(arrSamples), intEnd)
+	if intTo > intFrom:
+		arrBlock[intFrom - intStart:intTo - intStart] = StationMix.ToFloat(arrSamples[intFrom:intTo], objInfo)
+	return arrBlock
+
+def ResampleFilter(intUp, intDown, intZeros=conResampleZeros):
+	#the polyphase filter for resampling by intUp / intDown - row p holds the taps for an output
+	#	that falls p / intUp of the way from one input frame to the next, which are applied to the
+	#	input frames from (half the taps - 1) before it to half the taps after it
+	fltCutoff = min(1.0, intUp / float(intDown)) * conResampleCutoff
+	intHalf = int(math.ceil(intZeros / fltCutoff))
+	arrOffsets = numpy.arange(-intHalf + 1, intHalf + 1)[numpy.newaxis, :] - (numpy.arange(intUp) / float(intUp))[:, numpy.newaxis]
+	arrWindow = numpy.i0(conKaiserBeta * numpy.sqrt(numpy.clip(1.0 - (arrOffsets / intHalf) ** 2, 0.0, None))) / numpy.i0(conKaiserBeta)
+	arrFilter = numpy.sinc(fltCutoff * arrOffsets) * arrWindow
+	#every phase passes DC at exactly unity gain
+	return arrFilter / arrFilter.sum(axis=1, keepdims=True), intHalf
+
+def OutputFrames(intFrames, intUp, intDown):
+	return -(-intFrames * intUp // intDown)
+
+def Resample(arrSamples, objInfo, intStart, intEnd, intOutputRate, intBlockFrames=conBlockFrames):
+	#float blocks of the frames from intStart to intEnd at intOutputRate
+	intDivisor = math.gcd(objInfo.intSampleRate, intOutputRate)
+	intUp = intOutputRate // intDivisor
+	intDown = objInfo.intSampleRate // intDivisor
+	if intUp == intDown:
+		for intFrom in range(intStart, intEnd, intBlockFrames):
+			yield ReadFrames(arrSamples, objInfo, intFrom, min(intFrom + intBlockFrames, intEnd))
+		return
+
+	arrFilter, intHalf = ResampleFilter(intUp, intDown)
+	arrTaps = numpy.arange(2 * intHalf)
+	intFrames = OutputFrames(intEnd - intStart, intUp, intDown)
+	for intFrom in range(0, intFrames, intBlockFrames):
+		arrOutput = numpy.arange(intFrom, min(intFrom + intBlockFrames, intFrames), dtype=numpy.int64)
+		#the input frame at or before each output frame, and how far past it the output falls
+		arrBase = arrOutput * intDown // intUp
+		arrPhase = arrOutput * intDown % intUp
+		intFirst = int(arrBase[0]) - intHalf + 1
+		arrInput = ReadFrames(arrSamples, objInfo, intStart + intFirst, intStart + int(arrBase[-1]) + intHalf + 1)
+		yield numpy.einsum("nk,nkc->nc", arrFilter[arrPhase], arrInput[(arrBase - arrBase[0])[:, numpy.newaxis] + arrTaps])
+
+def Remix(arrBlock, intChannels):
+	#mono is copied to every channel, and anything else folded down to mono or cut to the first channels
+	if arrBlock.shape[1] == intChannels:
+		return arrBlock
+	if arrBlock.shape[1] == 1:
+		return numpy.repeat(arrBlock, intChannels, axis=1)
+	if intChannels == 1:
+		return arrBlock.mean(axis=1, keepdims=True)
+	if arrBlock.shape[1] > intChannels:
+		return arrBlock[:, :intChannels]
+	raise ConditionError("can't make %i channels from %i" % (intChannels, arrBlock.shape[1]))
+
+def ConditionSpot(strSrcPath, strDestPath, objFormat, fltTrimLevel=conTrimLevel):
+	#write strSrcPath to strDestPath in objFormat without its leading and trailing silence - a
+	#	spot that's already in the format and has nothing to trim is copied as it is
+	if numpy is None:
+		raise ConditionError("NumPy isn't installed")
+	try:
+		objInfo = WavInfo.ReadWavInfo(strSrcPath)
+		arrSamples = StationMix.MapSamples(strSrcPath, objInfo)
+	except (WavInfo.WavError, StationMix.MixError) as objError:
+		raise ConditionError(str(objError))
+	try:
+		objTargetInfo = objFormat.Info(objInfo.intSampleRate)
+		intStart, intEnd = TrimRange(arrSamples, objInfo, fltTrimLevel)
+		if SameFormat(objInfo, objTargetInfo) and (intStart, intEnd) == (0, objInfo.intFrames):
+			shutil.copyfile(strSrcPath, strDestPath)
+			return
+		intDivisor = math.gcd(objInfo.intSampleRate, objTargetInfo.intSampleRate)
+		intFrames = OutputFrames(intEnd - intStart, objTargetInfo.intSampleRate // intDivisor, objInfo.intSampleRate // intDivisor)
+		with open(strDestPath, "wb") as fDest:
+			fDest.write(WavInfo.WavHeader(objTargetInfo, intFrames))
+			for arrBlock in Resample(arrSamples, objInfo, intStart, intEnd, objTargetInfo.intSampleRate):
+				fDest.write(StationMix.FromFloat(Remix(arrBlock, objTargetInfo.intChannels), objTargetInfo))
+			if (intFrames * objTargetInfo.intBlockAlign) & 1:
+				#chunks are word aligned
+				fDest.write(b"\x00")
+	finally:
+		#the file stays open as long as it's mapped
+		del arrSamples
+
+class SpotConditioner:
+	def __init__(self, strCachePath, objHashIndex, intMaxBytes=0, fltTrimLevel=conTrimLevel, objTracer=None):
+		self.strRoot = os.path.join(strCachePath, conCacheFolderName)
+		self.objHashIndex = objHashIndex
+		self.intMaxBytes = intMaxBytes #0 means no limit
+		self.fltTrimLevel = fltTrimLevel
+		self.objTracer = objTracer or Tracing.objNullTracer
+		self.objLock = threading.Lock()
+		self.setUsed = set() #entries used by this run, which are never pruned
+		self.intConditioned = 0
+
+	def EntryPath(self, strHash, objFormat):
+		strKey = "%s-%ich-%ibit-trim%g" % (objFormat.intSampleRate or "src", objFormat.intChannels, objFormat.intBitsPerSample, -self.fltTrimLevel)
+		return os.path.join(self.strRoot, strHash[:2], strHash + "-" + strKey + ".wav")
+
+	def Touch(self, strEntryPath):
+		#mark the entry as recently used so it's the last to be removed - it's the access time that's
+		#	set, as the staged spots are matched to the entries' modified time (and are hardlinks of
+		#	them with --stagemode link)
+		os.utime(strEntryPath, ns=(time.time_ns(), os.stat(strEntryPath).st_mtime_ns))
+
+	def Get(self, strSrcPath, objFormat):
+		#the path of the conditioned copy of strSrcPath, which is made if it isn't cached - raises
+		#	ConditionError (or OSError)
+		strEntryPath = self.EntryPath(self.objHashIndex.Get(strSrcPath), objFormat)
+		with self.objLock:
+			self.setUsed.add(strEntryPath)
+		if os.path.isfile(strEntryPath):
+			self.Touch(strEntryPath)
+			return strEntryPath
+
+		os.makedirs(os.path.dirname(strEntryPath), exist_ok=True)
+		strTempPath = strEntryPath + ".tmp%i" % threading.get_ident()
+		try:
+			with self.objTracer.Span("condition spot", file=os.path.basename(strSrcPath)):
+				ConditionSpot(strSrcPath, strTempPath, objFormat, self.fltTrimLevel)
+			os.replace(strTempPath, strEntryPath)
+			self.Touch(strEntryPath)
+		finally:
+			if os.path.exists(strTempPath):
+				os.remove(strTempPath)
+		with self.objLock:
+			self.intConditioned += 1
+		return strEntryPath
+
+	def Prepare(self, lstPaths, objFormat, intWorkers=4):
+		#condition a batch of spots on a thread pool - returns {path: conditioned path} for the ones
+		#	that worked
+		dictPaths = {}
+		with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, intWorkers)) as objPool:
+			dictFutures = {objPool.submit(self.Get, strPath, objFormat): strPath for strPath in lstPaths}
+			for objFuture in concurrent.futures.as_completed(dictFutures):
+				try:
+					dictPaths[dictFutures[objFuture]] = objFuture.result()
+				except (OSError, ConditionError):
+					#reported when the spot is planned
+					pass
+		return dictPaths
+
+	def Prune(self):
+		#remove the least recently used spots until the cache fits in its size limit
+		if self.intMaxBytes <= 0 or not os.path.isdir(self.strRoot):
+			return
+		lstEntries = []
+		for strDirPath, _, lstFileNames in os.walk(self.strRoot):
+			for strFileName in lstFileNames:
+				strPath = os.path.join(strDirPath, strFileName)
+				objStat = os.stat(strPath)
+				lstEntries.append((objStat.st_atime, objStat.st_size, strPath))
+		intTotal = sum(intSize for _, intSize, _ in lstEntries)
+		for _, intSize, strPath in sorted(lstEntries):
+			if intTotal <= self.intMaxBytes:
+				break
+			if strPath in self.setUsed:
+				continue
+			os.remove(strPath)
+			intTotal -= intSize
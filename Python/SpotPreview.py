@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (SpotPreview.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Spot previews used by RenderShow.py
+#
+#Checking that every station's spots landed where they should means listening through every
+#station's whole show.  With --preview no station is rendered in full - each one gets a short
+#WAV of just the audio around its spots (from a few seconds before each spot starts to a few
+#seconds after it ends), one window after another with a short tone between them, and a JSON
+#list of where each window is in the preview and in the show.  Windows that overlap are joined.
+#
+#RenderShow.py renders the windows as custom time range renders of the station project, or with
+#--stationmix mixes them straight from the common mix and the spots.  Either way the windows
+#are joined here, a block at a time from memory mapped WAVs.
+#
+
+import os
+import json
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+import WavInfo
+import StationMix
+
+conBeforeSeconds = 5.0 #audio kept before each spot starts
+conAfterSeconds = 5.0 #audio kept after each spot ends
+conToneSeconds = 0.5 #tone between the windows
+conToneFrequency = 1000.0
+conToneLevel = -20.0 #dBFS
+conToneFadeSeconds = 0.01 #the tone fades in and out so it doesn't click
+conBlockFrames = 65536 #frames copied at a time
+
+class PreviewError(Exception):
+	pass
+
+class PreviewWindow:
+	__slots__ = ("fltStart", "fltEnd", "lstNames", "strPath")
+
+	def __init__(self, fltStart, fltEnd, lstNames):
+		self.fltStart = fltStart #seconds from the start of the show
+		self.fltEnd = fltEnd
+		self.lstNames = lstNames #the spots in the window
+		self.strPath = None #the window's WAV once it's rendered or mixed
+
+	@property
+	def fltLength(self):
+		return self.fltEnd - self.fltStart
+
+def Windows(lstSpots, fltLength, fltBefore=conBeforeSeconds, fltAfter=conAfterSeconds):
+	#lstSpots holds (name, position, duration) for every spot - the windows around them in show
+	#	order, kept inside the show's fltLength seconds
+	lstWindows = []
+	for strName, fltPosition, fltDuration in sorted(lstSpots, key=lambda tupSpot: tupSpot[1]):
+		fltStart = max(0.0, fltPosition - fltBefore)
+		fltEnd = min(fltPosition + fltDuration + fltAfter, max(fltLength, fltPosition + fltDuration))
+		if lstWindows and fltStart <= lstWindows[-1].fltEnd:
+			#it overlaps the last window - they're heard as one
+			lstWindows[-1].fltEnd = max(lstWindows[-1].fltEnd, fltEnd)
+			lstWindows[-1].lstNames.append(strName)
+		elif fltEnd > fltStart:
+			lstWindows.append(PreviewWindow(fltStart, fltEnd, [strName]))
+	return lstWindows
+
+def Tone(objInfo, intFrames):
+	#a sine on every channel, faded in and out
+	arrTime = numpy.arange(intFrames, dtype=numpy.float64) / objInfo.intSampleRate
+	arrTone = numpy.sin(2.0 * numpy.pi * conToneFrequency * arrTime) * 10.0 ** (conToneLevel / 20.0)
+	intFade = min(intFrames // 2, int(conToneFadeSeconds * objInfo.intSampleRate))
+	if intFade > 0:
+		arrRamp = numpy.arange(intFade, dtype=numpy.float64) / intFade
+		arrTone[:intFade] *= arrRamp
+		arrTone[-intFade:] *= arrRamp[::-1]
+	return numpy.repeat(arrTone[:, None], objInfo.intChannels, axis=1)
+
+def JoinWindows(lstWindows, strOutputPath, strIndexPath=None, intBlockFrames=conBlockFrames):
+	#write strOutputPath as the windows' WAVs with a tone between each one - they have to be in
+	#	the same format.  The index (the windows' spots and where they are in the preview and the
+	#	show) is written to strIndexPath as JSON and returned
+	if numpy is None:
+		raise PreviewError("NumPy isn't installed")
+	if not lstWindows:
+		raise PreviewError("there are no spots to preview")
+	lstInfos = []
+	for objWindow in lstWindows:
+		try:
+			lstInfos.append(WavInfo.ReadWavInfo(objWindow.strPath))
+		except (OSError, WavInfo.WavError) as objError:
+			raise PreviewError("unable to read %s (%s)" % (objWindow.strPath, objError))
+	objInfo = lstInfos[0]
+	for objWindow, objWindowInfo in zip(lstWindows, lstInfos):
+		if (objWindowInfo.intFormat, objWindowInfo.intChannels, objWindowInfo.intSampleRate, objWindowInfo.intBitsPerSample) != (objInfo.intFormat, objInfo.intChannels, objInfo.intSampleRate, objInfo.intBitsPerSample):
+			raise PreviewError("%s isn't in the same format as the other windows" % objWindow.strPath)
+
+	intToneFrames = int(round(conToneSeconds * objInfo.intSampleRate))
+	bytTone = StationMix.FromFloat(Tone(objInfo, intToneFrames), objInfo)
+	intFrames = sum(objWindowInfo.intFrames for objWindowInfo in lstInfos) + intToneFrames * (len(lstWindows) - 1)
+	lstIndex = []
+	intPosition = 0
+	strTempPath = strOutputPath + ".joining"
+	with open(strTempPath, "wb") as fOutFile:
+		fOutFile.write(WavInfo.WavHeader(objInfo, intFrames))
+		for intWindow, (objWindow, objWindowInfo) in enumerate(zip(lstWindows, lstInfos)):
+			if intWindow:
+				fOutFile.write(bytTone)
+				intPosition += intToneFrames
+			lstIndex.append({"spots": objWindow.lstNames, "preview": round(intPosition / float(objInfo.intSampleRate), 3),
+				"show": [round(objWindow.fltStart, 3), round(objWindow.fltEnd, 3)]})
+			arrSamples = StationMix.MapSamples(objWindow.strPath, objWindowInfo)
+			try:
+				for intFrom in range(0, objWindowInfo.intFrames, intBlockFrames):
+					fOutFile.write(arrSamples[intFrom:intFrom + intBlockFrames].tobytes())
+			finally:
+				#the file stays open as long as it's mapped
+				del arrSamples
+			intPosition += objWindowInfo.intFrames
+		if (intFrames * objInfo.intBlockAlign) & 1:
+			fOutFile.write(b"\x00")
+	os.replace(strTempPath, strOutputPath)
+
+	if strIndexPath:
+		with open(strIndexPath, "w") as fIndex:
+			json.dump({"file": strOutputPath, "windows": lstIndex}, fIndex, indent=1)
+	return lstIndex
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (SpotSampler.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Random spot selection used by RenderShow.py
+#
+#SpotListingCache keeps the list of WAVs in each station's random spots folder between
+#runs and only lists a folder again when its modified time changes (adding, removing or
+#renaming a file changes it).
+#
+#PickSpots() chooses the random spots for a station in one pass instead of drawing until it
+#finds one that hasn't been used yet.  Spots that haven't aired for the longest time are
+#preferred, so listeners don't hear the same spots two weeks in a row - RotationHistory
+#remembers which spots each station aired in its last shows.  Running the same show again
+#doesn't count as airing its spots twice, and only the shows that aired before it are
+#counted, so a seeded re-run of an older show picks the same spots it did the first time.
+#
+
+import os
+import json
+import time
+import heapq
+import threading
+
+conListingFilename = "listings.json"
+conRotationFolder = "rotation"
+conHistoryShows = 52 #shows remembered for each station
+
+class SpotListingCache:
+	def __init__(self, strCachePath=None):
+		#strCachePath is the folder the listings are kept in - None keeps them in memory only
+		self.strIndexPath = os.path.join(strCachePath, conListingFilename) if strCachePath else None
+		self.dictIndex = {}
+		self.blnDirty = False
+		self.objLock = threading.Lock()
+		if self.strIndexPath:
+			try:
+				with open(self.strIndexPath, "r") as fIndex:
+					self.dictIndex = json.load(fIndex)
+			except (OSError, ValueError):
+				self.dictIndex = {}
+
+	def List(self, strFolder, strExt=".wav"):
+		#sorted names of the files in strFolder with the extension (any case)
+		strKey = os.path.normcase(os.path.abspath(strFolder)) + "|" + strExt.lower()
+		intModified = os.stat(strFolder).st_mtime_ns
+		with self.objLock:
+			lstEntry = self.dictIndex.get(strKey)
+			if lstEntry and lstEntry[0] == intModified:
+				return list(lstEntry[1])
+
+		with os.scandir(strFolder) as iterEntries:
+			lstFiles = sorted(objEntry.name for objEntry in iterEntries if objEntry.name.lower().endswith(strExt.lower()) and objEntry.is_file())
+		with self.objLock:
+			self.dictIndex[strKey] = [intModified, lstFiles]
+			self.blnDirty = True
+		return list(lstFiles)
+
+	def Save(self):
+		if not self.strIndexPath or not self.blnDirty:
+			return
+		with self.objLock:
+			os.makedirs(os.path.dirname(self.strIndexPath), exist_ok=True)
+			strTempPath = self.strIndexPath + ".tmp"
+			with open(strTempPath, "w") as fIndex:
+				json.dump(self.dictIndex, fIndex)
+			os.replace(strTempPath, self.strIndexPath)
+			self.blnDirty = False
+
+class RotationHistory:
+	#{station: {show: [time first aired, [spot file names]]}} - one file per station
+	def __init__(self, strCachePath=None):
+		self.strFolder = os.path.join(strCachePath, conRotationFolder) if strCachePath else None
+		self.dictStations = {}
+		self.setDirty = set()
+
+	def Shows(self, strStation):
+		if strStation not in self.dictStations:
+			dictShows = {}
+			if self.strFolder:
+				try:
+					with open(os.path.join(self.strFolder, strStation + ".json"), "r") as fHistory:
+						dictShows = json.load(fHistory)
+				except (OSError, ValueError):
+					dictShows = {}
+			self.dictStations[strStation] = dictShows
+		return self.dictStations[strStation]
+
+	def LastAired(self, strStation, strShow):
+		#{spot file name: when it last aired} for the shows that aired before strShow - a show that's
+		#	run again sees the history as it was the first time, not the shows recorded after it
+		dictShows = self.Shows(strStation)
+		fltBefore = dictShows[strShow][0] if strShow in dictShows else float("inf")
+		dictLastAired = {}
+		for strAiredShow, (fltTime, lstFiles) in dictShows.items():
+			if strAiredShow == strShow or fltTime >= fltBefore:
+				continue
+			for strFile in lstFiles:
+				dictLastAired[strFile] = max(dictLastAired.get(strFile, 0.0), fltTime)
+		return dictLastAired
+
+	def Record(self, strStation, strShow, lstFiles):
+		dictShows = self.Shows(strStation)
+		fltTime = dictShows[strShow][0] if strShow in dictShows else time.time()
+		dictShows[strShow] = [fltTime, sorted(lstFiles)]
+		#only the most recent shows are kept
+		for strOldShow in sorted(dictShows, key=lambda strKey: dictShows[strKey][0])[:-conHistoryShows]:
+			del dictShows[strOldShow]
+		self.setDirty.add(strStation)
+
+	def Save(self):
+		if not self.strFolder:
+			return
+		for strStation in self.setDirty:
+			os.makedirs(self.strFolder, exist_ok=True)
+			strPath = os.path.join(self.strFolder, strStation + ".json")
+			with open(strPath + ".tmp", "w") as fHistory:
+				json.dump(self.dictStations[strStation], fHistory)
+			os.replace(strPath + ".tmp", strPath)
+		self.setDirty.clear()
+
+def PickSpots(lstFiles, intCount, dictLastAired, objRandom):
+	#intCount different files, the ones that aired longest ago (or never) first - ties are
+	#	broken randomly and the picks are returned in random order
+	lstPicks = [strFile for _, _, strFile in heapq.nsmallest(intCount, ((dictLastAired.get(strFile, 0.0), objRandom.random(), strFile) for strFile in lstFiles))]
+	objRandom.shuffle(lstPicks)
+	return lstPicks
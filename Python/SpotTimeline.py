@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (SpotTimeline.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Spot placement checks used by ShowPlanner.py
+#
+#A station's WAV is rarely the same length as the template's spot, so once it's moved to its
+#marker (or ended at the marker for -e spots) it can run into the next spot or leave dead air
+#between spots that were back to back in the template.  SpotTimeline sorts a station's placed
+#spots once and finds both in a single pass over them, so it stays fast with thousands of
+#spots.
+#
+#The program material on the other tracks stays where it is in every station.  Those ITEMs are
+#put in the timeline as fixed spans, and Collisions() finds every spot that runs into one of
+#them in the same kind of single pass.
+#
+#Spots that touch in the master project are "chained".  Ripple() works out new positions that
+#start every chained spot right where the one before it ends and push any spot that would
+#overlap the one before it later, which in turn pushes the spots after it.
+#
+
+conTouchTolerance = 0.01 #seconds - spots closer than this count as touching
+
+class TimelineSpan:
+	__slots__ = ("fltStart", "fltEnd", "keySpan")
+
+	def __init__(self, fltStart, fltEnd, keySpan):
+		self.fltStart = fltStart
+		self.fltEnd = fltEnd
+		self.keySpan = keySpan #identifies the spot - the same key is used for the template and the stations
+
+def SortedSpans(lstSpans):
+	return sorted(lstSpans, key=lambda objSpan: (objSpan.fltStart, objSpan.fltEnd))
+
+def Chains(lstSpans, fltTolerance=conTouchTolerance):
+	#(key, key) pairs of spans that follow each other without a gap or an overlap
+	lstSorted = SortedSpans(lstSpans)
+	return {(objSpan.keySpan, objNext.keySpan) for objSpan, objNext in zip(lstSorted, lstSorted[1:]) if abs(objNext.fltStart - objSpan.fltEnd) <= fltTolerance}
+
+class SpotTimeline:
+	def __init__(self, lstSpans, lstFixedSpans=(), fltTolerance=conTouchTolerance):
+		self.lstSpans = SortedSpans(lstSpans)
+		self.lstFixedSpans = SortedSpans(lstFixedSpans) #never moved, and only checked against the spans
+		self.fltTolerance = fltTolerance
+
+	def Overlaps(self):
+		#(earlier key, later key, seconds) for every span that starts before an earlier one has
+		#	ended - it's compared with the earlier span that runs the longest
+		lstOverlaps = []
+		objLongest = None
+		for objSpan in self.lstSpans:
+			if objLongest is not None and objSpan.fltStart < objLongest.fltEnd - self.fltTolerance:
+				lstOverlaps.append((objLongest.keySpan, objSpan.keySpan, min(objLongest.fltEnd, objSpan.fltEnd) - objSpan.fltStart))
+			if objLongest is None or objSpan.fltEnd > objLongest.fltEnd:
+				objLongest = objSpan
+		return lstOverlaps
+
+	def Collisions(self):
+		#(key, fixed key, seconds) for every span that overlaps a fixed span - both are walked in
+		#	start order, keeping the ones of each kind that haven't ended yet
+		lstCollisions = []
+		lstOpenSpans = []
+		lstOpenFixed = []
+		intFixed = 0
+		for objSpan in self.lstSpans + [None]:
+			while intFixed < len(self.lstFixedSpans) and (objSpan is None or self.lstFixedSpans[intFixed].fltStart < objSpan.fltStart):
+				objFixed = self.lstFixedSpans[intFixed]
+				intFixed += 1
+				lstOpenSpans = [objOpen for objOpen in lstOpenSpans if objOpen.fltEnd > objFixed.fltStart + self.fltTolerance]
+				lstCollisions.extend((objOpen.keySpan, objFixed.keySpan, min(objOpen.fltEnd, objFixed.fltEnd) - objFixed.fltStart) for objOpen in lstOpenSpans)
+				lstOpenFixed.append(objFixed)
+			if objSpan is None:
+				break
+			lstOpenFixed = [objOpen for objOpen in lstOpenFixed if objOpen.fltEnd > objSpan.fltStart + self.fltTolerance]
+			lstCollisions.extend((objSpan.keySpan, objOpen.keySpan, min(objOpen.fltEnd, objSpan.fltEnd) - objSpan.fltStart) for objOpen in lstOpenFixed)
+			lstOpenSpans.append(objSpan)
+		return [tupCollision for tupCollision in lstCollisions if tupCollision[2] > self.fltTolerance]
+
+	def Gaps(self, setChains):
+		#(key, key, seconds) for chained spans that don't touch anymore, in time order
+		dictSpans = {objSpan.keySpan: objSpan for objSpan in self.lstSpans}
+		lstGaps = []
+		for keySpan, keyNext in setChains:
+			if keySpan in dictSpans and keyNext in dictSpans:
+				fltGap = dictSpans[keyNext].fltStart - dictSpans[keySpan].fltEnd
+				if fltGap > self.fltTolerance:
+					lstGaps.append((dictSpans[keySpan].fltEnd, keySpan, keyNext, fltGap))
+		return [tupGap[1:] for tupGap in sorted(lstGaps, key=lambda tupGap: tupGap[0])]
+
+	def Ripple(self, setChains):
+		#{key: new start} for the spans that have to move so chained spans touch and nothing overlaps
+		dictStarts = {}
+		fltEnd = None
+		keyPrevious = None
+		for objSpan in self.lstSpans:
+			fltStart = objSpan.fltStart
+			if fltEnd is not None and ((keyPrevious, objSpan.keySpan) in setChains or fltStart < fltEnd - self.fltTolerance):
+				fltStart = fltEnd
+			if fltStart != objSpan.fltStart:
+				dictStarts[objSpan.keySpan] = fltStart
+			fltEnd = fltStart + (objSpan.fltEnd - objSpan.fltStart) if fltEnd is None else max(fltEnd, fltStart + (objSpan.fltEnd - objSpan.fltStart))
+			keyPrevious = objSpan.keySpan
+		return dictStarts
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (StationMix.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Station mixing used by RenderShow.py
+#
+#Only the Station VT track differs between stations, so with --stationmix Reaper renders the
+#show once with that track muted (the common mix) and each station's output is built by
+#streaming the common mix and adding the station's spots where the station project puts
+#them.  The common mix and the spots are memory mapped and mixed a block at a time with
+#NumPy, so memory use doesn't grow with the length of the show, and blocks without a spot
+#are copied straight through.
+#
+#This only matches a Reaper render when nothing happens to the Station VT track after its
+#items are added up, so TrackGain() and ItemMix() raise MixError for anything the mixer
+#can't reproduce (FX or envelopes on the station track, a folder it's in or the master, take FX
+#or envelopes on a spot, panning, play rate, curved fades) and MixStation() raises it for spots
+#in a different sample rate - RenderShow.py renders those stations with Reaper instead.
+#
+
+import os
+import shlex
+import subprocess
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+import WavInfo
+
+conBlockFrames = 65536 #frames mixed at a time
+
+#envelopes that change what's heard of a track, the master or a take
+conTrackEnvelopes = ("VOLENV", "VOLENV2", "VOLENV3", "PANENV", "PANENV2", "MUTEENV")
+conMasterEnvelopes = ("MASTERVOLENV", "MASTERVOLENV2", "MASTERPANENV", "MASTERPANENV2")
+conTakeEnvelopes = ("VOLENV", "PANENV", "MUTEENV", "PITCHENV")
+
+class MixError(Exception):
+	pass
+
+class MixSpot:
+	__slots__ = ("strPath", "fltPosition", "fltGain", "fltOffset", "fltFadeIn", "fltFadeOut")
+
+	def __init__(self, strPath, fltPosition, fltGain=1.0, fltOffset=0.0, fltFadeIn=0.0, fltFadeOut=0.0):
+		self.strPath = strPath
+		self.fltPosition = fltPosition #seconds from the start of the show
+		self.fltGain = fltGain #linear
+		self.fltOffset = fltOffset #seconds skipped at the start of the WAV
+		self.fltFadeIn = fltFadeIn
+		self.fltFadeOut = fltFadeOut
+
+def ElementValue(objProject, objChunk, strKeyword, intIndex, fltDefault):
+	#one numeric value of an element - fltDefault if the element or value isn't there
+	intLine = objChunk.FindElement(strKeyword)
+	if intLine < 0:
+		return fltDefault
+	lstValues = objProject.lstLines[intLine].split()
+	try:
+		return float(lstValues[intIndex + 1])
+	except (IndexError, ValueError):
+		return fltDefault
+
+def HasFX(objChunk, strKeyword):
+	#an FX chunk with at least one plug-in in it
+	objFX = objChunk.FindChunk(strKeyword)
+	return objFX is not None and len(objFX.lstChildren) > 0
+
+def HasEnvelope(objProject, objChunk, lstKeywords):
+	#an active envelope with points in it - envelopes are kept as opaque lines, so their ACT
+	#	and PT lines are looked at directly
+	for objEnvelope in objChunk.lstChildren:
+		if objEnvelope.strKeyword not in lstKeywords:
+			continue
+		blnActive = True
+		blnPoints = False
+		for strLine in objProject.lstLines[objEnvelope.intLine + 1:objEnvelope.intEndLine]:
+			lstValues = strLine.split()
+			if lstValues[:1] == ["ACT"]:
+				blnActive = lstValues[1:2] != ["0"]
+			elif lstValues[:1] == ["PT"]:
+				blnPoints = True
+		if blnActive and blnPoints:
+			return True
+	return False
+
+def FolderParents(objProject, objTrack):
+	#the folder tracks objTrack is in, outermost first - the second ISBUS value is how many
+	#	folders a track opens (1) or closes (-1, -2...)
+	lstParents = []
+	for objOther in objProject.lstTracks:
+		if objOther is objTrack:
+			return lstParents
+		intDepth = int(ElementValue(objProject, objOther, "ISBUS", 1, 0.0))
+		if intDepth > 0:
+			lstParents.append(objOther)
+		elif intDepth < 0:
+			del lstParents[max(0, len(lstParents) + intDepth):]
+	return []
+
+def TrackGain(objProject):
+	#gain applied to everything on the Station VT track on its way to the master
+	objTrack = objProject.objStationTrack
+	if objTrack is None:
+		raise MixError("there's no station track")
+	if HasFX(objProject.objRoot, "MASTERFXLIST"):
+		raise MixError("the master track has FX")
+	if HasEnvelope(objProject, objProject.objRoot, conMasterEnvelopes):
+		raise MixError("the master track has a volume or pan envelope")
+	if HasFX(objTrack, "FXCHAIN"):
+		raise MixError("the station track has FX")
+	if HasEnvelope(objProject, objTrack, conTrackEnvelopes):
+		raise MixError("the station track has a volume, pan or mute envelope")
+	for objParent in FolderParents(objProject, objTrack):
+		#the folder's FX and fader apply to the station track's audio too
+		if HasFX(objParent, "FXCHAIN"):
+			raise MixError("the station track's folder %s has FX" % objParent.strName)
+		if HasEnvelope(objProject, objParent, conTrackEnvelopes):
+			raise MixError("the station track's folder %s has a volume, pan or mute envelope" % objParent.strName)
+		if ElementValue(objProject, objParent, "VOLPAN", 0, 1.0) != 1.0 or ElementValue(objProject, objParent, "VOLPAN", 1, 0.0) != 0.0 or \
+			ElementValue(objProject, objParent, "MUTESOLO", 0, 0.0) != 0.0:
+			raise MixError("the station track's folder %s changes its volume" % objParent.strName)
+	if objTrack.FindElement("MUTESOLO") < 0:
+		raise MixError("the station track has no MUTESOLO element to mute it with")
+	if ElementValue(objProject, objTrack, "VOLPAN", 1, 0.0) != 0.0 or ElementValue(objProject, objProject.objRoot, "MASTER_VOLUME", 1, 0.0) != 0.0:
+		raise MixError("the station track or the master is panned")
+	if ElementValue(objProject, objTrack, "MUTESOLO", 0, 0.0) != 0.0 or ElementValue(objProject, objTrack, "MAINSEND", 0, 1.0) == 0.0:
+		#muted or not sent to the master - the station track isn't heard at all
+		return 0.0
+	return ElementValue(objProject, objTrack, "VOLPAN", 0, 1.0) * ElementValue(objProject, objProject.objRoot, "MASTER_VOLUME", 0, 1.0)
+
+def ItemMix(objProject, objItem):
+	#(gain, offset, fade in, fade out) of a spot ITEM - these don't change between stations
+	if ElementValue(objProject, objItem, "VOLPAN", 1, 0.0) != 0.0 or ElementValue(objProject, objItem, "TAKEVOLPAN", 0, 0.0) != 0.0:
+		raise MixError("%s is panned" % objItem.strName)
+	if ElementValue(objProject, objItem, "PLAYRATE", 0, 1.0) != 1.0:
+		raise MixError("%s doesn't play at its normal rate" % objItem.strName)
+	if HasFX(objItem, "TAKEFX"):
+		raise MixError("%s has take FX" % objItem.strName)
+	if HasEnvelope(objProject, objItem, conTakeEnvelopes):
+		raise MixError("%s has a take envelope" % objItem.strName)
+	lstFades = []
+	for strKeyword in ("FADEIN", "FADEOUT"):
+		#shape, length and automatic fade length - only linear fades are reproduced
+		fltLength = max(ElementValue(objProject, objItem, strKeyword, 1, 0.0), ElementValue(objProject, objItem, strKeyword, 2, 0.0))
+		if fltLength > 0.0 and ElementValue(objProject, objItem, strKeyword, 0, 0.0) != 0.0:
+			raise MixError("%s has a curved fade" % objItem.strName)
+		lstFades.append(fltLength)
+	fltGain = ElementValue(objProject, objItem, "VOLPAN", 0, 1.0) * ElementValue(objProject, objItem, "TAKEVOLPAN", 1, 1.0)
+	if ElementValue(objProject, objItem, "MUTE", 0, 0.0) != 0.0:
+		fltGain = 0.0
+	return (fltGain, ElementValue(objProject, objItem, "SOFFS", 0, 0.0), lstFades[0], lstFades[1])
+
+def MapSamples(strPath, objInfo):
+	#the samples of a WAV as a read-only (frames, channels) array - 24-bit files have an extra
+	#	axis for the three bytes of each sample
+	intBytes = objInfo.intBitsPerSample // 8
+	if objInfo.blnFloat:
+		strType = {4: "<f4", 8: "<f8"}.get(intBytes)
+	elif objInfo.intFormat == WavInfo.WaveFormatPCM:
+		strType = {1: "u1", 2: "<i2", 3: "u1", 4: "<i4"}.get(intBytes)
+	else:
+		strType = None
+	if strType is None or objInfo.intBitsPerSample % 8 or objInfo.intBlockAlign != intBytes * objInfo.intChannels:
+		raise MixError("%s is in a WAV format that can't be mixed" % strPath)
+	tupShape = (objInfo.intFrames, objInfo.intChannels, 3) if intBytes == 3 else (objInfo.intFrames, objInfo.intChannels)
+	if objInfo.intFrames == 0:
+		return numpy.zeros(tupShape, strType)
+	return numpy.memmap(strPath, strType, "r", offset=objInfo.intDataOffset, shape=tupShape)
+
+def ToFloat(arrSamples, objInfo):
+	if objInfo.blnFloat:
+		return arrSamples.astype(numpy.float64)
+	intBits = objInfo.intBitsPerSample
+	if intBits == 8:
+		return (arrSamples.astype(numpy.float64) - 128.0) / 128.0
+	if intBits == 24:
+		arrBytes = arrSamples.astype(numpy.int32)
+		arrSamples = arrBytes[..., 0] | (arrBytes[..., 1] << 8) | (arrBytes[..., 2] << 16)
+		arrSamples = (arrSamples ^ 0x800000) - 0x800000
+	return arrSamples.astype(numpy.float64) / float(1 << (intBits - 1))
+
+def FromFloat(arrBlock, objInfo):
+	#sample bytes for a block of floats in objInfo's format
+	if objInfo.blnFloat:
+		return arrBlock.astype("<f%i" % (objInfo.intBitsPerSample // 8)).tobytes()
+	intBits = objInfo.intBitsPerSample
+	fltScale = float(1 << (intBits - 1))
+	arrSamples = numpy.clip(numpy.round(arrBlock * fltScale), -fltScale, fltScale - 1).astype(numpy.int64)
+	if intBits == 8:
+		return (arrSamples + 128).astype("u1").tobytes()
+	if intBits == 24:
+		return arrSamples.astype("<i4").view("u1").reshape(arrSamples.shape + (4,))[..., :3].tobytes()
+	return arrSamples.astype("<i%i" % (intBits // 8)).tobytes()
+
+def MixStation(strCommonPath, lstSpots, strOutputPath, intBlockFrames=conBlockFrames, fltStart=0.0, fltEnd=None, intBitsPerSample=None):
+	#write strOutputPath as the common mix with the spots added - the output runs until the
+	#	common mix or the last spot ends, whichever is later.  fltStart and fltEnd (seconds) mix
+	#	only that part of the show.  The output is intBitsPerSample PCM, or in the common mix's
+	#	format if that's None - a common mix with more bits than the output keeps the spots
+	#	from being added to audio that's already been rounded to the output's bits
+	if numpy is None:
+		raise MixError("NumPy isn't installed")
+	objCommon = WavInfo.ReadWavInfo(strCommonPath)
+	arrCommon = MapSamples(strCommonPath, objCommon)
+	intRate = objCommon.intSampleRate
+	objOutput = objCommon
+	if intBitsPerSample is not None and (objCommon.blnFloat or intBitsPerSample != objCommon.intBitsPerSample):
+		objOutput = WavInfo.WavInfo(WavInfo.WaveFormatPCM, objCommon.intChannels, intRate, intBitsPerSample, objCommon.intChannels * intBitsPerSample // 8)
+
+	#(first frame, end frame, frames skipped in the WAV, samples, WAV info, spot)
+	lstSources = []
+	for objSpot in lstSpots:
+		if objSpot.fltGain == 0.0:
+			continue
+		objInfo = WavInfo.ReadWavInfo(objSpot.strPath)
+		if objInfo.intSampleRate != intRate:
+			raise MixError("%s is %i Hz but the show is %i Hz" % (os.path.basename(objSpot.strPath), objInfo.intSampleRate, intRate))
+		if objInfo.intChannels not in (1, objCommon.intChannels):
+			raise MixError("%s has %i channels but the show has %i" % (os.path.basename(objSpot.strPath), objInfo.intChannels, objCommon.intChannels))
+		intStart = int(round(objSpot.fltPosition * intRate))
+		intSkip = int(round(objSpot.fltOffset * intRate))
+		if intStart < 0:
+			intSkip -= intStart
+			intStart = 0
+		intFrames = objInfo.intFrames - intSkip
+		if intFrames > 0:
+			lstSources.append((intStart, intStart + intFrames, intSkip, MapSamples(objSpot.strPath, objInfo), objInfo, objSpot))
+
+	intFrames = max([objCommon.intFrames] + [tupSource[1] for tupSource in lstSources])
+	intFirstFrame = max(0, int(round(fltStart * intRate)))
+	if fltEnd is not None:
+		intFrames = int(round(fltEnd * intRate))
+	intFrames = max(intFrames, intFirstFrame)
+	strTempPath = strOutputPath + ".mixing"
+	with open(strTempPath, "wb") as fOutFile:
+		fOutFile.write(WavInfo.WavHeader(objOutput, intFrames - intFirstFrame))
+		for intStart in range(intFirstFrame, intFrames, intBlockFrames):
+			intEnd = min(intStart + intBlockFrames, intFrames)
+			intCommonEnd = max(intStart, min(intEnd, objCommon.intFrames))
+			lstActive = [tupSource for tupSource in lstSources if tupSource[0] < intEnd and tupSource[1] > intStart]
+			if not lstActive:
+				#nothing to add - copy the common mix as it is (and silence past its end)
+				if objOutput is objCommon:
+					fOutFile.write(arrCommon[intStart:intCommonEnd].tobytes())
+				else:
+					fOutFile.write(FromFloat(ToFloat(arrCommon[intStart:intCommonEnd], objCommon), objOutput))
+				fOutFile.write(bytes((intEnd - intCommonEnd) * objOutput.intBlockAlign))
+				continue
+
+			arrBlock = numpy.zeros((intEnd - intStart, objCommon.intChannels))
+			arrBlock[:intCommonEnd - intStart] = ToFloat(arrCommon[intStart:intCommonEnd], objCommon)
+			for intSpotStart, intSpotEnd, intSkip, arrSamples, objInfo, objSpot in lstActive:
+				intFrom = max(intStart, intSpotStart)
+				intTo = min(intEnd, intSpotEnd)
+				arrSpot = ToFloat(arrSamples[intSkip + intFrom - intSpotStart:intSkip + intTo - intSpotStart], objInfo) * objSpot.fltGain
+				if objSpot.fltFadeIn > 0.0 or objSpot.fltFadeOut > 0.0:
+					#linear fades, measured in frames from the start and end of the spot
+					arrFrame = numpy.arange(intFrom - intSpotStart, intTo - intSpotStart, dtype=numpy.float64)
+					arrEnvelope = numpy.ones(len(arrFrame))
+					if objSpot.fltFadeIn > 0.0:
+						arrEnvelope = numpy.minimum(arrEnvelope, arrFrame / (objSpot.fltFadeIn * intRate))
+					if objSpot.fltFadeOut > 0.0:
+						arrEnvelope = numpy.minimum(arrEnvelope, (intSpotEnd - intSpotStart - arrFrame) / (objSpot.fltFadeOut * intRate))
+					arrSpot *= arrEnvelope[:, None]
+				#mono spots are added to every channel
+				arrBlock[intFrom - intStart:intTo - intStart] += arrSpot
+			fOutFile.write(FromFloat(arrBlock, objOutput))
+
+		if ((intFrames - intFirstFrame) * objOutput.intBlockAlign) & 1:
+			fOutFile.write(b"\x00")
+	os.replace(strTempPath, strOutputPath)
+
+def EncodeFile(strCommandTemplate, strInputPath, strOutputPath, intBitrate=320):
+	#run an encoder command - {input} and {output} are replaced with the paths and {bitrate} with
+	#	the MP3 bitrate in kbps
+	lstCommand = [strToken.format(input=strInputPath, output=strOutputPath, bitrate=intBitrate) for strToken in shlex.split(strCommandTemplate)]
+	try:
+		objResult = subprocess.run(lstCommand, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+	except OSError as objError:
+		raise MixError("unable to start the encoder (%s)" % objError)
+	if objResult.returncode != 0 or not os.path.exists(strOutputPath):
+		raise MixError("encoder exited with code %i" % objResult.returncode)
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (Tracing.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Per-phase tracing used by RenderShow.py
+#
+#Spans are recorded for every phase and station of a run (parsing, WAV probing, staging,
+#Reaper renders, tagging...) along with counts such as files and bytes copied or render
+#attempts.  The trace is written in the Chrome trace event format, so it can be opened
+#in Perfetto (ui.perfetto.dev) or chrome://tracing, and a short text summary of the
+#slowest stations and phases is printed at the end of the run.
+#
+#The run history only needs how long each phase took, so without tracing the script uses
+#PhaseTimer, which keeps a count and a total per phase instead of every span, and NullTracer,
+#which records nothing, when the run history is off too.  TakePhases() hands the totals over
+#and starts them again for the next run (every pass of --watch is its own run).
+#
+
+import os
+import json
+import time
+import threading
+import contextlib
+
+class PhaseTimer:
+	def __init__(self):
+		self.dictPhases = {}
+		self.objLock = threading.Lock()
+
+	def Begin(self, strName, strCategory="phase", **dictArgs):
+		#start a span that's ended with End() - for spans that don't fit in a with block
+		return (strName, strCategory, dictArgs, time.perf_counter())
+
+	def End(self, tupSpan):
+		fltSeconds = time.perf_counter() - tupSpan[3]
+		with self.objLock:
+			lstPhase = self.dictPhases.setdefault(tupSpan[0], [0, 0.0])
+			lstPhase[0] += 1
+			lstPhase[1] += fltSeconds
+		return fltSeconds
+
+	@contextlib.contextmanager
+	def Span(self, strName, strCategory="phase", **dictArgs):
+		#dictArgs is yielded so the caller can add counts that are only known at the end
+		tupSpan = self.Begin(strName, strCategory, **dictArgs)
+		try:
+			yield tupSpan[2]
+		finally:
+			self.End(tupSpan)
+
+	def TakePhases(self):
+		#{span name: [count, seconds]} since the last call
+		with self.objLock:
+			dictPhases, self.dictPhases = self.dictPhases, {}
+		return dictPhases
+
+	def Write(self, strPath):
+		pass
+
+	def Summary(self, intTop=5):
+		return ""
+
+class Tracer(PhaseTimer):
+	def __init__(self):
+		PhaseTimer.__init__(self)
+		self.fltStart = time.perf_counter()
+		self.intPid = os.getpid()
+		self.lstEvents = []
+		self.dictThreadNames = {}
+
+	def End(self, tupSpan):
+		strName, strCategory, dictArgs, fltStart = tupSpan
+		fltSeconds = PhaseTimer.End(self, tupSpan)
+		objThread = threading.current_thread()
+		with self.objLock:
+			self.dictThreadNames.setdefault(objThread.ident, objThread.name)
+			self.lstEvents.append({
+				"name": strName,
+				"cat": strCategory,
+				"ph": "X",
+				"ts": round((fltStart - self.fltStart) * 1000000, 1),
+				"dur": round(fltSeconds * 1000000, 1),
+				"pid": self.intPid,
+				"tid": objThread.ident,
+				"args": dictArgs,
+			})
+
+	def Write(self, strPath):
+		with self.objLock:
+			lstEvents = [{"name": "thread_name", "ph": "M", "pid": self.intPid, "tid": intThread, "args": {"name": strName}} for intThread, strName in self.dictThreadNames.items()]
+			lstEvents.extend(self.lstEvents)
+		with open(strPath, "w") as fTrace:
+			json.dump({"traceEvents": lstEvents, "displayTimeUnit": "ms"}, fTrace, default=str)
+
+	def Phases(self):
+		#{span name: [count, seconds]} over the whole run
+		dictPhases = {}
+		with self.objLock:
+			for dictEvent in self.lstEvents:
+				lstPhase = dictPhases.setdefault(dictEvent["name"], [0, 0.0])
+				lstPhase[0] += 1
+				lstPhase[1] += dictEvent["dur"] / 1000000.0
+		return dictPhases
+
+	def Summary(self, intTop=5):
+		#the slowest stations (everything recorded for a station added up) and the phases that
+		#	took the most time over the whole run
+		dictStations = {}
+		with self.objLock:
+			for dictEvent in self.lstEvents:
+				strStation = dictEvent["args"].get("station")
+				if strStation and dictEvent["cat"] == "station":
+					dictStations[strStation] = dictStations.get(strStation, 0.0) + dictEvent["dur"] / 1000000.0
+		dictPhases = self.Phases()
+
+		lstLines = ["Slowest stations:"]
+		for strStation, fltSeconds in sorted(dictStations.items(), key=lambda tupItem: -tupItem[1])[:intTop]:
+			lstLines.append(" %-20s %8.2f sec" % (strStation, fltSeconds))
+		lstLines.append("Slowest phases:")
+		for strPhase, (intCount, fltSeconds) in sorted(dictPhases.items(), key=lambda tupItem: -tupItem[1][1])[:intTop * 2]:
+			lstLines.append(" %-20s %8.2f sec (%i)" % (strPhase, fltSeconds, intCount))
+		return "\n".join(lstLines)
+
+class NullTracer:
+	def Begin(self, strName, strCategory="phase", **dictArgs):
+		return dictArgs
+
+	def End(self, tupSpan):
+		pass
+
+	@contextlib.contextmanager
+	def Span(self, strName, strCategory="phase", **dictArgs):
+		yield dictArgs
+
+	def Write(self, strPath):
+		pass
+
+	def TakePhases(self):
+		return {}
+
+	def Summary(self, intTop=5):
+		return ""
+
+objNullTracer = NullTracer()
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (WavInfo.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Header-only WAV reader used by RenderShow.py
+#
+#Python's wave module only understands plain 16-bit style PCM and reads through the file
+#to get there.  This reader walks the RIFF chunk headers (RIFF, RF64 and BW64, including
+#broadcast WAVs with bext/iXML chunks) and stops at the data chunk, so it never touches
+#any sample data.  WAVE_FORMAT_EXTENSIBLE and 32/64-bit float files are supported.
+#
+#WavHeader() builds the header for a new WAV file in the same format as an existing one.
+#
+#WavInfoCache keeps the results in a small on-disk index keyed by path, size and
+#modified time so the same spot is only ever looked at once.
+#
+
+import os
+import json
+import struct
+import threading
+
+WaveFormatPCM = 0x0001
+WaveFormatFloat = 0x0003
+WaveFormatExtensible = 0xFFFE
+
+conCacheFilename = "wavinfo.json"
+conSubFormatGuidTail = b"\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71" #everything in the KSDATAFORMAT_SUBTYPE GUID after the format
+
+class WavError(Exception):
+	pass
+
+class WavInfo:
+	__slots__ = ("intFormat", "intChannels", "intSampleRate", "intBitsPerSample", "intBlockAlign", "intDataOffset", "intDataSize", "intFrames")
+
+	def __init__(self, intFormat=0, intChannels=0, intSampleRate=0, intBitsPerSample=0, intBlockAlign=0, intDataOffset=0, intDataSize=0, intFrames=0):
+		self.intFormat = intFormat #the real format - the sub-format for WAVE_FORMAT_EXTENSIBLE files
+		self.intChannels = intChannels
+		self.intSampleRate = intSampleRate
+		self.intBitsPerSample = intBitsPerSample
+		self.intBlockAlign = intBlockAlign
+		self.intDataOffset = intDataOffset #file offset of the first sample
+		self.intDataSize = intDataSize
+		self.intFrames = intFrames
+
+	@property
+	def blnFloat(self):
+		return self.intFormat == WaveFormatFloat
+
+	@property
+	def fltDuration(self):
+		return self.intFrames / float(self.intSampleRate)
+
+	def ToList(self):
+		return [getattr(self, strName) for strName in self.__slots__]
+
+	@classmethod
+	def FromList(cls, lstValues):
+		return cls(*lstValues)
+
+def ReadWavInfo(strPath):
+	with open(strPath, "rb") as fWav:
+		intFileSize = os.fstat(fWav.fileno()).st_size
+		bytHeader = fWav.read(12)
+		if len(bytHeader) < 12 or bytHeader[8:12] != b"WAVE" or bytHeader[0:4] not in (b"RIFF", b"RF64", b"BW64"):
+			raise WavError("%s is not a WAV file" % strPath)
+		blnRF64 = bytHeader[0:4] != b"RIFF"
+
+		objInfo = None
+		intDS64DataSize = None
+		intPosition = 12
+		while intPosition + 8 <= intFileSize:
+			fWav.seek(intPosition)
+			bytChunkId, intChunkSize = struct.unpack("<4sI", fWav.read(8))
+
+			if bytChunkId == b"ds64":
+				#RF64 - the real 64-bit sizes live here, the 32-bit ones are set to 0xFFFFFFFF
+				_, intDS64DataSize = struct.unpack("<QQ", fWav.read(16))
+			elif bytChunkId == b"fmt ":
+				bytFmt = fWav.read(min(intChunkSize, 40))
+				if len(bytFmt) < 16:
+					raise WavError("%s has a damaged fmt chunk" % strPath)
+				intFormat, intChannels, intSampleRate, _, intBlockAlign, intBitsPerSample = struct.unpack("<HHIIHH", bytFmt[:16])
+				if intFormat == WaveFormatExtensible and len(bytFmt) >= 26:
+					#the first two bytes of the sub-format GUID are the actual format
+					intFormat = struct.unpack("<H", bytFmt[24:26])[0]
+				objInfo = WavInfo(intFormat, intChannels, intSampleRate, intBitsPerSample, intBlockAlign)
+			elif bytChunkId == b"data":
+				if objInfo is None:
+					raise WavError("%s has no fmt chunk before its data" % strPath)
+				intDataSize = intChunkSize
+				if blnRF64 and intChunkSize == 0xFFFFFFFF and intDS64DataSize is not None:
+					intDataSize = intDS64DataSize
+				#files that were never finalized (or got truncated) claim more data than they have
+				intDataSize = min(intDataSize, intFileSize - intPosition - 8)
+				if objInfo.intBlockAlign <= 0 or objInfo.intSampleRate <= 0:
+					raise WavError("%s has an invalid fmt chunk" % strPath)
+				objInfo.intDataOffset = intPosition + 8
+				objInfo.intDataSize = intDataSize
+				objInfo.intFrames = intDataSize // objInfo.intBlockAlign
+				return objInfo
+
+			#chunks are word aligned
+			intPosition += 8 + intChunkSize + (intChunkSize & 1)
+
+	raise WavError("%s has no data chunk" % strPath)
+
+def WavHeader(objInfo, intFrames):
+	#everything up to the first sample of a WAV holding intFrames frames in objInfo's format - the
+	#	file is written as RF64 once it's too big for the 32-bit RIFF sizes
+	intDataSize = intFrames * objInfo.intBlockAlign
+	intByteRate = objInfo.intSampleRate * objInfo.intBlockAlign
+	if objInfo.intChannels > 2 or (objInfo.intFormat == WaveFormatPCM and objInfo.intBitsPerSample > 16):
+		#more than two channels or more than 16 bits should be WAVE_FORMAT_EXTENSIBLE
+		intChannelMask = {1: 0x4, 2: 0x3}.get(objInfo.intChannels, 0)
+		bytFmt = struct.pack("<HHIIHHHHIH", WaveFormatExtensible, objInfo.intChannels, objInfo.intSampleRate, intByteRate, objInfo.intBlockAlign, objInfo.intBitsPerSample,
+			22, objInfo.intBitsPerSample, intChannelMask, objInfo.intFormat) + conSubFormatGuidTail
+	else:
+		bytFmt = struct.pack("<HHIIHH", objInfo.intFormat, objInfo.intChannels, objInfo.intSampleRate, intByteRate, objInfo.intBlockAlign, objInfo.intBitsPerSample)
+
+	intRiffSize = 4 + 8 + len(bytFmt) + 8 + intDataSize + (intDataSize & 1)
+	bytChunks = struct.pack("<4sI", b"fmt ", len(bytFmt)) + bytFmt
+	if intRiffSize + 36 > 0xFFFFFFFF:
+		bytDS64 = struct.pack("<4sIQQQI", b"ds64", 28, intRiffSize + 36, intDataSize, intFrames, 0)
+		return struct.pack("<4sI4s", b"RF64", 0xFFFFFFFF, b"WAVE") + bytDS64 + bytChunks + struct.pack("<4sI", b"data", 0xFFFFFFFF)
+	return struct.pack("<4sI4s", b"RIFF", intRiffSize, b"WAVE") + bytChunks + struct.pack("<4sI", b"data", intDataSize)
+
+class WavInfoCache:
+	def __init__(self, strCachePath=None):
+		#strCachePath is the folder the index is kept in - None keeps the index in memory only
+		self.strIndexPath = os.path.join(strCachePath, conCacheFilename) if strCachePath else None
+		self.dictIndex = {}
+		self.blnDirty = False
+		self.objLock = threading.Lock()
+		self.intHits = 0
+		self.intMisses = 0
+		if self.strIndexPath:
+			try:
+				with open(self.strIndexPath, "r") as fIndex:
+					self.dictIndex = json.load(fIndex)
+			except (OSError, ValueError):
+				self.dictIndex = {}
+
+	def Get(self, strPath):
+		strKey = os.path.normcase(os.path.abspath(strPath))
+		objStat = os.stat(strPath)
+		with self.objLock:
+			lstEntry = self.dictIndex.get(strKey)
+			if lstEntry and lstEntry[0] == objStat.st_size and lstEntry[1] == objStat.st_mtime_ns:
+				self.intHits += 1
+				return WavInfo.FromList(lstEntry[2])
+
+		objInfo = ReadWavInfo(strPath)
+		with self.objLock:
+			self.intMisses += 1
+			self.dictIndex[strKey] = [objStat.st_size, objStat.st_mtime_ns, objInfo.ToList()]
+			self.blnDirty = True
+		return objInfo
+
+	def Save(self):
+		if not self.strIndexPath or not self.blnDirty:
+			return
+		with self.objLock:
+			os.makedirs(os.path.dirname(self.strIndexPath), exist_ok=True)
+			strTempPath = self.strIndexPath + ".tmp"
+			with open(strTempPath, "w") as fIndex:
+				json.dump(self.dictIndex, fIndex)
+			os.replace(strTempPath, self.strIndexPath)
+			self.blnDirty = False
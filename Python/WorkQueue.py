@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (WorkQueue.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Shared folder render queue used by RenderShow.py
+#
+#With --queue the station renders aren't run here - each one is dropped into a queue folder as a
+#job, and any number of workers (this script, run on this machine or any other that can see
+#the folder) pick the jobs up, render them, check the render and publish it to the render
+#folder:
+#	python WorkQueue.py [queue folder] [--rendercommand command] [--renderpath path]
+#
+#A job is a folder holding the station project, the spots staged for it and job.json with
+#everything the worker needs.  The spots are referenced relative to the project, any other
+#relative FILE paths are made absolute, and the worker points RENDER_FILE at the job folder -
+#so the show's other media and the render folder have to be reachable from the workers at the
+#same paths (or --renderpath tells a worker where the render folder is from there).
+#
+#A worker claims a job by creating lease.1 - the file is created exclusively, so only one
+#worker can get it - and touches it every few seconds while it renders.  A lease that hasn't
+#been touched for the job's lease timeout belongs to a worker that died, and the job is claimed
+#again with lease.2 and so on.  The file server's clock is used to judge that (by touching a
+#file in the queue folder), so the machines' clocks don't need to agree.  A worker that finds
+#its job claimed again kills its render and leaves the job to the new one, and a job whose
+#workers keep dying is given up on.
+#
+#RenderShow waits for each job's result.json, so its retries, render checks and run history work
+#the same as when the stations are rendered here.
+#
+
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import socket
+import argparse
+import threading
+import subprocess
+
+import RenderScheduler
+import RenderWatchdog
+import RenderCache
+import AssetStaging
+import ReaPeaks
+
+conJobsFolder = "jobs"
+conClockFolder = "clock"
+conSpotsFolder = "spots" #folder in a job where its spots are kept
+conJobFilename = "job.json"
+conResultFilename = "result.json"
+conProjectFilename = "project.RPP"
+conLeasePrefix = "lease."
+conLeaseTimeout = 60.0 #seconds a lease lasts without a heartbeat
+conHeartbeats = 6 #heartbeats per lease timeout
+conMaxClaims = 3 #times a job is claimed before it's given up on
+conPollInterval = 1.0
+conStagingFolderName = "Audio\\Imported" #where the spots are staged next to the station projects
+
+def WriteJson(strPath, objValue):
+	#written under another name and renamed, so a reader never sees half of it
+	strTempPath = strPath + ".tmp"
+	with open(strTempPath, "w") as fJson:
+		json.dump(objValue, fJson, indent=1)
+	os.replace(strTempPath, strPath)
+
+def ReadJson(strPath):
+	#None if the file isn't there (yet)
+	try:
+		with open(strPath, "r") as fJson:
+			return json.load(fJson)
+	except (OSError, ValueError):
+		return None
+
+def CurrentClaim(strJobPath):
+	#the number of the job's latest lease - 0 if it's never been claimed
+	intClaim = 0
+	for strFileName in os.listdir(strJobPath):
+		if strFileName.startswith(conLeasePrefix) and strFileName[len(conLeasePrefix):].isdigit():
+			intClaim = max(intClaim, int(strFileName[len(conLeasePrefix):]))
+	return intClaim
+
+def LeasePath(strJobPath, intClaim):
+	return os.path.join(strJobPath, conLeasePrefix + str(intClaim))
+
+class Lease:
+	def __init__(self, strJobPath, intClaim):
+		self.strJobPath = strJobPath
+		self.intClaim = intClaim
+		self.blnLost = False
+
+	def Lost(self):
+		#another worker claimed the job again, or the lease is gone
+		return os.path.exists(LeasePath(self.strJobPath, self.intClaim + 1)) or not os.path.exists(LeasePath(self.strJobPath, self.intClaim))
+
+	def Heartbeat(self, objStop, fltInterval):
+		#runs on its own thread until objStop is set or the lease is lost
+		while not objStop.wait(fltInterval):
+			try:
+				if self.Lost():
+					self.blnLost = True
+					return
+				os.utime(LeasePath(self.strJobPath, self.intClaim))
+			except OSError:
+				self.blnLost = True
+				return
+
+class LeaseExecutor(RenderWatchdog.WatchdogExecutor):
+	#the render watchdog, which also kills the render when the job's lease is lost
+	objLease = None
+
+	def Check(self, objJob, fltStart, fltNow, intSize, fltLastGrowth):
+		if self.objLease is not None and self.objLease.blnLost:
+			return "the job was claimed by another worker"
+		return RenderWatchdog.WatchdogExecutor.Check(self, objJob, fltStart, fltNow, intSize, fltLastGrowth)
+
+class QueueExecutor:
+	#a RenderScheduler executor that puts the job in the queue and waits for a worker to finish it
+	def __init__(self, strQueuePath, strCommandTemplate, dictValues=None, fltStallTimeout=RenderWatchdog.conStallTimeout, fltTolerance=RenderWatchdog.conDurationTolerance,
+		fltLeaseTimeout=conLeaseTimeout, fnLog=print):
+		self.strJobsPath = os.path.join(strQueuePath, conJobsFolder)
+		self.strCommandTemplate = strCommandTemplate
+		self.dictValues = dict(dictValues or {})
+		self.fltStallTimeout = fltStallTimeout
+		self.fltTolerance = fltTolerance
+		self.fltLeaseTimeout = fltLeaseTimeout
+		self.fnLog = fnLog
+		self.strRunId = uuid.uuid4().hex[:8]
+
+	def Submit(self, objJob):
+		#write the job's folder - job.json goes in last, as that's what the workers look for
+		strJobPath = os.path.join(self.strJobsPath, "%s-%s-%i" % ("".join(strChar if strChar.isalnum() else "_" for strChar in objJob.strName), self.strRunId, objJob.intAttempts))
+		shutil.rmtree(strJobPath, ignore_errors=True)
+		os.makedirs(strJobPath)
+		strProjectFolder = os.path.dirname(os.path.abspath(objJob.strProjectPath))
+		strStagingPath = os.path.normpath(os.path.join(strProjectFolder, conStagingFolderName))
+		lstLines = []
+		with open(objJob.strProjectPath, "r") as fProject:
+			for strLine in fProject:
+				strPath = RenderCache.ReferencedPath(strLine)
+				if strPath is not None:
+					strFullPath = os.path.normpath(strPath if os.path.isabs(strPath) else os.path.join(strProjectFolder, strPath))
+					if strFullPath.startswith(strStagingPath + os.sep):
+						#the staged spots go in the job, along with their peaks
+						strNewPath = os.path.join(conSpotsFolder, os.path.relpath(strFullPath, strStagingPath))
+						for strExtension in ("", ReaPeaks.conPeakExtension):
+							if os.path.exists(strFullPath + strExtension):
+								AssetStaging.LinkOrCopy(strFullPath + strExtension, os.path.join(strJobPath, strNewPath + strExtension))
+					else:
+						strNewPath = strFullPath
+					strLine = strLine.replace(strPath, strNewPath, 1)
+				lstLines.append(strLine)
+		with open(os.path.join(strJobPath, conProjectFilename), "w") as fProject:
+			fProject.writelines(lstLines)
+		WriteJson(os.path.join(strJobPath, conJobFilename), {"name": objJob.strName, "output": objJob.strOutputPath, "estimate": objJob.fltEstimate,
+			"renderlength": objJob.fltRenderLength, "bytespersecond": objJob.intBytesPerSecond, "priority": objJob.Priority(), "command": self.strCommandTemplate, "values": self.dictValues,
+			"stall": self.fltStallTimeout, "tolerance": self.fltTolerance, "leasetimeout": self.fltLeaseTimeout, "submitted": time.time()})
+		return strJobPath
+
+	def __call__(self, objJob):
+		try:
+			strJobPath = self.Submit(objJob)
+		except OSError as objError:
+			return "unable to queue the job (%s)" % objError
+		try:
+			intClaim = 0
+			while True:
+				dictResult = ReadJson(os.path.join(strJobPath, conResultFilename))
+				if dictResult is not None:
+					return dictResult.get("error", "")
+				intLatest = CurrentClaim(strJobPath)
+				if intLatest != intClaim:
+					dictLease = ReadJson(LeasePath(strJobPath, intLatest)) or {}
+					if intClaim:
+						self.fnLog(" %s was claimed again by %s - the last worker stopped responding" % (objJob.strName, dictLease.get("worker", "a worker")))
+					else:
+						self.fnLog(" %s picked up by %s" % (objJob.strName, dictLease.get("worker", "a worker")))
+					intClaim = intLatest
+				time.sleep(conPollInterval)
+		finally:
+			shutil.rmtree(strJobPath, ignore_errors=True)
+
+class QueueWorker:
+	def __init__(self, strQueuePath, strName=None, strRenderCommand=None, strRenderPath=None, fnLog=print):
+		self.strJobsPath = os.path.join(strQueuePath, conJobsFolder)
+		self.strClockPath = os.path.join(strQueuePath, conClockFolder)
+		self.strName = strName or "%s-%i" % (socket.gethostname(), os.getpid())
+		self.strRenderCommand = strRenderCommand #used instead of the job's command when it's set
+		self.strRenderPath = strRenderPath #the render folder as this worker sees it - None uses the job's output path
+		self.fnLog = fnLog
+
+	def ServerTime(self):
+		#the file server's idea of the time, to compare the leases' modified times with
+		os.makedirs(self.strClockPath, exist_ok=True)
+		strPath = os.path.join(self.strClockPath, "".join(strChar if strChar.isalnum() else "_" for strChar in self.strName))
+		with open(strPath, "w") as fClock:
+			fClock.write(self.strName)
+		return os.stat(strPath).st_mtime
+
+	def Jobs(self):
+		#(job folder, job.json) for the jobs that aren't finished, most important first
+		lstJobs = []
+		try:
+			lstFolders = os.listdir(self.strJobsPath)
+		except OSError:
+			return []
+		for strFolder in lstFolders:
+			strJobPath = os.path.join(self.strJobsPath, strFolder)
+			if os.path.exists(os.path.join(strJobPath, conResultFilename)):
+				continue
+			dictJob = ReadJson(os.path.join(strJobPath, conJobFilename))
+			if dictJob is not None:
+				lstJobs.append((strJobPath, dictJob))
+		return sorted(lstJobs, key=lambda tupJob: (-tupJob[1].get("priority", 0), tupJob[1].get("submitted", 0)))
+
+	def Claim(self, strJobPath, dictJob, fltNow):
+		#the job's Lease if this worker got it - None if it's someone else's
+		intClaim = CurrentClaim(strJobPath)
+		if intClaim:
+			try:
+				if fltNow - os.stat(LeasePath(strJobPath, intClaim)).st_mtime < dictJob.get("leasetimeout", conLeaseTimeout):
+					return None
+			except OSError:
+				return None
+		try:
+			intFile = os.open(LeasePath(strJobPath, intClaim + 1), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+		except OSError:
+			#another worker got there first
+			return None
+		with os.fdopen(intFile, "w") as fLease:
+			json.dump({"worker": self.strName, "claimed": time.time()}, fLease)
+		return Lease(strJobPath, intClaim + 1)
+
+	def ClaimNext(self):
+		#(job folder, job.json, Lease) of the next job this worker got - None when there's nothing to do
+		lstJobs = self.Jobs()
+		if not lstJobs:
+			return None
+		fltNow = self.ServerTime()
+		for strJobPath, dictJob in lstJobs:
+			try:
+				objLease = self.Claim(strJobPath, dictJob, fltNow)
+			except OSError:
+				#the job was finished and removed while it was being looked at
+				continue
+			if objLease is not None:
+				return strJobPath, dictJob, objLease
+		return None
+
+	def Render(self, strJobPath, dictJob, objLease):
+		#render, check and publish a job - returns the error, "" when it worked
+		if objLease.intClaim > conMaxClaims:
+			return "given up on after %i workers stopped responding while rendering it" % conMaxClaims
+
+		#the job's project, rendered into the job folder
+		strRenderFolder = os.path.join(os.path.abspath(strJobPath), "render-%i" % objLease.intClaim)
+		os.makedirs(strRenderFolder, exist_ok=True)
+		strRenderPath = os.path.join(strRenderFolder, os.path.basename(dictJob["output"].replace("\\", "/")))
+		strProjectPath = os.path.join(strRenderFolder, conProjectFilename)
+		blnRenderFile = False
+		with open(os.path.join(strJobPath, conProjectFilename), "r") as fProject, open(strProjectPath, "w") as fRender:
+			for strLine in fProject:
+				if strLine.strip().startswith("RENDER_FILE "):
+					strLine = strLine[:len(strLine) - len(strLine.lstrip())] + "RENDER_FILE \"" + strRenderPath + "\"\n"
+					blnRenderFile = True
+				fRender.write(strLine)
+		if not blnRenderFile:
+			return "the project has no RENDER_FILE"
+
+		objRenderJob = RenderScheduler.RenderJob(dictJob["name"], strProjectPath, strRenderPath, dictJob.get("estimate", 0.0), intBytesPerSecond=dictJob.get("bytespersecond", 0),
+			fltRenderLength=dictJob.get("renderlength"))
+		objExecutor = LeaseExecutor(self.strRenderCommand or dictJob["command"], dictJob.get("values"), fltStallTimeout=dictJob.get("stall", RenderWatchdog.conStallTimeout))
+		objExecutor.objLease = objLease
+		strError = objExecutor(objRenderJob)
+		if not strError:
+			strError = RenderWatchdog.RenderVerifier(dictJob.get("tolerance", RenderWatchdog.conDurationTolerance))(objRenderJob)
+		if strError or objLease.blnLost or objLease.Lost():
+			return strError or "the job was claimed by another worker"
+
+		#publish it under a temporary name and rename it, so the render folder never has half of it
+		strOutputPath = os.path.join(self.strRenderPath, os.path.basename(strRenderPath)) if self.strRenderPath else dictJob["output"]
+		AssetStaging.LinkOrCopy(strRenderPath, strOutputPath, False)
+		return ""
+
+	def Run(self, strJobPath, dictJob, objLease):
+		self.fnLog("%s: rendering %s (claim %i)" % (self.strName, dictJob["name"], objLease.intClaim))
+		fltStart = time.monotonic()
+		objStop = threading.Event()
+		objHeartbeat = threading.Thread(target=objLease.Heartbeat, args=(objStop, dictJob.get("leasetimeout", conLeaseTimeout) / conHeartbeats), daemon=True)
+		objHeartbeat.start()
+		try:
+			strError = self.Render(strJobPath, dictJob, objLease)
+		except (OSError, KeyError) as objError:
+			strError = "%s: %s" % (type(objError).__name__, objError)
+		finally:
+			objStop.set()
+			objHeartbeat.join()
+
+		if objLease.blnLost or objLease.Lost():
+			#the job belongs to the worker that claimed it again
+			self.fnLog("%s: %s was claimed by another worker" % (self.strName, dictJob["name"]))
+			return
+		try:
+			WriteJson(os.path.join(strJobPath, conResultFilename), {"error": strError, "worker": self.strName, "claim": objLease.intClaim, "seconds": time.monotonic() - fltStart})
+		except OSError:
+			#the job was removed
+			pass
+		self.fnLog("%s: %s %s" % (self.strName, dictJob["name"], "failed (%s)" % strError if strError else "done"))
+
+	def Work(self, fltIdleExit=None):
+		#render jobs until there haven't been any for fltIdleExit seconds - forever when it's None
+		fltIdleSince = time.monotonic()
+		while True:
+			tupClaim = self.ClaimNext()
+			if tupClaim is None:
+				if fltIdleExit is not None and time.monotonic() - fltIdleSince > fltIdleExit:
+					return
+				time.sleep(conPollInterval)
+				continue
+			self.Run(*tupClaim)
+			fltIdleSince = time.monotonic()
+
+def StartWorkers(strQueuePath, intCount):
+	#start intCount workers on this machine - returns their processes
+	return [subprocess.Popen([sys.executable, os.path.abspath(__file__), strQueuePath, "--name", "%s-local%i" % (socket.gethostname(), intWorker)], stdout=subprocess.DEVNULL)
+		for intWorker in range(1, intCount + 1)]
+
+def StopWorkers(lstProcesses):
+	for objProcess in lstProcesses:
+		objProcess.terminate()
+	for objProcess in lstProcesses:
+		objProcess.wait()
+
+if __name__ == "__main__":
+	objCLParser = argparse.ArgumentParser(description="Render the station jobs RenderShow.py puts in a queue folder")
+	objCLParser.add_argument("queue", metavar="[queue folder]", help="the folder given to RenderShow.py's --queue")
+	objCLParser.add_argument("--rendercommand", required=False, metavar="[command]", help="command used to render a job - {project} and {output} are replaced (default=the one RenderShow.py was told to use)")
+	objCLParser.add_argument("--renderpath", required=False, metavar="[path]", help="the render folder as this machine sees it (default=the path RenderShow.py was given)")
+	objCLParser.add_argument("--name", required=False, metavar="[text]", help="what this worker is called in the leases and logs (default=[computer name]-[process id])")
+	objCLParser.add_argument("--idleexit", required=False, type=float, metavar="[seconds]", help="stop once there's been nothing to do for this long (default=keep running until Ctrl+C)")
+	objCLArgs = objCLParser.parse_args()
+
+	objWorker = QueueWorker(objCLArgs.queue, objCLArgs.name, objCLArgs.rendercommand, objCLArgs.renderpath)
+	print("%s: watching %s for jobs" % (objWorker.strName, objCLArgs.queue))
+	try:
+		objWorker.Work(objCLArgs.idleexit)
+	except KeyboardInterrupt:
+		print("%s: stopped" % objWorker.strName)
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (conftest.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Fixtures shared by the tests (pytest picks this file up by itself)
+#
+#fnWriteWav writes float samples (-1.0 to 1.0) as a WAV in the test's own temporary folder,
+#in any format the scripts read, so the tests can build the audio they check against.
+#
+
+import pytest
+
+import WavInfo
+import StationMix
+
+@pytest.fixture
+def fnWriteWav(tmp_path):
+	def WriteWav(strName, arrSamples, intSampleRate=44100, intBitsPerSample=16, blnFloat=False):
+		#arrSamples is (frames, channels) or a single channel - returns the WAV's path
+		import numpy
+		arrSamples = numpy.asarray(arrSamples, dtype=numpy.float64)
+		if arrSamples.ndim == 1:
+			arrSamples = arrSamples[:, None]
+		intChannels = arrSamples.shape[1]
+		objInfo = WavInfo.WavInfo(WavInfo.WaveFormatFloat if blnFloat else WavInfo.WaveFormatPCM, intChannels, intSampleRate, intBitsPerSample, intChannels * intBitsPerSample // 8)
+		strPath = str(tmp_path / strName)
+		with open(strPath, "wb") as fWav:
+			fWav.write(WavInfo.WavHeader(objInfo, len(arrSamples)))
+			fWav.write(StationMix.FromFloat(arrSamples, objInfo))
+			if (len(arrSamples) * objInfo.intBlockAlign) & 1:
+				fWav.write(b"\x00")
+		return strPath
+	return WriteWav
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (test_AssetStaging.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Tests for AssetStaging.py
+#
+#The asset library and the project's imported audio folder are both in the test's temporary
+#folder, so whether a spot was staged again is told by the stager's counts and by the staged
+#file itself.
+#
+#Run with: python -m pytest (from the Python folder)
+#
+
+import os
+
+import pytest
+
+import AssetStaging
+
+def Spot(tmp_path, strName, bytData):
+	#a spot in the asset library
+	strPath = str(tmp_path / "library" / strName)
+	os.makedirs(os.path.dirname(strPath), exist_ok=True)
+	with open(strPath, "wb") as fSpot:
+		fSpot.write(bytData)
+	return strPath
+
+def Staged(tmp_path, strStation, strName):
+	return str(tmp_path / "Imported" / strStation / strName)
+
+def Stage(tmp_path, dictSpots, strMode=AssetStaging.StageModeCopy, tupSidecars=()):
+	#stage {(station, name): library path} - returns the run's stats
+	objStager = AssetStaging.AssetStager(str(tmp_path / "Imported"), strMode, tupSidecars=tupSidecars)
+	for (strStation, strName), strSrcPath in dictSpots.items():
+		objStager.Add(strSrcPath, Staged(tmp_path, strStation, strName))
+	return objStager.Run()
+
+def Counts(objStats):
+	#(skipped, staged, removed)
+	return (objStats.intSkipped, objStats.intLinked + objStats.intReflinked + objStats.intCopied, objStats.intRemoved)
+
+def Read(strPath):
+	with open(strPath, "rb") as fFile:
+		return fFile.read()
+
+def Files(tmp_path):
+	#every file under the imported audio folder
+	return sorted(os.path.relpath(os.path.join(strDirPath, strFileName), str(tmp_path / "Imported")).replace(os.sep, "/")
+		for strDirPath, _, lstFileNames in os.walk(str(tmp_path / "Imported")) for strFileName in lstFileNames)
+
+def test_UnchangedSpotsAreSkipped(tmp_path):
+	dictSpots = {("KAAA", "KAAA-one.wav"): Spot(tmp_path, "KAAA-one.wav", b"one"), ("KBBB", "KBBB-one.wav"): Spot(tmp_path, "KBBB-one.wav", b"two")}
+	assert Counts(Stage(tmp_path, dictSpots)) == (0, 2, 0)
+	assert Read(Staged(tmp_path, "KAAA", "KAAA-one.wav")) == b"one"
+	assert Counts(Stage(tmp_path, dictSpots)) == (2, 0, 0)
+	assert Files(tmp_path) == [AssetStaging.conManifestFilename, "KAAA/KAAA-one.wav", "KBBB/KBBB-one.wav"]
+
+def test_ChangedSpotsAreStagedAgain(tmp_path):
+	strSrcPath = Spot(tmp_path, "KAAA-one.wav", b"one")
+	dictSpots = {("KAAA", "KAAA-one.wav"): strSrcPath, ("KAAA", "KAAA-two.wav"): Spot(tmp_path, "KAAA-two.wav", b"two")}
+	Stage(tmp_path, dictSpots)
+
+	#the spot in the library is replaced
+	with open(strSrcPath, "wb") as fSpot:
+		fSpot.write(b"new one")
+	os.utime(strSrcPath, ns=(2000000000000000000, 2000000000000000000))
+	assert Counts(Stage(tmp_path, dictSpots)) == (1, 1, 0)
+	assert Read(Staged(tmp_path, "KAAA", "KAAA-one.wav")) == b"new one"
+
+	#the staged copy is changed in the project folder (a destructive edit in Reaper)
+	with open(Staged(tmp_path, "KAAA", "KAAA-two.wav"), "wb") as fSpot:
+		fSpot.write(b"edited")
+	assert Counts(Stage(tmp_path, dictSpots)) == (1, 1, 0)
+	assert Read(Staged(tmp_path, "KAAA", "KAAA-two.wav")) == b"two"
+
+	#the same name is staged from another spot
+	dictSpots[("KAAA", "KAAA-two.wav")] = Spot(tmp_path, "other/KAAA-two.wav", b"other two")
+	assert Counts(Stage(tmp_path, dictSpots)) == (1, 1, 0)
+	assert Read(Staged(tmp_path, "KAAA", "KAAA-two.wav")) == b"other two"
+
+def test_StaleFilesArePruned(tmp_path):
+	dictSpots = {("KAAA", "KAAA-one.wav"): Spot(tmp_path, "KAAA-one.wav", b"one"), ("KBBB", "KBBB-one.wav"): Spot(tmp_path, "KBBB-one.wav", b"two")}
+	Stage(tmp_path, dictSpots)
+	with open(Staged(tmp_path, "KAAA", "left over.wav"), "wb") as fSpot:
+		fSpot.write(b"old")
+	#KBBB isn't in this run, so its folder goes too
+	del dictSpots[("KBBB", "KBBB-one.wav")]
+	assert Counts(Stage(tmp_path, dictSpots)) == (1, 0, 2)
+	assert Files(tmp_path) == [AssetStaging.conManifestFilename, "KAAA/KAAA-one.wav"]
+
+def test_SidecarsAreKept(tmp_path):
+	dictSpots = {("KAAA", "KAAA-one.wav"): Spot(tmp_path, "KAAA-one.wav", b"one"), ("KAAA", "KAAA-two.wav"): Spot(tmp_path, "KAAA-two.wav", b"two")}
+	Stage(tmp_path, dictSpots, tupSidecars=(".reapeaks",))
+	for strName in ("KAAA-one.wav.reapeaks", "KAAA-two.wav.reapeaks", "KAAA-three.wav.reapeaks"):
+		with open(Staged(tmp_path, "KAAA", strName), "wb") as fPeaks:
+			fPeaks.write(b"peaks")
+	#the peaks of a spot that's no longer staged are removed along with it
+	del dictSpots[("KAAA", "KAAA-two.wav")]
+	assert Counts(Stage(tmp_path, dictSpots, tupSidecars=(".reapeaks",))) == (1, 0, 3)
+	assert Files(tmp_path) == [AssetStaging.conManifestFilename, "KAAA/KAAA-one.wav", "KAAA/KAAA-one.wav.reapeaks"]
+	#without sidecars the peaks aren't kept
+	assert Counts(Stage(tmp_path, dictSpots)) == (1, 0, 1)
+
+def test_CopiesAreIndependent(tmp_path):
+	strSrcPath = Spot(tmp_path, "KAAA-one.wav", b"one")
+	Stage(tmp_path, {("KAAA", "KAAA-one.wav"): strSrcPath})
+	assert not os.path.samefile(strSrcPath, Staged(tmp_path, "KAAA", "KAAA-one.wav"))
+	#the copy keeps the library's modified time
+	assert os.stat(Staged(tmp_path, "KAAA", "KAAA-one.wav")).st_mtime_ns == os.stat(strSrcPath).st_mtime_ns
+
+def test_LinkMode(tmp_path):
+	strSrcPath = Spot(tmp_path, "KAAA-one.wav", b"one")
+	objStats = Stage(tmp_path, {("KAAA", "KAAA-one.wav"): strSrcPath}, AssetStaging.StageModeLink)
+	if objStats.intLinked == 0:
+		pytest.skip("hardlinks aren't supported here")
+	assert os.path.samefile(strSrcPath, Staged(tmp_path, "KAAA", "KAAA-one.wav"))
+	assert Counts(Stage(tmp_path, {("KAAA", "KAAA-one.wav"): strSrcPath}, AssetStaging.StageModeLink)) == (1, 0, 0)
+
+def test_LinkOrCopyFallsBackToACopy(tmp_path, monkeypatch):
+	def Unsupported(*lstArgs):
+		raise OSError("not supported")
+	monkeypatch.setattr(AssetStaging.os, "link", Unsupported)
+	monkeypatch.setattr(AssetStaging, "Reflink", lambda strSrcPath, strDestPath: False)
+	monkeypatch.setattr(AssetStaging.os, "copy_file_range", Unsupported, raising=False)
+	strSrcPath = Spot(tmp_path, "KAAA-one.wav", bytes(range(256)) * 100)
+	strDestPath = str(tmp_path / "dest" / "KAAA-one.wav")
+	assert AssetStaging.LinkOrCopy(strSrcPath, strDestPath) == "copy"
+	assert Read(strDestPath) == Read(strSrcPath)
+	assert os.listdir(str(tmp_path / "dest")) == ["KAAA-one.wav"]
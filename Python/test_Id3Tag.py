@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (test_Id3Tag.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Tests for Id3Tag.py
+#
+#The "MP3s" are a block of stand-in audio bytes - the tagger never looks inside the audio, so
+#all that's checked is that it comes through untouched.  The tags are read back by ReadTag(),
+#which follows the ID3v2 layout rather than Id3Tag.py's own reader.
+#
+#Run with: python -m pytest (from the Python folder)
+#
+
+import os
+import struct
+
+import pytest
+
+import Id3Tag
+
+bytAudio = bytes(range(256)) * 40
+
+def Mp3(tmp_path, bytData=bytAudio, strName="show.mp3"):
+	strPath = str(tmp_path / strName)
+	with open(strPath, "wb") as fMp3:
+		fMp3.write(bytData)
+	return strPath
+
+def Read(strPath):
+	with open(strPath, "rb") as fFile:
+		return fFile.read()
+
+def ReadTag(bytFile):
+	#(version, tag size, {frame id: text}) of the ID3v2 tag at the start of bytFile
+	assert bytFile[:3] == b"ID3"
+	intVersion = bytFile[3]
+	intSize = 10 + ((bytFile[6] << 21) | (bytFile[7] << 14) | (bytFile[8] << 7) | bytFile[9])
+	dictFrames = {}
+	intPosition = 10
+	while intPosition + 10 <= intSize and bytFile[intPosition] != 0:
+		strFrameId = bytFile[intPosition:intPosition + 4].decode("latin-1")
+		bytSize = bytFile[intPosition + 4:intPosition + 8]
+		intFrameSize = ((bytSize[0] << 21) | (bytSize[1] << 14) | (bytSize[2] << 7) | bytSize[3]) if intVersion == 4 else struct.unpack(">I", bytSize)[0]
+		bytData = bytFile[intPosition + 10:intPosition + 10 + intFrameSize]
+		dictFrames[strFrameId] = bytData[1:].decode({0: "latin-1", 1: "utf-16", 3: "utf-8"}[bytData[0]])
+		intPosition += 10 + intFrameSize
+	#the rest of the tag is padding
+	assert bytFile[intPosition:intSize] == bytes(intSize - intPosition)
+	return intVersion, intSize, dictFrames
+
+def ReadID3v1(bytFile):
+	#(title, artist, album, year, comment, genre) of the ID3v1 tag at the end of bytFile
+	bytTag = bytFile[-128:]
+	assert bytTag[:3] == b"TAG"
+	return tuple(bytTag[intFrom:intTo].rstrip(b"\x00").decode("latin-1") for intFrom, intTo in ((3, 33), (33, 63), (63, 93), (93, 97), (97, 127))) + (bytTag[127],)
+
+dictShow = {"TIT2": "Show 42", "TPE1": "DJ Funk", "TCON": "Jazz"}
+
+def test_NewTag(tmp_path):
+	strPath = Mp3(tmp_path)
+	Id3Tag.TagFile(strPath, dictShow)
+	bytFile = Read(strPath)
+	intVersion, intSize, dictFrames = ReadTag(bytFile)
+	assert (intVersion, dictFrames) == (3, dictShow)
+	#a file without a tag gets padding for the next one
+	assert intSize > 10 + sum(10 + 1 + len(strText) for strText in dictShow.values()) + Id3Tag.conPaddingBytes - 1
+	assert bytFile[intSize:-128] == bytAudio
+	assert ReadID3v1(bytFile) == ("Show 42", "DJ Funk", "", "", "", Id3Tag.lstID3v1Genres.index("Jazz"))
+
+def test_RetagInPlace(tmp_path):
+	strPath = Mp3(tmp_path)
+	Id3Tag.TagFile(strPath, dict(dictShow, TALB="Album"))
+	intInode = os.stat(strPath).st_ino
+	intSize = ReadTag(Read(strPath))[1]
+
+	#the new tag fits, so the file isn't written again - the album that isn't set is kept
+	Id3Tag.TagFile(strPath, {"TIT2": "Show 43", "TCON": "Podcast"})
+	bytFile = Read(strPath)
+	assert ReadTag(bytFile) == (3, intSize, {"TIT2": "Show 43", "TPE1": "DJ Funk", "TCON": "Podcast", "TALB": "Album"})
+	assert os.stat(strPath).st_ino == intInode
+	assert bytFile[intSize:-128] == bytAudio
+	#the ID3v1 tag is replaced rather than added again, and an unknown genre is 255
+	assert len(bytFile) == intSize + len(bytAudio) + 128
+	assert ReadID3v1(bytFile) == ("Show 43", "", "", "", "", 255)
+
+def test_RetagGrowsTheFile(tmp_path):
+	strPath = Mp3(tmp_path)
+	Id3Tag.TagFile(strPath, dictShow)
+	intSize = ReadTag(Read(strPath))[1]
+	os.chmod(strPath, 0o640)
+
+	strComment = "x" * (intSize + 100)
+	Id3Tag.TagFile(strPath, {"TXXX": strComment})
+	bytFile = Read(strPath)
+	intVersion, intNewSize, dictFrames = ReadTag(bytFile)
+	assert intNewSize > intSize
+	assert dictFrames == dict(dictShow, TXXX=strComment)
+	assert bytFile[intNewSize:-128] == bytAudio
+	assert len(bytFile) == intNewSize + len(bytAudio) + 128
+	#the file keeps its permissions and nothing is left behind
+	assert os.stat(strPath).st_mode & 0o777 == 0o640
+	assert os.listdir(str(tmp_path)) == ["show.mp3"]
+
+@pytest.mark.parametrize("intVersion, intEncoding", [(3, 1), (4, 3)])
+def test_TextThatIsntLatin1(tmp_path, intVersion, intEncoding):
+	strPath = Mp3(tmp_path)
+	Id3Tag.TagFile(strPath, {"TIT2": "Show 42 – Café ♫", "TPE1": "DJ Funk"}, intVersion)
+	bytFile = Read(strPath)
+	assert ReadTag(bytFile) == (intVersion, ReadTag(bytFile)[1], {"TIT2": "Show 42 – Café ♫", "TPE1": "DJ Funk"})
+	assert bytFile[10 + 10] == intEncoding
+	#ID3v1 only has latin-1
+	assert ReadID3v1(bytFile)[0] == "Show 42 ? Café ?"
+
+def test_RecordingTime(tmp_path):
+	#v2.3 has a year frame instead of the recording time
+	strPath = Mp3(tmp_path)
+	Id3Tag.TagFile(strPath, {"TDRC": "2024-05-01"}, 3)
+	assert ReadTag(Read(strPath))[2] == {"TYER": "2024"}
+	Id3Tag.TagFile(strPath, {"TDRC": "2024-05-01"}, 4)
+	bytFile = Read(strPath)
+	#a tag of the other version is replaced, not added to
+	assert ReadTag(bytFile)[2] == {"TDRC": "2024-05-01"}
+	assert ReadID3v1(bytFile)[3] == "2024"
+
+def test_WithoutID3v1(tmp_path):
+	strPath = Mp3(tmp_path)
+	Id3Tag.TagFile(strPath, dictShow, blnID3v1=False)
+	bytFile = Read(strPath)
+	assert bytFile[ReadTag(bytFile)[1]:] == bytAudio
+
+def test_TagFiles(tmp_path):
+	lstFiles = [(Mp3(tmp_path, strName="KAAA.mp3"), dict(dictShow, TIT2="KAAA")), (Mp3(tmp_path, strName="KBBB.mp3"), dict(dictShow, TIT2="KBBB")),
+		(str(tmp_path / "missing.mp3"), dictShow)]
+	dictErrors = Id3Tag.TagFiles(lstFiles, intWorkers=2)
+	assert list(dictErrors) == [str(tmp_path / "missing.mp3")]
+	for strPath, dictFrames in lstFiles[:2]:
+		assert ReadTag(Read(strPath))[2] == dictFrames
+	with pytest.raises(Id3Tag.Id3Error):
+		Id3Tag.TagFile(lstFiles[0][0], dictShow, 2)
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (test_Loudness.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Tests for Loudness.py
+#
+#The expected loudness of the sine tests comes from EBU Tech 3341 - a stereo 1 kHz sine with
+#a peak of -23 dBFS is -23 LUFS, and the relative gate leaves out parts that are much quieter
+#than the rest.
+#
+#Run with: python -m pytest (from the Python folder)
+#
+
+import math
+
+import pytest
+
+import Loudness
+import ContentHash
+
+numpy = pytest.importorskip("numpy")
+
+def Sine(fltSeconds, fltLevel, intRate=48000, fltFrequency=1000.0, intChannels=2, fltPhase=0.0):
+	#fltLevel is the sine's peak in dBFS
+	arrTime = numpy.arange(int(round(fltSeconds * intRate))) / float(intRate)
+	arrSine = 10.0 ** (fltLevel / 20.0) * numpy.sin(2.0 * math.pi * fltFrequency * arrTime + fltPhase)
+	return numpy.repeat(arrSine[:, None], intChannels, axis=1)
+
+@pytest.mark.parametrize("intRate", [44100, 48000, 96000])
+def test_StereoSine(fnWriteWav, intRate):
+	objLevels = Loudness.Analyze(fnWriteWav("sine.wav", Sine(5.0, -23.0, intRate), intRate, 24))
+	assert objLevels.fltLoudness == pytest.approx(-23.0, abs=0.1)
+	assert objLevels.fltRMS == pytest.approx(-26.01, abs=0.05)
+
+def test_MonoSine(fnWriteWav):
+	#a mono spot is played on both channels, so it's as loud as the same sine in stereo
+	objLevels = Loudness.Analyze(fnWriteWav("sine.wav", Sine(5.0, -23.0, 48000, 997.0, 1), 48000, 32, True))
+	assert objLevels.fltLoudness == pytest.approx(-23.0, abs=0.1)
+	assert objLevels.fltRMS == pytest.approx(-26.01, abs=0.05)
+
+@pytest.mark.parametrize("intChannels", [1, 2])
+def test_MatchedSpotsComeOutAtTheTarget(fnWriteWav, intChannels):
+	#the matched spot is measured the way it airs, on both channels of the station's track
+	arrSamples = Sine(5.0, -33.0, 48000, 1000.0, intChannels)
+	fltGain = Loudness.MatchGain(Loudness.Analyze(fnWriteWav("spot.wav", arrSamples, 48000, 24)), -23.0)
+	objLevels = Loudness.Analyze(fnWriteWav("aired.wav", numpy.repeat(arrSamples * fltGain, 2 // intChannels, axis=1), 48000, 24))
+	assert objLevels.fltLoudness == pytest.approx(-23.0, abs=0.1)
+
+def test_RelativeGateLeavesOutQuietParts(fnWriteWav):
+	#without the gate the quiet parts would pull this down to about -25 LUFS - only the blocks
+	#that are partly loud and partly quiet still get through
+	arrSamples = numpy.concatenate((Sine(2.0, -36.0), Sine(6.0, -23.0), Sine(2.0, -36.0)))
+	objLevels = Loudness.Analyze(fnWriteWav("gated.wav", arrSamples, 48000, 24))
+	assert objLevels.fltLoudness == pytest.approx(-23.0, abs=0.3)
+
+def test_AbsoluteGate(fnWriteWav):
+	#everything under -70 LUFS is left out, so the spot has no loudness at all
+	objLevels = Loudness.Analyze(fnWriteWav("quiet.wav", Sine(2.0, -80.0), 48000, 24))
+	assert objLevels.fltLoudness is None
+	assert objLevels.fltTruePeak == pytest.approx(-80.0, abs=0.1)
+
+def test_Silence(fnWriteWav):
+	objLevels = Loudness.Analyze(fnWriteWav("silence.wav", numpy.zeros((48000, 2)), 48000))
+	assert (objLevels.fltLoudness, objLevels.fltTruePeak, objLevels.fltRMS) == (None, None, None)
+	objLevels = Loudness.Analyze(fnWriteWav("empty.wav", numpy.zeros((0, 2)), 48000))
+	assert (objLevels.fltLoudness, objLevels.fltTruePeak, objLevels.fltRMS) == (None, None, None)
+
+def test_TooShortToMeasure(fnWriteWav):
+	#shorter than one 400ms gating block
+	objLevels = Loudness.Analyze(fnWriteWav("short.wav", Sine(0.3, -10.0), 48000, 24))
+	assert objLevels.fltLoudness is None
+	assert objLevels.fltTruePeak == pytest.approx(-10.0, abs=0.1)
+
+def test_TruePeakBetweenSamples(fnWriteWav):
+	#a quarter of the sample rate, 45 degrees out - every sample is 3 dB under the sine's peak
+	arrSamples = Sine(1.0, -6.0, 48000, 12000.0, 1, math.pi / 4)
+	assert 20.0 * math.log10(numpy.abs(arrSamples).max()) == pytest.approx(-9.01, abs=0.01)
+	objLevels = Loudness.Analyze(fnWriteWav("peaks.wav", arrSamples, 48000, 32, True))
+	assert objLevels.fltTruePeak == pytest.approx(-6.0, abs=0.2)
+
+def test_NotAWav(tmp_path):
+	strPath = str(tmp_path / "spot.wav")
+	with open(strPath, "wb") as fSpot:
+		fSpot.write(bytes(100))
+	with pytest.raises(Loudness.LoudnessError):
+		Loudness.Analyze(strPath)
+
+def test_MatchGain():
+	#quiet spots are raised as far as the true peak ceiling allows, loud ones are always lowered
+	assert Loudness.MatchGain(Loudness.SpotLevels(-30.0, -10.0, -33.0), -23.0) == pytest.approx(10.0 ** (7.0 / 20.0))
+	assert Loudness.MatchGain(Loudness.SpotLevels(-30.0, -3.0, -33.0), -23.0) == pytest.approx(10.0 ** (2.0 / 20.0))
+	assert Loudness.MatchGain(Loudness.SpotLevels(-30.0, 0.5, -33.0), -23.0) == 1.0
+	assert Loudness.MatchGain(Loudness.SpotLevels(-16.0, -0.5, -19.0), -23.0) == pytest.approx(10.0 ** (-7.0 / 20.0))
+	assert Loudness.MatchGain(Loudness.SpotLevels(None, None, None), -23.0) == 1.0
+
+def test_CacheMeasuresChangedSpotsAgain(tmp_path, fnWriteWav):
+	#the measurements are kept by content, so a spot that changed is measured again
+	strPath = fnWriteWav("sine.wav", Sine(1.0, -23.0), 48000, 24)
+	objCache = Loudness.LevelCache(str(tmp_path / "cache"), ContentHash.ContentHashIndex())
+	assert objCache.Get(strPath).fltLoudness == pytest.approx(-23.0, abs=0.1)
+	assert objCache.Get(strPath).fltLoudness == pytest.approx(-23.0, abs=0.1)
+	assert objCache.intAnalyzed == 1
+	fnWriteWav("sine.wav", Sine(2.0, -33.0), 48000, 24)
+	assert objCache.Get(strPath).fltLoudness == pytest.approx(-33.0, abs=0.1)
+	assert objCache.intAnalyzed == 2
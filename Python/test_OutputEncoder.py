@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (test_OutputEncoder.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Tests for OutputEncoder.py
+#
+#The encoder is a small stand-in run through the same command template as --encodecommand -
+#it "encodes" by copying the WAV behind a line with the bitrate, and when it's told to fail it
+#writes half its output before exiting with an error, the way a real encoder that crashes does.
+#
+#Run with: python -m pytest (from the Python folder)
+#
+
+import os
+import sys
+import shlex
+
+import pytest
+
+import OutputEncoder
+
+strStandInEncoder = """
+import sys
+
+strInputPath, strOutputPath, strBitrate, strMode = sys.argv[1:5]
+with open(strInputPath, "rb") as fInput:
+	bytInput = fInput.read()
+if strMode == "silent":
+	sys.exit(0)
+with open(strOutputPath, "wb") as fOutput:
+	fOutput.write(b"ENCODED %s\\n" % strBitrate.encode())
+	if strMode == "fail":
+		fOutput.write(bytInput[:len(bytInput) // 2])
+		sys.exit(2)
+	fOutput.write(bytInput)
+"""
+
+def EncodeCommand(tmp_path, strMode="ok"):
+	#an --encodecommand for the stand-in encoder
+	strEncoderPath = str(tmp_path / "encoder.py")
+	with open(strEncoderPath, "w") as fEncoder:
+		fEncoder.write(strStandInEncoder)
+	return "%s %s {input} {output} {bitrate} %s" % (shlex.quote(sys.executable), shlex.quote(strEncoderPath), strMode)
+
+def MasterWav(tmp_path):
+	strPath = str(tmp_path / "KAAA.wav")
+	with open(strPath, "wb") as fWav:
+		fWav.write(b"RIFF master WAV")
+	return strPath
+
+def Jobs(strInputPath, strBasePath, lstSpecs, dictTags=None):
+	lstFormats = [OutputEncoder.ParseFormat(strSpec) for strSpec in lstSpecs]
+	return [OutputEncoder.EncodeJob("KAAA", strInputPath, strOutputPath, objFormat, dictTags) for objFormat, strOutputPath in OutputEncoder.OutputPaths(strBasePath, lstFormats)]
+
+def Read(strPath):
+	with open(strPath, "rb") as fFile:
+		return fFile.read()
+
+def Leftovers(tmp_path):
+	return [strName for strName in os.listdir(str(tmp_path)) if OutputEncoder.conTempSuffix in strName]
+
+def test_ParseFormat():
+	assert OutputEncoder.ParseFormat("mp3") == OutputEncoder.OutputFormat("mp3", 320)
+	assert OutputEncoder.ParseFormat(" MP3-128k ") == OutputEncoder.OutputFormat("mp3", 128)
+	assert OutputEncoder.ParseFormat("KAAA:wav") == OutputEncoder.OutputFormat("wav", None, "kaaa")
+	for strSpec in ("ogg", "wav-128", "mp3-0", "mp3-fast"):
+		with pytest.raises(OutputEncoder.EncodeError):
+			OutputEncoder.ParseFormat(strSpec)
+
+def test_StationFormats():
+	lstFormats = [OutputEncoder.ParseFormat(strSpec) for strSpec in ("mp3-128", "wav", "kaaa:mp3-64", "mp3-128")]
+	assert OutputEncoder.StationFormats(lstFormats, "kaaa") == [OutputEncoder.OutputFormat("mp3", 64, "kaaa")]
+	assert OutputEncoder.StationFormats(lstFormats, "kbbb") == [OutputEncoder.OutputFormat("mp3", 128), OutputEncoder.OutputFormat("wav")]
+
+def test_OutputPaths():
+	lstFormats = [OutputEncoder.ParseFormat(strSpec) for strSpec in ("mp3-128", "mp3-64", "wav")]
+	assert [strPath for _, strPath in OutputEncoder.OutputPaths("KAAA", lstFormats)] == ["KAAA-128k.mp3", "KAAA-64k.mp3", "KAAA.wav"]
+	assert [strPath for _, strPath in OutputEncoder.OutputPaths("KAAA", lstFormats[1:])] == ["KAAA.mp3", "KAAA.wav"]
+
+def test_EveryOutputIsEncoded(tmp_path):
+	strInputPath = MasterWav(tmp_path)
+	lstJobs = Jobs(strInputPath, str(tmp_path / "out" / "KAAA"), ["mp3-128", "mp3-64", "wav"])
+	os.makedirs(str(tmp_path / "out"))
+	OutputEncoder.EncoderPool(EncodeCommand(tmp_path), 2).Run(lstJobs)
+	assert [objJob.strError for objJob in lstJobs] == [None, None, None]
+	assert sorted(os.listdir(str(tmp_path / "out"))) == ["KAAA-128k.mp3", "KAAA-64k.mp3", "KAAA.wav"]
+	assert Read(str(tmp_path / "out" / "KAAA-128k.mp3")) == b"ENCODED 128\nRIFF master WAV"
+	assert Read(str(tmp_path / "out" / "KAAA-64k.mp3")) == b"ENCODED 64\nRIFF master WAV"
+	#a WAV output is a copy of the master
+	assert Read(str(tmp_path / "out" / "KAAA.wav")) == b"RIFF master WAV"
+
+def test_MP3sAreTagged(tmp_path):
+	lstJobs = Jobs(MasterWav(tmp_path), str(tmp_path / "show"), ["mp3"], {"TIT2": "Show 42"})
+	OutputEncoder.EncoderPool(EncodeCommand(tmp_path)).Run(lstJobs)
+	assert lstJobs[0].strError is None
+	bytOutput = Read(str(tmp_path / "show.mp3"))
+	assert bytOutput.startswith(b"ID3")
+	assert b"Show 42" in bytOutput
+	assert b"ENCODED 320\nRIFF master WAV" in bytOutput
+
+@pytest.mark.parametrize("strMode, strError", [("fail", "encoder exited with code 2"), ("silent", "encoder exited with code 0")])
+def test_FailedEncodeKeepsTheLastOutput(tmp_path, strMode, strError):
+	#the output from the last run is left as it was, and the half-written one is removed
+	strInputPath = MasterWav(tmp_path)
+	lstJobs = Jobs(strInputPath, str(tmp_path / "show"), ["mp3-128", "mp3-64"])
+	OutputEncoder.EncoderPool(EncodeCommand(tmp_path)).Run(lstJobs)
+	with open(strInputPath, "wb") as fWav:
+		fWav.write(b"RIFF the next run's master WAV")
+
+	lstJobs = Jobs(strInputPath, str(tmp_path / "show"), ["mp3-128", "mp3-64"])
+	OutputEncoder.EncoderPool(EncodeCommand(tmp_path, strMode)).Run(lstJobs)
+	assert [objJob.strError for objJob in lstJobs] == [strError, strError]
+	assert Read(str(tmp_path / "show-128k.mp3")) == b"ENCODED 128\nRIFF master WAV"
+	assert Read(str(tmp_path / "show-64k.mp3")) == b"ENCODED 64\nRIFF master WAV"
+	assert Leftovers(tmp_path) == []
+
+def test_MissingEncoder(tmp_path):
+	lstJobs = Jobs(MasterWav(tmp_path), str(tmp_path / "show"), ["mp3"])
+	OutputEncoder.EncoderPool(shlex.quote(str(tmp_path / "no-such-encoder")) + " {input} {output}").Run(lstJobs)
+	assert lstJobs[0].strError.startswith("unable to start the encoder")
+	assert not os.path.exists(str(tmp_path / "show.mp3"))
+	assert Leftovers(tmp_path) == []
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (test_OutputQC.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Tests for OutputQC.py
+#
+#RunFinder gets its mask a block at a time, so the runs it finds are checked against the runs
+#of the whole mask for every way of cutting it into blocks.
+#
+#Run with: python -m pytest (from the Python folder)
+#
+
+import pytest
+
+import OutputQC
+
+numpy = pytest.importorskip("numpy")
+
+def WholeRuns(lstMask, intMinLength):
+	#(first frame, frames) of every run of True at least intMinLength long, the slow way
+	lstRuns = []
+	intStart = None
+	for intFrame, blnValue in enumerate(list(lstMask) + [False]):
+		if blnValue and intStart is None:
+			intStart = intFrame
+		elif not blnValue and intStart is not None:
+			if intFrame - intStart >= intMinLength:
+				lstRuns.append((intStart, intFrame - intStart))
+			intStart = None
+	return lstRuns
+
+def BlockRuns(lstMask, intMinLength, lstSizes):
+	#the runs RunFinder finds when the mask arrives in blocks of lstSizes (the last one takes the rest)
+	arrMask = numpy.array(lstMask, dtype=bool)
+	objFinder = OutputQC.RunFinder(intMinLength)
+	intFrom = 0
+	for intSize in lstSizes + [len(arrMask)]:
+		if intFrom >= len(arrMask):
+			break
+		objFinder.Add(arrMask[intFrom:intFrom + intSize], intFrom)
+		intFrom += intSize
+	objFinder.Close()
+	return objFinder.lstRuns
+
+def Mask(strMask):
+	return [strChar == "x" for strChar in strMask]
+
+@pytest.mark.parametrize("strMask, lstSizes, lstRuns", [
+	#a run that crosses from one block into the next
+	("..xxx|xx...", [5], [(2, 5)]),
+	#a run through a whole block into a third one
+	("..xxx|xxxxx|xx..", [5, 5], [(2, 10)]),
+	#a run that ends right at the end of a block, and one that starts at the start of the next
+	("..xxx|..xxx|xxx..", [5, 5], [(2, 3), (7, 6)]),
+	("xxx..|xxx..", [5], [(0, 3), (5, 3)]),
+	#runs that are too short are dropped, but the two halves of a run that crosses blocks count together
+	("x..xx|x.x..", [5], [(3, 3)]),
+	("xx...|.xx..", [5], []),
+	#a run that's still open at the end is kept by Close
+	("...xx|xxxxx", [5], [(3, 7)]),
+	("xxxxx|xxxxx", [5], [(0, 10)]),
+	#blocks of a single frame
+	("x|x|x|.|x|x|x", [1] * 6, [(0, 3), (4, 3)]),
+])
+def test_RunsAcrossBlocks(strMask, lstSizes, lstRuns):
+	lstMask = Mask(strMask.replace("|", ""))
+	assert BlockRuns(lstMask, 3, lstSizes) == lstRuns
+	assert WholeRuns(lstMask, 3) == lstRuns
+
+def test_RandomMasks():
+	objRandom = numpy.random.RandomState(7)
+	for _ in range(500):
+		intFrames = int(objRandom.randint(1, 200))
+		#long runs of either value, so plenty of them cross the blocks
+		lstMask = numpy.repeat(objRandom.rand(intFrames) < 0.5, objRandom.randint(1, 10, intFrames)).tolist()
+		intMinLength = int(objRandom.randint(1, 12))
+		lstSizes = objRandom.randint(1, 40, len(lstMask)).tolist()
+		assert BlockRuns(lstMask, intMinLength, lstSizes) == WholeRuns(lstMask, intMinLength)
+
+def test_MinimumLengthIsAtLeastOne():
+	assert BlockRuns(Mask("x.x"), 0, [2]) == [(0, 1), (2, 1)]
+
+def test_CheckWav(fnWriteWav):
+	#a 10 second show with a spot from 3 to 6 seconds - the spot is 30 dB louder than the show,
+	#	has half a second of dead air, and clips
+	intRate = 8000
+	arrTime = numpy.arange(10 * intRate) / float(intRate)
+	arrSamples = 0.01 * numpy.sin(2.0 * numpy.pi * 440.0 * arrTime)
+	arrSpot = slice(3 * intRate, 6 * intRate)
+	arrSamples[arrSpot] *= 31.6
+	arrSamples[4 * intRate:int(4.6 * intRate)] = 0.0
+	arrSamples[5 * intRate:5 * intRate + 4] = 1.0
+	#a single clipped sample isn't clipping
+	arrSamples[5 * intRate + 100] = 1.0
+	strPath = fnWriteWav("station.wav", numpy.repeat(arrSamples[:, None], 2, axis=1), intRate)
+
+	lstSpots = OutputQC.CheckWav(strPath, [OutputQC.QCSpot("spot", 3.0, 3.0), OutputQC.QCSpot("clean", 8.0, 1.0)])
+	dictSpot, dictClean = lstSpots
+	#the sine is also at zero on the first frame after the dead air
+	assert dictSpot["silence"] == [[4.0, pytest.approx(0.6, abs=1.5 / intRate)]]
+	assert dictSpot["clipping"] == [[5.0, 4]]
+	assert [(dictJump["edge"], dictJump["at"]) for dictJump in dictSpot["jumps"]] == [("start", 3.0), ("end", 6.0)]
+	assert dictSpot["jumps"][0]["after"] - dictSpot["jumps"][0]["before"] == pytest.approx(30.0, abs=0.5)
+	assert (dictClean["silence"], dictClean["clipping"], dictClean["jumps"]) == ([], [], [])
+	assert len(OutputQC.Issues(dictSpot)) == 4
+
+def test_NotAWav(tmp_path):
+	strPath = str(tmp_path / "station.wav")
+	with open(strPath, "wb") as fOutput:
+		fOutput.write(bytes(100))
+	with pytest.raises(OutputQC.QCError):
+		OutputQC.CheckWav(strPath, [OutputQC.QCSpot("spot", 1.0, 1.0)])
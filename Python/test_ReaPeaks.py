@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (test_ReaPeaks.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Tests for ReaPeaks.py
+#
+#The peak files are read back by the layout of Reaper's RPKM header and checked against the
+#min/max of the samples worked out the slow way.
+#
+#Run with: python -m pytest (from the Python folder)
+#
+
+import os
+import struct
+
+import pytest
+
+import ContentHash
+import ReaPeaks
+
+numpy = pytest.importorskip("numpy")
+
+def ReadPeaks(bytPeaks):
+	#(channels, sample rate, source fields, [(division, (peaks, channels, max/min) array)])
+	strMagic, intChannels, intMipmaps, intSampleRate = struct.unpack("<4sBBi", bytPeaks[:10])
+	assert strMagic == b"RPKM"
+	intOffset = struct.calcsize(ReaPeaks.conHeaderFormat)
+	lstCounts = []
+	for _ in range(intMipmaps):
+		lstCounts.append(struct.unpack("<iI", bytPeaks[intOffset:intOffset + 8]))
+		intOffset += 8
+	lstMipmaps = []
+	for intDivision, intCount in lstCounts:
+		intBytes = intCount * intChannels * 2 * 2
+		arrPeaks = numpy.frombuffer(bytPeaks[intOffset:intOffset + intBytes], dtype="<i2").reshape(intCount, intChannels, 2)
+		lstMipmaps.append((intDivision, arrPeaks))
+		intOffset += intBytes
+	assert intOffset == len(bytPeaks)
+	return intChannels, intSampleRate, bytPeaks[ReaPeaks.conSourceOffset:ReaPeaks.conSourceOffset + 8], lstMipmaps
+
+def SlowPeaks(arrSamples, intDivision):
+	lstPeaks = []
+	for intFrom in range(0, len(arrSamples), intDivision):
+		arrBlock = arrSamples[intFrom:intFrom + intDivision]
+		lstPeaks.append(numpy.stack((arrBlock.max(axis=0), arrBlock.min(axis=0)), axis=1))
+	return numpy.clip(numpy.round(numpy.array(lstPeaks) * 32767.0), -32768, 32767).astype(numpy.int64)
+
+@pytest.mark.parametrize("intFrames, intChannels, intBitsPerSample", [(1000, 2, 16), (65536, 1, 24), (ReaPeaks.conBlockFrames + 5000, 2, 16)])
+def test_PeaksMatchTheSamples(fnWriteWav, intFrames, intChannels, intBitsPerSample):
+	#the biggest one is read in two blocks
+	arrSamples = numpy.random.RandomState(intFrames).uniform(-1.0, 1.0, (intFrames, intChannels)) * numpy.linspace(0.1, 1.0, intFrames)[:, None]
+	strPath = fnWriteWav("spot.wav", arrSamples, 48000, intBitsPerSample)
+	#the samples the way they're stored in the file
+	fltScale = float(1 << (intBitsPerSample - 1))
+	arrStored = numpy.clip(numpy.round(arrSamples * fltScale), -fltScale, fltScale - 1) / fltScale
+
+	intReadChannels, intSampleRate, bytSource, lstMipmaps = ReadPeaks(ReaPeaks.BuildPeaks(strPath))
+	assert (intReadChannels, intSampleRate, bytSource) == (intChannels, 48000, bytes(8))
+	assert [intDivision for intDivision, _ in lstMipmaps] == [128, 4096, 65536]
+	for intDivision, arrPeaks in lstMipmaps:
+		assert len(arrPeaks) == -(-intFrames // intDivision)
+		assert numpy.array_equal(arrPeaks, SlowPeaks(arrStored, intDivision))
+
+def test_EmptyWav(fnWriteWav):
+	intChannels, intSampleRate, bytSource, lstMipmaps = ReadPeaks(ReaPeaks.BuildPeaks(fnWriteWav("empty.wav", numpy.zeros((0, 2)))))
+	assert intChannels == 2
+	assert [len(arrPeaks) for _, arrPeaks in lstMipmaps] == [0, 0, 0]
+
+def test_NotAWav(tmp_path):
+	strPath = str(tmp_path / "spot.wav")
+	with open(strPath, "wb") as fSpot:
+		fSpot.write(bytes(100))
+	with pytest.raises(ReaPeaks.PeakError):
+		ReaPeaks.BuildPeaks(strPath)
+
+def test_CacheWritesEveryStagedSpot(tmp_path, fnWriteWav):
+	strSrcPath = fnWriteWav("spot.wav", numpy.random.RandomState(1).uniform(-0.5, 0.5, (5000, 2)))
+	bytPeaks = ReaPeaks.BuildPeaks(strSrcPath)
+	#two stations stage the same spot
+	dictFiles = {}
+	for strStation in ("KAAA", "KBBB"):
+		os.makedirs(str(tmp_path / strStation))
+		strDestPath = str(tmp_path / strStation / "spot.wav")
+		with open(strSrcPath, "rb") as fSrc, open(strDestPath, "wb") as fDest:
+			fDest.write(fSrc.read())
+		dictFiles[strDestPath] = strSrcPath
+	dictFiles[str(tmp_path / "KCCC" / "missing.wav")] = strSrcPath
+
+	objCache = ReaPeaks.PeakCache(str(tmp_path / "cache"), ContentHash.ContentHashIndex())
+	objStats = objCache.Write(dictFiles)
+	assert (objStats.intWritten, objStats.intSkipped, objStats.intComputed) == (2, 0, 1)
+	assert list(objStats.dictErrors) == [str(tmp_path / "KCCC" / "missing.wav")]
+	del dictFiles[str(tmp_path / "KCCC" / "missing.wav")]
+	for strDestPath in dictFiles:
+		with open(strDestPath + ReaPeaks.conPeakExtension, "rb") as fPeaks:
+			bytWritten = fPeaks.read()
+		#the header has the staged copy's modified time and size, which Reaper checks
+		objStat = os.stat(strDestPath)
+		assert struct.unpack("<II", bytWritten[ReaPeaks.conSourceOffset:ReaPeaks.conSourceOffset + 8]) == (int(objStat.st_mtime), objStat.st_size)
+		assert bytWritten[:ReaPeaks.conSourceOffset] + bytes(8) + bytWritten[ReaPeaks.conSourceOffset + 8:] == bytPeaks
+		assert ReaPeaks.IsCurrent(strDestPath + ReaPeaks.conPeakExtension, ReaPeaks.SourceFields(strDestPath))
+
+	#nothing changed, so nothing is written - and once a staged copy changes its peaks are written again
+	objStats = objCache.Write(dictFiles)
+	assert (objStats.intWritten, objStats.intSkipped, objStats.intComputed) == (0, 2, 0)
+	strDestPath = str(tmp_path / "KAAA" / "spot.wav")
+	os.utime(strDestPath, (1000000, 1000000))
+	assert not ReaPeaks.IsCurrent(strDestPath + ReaPeaks.conPeakExtension, ReaPeaks.SourceFields(strDestPath))
+	objStats = objCache.Write(dictFiles)
+	assert (objStats.intWritten, objStats.intSkipped, objStats.intComputed) == (1, 1, 0)
+	assert ReaPeaks.IsCurrent(strDestPath + ReaPeaks.conPeakExtension, ReaPeaks.SourceFields(strDestPath))
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (test_RenderCache.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Tests for RenderCache.py
+#
+#Station projects are written the way RenderShow.py writes them - a RENDER_FILE with the full
+#render path and FILE elements that point at the spots staged in the project folder.
+#
+#Run with: python -m pytest (from the Python folder)
+#
+
+import os
+
+import ContentHash
+import RenderCache
+
+def Project(strRenderPath, lstFiles, strExtraLine=""):
+	lstLines = ["<REAPER_PROJECT 0.1 \"5.70/x64\" 1500000000", "  RENDER_FILE \"%s\"" % strRenderPath, "  <TRACK", "    NAME \"Station VT\""]
+	for strFile in lstFiles:
+		lstLines += ["    <ITEM", "      POSITION 60", "      <SOURCE WAVE", "        FILE \"%s\"" % strFile, "      >", "    >"]
+	lstLines += ["  >"] + ([strExtraLine] if strExtraLine else []) + [">"]
+	return [strLine + "\n" for strLine in lstLines]
+
+def Write(strPath, bytData, intModified=None):
+	os.makedirs(os.path.dirname(strPath), exist_ok=True)
+	with open(strPath, "wb") as fFile:
+		fFile.write(bytData)
+	if intModified is not None:
+		os.utime(strPath, ns=(intModified, intModified))
+	return strPath
+
+def Key(lstLines, strProjectPath, strExtra=""):
+	return RenderCache.RenderKey(lstLines, strProjectPath, ContentHash.ContentHashIndex(), strExtra)
+
+def Spots(strProjectPath, dictSpots):
+	#stage {relative path: contents} in a project folder
+	for strPath, bytData in dictSpots.items():
+		Write(os.path.join(strProjectPath, strPath), bytData)
+
+def test_KeyIsTheSameInAnyRenderFolder(tmp_path):
+	strProjectPath = str(tmp_path / "show")
+	Spots(strProjectPath, {"Audio/KAAA/one.wav": b"one"})
+	strKey = Key(Project("C:\\Renders\\show-42-KAAA.mp3", ["Audio/KAAA/one.wav"]), strProjectPath)
+	assert Key(Project("\\\\nas\\shows\\this week\\show-42-KAAA.mp3", ["Audio/KAAA/one.wav"]), strProjectPath) == strKey
+	assert Key(Project(str(tmp_path / "renders" / "show-42-KAAA.mp3"), ["Audio/KAAA/one.wav"]), strProjectPath) == strKey
+	#but the rendered file's name is part of it
+	assert Key(Project("C:\\Renders\\show-42-KBBB.mp3", ["Audio/KAAA/one.wav"]), strProjectPath) != strKey
+
+def test_KeyFollowsTheSpotsContents(tmp_path):
+	#the same spot staged in another project folder (or under an absolute path) has the same key
+	lstLines = Project("show-42-KAAA.mp3", ["Audio/KAAA/one.wav", "Audio/KAAA/two.wav"])
+	Spots(str(tmp_path / "show"), {"Audio/KAAA/one.wav": b"one", "Audio/KAAA/two.wav": b"two"})
+	Spots(str(tmp_path / "moved"), {"Audio/KAAA/one.wav": b"one", "Audio/KAAA/two.wav": b"two"})
+	strKey = Key(lstLines, str(tmp_path / "show"))
+	assert Key(lstLines, str(tmp_path / "moved")) == strKey
+	assert Key(Project("show-42-KAAA.mp3", [str(tmp_path / "show" / "Audio" / "KAAA" / "one.wav"), "Audio/KAAA/two.wav"]), str(tmp_path / "show")) == strKey
+
+	#a spot with different contents changes it, even when its name, size and modified time don't
+	Spots(str(tmp_path / "changed"), {"Audio/KAAA/one.wav": b"one", "Audio/KAAA/two.wav": b"TWO"})
+	for strProjectPath in ("show", "changed"):
+		os.utime(str(tmp_path / strProjectPath / "Audio" / "KAAA" / "two.wav"), ns=(1000000000, 1000000000))
+	assert Key(lstLines, str(tmp_path / "changed")) != strKey
+	#and so do the spots being swapped around, or one of them missing
+	assert Key(Project("show-42-KAAA.mp3", ["Audio/KAAA/two.wav", "Audio/KAAA/one.wav"]), str(tmp_path / "show")) != strKey
+	os.remove(str(tmp_path / "moved" / "Audio" / "KAAA" / "two.wav"))
+	assert Key(lstLines, str(tmp_path / "moved")) != strKey
+
+def test_KeyChangesWhenTheSpotIsReplaced(tmp_path):
+	#the hash index is kept between runs, so it has to notice a spot was replaced in place
+	strSpotPath = Write(str(tmp_path / "show" / "Audio" / "KAAA" / "one.wav"), b"one", 1000000000)
+	objHashIndex = ContentHash.ContentHashIndex(str(tmp_path / "cache"))
+	lstLines = Project("show-42-KAAA.mp3", ["Audio/KAAA/one.wav"])
+	strKey = RenderCache.RenderKey(lstLines, str(tmp_path / "show"), objHashIndex)
+	objHashIndex.Save()
+	Write(strSpotPath, b"new", 2000000000)
+	assert RenderCache.RenderKey(lstLines, str(tmp_path / "show"), ContentHash.ContentHashIndex(str(tmp_path / "cache"))) != strKey
+
+def test_KeyChangesWithTheProjectAndTheExtraText(tmp_path):
+	strKey = Key(Project("show-42-KAAA.mp3", []), str(tmp_path))
+	assert Key(Project("show-42-KAAA.mp3", []), str(tmp_path)) == strKey
+	assert Key(Project("show-42-KAAA.mp3", [], "  TEMPO 120 4 4"), str(tmp_path)) != strKey
+	assert Key(Project("show-42-KAAA.mp3", []), str(tmp_path), "TIT2=Show 42") != strKey
+
+def test_FetchAndStore(tmp_path):
+	objCache = RenderCache.RenderCache(str(tmp_path / "cache"))
+	strKey = "ab" + "0" * 62
+	strRenderPath = Write(str(tmp_path / "renders" / "show-42-KAAA.mp3"), b"render")
+	assert not objCache.Fetch(strKey, str(tmp_path / "out" / "show-42-KAAA.mp3"))
+	objCache.Store(strKey, strRenderPath)
+	#a render with another extension is another entry
+	assert not objCache.Fetch(strKey, str(tmp_path / "out" / "show-42-KAAA.wav"))
+	assert objCache.Fetch(strKey, str(tmp_path / "out" / "show-42-KAAA.mp3"))
+	assert (objCache.intHits, objCache.intStored) == (1, 1)
+	with open(str(tmp_path / "out" / "show-42-KAAA.mp3"), "rb") as fRender:
+		assert fRender.read() == b"render"
+	#the output is the user's, so editing it doesn't change the cached render
+	assert not os.path.samefile(str(tmp_path / "out" / "show-42-KAAA.mp3"), objCache.EntryPath(strKey, ".mp3"))
+	assert not os.path.samefile(strRenderPath, objCache.EntryPath(strKey, ".mp3"))
+
+def test_PruneRemovesTheLeastRecentlyUsed(tmp_path):
+	objCache = RenderCache.RenderCache(str(tmp_path / "cache"), 250)
+	lstKeys = ["%02x" % intKey + "0" * 62 for intKey in range(3)]
+	for intKey, strKey in enumerate(lstKeys):
+		objCache.Store(strKey, Write(str(tmp_path / "renders" / ("%i.wav" % intKey)), bytes(100)))
+		os.utime(objCache.EntryPath(strKey, ".wav"), (1000 + intKey, 1000 + intKey))
+	#fetching the oldest makes it the most recently used
+	assert objCache.Fetch(lstKeys[0], str(tmp_path / "out.wav"))
+	objCache.Prune()
+	assert [os.path.isfile(objCache.EntryPath(strKey, ".wav")) for strKey in lstKeys] == [True, False, True]
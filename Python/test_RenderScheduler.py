@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (test_RenderScheduler.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Tests for RenderScheduler.py
+#
+#The scheduler is run with a CommandExecutor whose command is a small stand-in renderer
+#instead of reaper.exe.  The stand-in reads the "project" the way Reaper would, writes the
+#file named by its RENDER_FILE line, and takes a few more lines that tell it how to misbehave:
+#FAIL n exits with code 3 for the first n attempts, SKIP n exits cleanly without writing the
+#file for the first n attempts and SLEEP s waits s seconds first.  Every attempt is logged, so
+#the order the jobs were started in can be checked.
+#
+#Run with: python -m pytest (from the Python folder)
+#
+
+import os
+import sys
+
+import RenderScheduler
+
+strStandInRenderer = """
+import os
+import sys
+import time
+
+strProjectPath, strLogPath = sys.argv[1], sys.argv[2]
+with open(strProjectPath, "r") as fProject:
+	dictProject = dict(strLine.split(" ", 1) for strLine in fProject.read().splitlines() if strLine)
+strAttemptsPath = strProjectPath + ".attempts"
+intAttempt = 1
+if os.path.exists(strAttemptsPath):
+	with open(strAttemptsPath, "r") as fAttempts:
+		intAttempt += int(fAttempts.read())
+with open(strAttemptsPath, "w") as fAttempts:
+	fAttempts.write(str(intAttempt))
+with open(strLogPath, "a") as fLog:
+	fLog.write(os.path.basename(strProjectPath) + "\\n")
+time.sleep(float(dictProject.get("SLEEP", "0")))
+if intAttempt <= int(dictProject.get("FAIL", "0")):
+	sys.exit(3)
+if intAttempt > int(dictProject.get("SKIP", "0")):
+	with open(dictProject["RENDER_FILE"].strip('"'), "w") as fOutput:
+		fOutput.write("rendered")
+"""
+
+def Executor(tmp_path, fltTimeout=None):
+	#a CommandExecutor that runs the stand-in renderer - returns it and the attempt log's path
+	strRendererPath = str(tmp_path / "renderer.py")
+	with open(strRendererPath, "w") as fRenderer:
+		fRenderer.write(strStandInRenderer)
+	strLogPath = str(tmp_path / "attempts.log")
+	return RenderScheduler.CommandExecutor("\"{python}\" \"%s\" \"{project}\" \"%s\"" % (strRendererPath, strLogPath), {"python": sys.executable}, fltTimeout), strLogPath
+
+def Job(tmp_path, strName, fltEstimate=10.0, **dictBehaviour):
+	#a RenderJob for a stand-in project - dictBehaviour holds the FAIL, SKIP and SLEEP lines
+	strProjectPath = str(tmp_path / (strName + ".RPP"))
+	strOutputPath = str(tmp_path / (strName + ".wav"))
+	with open(strProjectPath, "w") as fProject:
+		fProject.write("RENDER_FILE \"%s\"\n" % strOutputPath)
+		for strKeyword, objValue in dictBehaviour.items():
+			fProject.write("%s %s\n" % (strKeyword, objValue))
+	return RenderScheduler.RenderJob(strName, strProjectPath, strOutputPath, fltEstimate)
+
+def Attempts(strLogPath):
+	#the projects in the order their attempts were started
+	if not os.path.exists(strLogPath):
+		return []
+	with open(strLogPath, "r") as fLog:
+		return [os.path.splitext(strLine)[0] for strLine in fLog.read().splitlines()]
+
+def Scheduler(fnExecutor, **dictArgs):
+	return RenderScheduler.RenderScheduler(fnExecutor, fnLog=lambda strMessage: None, **dictArgs)
+
+def test_LongestJobsStartFirst(tmp_path):
+	fnExecutor, strLogPath = Executor(tmp_path)
+	objScheduler = Scheduler(fnExecutor)
+	objScheduler.Add(Job(tmp_path, "short", 10.0))
+	objScheduler.Add(Job(tmp_path, "long", 30.0))
+	objScheduler.Add(Job(tmp_path, "middle", 20.0))
+	#a short project that took a long time to render in past runs goes before all of them
+	objSlow = objScheduler.Add(Job(tmp_path, "slow", 5.0))
+	objSlow.fltExpectedSeconds = 100.0
+	objScheduler.Run()
+	assert Attempts(strLogPath) == ["slow", "long", "middle", "short"]
+
+def test_JobsOfTheSameLengthKeepTheirOrder(tmp_path):
+	fnExecutor, strLogPath = Executor(tmp_path)
+	objScheduler = Scheduler(fnExecutor)
+	for strName in ("a", "b", "c"):
+		objScheduler.Add(Job(tmp_path, strName, 10.0))
+	objScheduler.Run()
+	assert Attempts(strLogPath) == ["a", "b", "c"]
+
+def test_FailedRendersAreRetried(tmp_path):
+	fnExecutor, strLogPath = Executor(tmp_path)
+	objScheduler = Scheduler(fnExecutor, intMaxAttempts=3)
+	objJob = objScheduler.Add(Job(tmp_path, "flaky", FAIL=2))
+	objScheduler.Run()
+	assert objJob.blnSuccess
+	assert objJob.intAttempts == 3
+	assert objJob.lstAttemptErrors == ["renderer exited with code 3", "renderer exited with code 3", ""]
+	assert len(objJob.lstAttemptTimes) == 3
+	assert objJob.strError == ""
+
+def test_GivesUpAfterMaxAttempts(tmp_path):
+	fnExecutor, strLogPath = Executor(tmp_path)
+	objScheduler = Scheduler(fnExecutor, intMaxAttempts=3)
+	objJob = objScheduler.Add(Job(tmp_path, "broken", FAIL=99))
+	objScheduler.Run()
+	assert not objJob.blnSuccess
+	assert objJob.intAttempts == 3
+	assert objJob.strError == "renderer exited with code 3"
+	assert Attempts(strLogPath) == ["broken"] * 3
+
+def test_VerifyFailuresAreRetried(tmp_path):
+	#the renderer exits cleanly but doesn't write the file - the Reaper bug the retries are for
+	fnExecutor, strLogPath = Executor(tmp_path)
+	objScheduler = Scheduler(fnExecutor, intMaxAttempts=3)
+	objJob = objScheduler.Add(Job(tmp_path, "missing", SKIP=1))
+	objScheduler.Run()
+	assert objJob.blnSuccess
+	assert objJob.lstAttemptErrors == ["rendered file was not created", ""]
+
+def test_CustomVerifyFailuresAreRetried(tmp_path):
+	fnExecutor, strLogPath = Executor(tmp_path)
+	lstChecked = []
+	def Verify(objJob):
+		lstChecked.append(objJob.strName)
+		return "rendered file is too short" if len(lstChecked) == 1 else ""
+	objScheduler = Scheduler(fnExecutor, intMaxAttempts=2, fnVerify=Verify)
+	objJob = objScheduler.Add(Job(tmp_path, "short"))
+	objScheduler.Run()
+	assert objJob.blnSuccess
+	assert lstChecked == ["short", "short"]
+	assert objJob.lstAttemptErrors == ["rendered file is too short", ""]
+
+def test_VerifyIsSkippedWhenTheRendererFails(tmp_path):
+	fnExecutor, strLogPath = Executor(tmp_path)
+	lstChecked = []
+	objScheduler = Scheduler(fnExecutor, intMaxAttempts=1, fnVerify=lambda objJob: lstChecked.append(objJob) or "")
+	objScheduler.Add(Job(tmp_path, "broken", FAIL=1))
+	objScheduler.Run()
+	assert lstChecked == []
+
+def test_SuccessStepErrorsAreRetried(tmp_path):
+	fnExecutor, strLogPath = Executor(tmp_path)
+	lstCalls = []
+	def OnSuccess(objJob):
+		lstCalls.append(objJob.strName)
+		if len(lstCalls) == 1:
+			raise ValueError("unable to tag")
+	objScheduler = Scheduler(fnExecutor, intMaxAttempts=2)
+	objJob = objScheduler.Add(Job(tmp_path, "tagged"))
+	objJob.fnOnSuccess = OnSuccess
+	objScheduler.Run()
+	assert objJob.blnSuccess
+	assert objJob.lstAttemptErrors == ["ValueError: unable to tag", ""]
+
+def test_HungRenderersTimeOut(tmp_path):
+	fnExecutor, strLogPath = Executor(tmp_path, fltTimeout=1)
+	objScheduler = Scheduler(fnExecutor, intMaxAttempts=1)
+	objJob = objScheduler.Add(Job(tmp_path, "hung", SLEEP=30))
+	objScheduler.Run()
+	assert not objJob.blnSuccess
+	assert objJob.strError == "renderer timed out after 1 seconds"
+
+def test_MissingRenderer(tmp_path):
+	objScheduler = Scheduler(RenderScheduler.CommandExecutor(str(tmp_path / "no-such-renderer")), intMaxAttempts=2)
+	objJob = objScheduler.Add(Job(tmp_path, "station"))
+	objScheduler.Run()
+	assert not objJob.blnSuccess
+	assert objJob.intAttempts == 2
+	assert objJob.strError.startswith("unable to start the renderer")
+
+def test_SummaryCounts(tmp_path, capsys):
+	fnExecutor, strLogPath = Executor(tmp_path)
+	objScheduler = Scheduler(fnExecutor, intWorkers=2, intMaxAttempts=2)
+	objScheduler.Add(Job(tmp_path, "fine", 30.0))
+	objScheduler.Add(Job(tmp_path, "retried", 20.0, FAIL=1))
+	objScheduler.Add(Job(tmp_path, "failed", 10.0, FAIL=99))
+	objSummary = objScheduler.Run()
+	assert objSummary.intTotalAttempts == 5
+	assert objSummary.intSuccessCnt == 2
+	assert objSummary.intFailedAttempts == 3
+	assert [objJob.strName for objJob in objSummary.lstRetriedJobs] == ["retried", "failed"]
+	assert [objJob.strName for objJob in objSummary.lstFailedJobs] == ["failed"]
+	assert sorted(Attempts(strLogPath)) == ["failed", "failed", "fine", "retried", "retried"]
+
+	objSummary.Print()
+	strOutput = capsys.readouterr().out
+	assert "3 render(s) failed out of a total of 5 render attempt(s) for 3 station(s)" in strOutput
+	assert "Station(s) that did NOT render: failed" in strOutput
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (test_RenderWatchdog.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Tests for RenderWatchdog.py
+#
+#The MP3s are built from frame headers with silent frame bodies, which is all Mp3Duration()
+#reads.  The renders are a small stand-in for Reaper that writes its output the way it's told
+#to - steadily, not at all, or until it stalls - so the watchdog's timeouts are shortened to a
+#fraction of a second.
+#
+#Run with: python -m pytest (from the Python folder)
+#
+
+import os
+import sys
+import time
+import struct
+
+import pytest
+
+import RenderScheduler
+import RenderWatchdog
+
+numpy = pytest.importorskip("numpy")
+
+conMpeg1 = 0xFFFB9000 #MPEG-1 layer III, 128 kbps, 44100 Hz - 417 bytes and 1152 samples a frame
+conMpeg2 = 0xFFF38000 #MPEG-2 layer III, 64 kbps, 22050 Hz - 208 bytes and 576 samples a frame
+
+def Frames(intFrames, intHeader=conMpeg1):
+	intLength = RenderWatchdog.Mp3FrameHeader(struct.pack(">I", intHeader))[0]
+	return (struct.pack(">I", intHeader) + bytes(intLength - 4)) * intFrames
+
+def WriteFile(strPath, bytData):
+	with open(strPath, "wb") as fFile:
+		fFile.write(bytData)
+	return strPath
+
+def test_FrameHeaders():
+	assert RenderWatchdog.Mp3FrameHeader(struct.pack(">I", conMpeg1)) == (417, 1152, 44100)
+	assert RenderWatchdog.Mp3FrameHeader(struct.pack(">I", conMpeg1 | 0x200)) == (418, 1152, 44100)
+	assert RenderWatchdog.Mp3FrameHeader(struct.pack(">I", conMpeg2)) == (208, 576, 22050)
+	#not a frame, layer II, a free bitrate and a reserved sample rate
+	for intHeader in (0x12345678, 0xFFFD9000, 0xFFFB0000, 0xFFFB9C00):
+		assert RenderWatchdog.Mp3FrameHeader(struct.pack(">I", intHeader)) is None
+
+def test_Mp3Duration(tmp_path):
+	#an ID3v2 tag, some junk before the first frame, a Xing header frame and an ID3v1 tag
+	bytXing = bytearray(Frames(1))
+	bytXing[36:40] = b"Xing"
+	bytTag = b"ID3\x03\x00\x00" + bytes([0, 0, 1, 0]) + bytes(128)
+	strPath = WriteFile(str(tmp_path / "show.mp3"), bytTag + b"\x00\xff\x00junk" + bytes(bytXing) + Frames(100) + b"TAG" + bytes(125))
+	assert RenderWatchdog.Mp3Duration(strPath) == pytest.approx(100 * 1152 / 44100.0)
+	assert RenderWatchdog.OutputDuration(WriteFile(str(tmp_path / "low.mp3"), Frames(50, conMpeg2))) == pytest.approx(50 * 576 / 22050.0)
+
+@pytest.mark.parametrize("bytData, strError", [
+	(Frames(10)[:-100], "cut off in the middle of a frame"),
+	(Frames(5) + b"garbage" + Frames(5), "damaged at byte %i" % (5 * 417)),
+	(bytes(2000), "has no MP3 frames"),
+	(b"", "is empty"),
+], ids=["cut off", "damaged", "no frames", "empty"])
+def test_DamagedMp3(tmp_path, bytData, strError):
+	with pytest.raises(RenderWatchdog.Mp3Error) as objError:
+		RenderWatchdog.Mp3Duration(WriteFile(str(tmp_path / "show.mp3"), bytData))
+	assert strError in str(objError.value)
+
+def Job(tmp_path, strName="show.mp3", fltEstimate=10.0, **dictArgs):
+	return RenderScheduler.RenderJob("KAAA", str(tmp_path / "show.RPP"), str(tmp_path / strName), fltEstimate, **dictArgs)
+
+def test_Verifier(tmp_path, fnWriteWav):
+	objVerifier = RenderWatchdog.RenderVerifier(1.0)
+	intFrames = int(round(10.0 * 44100 / 1152))
+	WriteFile(str(tmp_path / "show.mp3"), Frames(intFrames))
+	assert objVerifier(Job(tmp_path)) == ""
+	assert objVerifier(Job(tmp_path, fltEstimate=20.0)) == "rendered file is 10.0 seconds but the project renders 20.0 seconds"
+	assert objVerifier(Job(tmp_path, fltEstimate=5.0)) == "rendered file is 10.0 seconds, longer than the 5.0 seconds the project renders"
+	#the job's render length wins over the project length, e.g. for a time selection
+	assert objVerifier(Job(tmp_path, fltEstimate=60.0, fltRenderLength=10.0)) == ""
+	WriteFile(str(tmp_path / "show.mp3"), Frames(intFrames)[:-10])
+	assert objVerifier(Job(tmp_path)).startswith("rendered file is damaged (")
+	os.remove(str(tmp_path / "show.mp3"))
+	assert objVerifier(Job(tmp_path)) == "rendered file was not created"
+
+	fnWriteWav("show.wav", numpy.zeros((8000 * 9, 2)), 8000)
+	assert objVerifier(Job(tmp_path, "show.wav")) == ""
+	assert objVerifier(Job(tmp_path, "show.wav", 12.0)) == "rendered file is 9.0 seconds but the project renders 12.0 seconds"
+	#formats that can't be read are only checked for being there
+	WriteFile(str(tmp_path / "show.flac"), b"fLaC")
+	assert objVerifier(Job(tmp_path, "show.flac")) == ""
+
+def test_Check():
+	objExecutor = RenderWatchdog.WatchdogExecutor("renderer", fltTimeout=1000.0, intBytesPerSecond=1000, fltStartTimeout=30.0, fltStallTimeout=20.0)
+	objJob = RenderScheduler.RenderJob("KAAA", "show.RPP", "show.mp3", 600.0)
+	assert objExecutor.Check(objJob, 0.0, 29.0, -1, 0.0) == ""
+	assert objExecutor.Check(objJob, 0.0, 31.0, -1, 0.0) == "renderer didn't start writing the output in 30 seconds"
+	assert objExecutor.Check(objJob, 0.0, 100.0, 300000, 90.0) == ""
+	assert objExecutor.Check(objJob, 0.0, 100.0, 300000, 70.0) == "output stopped growing at 300000 bytes (50% done) for 20 seconds"
+	assert objExecutor.Check(objJob, 0.0, 100.0, 2 * 600000 + 1024 * 1024 + 1, 100.0) == "output grew to 2248577 bytes, far more than a 600 second project needs"
+	assert objExecutor.Check(objJob, 0.0, 1001.0, 300000, 1001.0) == "renderer timed out after 1000 seconds"
+	#the job's own output rate wins
+	objJob.intBytesPerSecond = 500
+	assert objExecutor.Check(objJob, 0.0, 100.0, 300000, 70.0) == "output stopped growing at 300000 bytes (100% done) for 20 seconds"
+
+strStandInRenderer = """
+import sys
+import time
+
+strOutputPath, strMode = sys.argv[1], sys.argv[2]
+if strMode == "hang":
+	time.sleep(60)
+with open(strOutputPath, "wb") as fOutput:
+	for intBlock in range(5):
+		fOutput.write(bytes(1000))
+		fOutput.flush()
+		time.sleep(0.1)
+	if strMode == "stall":
+		time.sleep(60)
+sys.exit(3 if strMode == "fail" else 0)
+"""
+
+@pytest.mark.parametrize("strMode, strError", [
+	("ok", ""),
+	("fail", "renderer exited with code 3"),
+	("hang", "renderer didn't start writing the output in 0 seconds"),
+	("stall", "output stopped growing at 5000 bytes (50% done) for 1 seconds"),
+])
+def test_Executor(tmp_path, strMode, strError):
+	strRendererPath = WriteFile(str(tmp_path / "renderer.py"), strStandInRenderer.encode())
+	objExecutor = RenderWatchdog.WatchdogExecutor("\"{python}\" \"{renderer}\" \"{output}\" %s" % strMode, {"python": sys.executable, "renderer": strRendererPath},
+		intBytesPerSecond=1000, fltStartTimeout=0.5, fltStallTimeout=1.0, fltPollInterval=0.05)
+	fltStart = time.monotonic()
+	assert objExecutor(Job(tmp_path, fltEstimate=10.0)) == strError
+	#a stuck render is killed long before the renderer would have given up
+	assert time.monotonic() - fltStart < 30.0
+
+def test_RendererThatWontStart(tmp_path):
+	objExecutor = RenderWatchdog.WatchdogExecutor(str(tmp_path / "no-such-renderer") + " {project}")
+	assert objExecutor(Job(tmp_path)).startswith("unable to start the renderer (")
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (test_RppProject.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Tests for RppProject.py
+#
+#strMaster is a small master project with the things real ones have around the parts the
+#script edits - non-IMPORT markers, a plugin chunk that isn't indexed, an ITEM with a second
+#take and an ITEM whose elements are in a different order.  MasterFile() saves it with a
+#plugin chunk big enough for WriteSplice() to send with sendfile.
+#
+#Run with: python -m pytest (from the Python folder)
+#
+
+import pytest
+
+import RppProject
+
+strMaster = """<REAPER_PROJECT 0.1 "5.70/x64" 1500000000
+  RIPPLE 0
+  CURSOR 812.3
+  RENDER_FILE "C:\\\\old\\\\show.mp3"
+  <RENDER_CFG
+    ZXZhdxAA
+  >
+  MARKER 1 60.25 "IMPORT Spot One" 0 0 1 B {M1} 0
+  MARKER 2 120.5 "IMPORT spot two-RE" 0 0 1 B {M2} 0
+  MARKER 3 3000 "Break" 0 0 1
+  <TRACK {T1}
+    NAME "Music"
+    <FXCHAIN
+      <VST "VST: ReaEQ" reaeq.dll 0 "" 1919247729
+        NAME "not the track's name"
+        POSITION 999
+      >
+    >
+    <ITEM
+      POSITION 0
+      LENGTH 3000
+      LOOP 1
+      NAME "song"
+      <SOURCE WAVE
+        FILE "song.wav"
+      >
+    >
+  >
+  <TRACK {T2}
+    NAME "Station VT"
+    <ITEM
+      POSITION 60.25
+      LENGTH 5
+      LOOP 1
+      VOLPAN 1 0 1 -1
+      NAME "IMPORT spot one"
+      <SOURCE WAVE
+        FILE "silence.wav"
+      >
+      TAKE
+      NAME "second take"
+      <SOURCE WAVE
+        FILE "other.wav"
+      >
+    >
+    <ITEM
+      NAME "IMPORT spot two"
+      <SOURCE WAVE
+        <SOURCE WAVE
+          FILE "nested.wav"
+        >
+      >
+      LOOP 1
+      LENGTH 5
+      POSITION 115.5
+    >
+    <ITEM
+      POSITION 2000
+      LENGTH 5
+      NAME "Other thing"
+    >
+  >
+>
+"""
+
+def Parse(strText=strMaster):
+	return RppProject.ParseLines("show.RPP", strText.splitlines(True), "Station VT", "IMPORT ", "-")
+
+def Lines(objProject, lstLines):
+	#the text of some of the project's lines
+	return [objProject.lstLines[intLine].strip() for intLine in lstLines]
+
+def test_Tracks():
+	objProject = Parse()
+	assert [objTrack.strName for objTrack in objProject.lstTracks] == ["Music", "Station VT"]
+	assert objProject.objStationTrack is objProject.lstTracks[1]
+	assert [objItem.strName for objItem in objProject.lstTracks[0].lstItems] == ["song"]
+	assert [objItem.strName for objItem in objProject.lstStationItems] == ["IMPORT spot one", "IMPORT spot two", "Other thing"]
+	assert objProject.lstImportItems == objProject.lstStationItems[:2]
+	assert objProject.lstStationItems[0].objParent is objProject.objStationTrack
+
+def test_Markers():
+	objProject = Parse()
+	assert Lines(objProject, objProject.lstMarkers) == [strLine.strip() for strLine in strMaster.splitlines() if strLine.strip().startswith("MARKER")]
+	assert sorted(objProject.dictImportMarkers) == ["spot one", "spot two"]
+	objMarker = objProject.dictImportMarkers["spot two"]
+	assert (objMarker.strId, objMarker.fltPosition, objMarker.strOptions) == ("2", 120.5, "re")
+	assert objProject.dictImportMarkers["spot one"].strOptions == ""
+
+def test_ElementsAreFoundByKeyword():
+	objProject = Parse()
+	objFirst, objSecond, _ = objProject.lstStationItems
+	#the first take's NAME and FILE, not the second's
+	assert Lines(objProject, [objFirst.intPositionLine, objFirst.intLengthLine, objFirst.intLoopLine, objFirst.intNameLine, objFirst.intFileLine, objFirst.intVolPanLine]) == [
+		"POSITION 60.25", "LENGTH 5", "LOOP 1", "NAME \"IMPORT spot one\"", "FILE \"silence.wav\"", "VOLPAN 1 0 1 -1"]
+	#the elements in another order, and a FILE that's inside a nested SOURCE
+	assert Lines(objProject, objSecond.SlotLines()) == ["POSITION 115.5", "LENGTH 5", "LOOP 1", "FILE \"nested.wav\""]
+	assert objSecond.intVolPanLine == -1
+	#the plugin's NAME and POSITION belong to a chunk that isn't indexed
+	assert objProject.lstTracks[0].FindElement("POSITION") == -1
+	assert objProject.lstTracks[0].FindElement("POSITION", True) == objProject.lstTracks[0].lstItems[0].intPositionLine
+	assert objProject.RootElement("CURSOR") == 2
+
+def test_Positions():
+	objProject = Parse()
+	objFirst, objSecond, objOther = objProject.lstStationItems
+	assert (objProject.ItemPosition(objSecond), objProject.ItemEnd(objSecond)) == (115.5, 120.5)
+	assert objProject.Length() == 3000.0
+	assert objProject.Length(objProject.lstTracks[0].lstItems) == 2005.0
+
+def test_Write(tmp_path):
+	objProject = Parse()
+	objFirst = objProject.lstImportItems[0]
+	#edited for every station before the template is compiled
+	objProject.SetLine(2, "  CURSOR 0\n")
+	objProject.Compile([objProject.RootElement("RENDER_FILE")] + objFirst.SlotLines())
+	with pytest.raises(RppProject.RppError):
+		objProject.SetLine(1, "  RIPPLE 1\n")
+
+	dictEdits = {objProject.RootElement("RENDER_FILE"): "  RENDER_FILE \"KAAA.mp3\"\n", objFirst.intFileLine: objProject.FormatElement(objFirst.intFileLine, "\"KAAA-spot one.wav\""),
+		objFirst.intPositionLine: objProject.FormatElement(objFirst.intPositionLine, "61.5")}
+	objProject.Write(str(tmp_path / "KAAA.RPP"), dictEdits)
+	lstExpected = strMaster.splitlines(True)
+	lstExpected[2] = "  CURSOR 0\n"
+	for intLine, strEdit in dictEdits.items():
+		lstExpected[intLine] = strEdit
+	with open(str(tmp_path / "KAAA.RPP"), "r") as fStation:
+		assert fStation.read() == "".join(lstExpected)
+	assert dictEdits[objFirst.intFileLine] == "        FILE \"KAAA-spot one.wav\"\n"
+	#a slot a station doesn't edit keeps the master's line
+	objProject.Write(str(tmp_path / "KBBB.RPP"), {})
+	with open(str(tmp_path / "KBBB.RPP"), "r") as fStation:
+		assert fStation.read() == strMaster.replace("CURSOR 812.3", "CURSOR 0")
+
+@pytest.mark.parametrize("strText, strError", [
+	(strMaster.replace("      LOOP 1\n      LENGTH 5\n", "      LENGTH 5\n"), "LOOP element wasn't found in the ITEM starting on line 46 (IMPORT spot two)"),
+	(strMaster + ">\n", "unbalanced \">\" on line 64"),
+	(strMaster[:-2], "project ended inside the <REAPER_PROJECT chunk starting on line 1"),
+	(strMaster.replace("spot two-RE", "spot one-e"), "Duplicate marker found: \"spot one\""),
+	(strMaster.replace("MARKER 1 60.25 \"IMPORT Spot One\" 0 0 1 B {M1} 0", "MARKER 1 IMPORT "), "IMPORT marker on line 8 is missing its name"),
+	("", "show.RPP is not a Reaper project"),
+], ids=["missing element", "unbalanced", "unterminated", "duplicate marker", "marker without a name", "empty"])
+def test_Errors(strText, strError):
+	with pytest.raises(RppProject.RppError) as objError:
+		Parse(strText)
+	assert str(objError.value) == strError
+
+def test_ParseProject(tmp_path):
+	strPath = str(tmp_path / "show.RPP")
+	with open(strPath, "w") as fMaster:
+		fMaster.write(strMaster)
+	objProject = RppProject.ParseProject(strPath, "station vt", "IMPORT ", "-")
+	assert objProject.lstLines == Parse().lstLines
+	assert [objItem.strName for objItem in objProject.lstImportItems] == ["IMPORT spot one", "IMPORT spot two"]
+
+def MasterFile(tmp_path, strNewline="\n"):
+	#strMaster with a plugin chunk big enough to be sent with sendfile, saved with strNewline
+	strPlugin = "".join("        %s\n" % ("%064x" % intLine) for intLine in range(3 * RppProject.conSendfileMinBytes // 64))
+	strText = strMaster.replace("        POSITION 999\n", "        POSITION 999\n" + strPlugin).replace("\"Music\"", "\"Música\"")
+	strPath = str(tmp_path / "master.RPP")
+	with open(strPath, "wb") as fMaster:
+		fMaster.write(strText.replace("\n", strNewline).encode(RppProject.locale.getpreferredencoding(False)))
+	return strPath
+
+def CompiledMaster(strPath):
+	objProject = RppProject.ParseProject(strPath, "Station VT", "IMPORT ", "-")
+	objProject.SetLine(objProject.RootElement("CURSOR"), "  CURSOR 0\n")
+	objProject.SetLine(objProject.RootElement("RENDER_FILE"), "  RENDER_FILE \"template.mp3\"\n")
+	lstSlotLines = [objProject.RootElement("RENDER_FILE")]
+	for objItem in objProject.lstImportItems:
+		lstSlotLines.extend(objItem.SlotLines())
+	objProject.Compile(lstSlotLines)
+	return objProject
+
+def Stations(objProject):
+	#edits for a few stations - every slot, some of them, and none
+	objFirst, objSecond = objProject.lstImportItems
+	yield {objProject.RootElement("RENDER_FILE"): "  RENDER_FILE \"KAAA.mp3\"\n", objFirst.intFileLine: objProject.FormatElement(objFirst.intFileLine, "\"KAAA-spot one.wav\""),
+		objFirst.intLengthLine: objProject.FormatElement(objFirst.intLengthLine, "12.5"), objSecond.intPositionLine: objProject.FormatElement(objSecond.intPositionLine, "116"),
+		objSecond.intFileLine: objProject.FormatElement(objSecond.intFileLine, "\"KAAA-spot two ñ.wav\"")}
+	yield {objSecond.intLoopLine: objProject.FormatElement(objSecond.intLoopLine, "0")}
+	yield {}
+
+def Read(strPath):
+	with open(strPath, "rb") as fFile:
+		return fFile.read()
+
+@pytest.mark.parametrize("strSendfile", ["sendfile", "no sendfile", "sendfile fails"])
+def test_WriteSpliceMatchesWrite(tmp_path, monkeypatch, strSendfile):
+	if strSendfile == "no sendfile":
+		monkeypatch.delattr(RppProject.os, "sendfile", raising=False)
+	elif strSendfile == "sendfile fails":
+		def Sendfile(intOutFd, intInFd, intOffset, intCount):
+			raise OSError("not on this file system")
+		monkeypatch.setattr(RppProject.os, "sendfile", Sendfile, raising=False)
+	objProject = CompiledMaster(MasterFile(tmp_path))
+	for intStation, dictEdits in enumerate(Stations(objProject)):
+		objProject.Write(str(tmp_path / ("write%i.RPP" % intStation)), dictEdits)
+		objProject.WriteSplice(str(tmp_path / ("splice%i.RPP" % intStation)), dictEdits)
+		assert Read(str(tmp_path / ("splice%i.RPP" % intStation))) == Read(str(tmp_path / ("write%i.RPP" % intStation)))
+
+def test_WriteSpliceKeepsWindowsLineEnds(tmp_path):
+	objProject = CompiledMaster(MasterFile(tmp_path, "\r\n"))
+	for dictEdits in Stations(objProject):
+		objProject.Write(str(tmp_path / "write.RPP"), dictEdits)
+		objProject.WriteSplice(str(tmp_path / "splice.RPP"), dictEdits)
+		bytSplice = Read(str(tmp_path / "splice.RPP"))
+		assert bytSplice.count(b"\r\n") == bytSplice.count(b"\n")
+		assert bytSplice.replace(b"\r\n", b"\n") == Read(str(tmp_path / "write.RPP")).replace(b"\r\n", b"\n")
+
+def test_WriteSpliceChecksTheMaster(tmp_path):
+	strPath = MasterFile(tmp_path)
+	objProject = CompiledMaster(strPath)
+	with open(strPath, "ab") as fMaster:
+		fMaster.write(b"\n")
+	with pytest.raises(RppProject.RppError):
+		objProject.WriteSplice(str(tmp_path / "splice.RPP"), {})
+	#a project that wasn't read from a file has no bytes to splice
+	with pytest.raises(RppProject.RppError):
+		Parse().WriteSplice(str(tmp_path / "splice.RPP"), {})
+
+def test_SendRange(tmp_path):
+	with open(str(tmp_path / "in"), "wb") as fIn:
+		fIn.write(bytes(range(256)) * 1024)
+	with open(str(tmp_path / "in"), "rb") as fIn, open(str(tmp_path / "out"), "wb") as fOut:
+		fOut.write(b"head")
+		fOut.flush()
+		if not RppProject.SendRange(fOut, fIn, 1000, 200000):
+			pytest.skip("sendfile can't copy between files here")
+		#the file object carries on after what sendfile wrote
+		fOut.write(b"tail")
+	assert Read(str(tmp_path / "out")) == b"head" + (bytes(range(256)) * 1024)[1000:200000] + b"tail"
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (test_RunHistory.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Tests for RunHistory.py
+#
+#The jobs are the RenderJobs RenderShow.py records, with their attempts filled in the way the
+#scheduler fills them in, and the history is a database in a temporary cache folder.
+#
+#Run with: python -m pytest (from the Python folder)
+#
+
+import os
+
+import pytest
+
+import OutputEncoder
+import RenderScheduler
+import RunHistory
+import Tracing
+
+def Job(tmp_path, strName, fltLength, lstAttempts, intBytes=0):
+	#a finished station job - lstAttempts is (seconds, error) for each attempt, and the output is
+	#	written when intBytes is given
+	strOutputPath = str(tmp_path / (strName + ".wav"))
+	if intBytes:
+		with open(strOutputPath, "wb") as fOutput:
+			fOutput.write(bytes(intBytes))
+	objJob = RenderScheduler.RenderJob(strName, str(tmp_path / (strName + ".RPP")), strOutputPath, fltLength)
+	objJob.intAttempts = len(lstAttempts)
+	objJob.lstAttemptTimes = [fltSeconds for fltSeconds, _ in lstAttempts]
+	objJob.lstAttemptErrors = [strError for _, strError in lstAttempts]
+	#a cached or mixed station wasn't rendered at all
+	objJob.strError = lstAttempts[-1][1] if lstAttempts else ""
+	objJob.blnSuccess = objJob.strError == ""
+	return objJob
+
+def Run(objHistory, lstStations, dictPhases=None):
+	#record a run - lstStations is (station, RenderJob, result)
+	objHistory.BeginRun("show 42", 1)
+	for strStation, objJob, strResult in lstStations:
+		objHistory.RecordStation("42", strStation, objJob, strResult)
+	objHistory.FinishRun(dictPhases)
+
+def Rendered(tmp_path, strStation, fltLength, fltSeconds):
+	return (strStation, Job(tmp_path, strStation, fltLength, [(fltSeconds, "")], 100), "rendered")
+
+@pytest.fixture
+def objHistory(tmp_path):
+	objHistory = RunHistory.RunHistory(str(tmp_path))
+	yield objHistory
+	objHistory.Close()
+
+def test_RunIsRecorded(tmp_path, objHistory):
+	objHistory.BeginRun("show 42 --workers 2", 3)
+	objHistory.RecordStation("42", "kaaa", Job(tmp_path, "KAAA", 600.0, [(5.0, "renderer exited with code 1"), (7.5, "")], 1000), "rendered")
+	objHistory.RecordStation("42", "kbbb", Job(tmp_path, "KBBB", 600.0, [(2.0, "no output"), (3.0, "no output")]), "failed")
+	objHistory.RecordStation("42", "kccc", Job(tmp_path, "KCCC", 600.0, [], 2000), "cached")
+	objEncodeJob = OutputEncoder.EncodeJob("KAAA", str(tmp_path / "KAAA.wav"), str(tmp_path / "KAAA.wav"), OutputEncoder.ParseFormat("wav"))
+	objEncodeJob.fltSeconds = 0.25
+	objHistory.RecordEncode("42", "kaaa", objEncodeJob)
+	objHistory.FinishRun({"parse projects": [3, 1.5], "render": [2, 12.5]})
+	objHistory.Close()
+
+	#the database is found again from the cache folder
+	objConnection = RunHistory.sqlite3.connect(RunHistory.DatabasePath(str(tmp_path)))
+	assert RunHistory.DatabasePath(str(tmp_path)) == os.path.join(str(tmp_path), RunHistory.conDatabaseFilename)
+	assert objConnection.execute("SELECT id, command, shows, finished >= started FROM runs").fetchall() == [(1, "show 42 --workers 2", 3, 1)]
+	assert objConnection.execute("SELECT * FROM stations ORDER BY station").fetchall() == [
+		(1, "42", "kaaa", 600.0, "rendered", 2, 12.5, 1000, ""),
+		(1, "42", "kbbb", 600.0, "failed", 2, 5.0, None, "no output"),
+		(1, "42", "kccc", 600.0, "cached", 0, 0, 2000, "")]
+	assert objConnection.execute("SELECT * FROM attempts ORDER BY station, attempt").fetchall() == [
+		(1, "42", "kaaa", 1, 5.0, "renderer exited with code 1"), (1, "42", "kaaa", 2, 7.5, ""),
+		(1, "42", "kbbb", 1, 2.0, "no output"), (1, "42", "kbbb", 2, 3.0, "no output")]
+	assert objConnection.execute("SELECT * FROM encodes").fetchall() == [(1, "42", "kaaa", str(tmp_path / "KAAA.wav"), "WAV", 0.25, 1000, "")]
+	assert objConnection.execute("SELECT * FROM phases ORDER BY phase").fetchall() == [(1, "parse projects", 3, 1.5), (1, "render", 2, 12.5)]
+	objConnection.close()
+
+def test_RenderRates(tmp_path, objHistory):
+	assert objHistory.RenderRates() == ({}, None)
+	#only renders that worked the first time count - a retried one took longer than the render does
+	Run(objHistory, [
+		Rendered(tmp_path, "kaaa", 100.0, 10.0),
+		Rendered(tmp_path, "kbbb", 100.0, 40.0),
+		("kccc", Job(tmp_path, "KCCC", 100.0, [(1.0, "no output"), (90.0, "")], 100), "rendered"),
+		("kddd", Job(tmp_path, "KDDD", 100.0, [(1.0, "no output")]), "failed"),
+		("keee", Job(tmp_path, "KEEE", 100.0, []), "mixed")])
+	Run(objHistory, [Rendered(tmp_path, "kaaa", 200.0, 40.0), Rendered(tmp_path, "kaaa", 100.0, 30.0), Rendered(tmp_path, "kccc", 0.0, 5.0)])
+	dictRates, fltDefault = objHistory.RenderRates()
+	assert dictRates == {"kaaa": pytest.approx(0.2), "kbbb": pytest.approx(0.4)}
+	assert fltDefault == pytest.approx(0.3)
+
+def test_RenderRatesUseTheLatestRenders(tmp_path, objHistory):
+	#a station that got faster is judged by its last renders
+	for _ in range(RunHistory.conRateSamples):
+		Run(objHistory, [Rendered(tmp_path, "kaaa", 100.0, 50.0)])
+	for _ in range(RunHistory.conRateSamples):
+		Run(objHistory, [Rendered(tmp_path, "kaaa", 100.0, 10.0)])
+	assert objHistory.RenderRates()[0] == {"kaaa": pytest.approx(0.1)}
+
+def test_ExpectedSeconds(tmp_path, objHistory):
+	lstStationJobs = [(strStation, RenderScheduler.RenderJob(strStation.upper(), "", "", 600.0)) for strStation in ("kaaa", "kbbb", "knew")]
+	#no history leaves the jobs in their usual order
+	objHistory.ExpectedSeconds(lstStationJobs)
+	assert [objJob.fltExpectedSeconds for _, objJob in lstStationJobs] == [0.0, 0.0, 0.0]
+
+	Run(objHistory, [Rendered(tmp_path, "kaaa", 100.0, 10.0), Rendered(tmp_path, "kbbb", 100.0, 50.0)])
+	objHistory.ExpectedSeconds(lstStationJobs)
+	#a station that hasn't been rendered before gets the median rate
+	assert [objJob.fltExpectedSeconds for _, objJob in lstStationJobs] == [pytest.approx(60.0), pytest.approx(300.0), pytest.approx(180.0)]
+	assert [strStation for strStation, objJob in sorted(lstStationJobs, key=lambda tupJob: -tupJob[1].Priority())] == ["kbbb", "knew", "kaaa"]
+
+def test_Failures(tmp_path, objHistory):
+	Run(objHistory, [("kaaa", Job(tmp_path, "KAAA", 100.0, [(1.0, "old error")]), "failed")])
+	Run(objHistory, [
+		Rendered(tmp_path, "kaaa", 100.0, 10.0),
+		("kbbb", Job(tmp_path, "KBBB", 100.0, [(1.0, "no output"), (1.0, "stalled"), (1.0, "no output")]), "failed"),
+		("kccc", Job(tmp_path, "KCCC", 100.0, [(1.0, "stalled"), (1.0, "")], 100), "rendered"),
+		("kddd", Job(tmp_path, "KDDD", 100.0, []), "cached")])
+	lstLines = RunHistory.Failures(objHistory.objConnection, 1)
+	#the first run is left out, and so are stations that weren't rendered
+	assert [strLine.split()[0] for strLine in lstLines[1:]] == ["kbbb", "kccc", "kaaa"]
+	assert lstLines[1].split() == ["kbbb", "1", "3", "1", "1", "no", "output", "(2)"]
+	assert lstLines[2].split() == ["kccc", "1", "2", "1", "0", "stalled", "(1)"]
+	assert lstLines[3].split() == ["kaaa", "1", "1", "0", "0"]
+	assert RunHistory.Failures(objHistory.objConnection, 2)[-1].split() == ["kaaa", "2", "2", "0", "1", "old", "error", "(1)"]
+
+def test_Durations(tmp_path, objHistory):
+	Run(objHistory, [Rendered(tmp_path, "kaaa", 3600.0, 120.0), Rendered(tmp_path, "kbbb", 600.0, 30.0)])
+	Run(objHistory, [Rendered(tmp_path, "kaaa", 1800.0, 60.0), ("kbbb", Job(tmp_path, "KBBB", 100.0, [(1.0, "no output")]), "failed")])
+	#shortest show first
+	assert [strLine.split()[:5] for strLine in RunHistory.Durations(objHistory.objConnection, 2)[1:]] == [
+		["1", "42", "kbbb", "10.0", "30.0"], ["2", "42", "kaaa", "30.0", "60.0"], ["1", "42", "kaaa", "60.0", "120.0"]]
+	assert [strLine.split()[0] for strLine in RunHistory.Durations(objHistory.objConnection, 2, "kaaa")[1:]] == ["2", "1"]
+	assert [strLine.split()[0] for strLine in RunHistory.Durations(objHistory.objConnection, 1, "kaaa")[1:]] == ["2"]
+	assert RunHistory.Durations(objHistory.objConnection, 2, "kaaa")[1].split()[5] == "2.00"
+
+def test_Phases(objHistory):
+	objHistory.BeginRun("show 1", 1)
+	objHistory.FinishRun({"render": [4, 10.0], "parse projects": [1, 1.0]})
+	objHistory.BeginRun("show 2", 1)
+	objHistory.FinishRun({"render": [2, 20.0]})
+	assert [strLine.split() for strLine in RunHistory.Phases(objHistory.objConnection, 2)[1:]] == [["render", "2", "15.00", "3.0"], ["parse", "projects", "1", "1.00", "1.0"]]
+	assert [strLine.split() for strLine in RunHistory.Phases(objHistory.objConnection, 1)[1:]] == [["render", "1", "20.00", "2.0"]]
+
+def test_Runs(tmp_path, objHistory):
+	Run(objHistory, [Rendered(tmp_path, "kaaa", 100.0, 10.0), ("kbbb", Job(tmp_path, "KBBB", 100.0, []), "mixed"),
+		("kccc", Job(tmp_path, "KCCC", 100.0, [(1.0, "no output")]), "failed")])
+	objHistory.BeginRun("show 43", 2)
+	lstLines = RunHistory.Runs(objHistory.objConnection, 5)
+	#the run that hasn't finished has no time yet, and the latest run comes first
+	assert lstLines[1].split()[0:1] + lstLines[1].split()[3:] == ["2", "-", "2", "0", "0", "0", "0"]
+	assert lstLines[2].split()[0:1] + lstLines[2].split()[4:] == ["1", "1", "1", "1", "0", "1"]
+
+@pytest.mark.parametrize("objTimer", [Tracing.PhaseTimer(), Tracing.Tracer()], ids=["PhaseTimer", "Tracer"])
+def test_TakePhases(objTimer):
+	#each run's phases are recorded once - taking them starts the next run from nothing
+	with objTimer.Span("render"):
+		pass
+	tupSpan = objTimer.Begin("render")
+	objTimer.End(tupSpan)
+	with objTimer.Span("encode"):
+		pass
+	dictPhases = objTimer.TakePhases()
+	assert {strPhase: intCount for strPhase, (intCount, _) in dictPhases.items()} == {"render": 2, "encode": 1}
+	assert all(fltSeconds >= 0.0 for _, fltSeconds in dictPhases.values())
+	assert objTimer.TakePhases() == {}
+	assert Tracing.objNullTracer.TakePhases() == {}
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (test_ShowPlanner.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Tests for ShowPlanner.py
+#
+#The template is a small project built by Project() - a music track and a Station VT track
+#with an IMPORT ITEM and marker for each spot - and the stations' spots are one second WAVs.
+#
+#Run with: python -m pytest (from the Python folder)
+#
+
+import os
+
+import pytest
+
+import RppProject
+import ShowPlanner
+import SpotSampler
+import WavInfo
+
+numpy = pytest.importorskip("numpy")
+
+def Item(fltPosition, fltLength, strName, strFile):
+	return ["    <ITEM", "      POSITION %s" % fltPosition, "      LENGTH %s" % fltLength, "      LOOP 1", "      NAME \"%s\"" % strName,
+		"      <SOURCE WAVE", "        FILE \"%s\"" % strFile, "      >", "    >"]
+
+def Project(lstSpots):
+	#lstSpots is (name, position, options) for each spot on the Station VT track
+	lstLines = ["<REAPER_PROJECT 0.1 \"5.70/x64\" 1500000000"]
+	for intMarker, (strName, fltPosition, strOptions) in enumerate(lstSpots):
+		lstLines.append("  MARKER %i %s \"IMPORT %s%s\" 0 0 1" % (intMarker + 1, fltPosition, strName, "-" + strOptions if strOptions else ""))
+	lstLines += ["  <TRACK", "    NAME \"Music\""] + Item(0, 100, "song", "song.wav") + ["  >", "  <TRACK", "    NAME \"Station VT\""]
+	for strName, fltPosition, _ in lstSpots:
+		lstLines += Item(fltPosition, 5, "IMPORT " + strName, "silence.wav")
+	lstLines += ["  >", ">"]
+	return RppProject.ParseLines("show.RPP", [strLine + "\n" for strLine in lstLines], "Station VT", "IMPORT ", "-")
+
+def Planner(tmp_path, lstSpots):
+	return ShowPlanner.ShowPlanner(Project(lstSpots), "42", "DJ", str(tmp_path / "show"), str(tmp_path / "assets"), str(tmp_path / "render"), ".wav",
+		WavInfo.WavInfoCache(), SpotSampler.SpotListingCache(), SpotSampler.RotationHistory(), strSeed="seed")
+
+def Spots(tmp_path, fnWriteWav, strFolder, lstNames):
+	os.makedirs(str(tmp_path / "assets" / "Audio" / "KAAA" / strFolder), exist_ok=True)
+	for strName in lstNames:
+		os.replace(fnWriteWav(strName, numpy.zeros((8000, 2)), 8000), str(tmp_path / "assets" / "Audio" / "KAAA" / strFolder / strName))
+
+def Plan(tmp_path, lstSpots):
+	objPlanner = Planner(tmp_path, lstSpots)
+	lstProblems, lstWarnings = [], []
+	objPlan = objPlanner.PlanStation("KAAA", objPlanner.SpotItems(lstProblems), lstProblems, lstWarnings)
+	return objPlan, lstProblems, lstWarnings
+
+def test_MisnamedRandomFilesAreLeftOut(tmp_path, fnWriteWav):
+	Spots(tmp_path, fnWriteWav, "General", ["KAAA-one.wav"])
+	Spots(tmp_path, fnWriteWav, "Random spots", ["KAAA-a.wav", "KAAA-b.wav", "KBBB-c.wav"])
+	objPlan, lstProblems, lstWarnings = Plan(tmp_path, [("one", 10.0, ""), ("two", 30.0, "r"), ("three", 50.0, "r")])
+	assert lstProblems == []
+	assert sorted(objPlan.lstRandomPicks) == ["KAAA-a.wav", "KAAA-b.wav"]
+	assert [objSpot.strSrcPath for objSpot in objPlan.lstSpots] == [str(tmp_path / "assets" / "Audio" / "KAAA" / strFolder / strName)
+		for strFolder, strName in [("General", "KAAA-one.wav")] + [("Random spots", strPick) for strPick in objPlan.lstRandomPicks]]
+	assert lstWarnings == ["KAAA: \"KBBB-c.wav\" was left out of the random spots - it needs to contain [station hypen] at the beginning of the filename"]
+
+def test_MisnamedRandomFilesDontCount(tmp_path, fnWriteWav):
+	#there are two random files, but only one of them can be used
+	Spots(tmp_path, fnWriteWav, "Random spots", ["KAAA-a.wav", "KBBB-c.wav"])
+	objPlan, lstProblems, lstWarnings = Plan(tmp_path, [("two", 30.0, "r"), ("three", 50.0, "r")])
+	assert lstProblems == ["KAAA: not enough WAVs in the random spots folder to fill all the spots - expecting at least 2, found 1"]
+	assert objPlan.lstRandomPicks == []
+
+def test_RandomFilesAreOnlyCheckedWhenNeeded(tmp_path, fnWriteWav):
+	Spots(tmp_path, fnWriteWav, "General", ["KAAA-one.wav"])
+	Spots(tmp_path, fnWriteWav, "Random spots", ["KBBB-c.wav"])
+	objPlan, lstProblems, lstWarnings = Plan(tmp_path, [("one", 10.0, "")])
+	assert (lstProblems, lstWarnings, objPlan.lstRandomPicks) == ([], [], [])
+	assert [objSpot.strName for objSpot in objPlan.lstSpots] == ["one"]
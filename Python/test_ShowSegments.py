@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (test_ShowSegments.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Tests for ShowSegments.py
+#
+#The segments are cut from one WAV of the whole show the way the time range renders cut them,
+#each with a little audio past its end like a render's tail, so a join that's sample accurate
+#comes out the same as the whole show frame for frame.
+#
+#Run with: python -m pytest (from the Python folder)
+#
+
+import os
+
+import pytest
+
+import ShowSegments
+import StationMix
+import WavInfo
+
+numpy = pytest.importorskip("numpy")
+
+intRate = 8000
+
+def ReadWav(strPath):
+	#(samples as floats, WAV info)
+	objInfo = WavInfo.ReadWavInfo(strPath)
+	return StationMix.ToFloat(StationMix.MapSamples(strPath, objInfo), objInfo), objInfo
+
+def Sine(intFrames, intChannels, fltFrequency=440.0, fltLevel=0.5):
+	arrTime = numpy.arange(intFrames, dtype=numpy.float64) / intRate
+	return numpy.repeat((numpy.sin(2.0 * numpy.pi * fltFrequency * arrTime) * fltLevel)[:, None], intChannels, axis=1)
+
+def Noise(intSeed, intFrames, intChannels, fltLevel=0.5):
+	return numpy.random.RandomState(intSeed).uniform(-fltLevel, fltLevel, (intFrames, intChannels))
+
+def Segments(fnWriteWav, arrShow, lstBounds, intTail=100, intBitsPerSample=16):
+	#a WAV for each (first frame, end frame) segment of arrShow, with intTail frames of what comes
+	#	after it - returns them as JoinSegments takes them
+	lstSegments = []
+	for intSegment, (intStart, intEnd) in enumerate(lstBounds, start=1):
+		blnLast = intSegment == len(lstBounds)
+		strPath = fnWriteWav("segment%i.wav" % intSegment, arrShow[intStart:intEnd if blnLast else intEnd + intTail], intRate, intBitsPerSample)
+		lstSegments.append((strPath, None if blnLast else intEnd - intStart))
+	return lstSegments
+
+def test_SplitFrames():
+	#out of order, rounded to the nearest frame, and ones at the ends, past the show or on the
+	#	same frame are dropped
+	assert ShowSegments.SplitFrames([20.0, 0.0, 10.00004, 10.0, 30.0, -1.0, 5.5], 30.0, intRate) == [(0, 44000), (44000, 80000), (80000, 160000), (160000, 240000)]
+	assert ShowSegments.SplitFrames([1.0 / 3.0], 1.0, 44100) == [(0, 14700), (14700, 44100)]
+	assert ShowSegments.SplitFrames([], 2.5, 44100) == [(0, 110250)]
+
+@pytest.mark.parametrize("intBlockFrames", [1, 7, 1000, ShowSegments.conBlockFrames])
+def test_JoinedLikeTheWholeShow(tmp_path, fnWriteWav, intBlockFrames):
+	#the sum of a sine and noise, split at a zero crossing and at frames that aren't
+	arrShow = Sine(5 * intRate, 2) + Noise(1, 5 * intRate, 2, 0.2)
+	lstBounds = ShowSegments.SplitFrames([1.0, 2.3333, 4.9999], 5.0, intRate)
+	strShowPath = fnWriteWav("show.wav", arrShow, intRate)
+	ShowSegments.JoinSegments(Segments(fnWriteWav, arrShow, lstBounds), str(tmp_path / "KAAA.wav"), intBlockFrames)
+	arrJoined, objInfo = ReadWav(str(tmp_path / "KAAA.wav"))
+	assert (objInfo.intChannels, objInfo.intSampleRate, objInfo.intBitsPerSample) == (2, intRate, 16)
+	assert numpy.array_equal(arrJoined, ReadWav(strShowPath)[0])
+	assert not os.path.exists(str(tmp_path / "KAAA.wav.joining"))
+
+def test_OddLengthIsPadded(tmp_path, fnWriteWav):
+	#3 byte mono frames - an odd number of them needs a pad byte after the data
+	arrShow = Sine(1001, 1)
+	ShowSegments.JoinSegments(Segments(fnWriteWav, arrShow, [(0, 500), (500, 1001)], intBitsPerSample=24), str(tmp_path / "KAAA.wav"))
+	arrJoined, objInfo = ReadWav(str(tmp_path / "KAAA.wav"))
+	assert objInfo.intDataSize == 1001 * 3
+	assert os.path.getsize(str(tmp_path / "KAAA.wav")) == objInfo.intDataOffset + objInfo.intDataSize + 1
+	assert numpy.array_equal(arrJoined, ReadWav(fnWriteWav("show.wav", arrShow, intRate, 24))[0])
+
+def test_Step():
+	#a steady slope and a sine bend no more at the join than either side of it
+	arrSlope = numpy.linspace(-0.5, 0.5, 128)[:, None]
+	arrAtJoin, arrAround = ShowSegments.Step(arrSlope[:64], arrSlope[64:])
+	assert arrAtJoin[0] == pytest.approx(0.0, abs=1e-12) and arrAround[0] == pytest.approx(0.0, abs=1e-12)
+	arrSine = Sine(128, 2)
+	arrAtJoin, arrAround = ShowSegments.Step(arrSine[:64], arrSine[64:])
+	assert (arrAtJoin <= arrAround).all()
+	#a jump of 0.3 shows up in both second differences that cross the join
+	arrStepped = arrSine.copy()
+	arrStepped[64:, 1] += 0.3
+	arrAtJoin, arrAround = ShowSegments.Step(arrStepped[:64], arrStepped[64:])
+	assert arrAtJoin[0] <= arrAround[0]
+	assert arrAtJoin[1] == pytest.approx(0.3, abs=0.1) and arrAtJoin[1] > arrAround[1] * ShowSegments.conStepFactor
+
+#loud noise bends as much everywhere as it does at any join
+@pytest.mark.parametrize("arrShow", [Sine(4000, 2), Noise(2, 4000, 2, 0.9), numpy.zeros((4000, 2))], ids=["sine", "noise", "silence"])
+def test_NoStepWhereThereIsNone(tmp_path, fnWriteWav, arrShow):
+	ShowSegments.JoinSegments(Segments(fnWriteWav, arrShow, [(0, 1000), (1000, 2555), (2555, 4000)]), str(tmp_path / "KAAA.wav"))
+	assert os.path.exists(str(tmp_path / "KAAA.wav"))
+
+@pytest.mark.parametrize("fltLevel, fltStep", [(0.5, 0.5), (0.001, 0.05)], ids=["loud", "quiet"])
+def test_StepIsFound(tmp_path, fnWriteWav, fltLevel, fltStep):
+	#the second segment starts at a different level than the first one ended on, the way it does
+	#	when something that carried over the split point starts again from nothing
+	with open(str(tmp_path / "KAAA.wav"), "wb") as fOutput:
+		fOutput.write(b"last run's output")
+	arrShow = Sine(3000, 2, fltLevel=fltLevel)
+	lstSegments = Segments(fnWriteWav, arrShow, [(0, 1000), (1000, 2000), (2000, 3000)])
+	arrStepped = arrShow[2000:].copy()
+	arrStepped[:, 0] += fltStep
+	lstSegments[2] = (fnWriteWav("segment3.wav", arrStepped, intRate), None)
+	with pytest.raises(ShowSegments.SegmentError, match=r"where segments 2 and 3 join \(0.250 seconds\)"):
+		ShowSegments.JoinSegments(lstSegments, str(tmp_path / "KAAA.wav"))
+	with open(str(tmp_path / "KAAA.wav"), "rb") as fOutput:
+		assert fOutput.read() == b"last run's output"
+	assert not os.path.exists(str(tmp_path / "KAAA.wav.joining"))
+
+def test_StepBelowTheFloor(tmp_path, fnWriteWav):
+	#a step in silence that's too small to hear is let through
+	arrShow = numpy.zeros((2000, 1))
+	lstSegments = Segments(fnWriteWav, arrShow, [(0, 1000), (1000, 2000)])
+	lstSegments[1] = (fnWriteWav("segment2.wav", arrShow[1000:] + ShowSegments.conStepFloor / 2.0, intRate), None)
+	ShowSegments.JoinSegments(lstSegments, str(tmp_path / "KAAA.wav"))
+	assert os.path.exists(str(tmp_path / "KAAA.wav"))
+
+def test_ShortSegmentsArentChecked(tmp_path, fnWriteWav):
+	#there aren't enough frames either side of a 2 frame segment to tell a step from the audio,
+	#	so a click there gets through
+	arrShow = numpy.zeros((1000, 1))
+	arrShow[500:502] = 0.5
+	ShowSegments.JoinSegments(Segments(fnWriteWav, arrShow, [(0, 500), (500, 502), (502, 1000)]), str(tmp_path / "KAAA.wav"))
+	assert numpy.array_equal(ReadWav(str(tmp_path / "KAAA.wav"))[0], ReadWav(fnWriteWav("show.wav", arrShow, intRate))[0])
+	#one frame more and it's checked
+	arrShow[502] = 0.5
+	with pytest.raises(ShowSegments.SegmentError, match="segments 1 and 2"):
+		ShowSegments.JoinSegments(Segments(fnWriteWav, arrShow, [(0, 500), (500, 503), (503, 1000)]), str(tmp_path / "KAAA.wav"))
+
+def test_SegmentsThatCantBeJoined(tmp_path, fnWriteWav):
+	strOutputPath = str(tmp_path / "KAAA.wav")
+	arrShow = Sine(2000, 2)
+	lstSegments = Segments(fnWriteWav, arrShow, [(0, 1000), (1000, 2000)])
+	with pytest.raises(ShowSegments.SegmentError, match="segment 1 is 5 frame"):
+		ShowSegments.JoinSegments([(lstSegments[0][0], 1105)] + lstSegments[1:], strOutputPath)
+	with pytest.raises(ShowSegments.SegmentError, match="unable to read segment 2"):
+		ShowSegments.JoinSegments([lstSegments[0], (str(tmp_path / "missing.wav"), None)], strOutputPath)
+	with pytest.raises(ShowSegments.SegmentError, match="segment 2 isn't in the same format"):
+		ShowSegments.JoinSegments([lstSegments[0], (fnWriteWav("mono.wav", arrShow[1000:, :1], intRate), None)], strOutputPath)
+	with pytest.raises(ShowSegments.SegmentError, match="segment 2 isn't in the same format"):
+		ShowSegments.JoinSegments([lstSegments[0], (fnWriteWav("24bit.wav", arrShow[1000:], intRate, 24), None)], strOutputPath)
+	assert not os.path.exists(strOutputPath)
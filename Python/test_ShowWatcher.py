@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (test_ShowWatcher.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Tests for ShowWatcher.py
+#
+#Wait() is driven by replacing its sleep with a script of file changes, one step per poll, so
+#the tests don't depend on how fast the machine is.
+#
+#Run with: python -m pytest (from the Python folder)
+#
+
+import os
+
+import ShowWatcher
+
+def Write(strPath, bytData, intModified=None):
+	os.makedirs(os.path.dirname(strPath), exist_ok=True)
+	with open(strPath, "wb") as fFile:
+		fFile.write(bytData)
+	if intModified is not None:
+		os.utime(strPath, ns=(intModified, intModified))
+	return strPath
+
+def Inputs(tmp_path):
+	#the master project and two stations' audio folders
+	Write(str(tmp_path / "show.RPP"), b"<REAPER_PROJECT\n>\n", 1000000000)
+	for strStation in ("KAAA", "KBBB"):
+		Write(str(tmp_path / "Audio" / strStation / "General" / (strStation + "-one.wav")), b"one", 1000000000)
+	return {"master": str(tmp_path / "show.RPP"), "KAAA": str(tmp_path / "Audio" / "KAAA"), "KBBB": str(tmp_path / "Audio" / "KBBB")}
+
+def test_PathSignature(tmp_path):
+	dictInputs = Inputs(tmp_path)
+	assert ShowWatcher.PathSignature(dictInputs["master"]) == (18, 1000000000)
+	assert ShowWatcher.PathSignature(dictInputs["KAAA"]) == ((os.path.join("General", "KAAA-one.wav"), 3, 1000000000),)
+	assert ShowWatcher.PathSignature(str(tmp_path / "missing")) is None
+	#an empty folder isn't a missing one
+	os.makedirs(str(tmp_path / "empty"))
+	assert ShowWatcher.PathSignature(str(tmp_path / "empty")) == ()
+
+def test_Changed(tmp_path):
+	dictInputs = Inputs(tmp_path)
+	objWatcher = ShowWatcher.InputWatcher(dictInputs)
+	assert objWatcher.Changed() == set()
+
+	#a spot dropped into a station's random folder only affects that station
+	Write(str(tmp_path / "Audio" / "KAAA" / "Random spots" / "KAAA-new.wav"), b"new")
+	assert objWatcher.Changed() == {"KAAA"}
+	assert objWatcher.Changed() == set()
+
+	#a spot that's saved again with the same size, a renamed spot and a changed master
+	Write(str(tmp_path / "Audio" / "KBBB" / "General" / "KBBB-one.wav"), b"ONE", 2000000000)
+	assert objWatcher.Changed() == {"KBBB"}
+	os.rename(str(tmp_path / "Audio" / "KAAA" / "General" / "KAAA-one.wav"), str(tmp_path / "Audio" / "KAAA" / "General" / "KAAA-two.wav"))
+	Write(dictInputs["master"], b"<REAPER_PROJECT\n  CURSOR 0\n>\n")
+	assert objWatcher.Changed() == {"KAAA", "master"}
+
+	#a station's folder going away is a change too
+	for strDirPath, lstDirNames, lstFileNames in os.walk(dictInputs["KBBB"], topdown=False):
+		for strFileName in lstFileNames:
+			os.remove(os.path.join(strDirPath, strFileName))
+		os.rmdir(strDirPath)
+	assert objWatcher.Changed() == {"KBBB"}
+
+def test_WaitForChangesToSettle(tmp_path, monkeypatch):
+	dictInputs = Inputs(tmp_path)
+	objWatcher = ShowWatcher.InputWatcher(dictInputs, 5.0)
+	strSpotPath = str(tmp_path / "Audio" / "KAAA" / "General" / "KAAA-big.wav")
+	#nothing happens for two polls, then a spot is copied in over three polls and the master is
+	#	saved while that's going on
+	lstSteps = [
+		lambda: None,
+		lambda: None,
+		lambda: Write(strSpotPath, b"x" * 100),
+		lambda: (Write(strSpotPath, b"x" * 200), Write(dictInputs["master"], b"<REAPER_PROJECT\n  CURSOR 0\n>\n")),
+		lambda: Write(strSpotPath, b"x" * 300),
+		lambda: None,
+		lambda: Write(str(tmp_path / "Audio" / "KBBB" / "later.wav"), b"later"),
+		lambda: None,
+	]
+	lstSleeps = []
+	def Sleep(fltSeconds):
+		lstSleeps.append(fltSeconds)
+		lstSteps.pop(0)()
+	monkeypatch.setattr(ShowWatcher.time, "sleep", Sleep)
+
+	assert objWatcher.Wait() == {"KAAA", "master"}
+	#it came back on the first quiet poll after the copy finished
+	assert lstSleeps == [5.0] * 6
+	assert objWatcher.Wait() == {"KBBB"}
+	assert lstSteps == []
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (test_SpotConditioning.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Tests for SpotConditioning.py
+#
+#Run with: python -m pytest (from the Python folder)
+#
+
+import os
+import math
+
+import pytest
+
+import WavInfo
+import StationMix
+import ContentHash
+import SpotConditioning
+
+numpy = pytest.importorskip("numpy")
+
+def Sine(intFrames, intRate, fltFrequency=1000.0, fltLevel=0.5, fltPhase=0.0):
+	return fltLevel * numpy.sin(2.0 * math.pi * fltFrequency * numpy.arange(intFrames) / float(intRate) + fltPhase)
+
+def ReadWav(strPath):
+	#(WavInfo, float samples) of a WAV
+	objInfo = WavInfo.ReadWavInfo(strPath)
+	arrSamples = StationMix.MapSamples(strPath, objInfo)
+	arrFloat = StationMix.ToFloat(arrSamples, objInfo)
+	del arrSamples
+	return objInfo, arrFloat
+
+def test_TrimRange(fnWriteWav):
+	#the loud part starts and ends in different blocks than the search does
+	arrSamples = numpy.zeros((1000, 2))
+	arrSamples[123, 1] = 0.01
+	arrSamples[876, 0] = -0.01
+	strPath = fnWriteWav("spot.wav", arrSamples, 48000, 24)
+	objInfo = WavInfo.ReadWavInfo(strPath)
+	arrMapped = StationMix.MapSamples(strPath, objInfo)
+	for intBlockFrames in (7, 100, 1000, 4096):
+		assert SpotConditioning.TrimRange(arrMapped, objInfo, -60.0, intBlockFrames) == (123, 877)
+	#the threshold is the level given - -40 dBFS is 0.01, which isn't louder than itself
+	assert SpotConditioning.TrimRange(arrMapped, objInfo, -40.0, 100) == (0, 1000)
+	del arrMapped
+
+def test_TrimRangeOneLoudFrame(fnWriteWav):
+	arrSamples = numpy.zeros((500, 1))
+	arrSamples[499] = 0.5
+	strPath = fnWriteWav("spot.wav", arrSamples, 44100, 16)
+	objInfo = WavInfo.ReadWavInfo(strPath)
+	arrMapped = StationMix.MapSamples(strPath, objInfo)
+	assert SpotConditioning.TrimRange(arrMapped, objInfo, -60.0, 64) == (499, 500)
+	del arrMapped
+
+def test_SpotInTheFormatIsCopied(tmp_path, fnWriteWav):
+	#a cosine, so there's no silent first sample to trim
+	strSrcPath = fnWriteWav("spot.wav", numpy.repeat(Sine(4800, 48000, fltPhase=math.pi / 2)[:, None], 2, axis=1), 48000, 24)
+	strDestPath = str(tmp_path / "conditioned.wav")
+	SpotConditioning.ConditionSpot(strSrcPath, strDestPath, SpotConditioning.SpotFormat(48000, 2, 24))
+	with open(strSrcPath, "rb") as fSrc, open(strDestPath, "rb") as fDest:
+		assert fSrc.read() == fDest.read()
+
+def test_SilenceIsTrimmed(tmp_path, fnWriteWav):
+	arrSamples = numpy.concatenate((numpy.zeros(1000), Sine(4800, 48000), numpy.zeros(2000)))
+	strSrcPath = fnWriteWav("spot.wav", numpy.repeat(arrSamples[:, None], 2, axis=1), 48000, 24)
+	strDestPath = str(tmp_path / "conditioned.wav")
+	SpotConditioning.ConditionSpot(strSrcPath, strDestPath, SpotConditioning.SpotFormat(48000, 2, 24))
+	objInfo, arrFloat = ReadWav(strDestPath)
+	#the sine's first sample is 0, so it starts one frame in
+	assert objInfo.intFrames == 4799
+	assert numpy.abs(arrFloat - arrSamples[1001:5800, None]).max() < 1e-6
+
+@pytest.mark.parametrize("intSrcRate, intDestRate", [(44100, 48000), (48000, 44100), (22050, 48000), (96000, 48000)])
+def test_Resample(tmp_path, fnWriteWav, intSrcRate, intDestRate):
+	#a 1 kHz sine is still a 1 kHz sine at the same level, and DC stays at exactly the same level
+	intFrames = intSrcRate
+	arrSamples = numpy.stack((Sine(intFrames, intSrcRate), numpy.full(intFrames, 0.25)), axis=1)
+	strSrcPath = fnWriteWav("spot.wav", arrSamples, intSrcRate, 32, True)
+	strDestPath = str(tmp_path / "conditioned.wav")
+	SpotConditioning.ConditionSpot(strSrcPath, strDestPath, SpotConditioning.SpotFormat(intDestRate, 2, 32), -200.0)
+	objInfo, arrFloat = ReadWav(strDestPath)
+	assert objInfo.intSampleRate == intDestRate
+	assert objInfo.intFrames == intDestRate
+	#the ends are left out, where the filter runs into the silence either side of the spot
+	arrMiddle = slice(intDestRate // 10, intDestRate - intDestRate // 10)
+	assert numpy.abs(arrFloat[arrMiddle, 0] - Sine(intDestRate, intDestRate)[arrMiddle]).max() < 1e-4
+	assert numpy.abs(arrFloat[arrMiddle, 1] - 0.25).max() < 1e-6
+
+def test_ResampleBlocksMatchOneBlock(fnWriteWav):
+	arrSamples = numpy.random.RandomState(1).uniform(-0.5, 0.5, (3000, 2))
+	strPath = fnWriteWav("noise.wav", arrSamples, 44100, 32, True)
+	objInfo = WavInfo.ReadWavInfo(strPath)
+	arrMapped = StationMix.MapSamples(strPath, objInfo)
+	arrWhole = numpy.concatenate(list(SpotConditioning.Resample(arrMapped, objInfo, 100, 2900, 48000, 100000)))
+	arrBlocks = numpy.concatenate(list(SpotConditioning.Resample(arrMapped, objInfo, 100, 2900, 48000, 777)))
+	del arrMapped
+	assert len(arrWhole) == SpotConditioning.OutputFrames(2800, 160, 147)
+	assert numpy.array_equal(arrWhole, arrBlocks)
+
+def test_Remix():
+	arrMono = numpy.array([[0.5], [-0.25]])
+	assert numpy.array_equal(SpotConditioning.Remix(arrMono, 2), [[0.5, 0.5], [-0.25, -0.25]])
+	arrStereo = numpy.array([[0.5, 0.25], [-0.5, 0.5]])
+	assert numpy.array_equal(SpotConditioning.Remix(arrStereo, 1), [[0.375], [0.0]])
+	assert SpotConditioning.Remix(numpy.zeros((5, 6)), 2).shape == (5, 2)
+	with pytest.raises(SpotConditioning.ConditionError):
+		SpotConditioning.Remix(arrStereo, 3)
+
+def test_MonoToStereo16Bit(tmp_path, fnWriteWav):
+	strSrcPath = fnWriteWav("spot.wav", Sine(4800, 48000), 48000, 24)
+	strDestPath = str(tmp_path / "conditioned.wav")
+	SpotConditioning.ConditionSpot(strSrcPath, strDestPath, SpotConditioning.SpotFormat(None, 2, 16))
+	objInfo, arrFloat = ReadWav(strDestPath)
+	assert (objInfo.intSampleRate, objInfo.intChannels, objInfo.intBitsPerSample) == (48000, 2, 16)
+	assert numpy.array_equal(arrFloat[:, 0], arrFloat[:, 1])
+
+def test_NotAWav(tmp_path):
+	strSrcPath = str(tmp_path / "spot.wav")
+	with open(strSrcPath, "wb") as fSpot:
+		fSpot.write(bytes(100))
+	with pytest.raises(SpotConditioning.ConditionError):
+		SpotConditioning.ConditionSpot(strSrcPath, str(tmp_path / "conditioned.wav"), SpotConditioning.SpotFormat())
+
+def test_ConditionerCachesByContent(tmp_path, fnWriteWav):
+	objFormat = SpotConditioning.SpotFormat(48000, 2, 24)
+	strSrcPath = fnWriteWav("spot.wav", Sine(4410, 44100), 44100, 16)
+	objConditioner = SpotConditioning.SpotConditioner(str(tmp_path / "cache"), ContentHash.ContentHashIndex())
+	strEntryPath = objConditioner.Get(strSrcPath, objFormat)
+	assert objConditioner.Get(strSrcPath, objFormat) == strEntryPath
+	assert objConditioner.intConditioned == 1
+	assert WavInfo.ReadWavInfo(strEntryPath).intSampleRate == 48000
+
+	#a spot that changed gets its own entry, and another format is another entry
+	fnWriteWav("spot.wav", Sine(8820, 44100), 44100, 16)
+	assert objConditioner.Get(strSrcPath, objFormat) != strEntryPath
+	assert objConditioner.Get(strSrcPath, SpotConditioning.SpotFormat(44100, 1, 16)) != strEntryPath
+	assert objConditioner.intConditioned == 3
+	assert not [strName for _, _, lstNames in os.walk(str(tmp_path / "cache")) for strName in lstNames if ".tmp" in strName]
+
+def test_PruneKeepsEntriesInUse(tmp_path, fnWriteWav):
+	objFormat = SpotConditioning.SpotFormat(48000, 2, 24)
+	strCachePath = str(tmp_path / "cache")
+	objConditioner = SpotConditioning.SpotConditioner(strCachePath, ContentHash.ContentHashIndex())
+	lstEntries = [objConditioner.Get(fnWriteWav("spot%i.wav" % intSpot, Sine(4800 * (intSpot + 1), 48000)), objFormat) for intSpot in range(3)]
+	#the first entry was used the longest time ago
+	for intEntry, strEntryPath in enumerate(lstEntries):
+		os.utime(strEntryPath, (1000000 + intEntry, os.stat(strEntryPath).st_mtime))
+
+	#a new run only uses the last spot, and the cache only has room for two of them
+	objConditioner = SpotConditioning.SpotConditioner(strCachePath, ContentHash.ContentHashIndex(), os.path.getsize(lstEntries[1]) + os.path.getsize(lstEntries[2]))
+	objConditioner.Get(str(tmp_path / "spot2.wav"), objFormat)
+	objConditioner.Prune()
+	assert [os.path.exists(strEntryPath) for strEntryPath in lstEntries] == [False, True, True]
+	assert objConditioner.intConditioned == 0
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (test_SpotPreview.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Tests for SpotPreview.py
+#
+#A joined preview is checked frame for frame - each window's WAV has to come through as it is,
+#with exactly one tone between windows, at the positions the index gives.
+#
+#Run with: python -m pytest (from the Python folder)
+#
+
+import os
+import json
+
+import pytest
+
+import SpotPreview
+import StationMix
+import WavInfo
+
+numpy = pytest.importorskip("numpy")
+
+intRate = 8000
+intToneFrames = int(round(SpotPreview.conToneSeconds * intRate))
+
+def ReadWav(strPath):
+	#(samples as floats, WAV info)
+	objInfo = WavInfo.ReadWavInfo(strPath)
+	return StationMix.ToFloat(StationMix.MapSamples(strPath, objInfo), objInfo), objInfo
+
+def Noise(intSeed, intFrames, intChannels, fltLevel=0.5):
+	return numpy.random.RandomState(intSeed).uniform(-fltLevel, fltLevel, (intFrames, intChannels))
+
+def Window(fnWriteWav, strName, fltStart, arrSamples, intBitsPerSample=16):
+	objWindow = SpotPreview.PreviewWindow(fltStart, fltStart + len(arrSamples) / float(intRate), [strName])
+	objWindow.strPath = fnWriteWav(strName + ".wav", arrSamples, intRate, intBitsPerSample)
+	return objWindow
+
+def Spans(lstWindows):
+	return [(objWindow.fltStart, objWindow.fltEnd, objWindow.lstNames) for objWindow in lstWindows]
+
+def test_Windows():
+	lstSpots = [("late", 100.0, 30.0), ("first", 2.0, 10.0), ("middle", 50.0, 20.0)]
+	#out of order, the first one starts less than fltBefore into the show and the last one's
+	#	after audio is cut off where the show ends
+	assert Spans(SpotPreview.Windows(lstSpots, 133.0, 5.0, 4.0)) == [(0.0, 16.0, ["first"]), (45.0, 74.0, ["middle"]), (95.0, 133.0, ["late"])]
+
+def test_OverlappingWindowsAreJoined():
+	lstSpots = [("a", 10.0, 10.0), ("b", 30.0, 5.0), ("c", 45.0, 2.0), ("d", 31.0, 1.0), ("e", 60.0, 5.0)]
+	#a's window ends where b's starts, d's is inside b's and c's starts where b's ends
+	assert Spans(SpotPreview.Windows(lstSpots, 300.0, 7.0, 3.0)) == [(3.0, 50.0, ["a", "b", "d", "c"]), (53.0, 68.0, ["e"])]
+
+def test_SpotRunningPastTheShow():
+	#the spot itself is kept even though the show ends before it does - only the after audio
+	#	that isn't there is left off
+	assert Spans(SpotPreview.Windows([("a", 95.0, 10.0)], 100.0)) == [(90.0, 105.0, ["a"])]
+	assert SpotPreview.Windows([], 100.0) == []
+
+@pytest.mark.parametrize("intBlockFrames", [1, 7, 1000, SpotPreview.conBlockFrames])
+def test_JoinWindows(tmp_path, fnWriteWav, intBlockFrames):
+	lstSamples = [Noise(1, 3000, 2), Noise(2, 1, 2), Noise(3, 2501, 2)]
+	lstWindows = [Window(fnWriteWav, "window%i" % intWindow, fltStart, arrSamples) for intWindow, (fltStart, arrSamples) in enumerate(zip((0.0, 12.5, 60.0), lstSamples))]
+	lstWindows[2].lstNames.append("next")
+	strIndexPath = str(tmp_path / "KAAA-preview.json")
+	lstIndex = SpotPreview.JoinWindows(lstWindows, str(tmp_path / "KAAA-preview.wav"), strIndexPath, intBlockFrames)
+
+	arrPreview, objInfo = ReadWav(str(tmp_path / "KAAA-preview.wav"))
+	assert (objInfo.intChannels, objInfo.intSampleRate, objInfo.intBitsPerSample) == (2, intRate, 16)
+	assert len(arrPreview) == 3000 + 1 + 2501 + 2 * intToneFrames
+	intPosition = 0
+	for intWindow, objWindow in enumerate(lstWindows):
+		arrWindow = ReadWav(objWindow.strPath)[0]
+		assert lstIndex[intWindow] == {"spots": objWindow.lstNames, "preview": round(intPosition / float(intRate), 3),
+			"show": [round(objWindow.fltStart, 3), round(objWindow.fltEnd, 3)]}
+		assert numpy.array_equal(arrPreview[intPosition:intPosition + len(arrWindow)], arrWindow)
+		intPosition += len(arrWindow) + intToneFrames
+	with open(strIndexPath, "r") as fIndex:
+		assert json.load(fIndex) == {"file": str(tmp_path / "KAAA-preview.wav"), "windows": lstIndex}
+	assert not os.path.exists(str(tmp_path / "KAAA-preview.wav.joining"))
+
+def test_Tone(tmp_path, fnWriteWav):
+	lstWindows = [Window(fnWriteWav, "first", 0.0, numpy.zeros((100, 1))), Window(fnWriteWav, "second", 10.0, numpy.zeros((100, 1)))]
+	SpotPreview.JoinWindows(lstWindows, str(tmp_path / "KAAA-preview.wav"), intBlockFrames=7)
+	arrTone = ReadWav(str(tmp_path / "KAAA-preview.wav"))[0][100:100 + intToneFrames, 0]
+	fltLevel = 10.0 ** (SpotPreview.conToneLevel / 20.0)
+	#it's at the tone's level, and fades in and out so the windows don't click into it
+	assert numpy.max(numpy.abs(arrTone)) == pytest.approx(fltLevel, abs=0.01)
+	assert numpy.max(numpy.abs(arrTone[:3])) < 0.01 and numpy.max(numpy.abs(arrTone[-3:])) < 0.01
+	#a 1kHz tone crosses zero 2000 times a second
+	assert numpy.count_nonzero(numpy.diff(numpy.sign(arrTone[arrTone != 0.0])) != 0) == pytest.approx(SpotPreview.conToneFrequency * 2 * SpotPreview.conToneSeconds, abs=2)
+
+def test_OddLengthIsPadded(tmp_path, fnWriteWav):
+	#3 byte mono frames - an odd number of them needs a pad byte after the data
+	lstWindows = [Window(fnWriteWav, "first", 0.0, Noise(4, 101, 1), 24), Window(fnWriteWav, "second", 10.0, Noise(5, 200, 1), 24)]
+	SpotPreview.JoinWindows(lstWindows, str(tmp_path / "KAAA-preview.wav"))
+	arrPreview, objInfo = ReadWav(str(tmp_path / "KAAA-preview.wav"))
+	assert objInfo.intDataSize == (301 + intToneFrames) * 3
+	assert os.path.getsize(str(tmp_path / "KAAA-preview.wav")) == objInfo.intDataOffset + objInfo.intDataSize + 1
+	assert numpy.array_equal(arrPreview[-200:], ReadWav(lstWindows[1].strPath)[0])
+
+def test_MixedWindowsMatchTheShow(tmp_path, fnWriteWav):
+	#windows mixed from the common mix are the same audio as the whole station mix
+	strCommonPath = fnWriteWav("common.wav", Noise(6, 20 * intRate, 2, 0.3), intRate)
+	lstMixSpots = [StationMix.MixSpot(fnWriteWav("spot1.wav", Noise(7, 2 * intRate, 1), intRate), 3.0),
+		StationMix.MixSpot(fnWriteWav("spot2.wav", Noise(8, intRate, 2), intRate), 14.5, 0.5)]
+	StationMix.MixStation(strCommonPath, lstMixSpots, str(tmp_path / "KAAA.wav"))
+	arrShow = ReadWav(str(tmp_path / "KAAA.wav"))[0]
+
+	lstWindows = SpotPreview.Windows([("spot2", 14.5, 1.0), ("spot1", 3.0, 2.0)], 20.0, 2.0, 1.5)
+	for intWindow, objWindow in enumerate(lstWindows, start=1):
+		objWindow.strPath = str(tmp_path / ("KAAA-preview%i.wav" % intWindow))
+		StationMix.MixStation(strCommonPath, lstMixSpots, objWindow.strPath, fltStart=objWindow.fltStart, fltEnd=objWindow.fltEnd)
+	lstIndex = SpotPreview.JoinWindows(lstWindows, str(tmp_path / "KAAA-preview.wav"))
+	arrPreview = ReadWav(str(tmp_path / "KAAA-preview.wav"))[0]
+
+	assert [dictWindow["show"] for dictWindow in lstIndex] == [[1.0, 6.5], [12.5, 17.0]]
+	assert numpy.array_equal(arrPreview[:int(5.5 * intRate)], arrShow[int(1.0 * intRate):int(6.5 * intRate)])
+	intSecond = int(5.5 * intRate) + intToneFrames
+	assert lstIndex[1]["preview"] == intSecond / float(intRate)
+	assert numpy.array_equal(arrPreview[intSecond:], arrShow[int(12.5 * intRate):int(17.0 * intRate)])
+
+def test_WindowsThatCantBeJoined(tmp_path, fnWriteWav):
+	strOutputPath = str(tmp_path / "KAAA-preview.wav")
+	with pytest.raises(SpotPreview.PreviewError):
+		SpotPreview.JoinWindows([], strOutputPath)
+	objMissing = SpotPreview.PreviewWindow(0.0, 1.0, ["missing"])
+	objMissing.strPath = str(tmp_path / "missing.wav")
+	with pytest.raises(SpotPreview.PreviewError, match="unable to read"):
+		SpotPreview.JoinWindows([Window(fnWriteWav, "first", 0.0, Noise(9, 100, 2)), objMissing], strOutputPath)
+	#every window has to be in the same format
+	with pytest.raises(SpotPreview.PreviewError, match="same format"):
+		SpotPreview.JoinWindows([Window(fnWriteWav, "first", 0.0, Noise(9, 100, 2)), Window(fnWriteWav, "mono", 10.0, Noise(10, 100, 1))], strOutputPath)
+	with pytest.raises(SpotPreview.PreviewError, match="same format"):
+		SpotPreview.JoinWindows([Window(fnWriteWav, "first", 0.0, Noise(9, 100, 2)), Window(fnWriteWav, "24bit", 10.0, Noise(11, 100, 2), 24)], strOutputPath)
+	assert sorted(os.listdir(str(tmp_path))) == ["24bit.wav", "first.wav", "mono.wav"]
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (test_SpotSampler.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Tests for SpotSampler.py
+#
+#The rotation history's clock is set by each test, so the order the shows aired in is known.
+#
+#Run with: python -m pytest (from the Python folder)
+#
+
+import random
+
+import SpotSampler
+
+lstSpots = ["KAAA-spot%02i.wav" % intSpot for intSpot in range(12)]
+
+def Air(objHistory, monkeypatch, fltTime, strShow, intCount=4):
+	#pick and record a show's spots the way ShowPlanner and RenderShow do, with the clock at fltTime
+	monkeypatch.setattr(SpotSampler.time, "time", lambda: fltTime)
+	lstPicks = SpotSampler.PickSpots(lstSpots, intCount, objHistory.LastAired("KAAA", strShow), random.Random("seed-%s-KAAA" % strShow))
+	objHistory.Record("KAAA", strShow, lstPicks)
+	return lstPicks
+
+def test_PicksTheSpotsThatAiredLongestAgo():
+	dictLastAired = {strSpot: float(intSpot) for intSpot, strSpot in enumerate(lstSpots[:10])}
+	#two have never aired, and the next two are the oldest
+	assert sorted(SpotSampler.PickSpots(lstSpots, 4, dictLastAired, random.Random(1))) == sorted(lstSpots[10:] + lstSpots[:2])
+
+def test_ShowsDontRepeatSpots(monkeypatch):
+	objHistory = SpotSampler.RotationHistory()
+	lstFirst = Air(objHistory, monkeypatch, 100.0, "1")
+	lstSecond = Air(objHistory, monkeypatch, 200.0, "2")
+	lstThird = Air(objHistory, monkeypatch, 300.0, "3")
+	assert sorted(lstFirst + lstSecond + lstThird) == lstSpots
+
+def test_RerunOfAnOlderShowPicksTheSameSpots(monkeypatch, tmp_path):
+	objHistory = SpotSampler.RotationHistory(str(tmp_path))
+	Air(objHistory, monkeypatch, 100.0, "1")
+	lstSecond = Air(objHistory, monkeypatch, 200.0, "2")
+	dictLastAired = objHistory.LastAired("KAAA", "2")
+	#a later show is recorded, and the history is saved and loaded again
+	Air(objHistory, monkeypatch, 300.0, "3")
+	objHistory.Save()
+	objHistory = SpotSampler.RotationHistory(str(tmp_path))
+
+	assert objHistory.LastAired("KAAA", "2") == dictLastAired
+	assert Air(objHistory, monkeypatch, 400.0, "2") == lstSecond
+	#the re-run keeps the time the show first aired
+	assert objHistory.Shows("KAAA")["2"][0] == 200.0
+
+def test_NewShowCountsEveryShow(monkeypatch):
+	objHistory = SpotSampler.RotationHistory()
+	Air(objHistory, monkeypatch, 100.0, "1")
+	Air(objHistory, monkeypatch, 200.0, "2")
+	assert objHistory.LastAired("KAAA", "3") == objHistory.LastAired("KAAA", "0") == {strSpot: fltTime for fltTime, strShow in ((100.0, "1"), (200.0, "2"))
+		for strSpot in objHistory.Shows("KAAA")[strShow][1]}
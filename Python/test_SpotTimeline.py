@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (test_SpotTimeline.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Tests for SpotTimeline.py
+#
+#Run with: python -m pytest (from the Python folder)
+#
+
+import random
+
+import pytest
+
+import SpotTimeline
+
+def Spans(*tupSpans):
+	#TimelineSpans from (start, end, key) tuples
+	return [SpotTimeline.TimelineSpan(fltStart, fltEnd, keySpan) for fltStart, fltEnd, keySpan in tupSpans]
+
+def test_Chains():
+	#a and b touch, b and c are a hair apart (inside the tolerance), d is on its own
+	lstSpans = Spans((10.0, 15.0, "b"), (0.0, 10.0, "a"), (15.005, 20.0, "c"), (30.0, 40.0, "d"))
+	assert SpotTimeline.Chains(lstSpans) == {("a", "b"), ("b", "c")}
+
+def test_Overlaps():
+	objTimeline = SpotTimeline.SpotTimeline(Spans((0.0, 10.0, "a"), (8.0, 12.0, "b"), (12.0, 20.0, "c"), (25.0, 30.0, "d"), (29.995, 35.0, "e")))
+	#b and c only touch, and d and e overlap by less than the tolerance
+	assert objTimeline.Overlaps() == [("a", "b", pytest.approx(2.0))]
+
+def test_OverlapsAreWithTheLongestEarlierSpot():
+	#c starts after b has ended but while a is still going - and a spot inside another overlaps by its own length
+	objTimeline = SpotTimeline.SpotTimeline(Spans((0.0, 30.0, "a"), (5.0, 10.0, "b"), (20.0, 40.0, "c")))
+	assert objTimeline.Overlaps() == [("a", "b", pytest.approx(5.0)), ("a", "c", pytest.approx(10.0))]
+
+def test_Gaps():
+	setChains = {("a", "b"), ("b", "c"), ("c", "gone")}
+	objTimeline = SpotTimeline.SpotTimeline(Spans((0.0, 8.0, "a"), (10.0, 14.0, "b"), (14.005, 20.0, "c"), (50.0, 60.0, "d")))
+	#b to c is inside the tolerance, and a spot that wasn't placed has no gap
+	assert objTimeline.Gaps(setChains) == [("a", "b", pytest.approx(2.0))]
+
+def test_RippleClosesChainedGaps():
+	setChains = {("a", "b"), ("b", "c")}
+	objTimeline = SpotTimeline.SpotTimeline(Spans((0.0, 8.0, "a"), (10.0, 14.0, "b"), (16.0, 20.0, "c"), (50.0, 60.0, "d")))
+	assert objTimeline.Ripple(setChains) == {"b": 8.0, "c": 12.0}
+
+def test_RipplePushesIntoTheNextSpot():
+	#a runs long and pushes b, and b then runs into c even though c wasn't chained to it, so c
+	#	is pushed too - d is far enough away to stay where it is
+	objTimeline = SpotTimeline.SpotTimeline(Spans((0.0, 13.0, "a"), (10.0, 15.0, "b"), (17.0, 20.0, "c"), (40.0, 45.0, "d")))
+	dictStarts = objTimeline.Ripple(set())
+	assert dictStarts == {"b": 13.0, "c": 18.0}
+	objRippled = SpotTimeline.SpotTimeline(Spans((0.0, 13.0, "a"), (13.0, 18.0, "b"), (18.0, 21.0, "c"), (40.0, 45.0, "d")))
+	assert objRippled.Overlaps() == []
+
+def test_RippleLeavesSpotsThatFit():
+	objTimeline = SpotTimeline.SpotTimeline(Spans((0.0, 5.0, "a"), (10.0, 15.0, "b")))
+	assert objTimeline.Ripple({("a", "c")}) == {}
+
+def test_Collisions():
+	lstProgram = Spans((0.0, 60.0, "bed"), (100.0, 110.0, "talk"), (120.0, 125.0, "id"), (200.0, 201.0, "short"))
+	lstSpots = Spans(
+		(50.0, 70.0, "runs past the bed"),
+		(95.0, 130.0, "covers talk and id"),
+		#talk starts inside this one
+		(90.0, 102.0, "talk starts inside"),
+		(110.0, 120.0, "between"),
+		(200.0, 200.005, "inside the tolerance"))
+	lstCollisions = SpotTimeline.SpotTimeline(lstSpots, lstProgram).Collisions()
+	assert sorted((keySpan, keyFixed, round(fltSeconds, 6)) for keySpan, keyFixed, fltSeconds in lstCollisions) == [
+		("covers talk and id", "id", 5.0), ("covers talk and id", "talk", 10.0), ("runs past the bed", "bed", 10.0), ("talk starts inside", "talk", 2.0)]
+
+def test_CollisionsMatchEveryPair():
+	#the single pass finds the same collisions as checking every spot against every program ITEM
+	objRandom = random.Random(3)
+	for _ in range(200):
+		lstSpots = [(fltStart, fltStart + objRandom.uniform(0.5, 30.0), "spot%i" % intSpot) for intSpot, fltStart in enumerate(objRandom.uniform(0.0, 300.0) for _ in range(20))]
+		lstProgram = [(fltStart, fltStart + objRandom.uniform(0.5, 60.0), "item%i" % intItem) for intItem, fltStart in enumerate(objRandom.uniform(0.0, 300.0) for _ in range(10))]
+		setExpected = {(keySpot, keyItem) for fltStart, fltEnd, keySpot in lstSpots for fltItemStart, fltItemEnd, keyItem in lstProgram
+			if min(fltEnd, fltItemEnd) - max(fltStart, fltItemStart) > SpotTimeline.conTouchTolerance}
+		lstCollisions = SpotTimeline.SpotTimeline(Spans(*lstSpots), Spans(*lstProgram)).Collisions()
+		assert len(lstCollisions) == len(setExpected)
+		assert {(keySpot, keyItem) for keySpot, keyItem, _ in lstCollisions} == setExpected
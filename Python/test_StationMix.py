@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (test_StationMix.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Tests for StationMix.py
+#
+#Every mix is checked against HandMix(), which adds the spots to the whole common mix at once
+#with a loop per spot - no blocks - so a spot or fade that crosses a block boundary has to come
+#out the same as one that doesn't.
+#
+#Run with: python -m pytest (from the Python folder)
+#
+
+import pytest
+
+import RppProject
+import StationMix
+import WavInfo
+
+numpy = pytest.importorskip("numpy")
+
+intRate = 8000
+
+def ReadWav(strPath):
+	#(samples as floats, WAV info)
+	objInfo = WavInfo.ReadWavInfo(strPath)
+	return StationMix.ToFloat(StationMix.MapSamples(strPath, objInfo), objInfo), objInfo
+
+def HandMix(strCommonPath, lstSpots):
+	#the common mix with the spots added, before it's rounded to the output's bits
+	arrMix = ReadWav(strCommonPath)[0].copy()
+	for objSpot in lstSpots:
+		arrSpot = ReadWav(objSpot.strPath)[0][int(round(objSpot.fltOffset * intRate)):]
+		intStart = int(round(objSpot.fltPosition * intRate))
+		if intStart + len(arrSpot) > len(arrMix):
+			arrMix = numpy.concatenate((arrMix, numpy.zeros((intStart + len(arrSpot) - len(arrMix), arrMix.shape[1]))))
+		for intFrame in range(len(arrSpot)):
+			fltEnvelope = 1.0
+			if objSpot.fltFadeIn > 0.0:
+				fltEnvelope = min(fltEnvelope, intFrame / (objSpot.fltFadeIn * intRate))
+			if objSpot.fltFadeOut > 0.0:
+				fltEnvelope = min(fltEnvelope, (len(arrSpot) - intFrame) / (objSpot.fltFadeOut * intRate))
+			arrMix[intStart + intFrame] += arrSpot[intFrame] * objSpot.fltGain * fltEnvelope
+	return arrMix
+
+def Rounded(arrMix, intBits=16):
+	fltScale = float(1 << (intBits - 1))
+	return numpy.clip(numpy.round(arrMix * fltScale), -fltScale, fltScale - 1) / fltScale
+
+def Noise(intSeed, intFrames, intChannels, fltLevel):
+	return numpy.random.RandomState(intSeed).uniform(-fltLevel, fltLevel, (intFrames, intChannels))
+
+def Show(fnWriteWav, intBits=16):
+	#2 seconds of common mix, a mono spot with fades and a stereo spot
+	strCommonPath = fnWriteWav("common.wav", Noise(1, 2 * intRate, 2, 0.3), intRate, intBits)
+	lstSpots = [
+		#the fade in runs from 2400 to 3200 frames and the fade out from 5600 to 7200, so both
+		#	cross the 1000 frame blocks - and the first 400 frames of the WAV are skipped
+		StationMix.MixSpot(fnWriteWav("mono.wav", Noise(2, 5200, 1, 0.5), intRate), 0.3, 0.7, 0.05, 0.1, 0.2),
+		StationMix.MixSpot(fnWriteWav("stereo.wav", Noise(3, 3000, 2, 0.5), intRate), 0.85, 0.5),
+	]
+	return strCommonPath, lstSpots
+
+@pytest.mark.parametrize("intBlockFrames", [1000, 999, 7, 1, StationMix.conBlockFrames])
+def test_MatchesAHandMix(tmp_path, fnWriteWav, intBlockFrames):
+	strCommonPath, lstSpots = Show(fnWriteWav)
+	StationMix.MixStation(strCommonPath, lstSpots, str(tmp_path / "KAAA.wav"), intBlockFrames)
+	arrMix, objInfo = ReadWav(str(tmp_path / "KAAA.wav"))
+	assert (objInfo.intChannels, objInfo.intSampleRate, objInfo.intBitsPerSample) == (2, intRate, 16)
+	assert arrMix.shape == (2 * intRate, 2)
+	assert numpy.array_equal(arrMix, Rounded(HandMix(strCommonPath, lstSpots)))
+
+def test_SpotRunsPastTheShow(tmp_path, fnWriteWav):
+	strCommonPath, lstSpots = Show(fnWriteWav)
+	lstSpots.append(StationMix.MixSpot(fnWriteWav("last.wav", Noise(4, 2000, 1, 0.5), intRate), 1.9, 1.0, fltFadeOut=0.1))
+	StationMix.MixStation(strCommonPath, lstSpots, str(tmp_path / "KAAA.wav"), 1000)
+	arrMix = ReadWav(str(tmp_path / "KAAA.wav"))[0]
+	assert arrMix.shape == (int(1.9 * intRate) + 2000, 2)
+	assert numpy.array_equal(arrMix, Rounded(HandMix(strCommonPath, lstSpots)))
+
+def test_PartOfTheShow(tmp_path, fnWriteWav):
+	#a window mixed on its own is the same as that part of the whole mix
+	strCommonPath, lstSpots = Show(fnWriteWav)
+	StationMix.MixStation(strCommonPath, lstSpots, str(tmp_path / "KAAA.wav"), 1000)
+	StationMix.MixStation(strCommonPath, lstSpots, str(tmp_path / "window.wav"), 1000, 0.35, 0.8)
+	assert numpy.array_equal(ReadWav(str(tmp_path / "window.wav"))[0], ReadWav(str(tmp_path / "KAAA.wav"))[0][int(0.35 * intRate):int(0.8 * intRate)])
+
+def test_RoundedOnlyOnce(tmp_path, fnWriteWav):
+	#a 24-bit common mix is mixed with the spots before it's rounded to 16 bits
+	strCommonPath, lstSpots = Show(fnWriteWav, 24)
+	StationMix.MixStation(strCommonPath, lstSpots, str(tmp_path / "KAAA.wav"), 1000, intBitsPerSample=16)
+	arrMix, objInfo = ReadWav(str(tmp_path / "KAAA.wav"))
+	assert objInfo.intBitsPerSample == 16
+	assert numpy.array_equal(arrMix, Rounded(HandMix(strCommonPath, lstSpots)))
+	#rounding the common mix to 16 bits first would put thousands of samples off by one
+	arrCommon = ReadWav(strCommonPath)[0]
+	assert not numpy.array_equal(arrMix, Rounded(HandMix(strCommonPath, lstSpots) - arrCommon + Rounded(arrCommon)))
+
+def test_SpotsThatCantBeMixed(tmp_path, fnWriteWav):
+	strCommonPath, _ = Show(fnWriteWav)
+	for strName, arrSamples, intSpotRate in (("rate.wav", numpy.zeros((100, 2)), 44100), ("channels.wav", numpy.zeros((100, 3)), intRate)):
+		with pytest.raises(StationMix.MixError):
+			StationMix.MixStation(strCommonPath, [StationMix.MixSpot(fnWriteWav(strName, arrSamples, intSpotRate), 0.0)], str(tmp_path / "KAAA.wav"))
+
+def Item(strElements):
+	strText = "<REAPER_PROJECT 0.1\n  <TRACK\n    NAME \"Station VT\"\n    <ITEM\n      POSITION 0\n      LENGTH 5\n      LOOP 0\n      NAME \"IMPORT spot\"\n%s      <SOURCE WAVE\n        FILE \"spot.wav\"\n      >\n    >\n  >\n>\n" % \
+		"".join("      %s\n" % strElement for strElement in strElements.split("|"))
+	objProject = RppProject.ParseLines("show.RPP", strText.splitlines(True), "Station VT", "IMPORT ", "-")
+	return objProject, objProject.lstImportItems[0]
+
+def test_ItemMix():
+	assert StationMix.ItemMix(*Item("VOLPAN 0.5 0 1 -1|TAKEVOLPAN 0 0.8 -1|SOFFS 1.5|FADEIN 0 0.25 0|FADEOUT 0 0 0.5")) == (0.5 * 0.8, 1.5, 0.25, 0.5)
+	assert StationMix.ItemMix(*Item("VOLPAN 0.5 0 1 -1|MUTE 1 0"))[0] == 0.0
+	for strElements in ("VOLPAN 1 0.5 1 -1", "FADEIN 1 0.25 0", "PLAYRATE 1.5 1 0 -1 0 0.0025"):
+		with pytest.raises(StationMix.MixError):
+			StationMix.ItemMix(*Item(strElements))
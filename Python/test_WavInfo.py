@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (test_WavInfo.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Tests for WavInfo.py
+#
+#Run with: python -m pytest (from the Python folder)
+#
+
+import struct
+
+import pytest
+
+import WavInfo
+
+numpy = pytest.importorskip("numpy")
+
+@pytest.mark.parametrize("intBitsPerSample, blnFloat, intChannels", [(16, False, 2), (24, False, 2), (16, False, 1), (32, True, 2), (24, False, 6)])
+def test_HeaderRoundTrip(fnWriteWav, intBitsPerSample, blnFloat, intChannels):
+	strPath = fnWriteWav("spot.wav", numpy.zeros((1001, intChannels)), 48000, intBitsPerSample, blnFloat)
+	objInfo = WavInfo.ReadWavInfo(strPath)
+	assert objInfo.intFormat == (WavInfo.WaveFormatFloat if blnFloat else WavInfo.WaveFormatPCM)
+	assert objInfo.blnFloat == blnFloat
+	assert (objInfo.intChannels, objInfo.intSampleRate, objInfo.intBitsPerSample) == (intChannels, 48000, intBitsPerSample)
+	assert objInfo.intBlockAlign == intChannels * intBitsPerSample // 8
+	assert objInfo.intFrames == 1001
+	assert objInfo.intDataSize == 1001 * objInfo.intBlockAlign
+	assert objInfo.fltDuration == pytest.approx(1001 / 48000.0)
+
+def test_ExtensibleFormatForMoreThan16Bits(fnWriteWav):
+	#the format tag is WAVE_FORMAT_EXTENSIBLE and the real format is read from the sub-format
+	strPath = fnWriteWav("spot.wav", numpy.zeros((10, 2)), 44100, 24)
+	with open(strPath, "rb") as fWav:
+		bytHeader = fWav.read(64)
+	assert struct.unpack("<H", bytHeader[20:22])[0] == WavInfo.WaveFormatExtensible
+	assert WavInfo.ReadWavInfo(strPath).intFormat == WavInfo.WaveFormatPCM
+
+def test_DataOffsetPastOddSizedChunks(tmp_path):
+	#chunks are word aligned, so a 3 byte chunk is followed by a pad byte
+	bytFmt = struct.pack("<HHIIHH", WavInfo.WaveFormatPCM, 1, 8000, 16000, 2, 16)
+	bytData = struct.pack("<4h", 1, 2, 3, 4)
+	bytChunks = b"fmt " + struct.pack("<I", len(bytFmt)) + bytFmt + b"LIST" + struct.pack("<I", 3) + b"abc\x00" + b"data" + struct.pack("<I", len(bytData)) + bytData
+	strPath = str(tmp_path / "chunks.wav")
+	with open(strPath, "wb") as fWav:
+		fWav.write(b"RIFF" + struct.pack("<I", 4 + len(bytChunks)) + b"WAVE" + bytChunks)
+	objInfo = WavInfo.ReadWavInfo(strPath)
+	assert objInfo.intFrames == 4
+	assert objInfo.intDataOffset == 12 + 8 + len(bytFmt) + 8 + 4 + 8
+
+def test_TruncatedDataIsCutToTheFile(tmp_path):
+	#a render that was never finished claims more frames than the file holds
+	objInfo = WavInfo.WavInfo(WavInfo.WaveFormatPCM, 2, 44100, 16, 4)
+	strPath = str(tmp_path / "truncated.wav")
+	with open(strPath, "wb") as fWav:
+		fWav.write(WavInfo.WavHeader(objInfo, 1000))
+		fWav.write(bytes(400 * 4 + 3))
+	assert WavInfo.ReadWavInfo(strPath).intFrames == 400
+
+def test_RF64ForBigFiles(tmp_path):
+	objInfo = WavInfo.WavInfo(WavInfo.WaveFormatPCM, 2, 44100, 16, 4)
+	intFrames = 0x40000000 #4GB of 16-bit stereo
+	bytHeader = WavInfo.WavHeader(objInfo, intFrames)
+	assert bytHeader[:4] == b"RF64"
+	assert bytHeader[12:16] == b"ds64"
+	assert struct.unpack("<Q", bytHeader[28:36])[0] == intFrames * 4
+	assert WavInfo.WavHeader(objInfo, 1000)[:4] == b"RIFF"
+
+	#the 64-bit data size comes from ds64 - here it's more than the file holds
+	strPath = str(tmp_path / "big.wav")
+	with open(strPath, "wb") as fWav:
+		fWav.write(bytHeader)
+		fWav.write(bytes(10 * 4))
+	objRead = WavInfo.ReadWavInfo(strPath)
+	assert objRead.intDataOffset == len(bytHeader)
+	assert objRead.intFrames == 10
+
+def test_NotAWav(tmp_path):
+	strPath = str(tmp_path / "spot.wav")
+	with open(strPath, "wb") as fWav:
+		fWav.write(b"ID3\x03\x00" + bytes(100))
+	with pytest.raises(WavInfo.WavError):
+		WavInfo.ReadWavInfo(strPath)
+
+def test_NoDataChunk(tmp_path):
+	bytFmt = struct.pack("<HHIIHH", WavInfo.WaveFormatPCM, 1, 8000, 16000, 2, 16)
+	strPath = str(tmp_path / "spot.wav")
+	with open(strPath, "wb") as fWav:
+		fWav.write(b"RIFF" + struct.pack("<I", 4 + 8 + len(bytFmt)) + b"WAVE" + b"fmt " + struct.pack("<I", len(bytFmt)) + bytFmt)
+	with pytest.raises(WavInfo.WavError):
+		WavInfo.ReadWavInfo(strPath)
+
+def test_CacheReadsChangedFilesAgain(tmp_path, fnWriteWav):
+	strPath = fnWriteWav("spot.wav", numpy.zeros((100, 2)))
+	objCache = WavInfo.WavInfoCache(str(tmp_path / "cache"))
+	assert objCache.Get(strPath).intFrames == 100
+	assert objCache.Get(strPath).intFrames == 100
+	assert (objCache.intHits, objCache.intMisses) == (1, 1)
+	objCache.Save()
+
+	#the index is kept between runs, and a file that changed size is read again
+	fnWriteWav("spot.wav", numpy.zeros((250, 2)))
+	objCache = WavInfo.WavInfoCache(str(tmp_path / "cache"))
+	assert objCache.Get(strPath).intFrames == 250
+	assert objCache.intMisses == 1
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+#****************************************************************************************
+#****************************************************************************************
+#**   Reaper Radio Show Rendering Utility (test_WorkQueue.py)
+#**
+#**   Copyright (C) 2017 - Mike Soultanian - mike@soultanian.com
+#**
+#**   This program is free software; you can redistribute it and/or
+#**   modify it under the terms of the GNU General Public License
+#**   as published by the Free Software Foundation; either version 2
+#**   of the License, or (at your option) any later version.
+#**
+#**   This program is distributed in the hope that it will be useful,
+#**   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#**   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#**   GNU General Public License for more details.
+#**
+#**   You should have received a copy of the GNU General Public License
+#**   along with this program; if not, write to the Free Software
+#**   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+#**
+#**   This header must appear on all derivatives of this code.
+#****************************************************************************************
+#****************************************************************************************
+#
+#Tests for WorkQueue.py
+#
+#The jobs are queued the way RenderShow.py queues them, with a QueueExecutor, and rendered by
+#real WorkQueue.py workers whose render command is a small stand-in for Reaper.  The stand-in
+#writes a one second WAV to the project's RENDER_FILE and logs the name of every project it
+#renders, so it's known how many times each job was rendered.
+#
+#Run with: python -m pytest (from the Python folder)
+#
+
+import os
+import sys
+import subprocess
+
+import RenderScheduler
+import WorkQueue
+
+strStandInRenderer = """
+import sys
+import wave
+
+strProjectPath, strLogPath = sys.argv[1], sys.argv[2]
+with open(strProjectPath, "r") as fProject:
+	dictProject = dict(strLine.strip().split(" ", 1) for strLine in fProject if strLine.strip())
+with open(strLogPath, "a") as fLog:
+	fLog.write(dictProject["NAME"] + "\\n")
+objWav = wave.open(dictProject["RENDER_FILE"].strip('"'), "wb")
+objWav.setnchannels(1)
+objWav.setsampwidth(2)
+objWav.setframerate(8000)
+objWav.writeframes(bytes(16000))
+objWav.close()
+"""
+
+strWorkQueuePath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "WorkQueue.py")
+
+def Executor(tmp_path):
+	#a QueueExecutor whose jobs are rendered by the stand-in - returns it and the render log's path
+	strRendererPath = str(tmp_path / "renderer.py")
+	with open(strRendererPath, "w") as fRenderer:
+		fRenderer.write(strStandInRenderer)
+	strLogPath = str(tmp_path / "renders.log")
+	objExecutor = WorkQueue.QueueExecutor(str(tmp_path / "queue"), "\"{python}\" \"{renderer}\" \"{project}\" \"{log}\"",
+		{"python": sys.executable, "renderer": strRendererPath, "log": strLogPath}, fnLog=lambda strMessage: None)
+	return objExecutor, strLogPath
+
+def Job(tmp_path, strName):
+	#a station job - its output path is the render folder the way RenderShow sees it, which the
+	#	workers don't, so they only find it with --renderpath
+	os.makedirs(str(tmp_path / "projects"), exist_ok=True)
+	strProjectPath = str(tmp_path / "projects" / (strName + ".RPP"))
+	strOutputPath = str(tmp_path / "RenderShow's view" / (strName + ".wav"))
+	with open(strProjectPath, "w") as fProject:
+		fProject.write("NAME %s\nRENDER_FILE \"%s\"\n" % (strName, strOutputPath))
+	return RenderScheduler.RenderJob(strName, strProjectPath, strOutputPath, 1.0)
+
+def Renders(strLogPath):
+	#the names of the projects the stand-in rendered, in the order it rendered them
+	if not os.path.exists(strLogPath):
+		return []
+	with open(strLogPath, "r") as fLog:
+		return fLog.read().splitlines()
+
+def Worker(tmp_path, strName):
+	return WorkQueue.QueueWorker(str(tmp_path / "queue"), strName, strRenderPath=str(tmp_path / "renders"), fnLog=lambda strMessage: None)
+
+def QueuedJob(tmp_path, strName):
+	#queue a job without waiting for it - returns its folder, its job.json and the render log's path
+	objExecutor, strLogPath = Executor(tmp_path)
+	objJob = Job(tmp_path, strName)
+	objJob.intAttempts = 1
+	strJobPath = objExecutor.Submit(objJob)
+	return strJobPath, WorkQueue.ReadJson(os.path.join(strJobPath, WorkQueue.conJobFilename)), strLogPath
+
+def test_TwoWorkersRenderEveryJobOnce(tmp_path):
+	os.makedirs(str(tmp_path / "renders"))
+	objExecutor, strLogPath = Executor(tmp_path)
+	lstNames = ["K%03i" % intJob for intJob in range(8)]
+	#the render folder is checked where the workers publish to
+	objScheduler = RenderScheduler.RenderScheduler(objExecutor, intWorkers=len(lstNames), intMaxAttempts=1, fnLog=lambda strMessage: None,
+		fnVerify=lambda objJob: "" if os.path.exists(str(tmp_path / "renders" / os.path.basename(objJob.strOutputPath))) else "not published")
+	for strName in lstNames:
+		objScheduler.Add(Job(tmp_path, strName))
+
+	lstWorkers = [subprocess.Popen([sys.executable, strWorkQueuePath, str(tmp_path / "queue"), "--name", "worker%i" % intWorker, "--renderpath", str(tmp_path / "renders"), "--idleexit", "5"],
+		stdout=subprocess.DEVNULL) for intWorker in (1, 2)]
+	try:
+		objSummary = objScheduler.Run()
+		for objWorker in lstWorkers:
+			assert objWorker.wait(timeout=30) == 0
+	finally:
+		for objWorker in lstWorkers:
+			if objWorker.poll() is None:
+				objWorker.kill()
+				objWorker.wait()
+
+	assert objSummary.intSuccessCnt == len(lstNames)
+	assert [objJob.strError for objJob in objSummary.lstJobs] == [""] * len(lstNames)
+	assert sorted(Renders(strLogPath)) == lstNames
+	assert sorted(os.listdir(str(tmp_path / "renders"))) == [strName + ".wav" for strName in lstNames]
+	assert not os.path.exists(str(tmp_path / "RenderShow's view"))
+	#the finished jobs are cleared out of the queue
+	assert os.listdir(str(tmp_path / "queue" / WorkQueue.conJobsFolder)) == []
+
+def test_OnlyOneWorkerGetsAClaim(tmp_path):
+	strJobPath, dictJob, strLogPath = QueuedJob(tmp_path, "KAAA")
+	objFirst = Worker(tmp_path, "first")
+	fltNow = objFirst.ServerTime()
+	objLease = objFirst.Claim(strJobPath, dictJob, fltNow)
+	assert objLease.intClaim == 1
+	assert Worker(tmp_path, "second").Claim(strJobPath, dictJob, fltNow) is None
+	assert Worker(tmp_path, "second").ClaimNext() is None
+	assert WorkQueue.ReadJson(WorkQueue.LeasePath(strJobPath, 1))["worker"] == "first"
+
+def test_ExpiredLeaseIsClaimedAgain(tmp_path):
+	strJobPath, dictJob, strLogPath = QueuedJob(tmp_path, "KAAA")
+	objWorker = Worker(tmp_path, "second")
+	#a worker claimed the job and stopped touching its lease more than a lease timeout ago
+	objDead = Worker(tmp_path, "dead").Claim(strJobPath, dictJob, 0.0)
+	fltStale = objWorker.ServerTime() - dictJob["leasetimeout"] - 10.0
+	os.utime(WorkQueue.LeasePath(strJobPath, 1), (fltStale, fltStale))
+
+	strClaimedPath, _, objLease = objWorker.ClaimNext()
+	assert (strClaimedPath, objLease.intClaim) == (strJobPath, 2)
+	assert objDead.Lost()
+	objWorker.Run(strJobPath, dictJob, objLease)
+	dictResult = WorkQueue.ReadJson(os.path.join(strJobPath, WorkQueue.conResultFilename))
+	assert (dictResult["error"], dictResult["worker"], dictResult["claim"]) == ("", "second", 2)
+	assert Renders(strLogPath) == ["KAAA"]
+	assert os.path.exists(str(tmp_path / "renders" / "KAAA.wav"))
+	#a finished job isn't picked up again
+	assert objWorker.ClaimNext() is None
+
+def test_LeaseInUseIsLeftAlone(tmp_path):
+	strJobPath, dictJob, strLogPath = QueuedJob(tmp_path, "KAAA")
+	Worker(tmp_path, "first").Claim(strJobPath, dictJob, 0.0)
+	assert Worker(tmp_path, "second").ClaimNext() is None
+	assert WorkQueue.CurrentClaim(strJobPath) == 1
+
+def test_GivenUpAfterMaxClaims(tmp_path):
+	strJobPath, dictJob, strLogPath = QueuedJob(tmp_path, "KAAA")
+	objWorker = Worker(tmp_path, "last")
+	fltStale = objWorker.ServerTime() - dictJob["leasetimeout"] - 10.0
+	for intClaim in range(1, WorkQueue.conMaxClaims + 1):
+		with open(WorkQueue.LeasePath(strJobPath, intClaim), "w") as fLease:
+			fLease.write("{}")
+		os.utime(WorkQueue.LeasePath(strJobPath, intClaim), (fltStale, fltStale))
+
+	_, _, objLease = objWorker.ClaimNext()
+	assert objLease.intClaim == WorkQueue.conMaxClaims + 1
+	objWorker.Run(strJobPath, dictJob, objLease)
+	dictResult = WorkQueue.ReadJson(os.path.join(strJobPath, WorkQueue.conResultFilename))
+	assert dictResult["error"] == "given up on after %i workers stopped responding while rendering it" % WorkQueue.conMaxClaims
+	assert Renders(strLogPath) == []
+	assert not os.path.exists(str(tmp_path / "renders"))
+
+def test_LostLeaseLeavesNoResult(tmp_path):
+	#the job was claimed again while this worker was rendering it, so the result is the new worker's to write
+	strJobPath, dictJob, strLogPath = QueuedJob(tmp_path, "KAAA")
+	objWorker = Worker(tmp_path, "slow")
+	objLease = objWorker.Claim(strJobPath, dictJob, objWorker.ServerTime())
+	with open(WorkQueue.LeasePath(strJobPath, 2), "w") as fLease:
+		fLease.write("{}")
+	objWorker.Run(strJobPath, dictJob, objLease)
+	assert not os.path.exists(os.path.join(strJobPath, WorkQueue.conResultFilename))
+	assert not os.path.exists(str(tmp_path / "renders" / "KAAA.wav"))